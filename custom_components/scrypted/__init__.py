@@ -1,188 +1,154 @@
 """The Scrypted integration."""
 
+import asyncio
 import logging
-from typing import Any
+from collections.abc import Awaitable
+from typing import TYPE_CHECKING, Any
 
-from aiohttp import ClientConnectorError
+from aiohttp import ClientConnectorError, ClientError, ClientResponseError
 
 from homeassistant.components.frontend import (
     async_register_built_in_panel,
     async_remove_panel,
 )
-from homeassistant.components.lovelace.const import (
-    CONF_RESOURCE_TYPE_WS,
-    DOMAIN as LL_DOMAIN,
-)
-from homeassistant.components.lovelace.resources import (
-    ResourceStorageCollection,
-    ResourceYAMLCollection,
-)
-from homeassistant.components.persistent_notification import async_create
 from homeassistant.config_entries import SOURCE_IMPORT, SOURCE_REAUTH, ConfigEntry
-from homeassistant.const import CONF_ICON, CONF_ID, CONF_NAME, CONF_URL, Platform
+from homeassistant.const import CONF_HOST, CONF_ICON, CONF_NAME, Platform
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.exceptions import ConfigEntryNotReady
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.dispatcher import async_dispatcher_send
 from homeassistant.helpers.typing import ConfigType
 
-from .const import CONF_AUTO_REGISTER_RESOURCES, CONF_SCRYPTED_NVR, DOMAIN
-from .http import ScryptedView, retrieve_token
+from .api import ScryptedClient
+from .const import (
+    CONF_AUTO_REGISTER_RESOURCES,
+    CONF_BACKUP_HOSTS,
+    CONF_CLUSTER_ROUTING,
+    CONF_LOOP_MONITOR,
+    CONF_SCRYPTED_NVR,
+    DATA_ENTRIES,
+    DOMAIN,
+    SIGNAL_TOKEN_UPDATED,
+)
+from .devices import ScryptedDevices
+from .events import ScryptedEventStream
+from .http import (
+    ProxyActivity,
+    ScryptedView,
+    check_endpoint,
+    parse_backup_hosts,
+    retrieve_content_hash,
+    retrieve_token,
+)
+from .models import ScryptedEntryData
+from .store import ScryptedDeviceStore, ScryptedTokenStore
+
+if TYPE_CHECKING:
+    from .cluster import ClusterRoutes
+    from .endpoints import EndpointPool
+    from .loop_monitor import LoopLagMonitor
+    from .resources import LovelaceResourceReconciler
 
 PLATFORMS = [
-    Platform.SENSOR
+    Platform.BINARY_SENSOR,
+    Platform.CAMERA,
+    Platform.EVENT,
+    Platform.SENSOR,
 ]
 
 _LOGGER = logging.getLogger(__name__)
-_RESOURCE_TRACKER = f"{DOMAIN}_lovelace_resources"
+_RESOURCE_RECONCILER = f"{DOMAIN}_lovelace_resources"
+_TOKEN_STORE = f"{DOMAIN}_tokens"
+_VIEW = f"{DOMAIN}_view"
+_LOOP_MONITOR = f"{DOMAIN}_loop_monitor"
+_LOGIN_RETRY_MIN = 5
+_LOGIN_RETRY_MAX = 300
 _OPTION_DEFAULTS = {
     CONF_AUTO_REGISTER_RESOURCES: False,
     CONF_SCRYPTED_NVR: False,
 }
+_CARD_RESOURCE_PATH = "endpoint/@scrypted/nvr/assets/web-components"
+_CARD_RESOURCES = (("module", "js"), ("css", "css"))
 
 
-def _get_card_resource_definitions(token: str) -> list[tuple[str, str]]:
-    """Return the Lovelace resources that power the Scrypted cards."""
-    base_url = f"/api/{DOMAIN}/{token}/endpoint/@scrypted/nvr/assets/web-components"
-    return [
-        ("module", f"{base_url}.js"),
-        ("css", f"{base_url}.css"),
-    ]
+def _get_card_resource_definitions(
+    token: str, versions: dict[str, str] | None = None
+) -> list[tuple[str, str]]:
+    """Return the Lovelace resources that power the Scrypted cards.
 
-
-async def _async_register_lovelace_resource(
-    hass: HomeAssistant, token: str, entry_id: str
-) -> None:
-    """Register the Lovelace resources used by the custom cards.
-
-    We inspect the current Lovelace storage collection and only create entries for URLs
-    that are missing. When an entry is auto-created we remember which URLs belong to the
-    config entry so a later unload can tear down exactly the resources the integration added.
+    When the content hash of a bundle is known its URL carries it as `?v=<hash>`,
+    which lets browsers cache the bundle forever and still pick up upstream updates.
     """
-    lovelace_data = hass.data.get(LL_DOMAIN)
-    if not lovelace_data or not lovelace_data.resources:
-        return
-
-    resources: ResourceStorageCollection | ResourceYAMLCollection = lovelace_data.resources
-    if not resources.loaded:
-        await resources.async_load()
-        resources.loaded = True
-
-    # Keep track of which URLs we created so we can cleanly undo only those later.
-    tracker: dict[str, set[str]] = hass.data.setdefault(_RESOURCE_TRACKER, {})
-    entry_tracker = tracker.setdefault(entry_id, set())
-
-    created_resource = False
-    for resource_type, resource_url in _get_card_resource_definitions(token):
-        # Skip creation when Home Assistant already has an entry for this URL.
+    versions = versions or {}
+    base_url = f"/api/{DOMAIN}/{token}/{_CARD_RESOURCE_PATH}"
+    definitions = []
+    for resource_type, extension in _CARD_RESOURCES:
+        url = f"{base_url}.{extension}"
+        if version := versions.get(extension):
+            url = f"{url}?v={version}"
+        definitions.append((resource_type, url))
+    return definitions
+
+
+async def _async_get_resource_versions(
+    hass: HomeAssistant, config_entry: ConfigEntry, token: str
+) -> dict[str, str]:
+    """Hash the card bundles currently served by Scrypted."""
+    session = async_get_clientsession(hass, verify_ssl=False)
+    versions: dict[str, str] = {}
+    for _, extension in _CARD_RESOURCES:
         try:
-            resource_id = next(
-                data.get(CONF_ID)
-                for data in resources.async_items()
-                if data[CONF_URL] == resource_url
-            )
-        except StopIteration:
-            if isinstance(resources, ResourceYAMLCollection):
-                _LOGGER.warning(
-                    "Scrypted Lovelace resource can't automatically be registered "
-                    "because this Home Assistant instance manages resources via YAML. "
-                    "Please register the following resource manually:\n"
-                    "  - url: %s\n    type: %s",
-                    resource_url,
-                    resource_type,
-                )
-                continue
-
-            data = await resources.async_create_item(
-                {CONF_RESOURCE_TYPE_WS: resource_type, CONF_URL: resource_url}
+            versions[extension] = await retrieve_content_hash(
+                config_entry.data, session, token, f"{_CARD_RESOURCE_PATH}.{extension}"
             )
-            entry_tracker.add(resource_url)
-            created_resource = True
+        except (ClientError, asyncio.TimeoutError) as err:
             _LOGGER.debug(
-                "Registered Scrypted Lovelace resource (resource ID %s) for entry %s",
-                data.get(CONF_ID),
-                entry_id,
+                "Unable to hash Scrypted resource %s.%s: %s",
+                _CARD_RESOURCE_PATH,
+                extension,
+                err,
             )
-        else:
-            _LOGGER.debug(
-                "Scrypted Lovelace resource already registered with resource ID %s",
-                resource_id,
-            )
-
-    if not entry_tracker:
-        tracker.pop(entry_id, None)
-    if not tracker:
-        hass.data.pop(_RESOURCE_TRACKER, None)
+    return versions
 
 
-async def _async_unregister_lovelace_resource(
-    hass: HomeAssistant, token: str, entry_id: str
-) -> None:
-    """Remove any Lovelace resources created for this entry.
-
-    During unload we look up the URLs that were created while the entry was active and
-    remove only those resources, leaving any manually registered URLs intact.
-    """
-    tracker: dict[str, set[str]] | None = hass.data.get(_RESOURCE_TRACKER)
-    if not tracker or entry_id not in tracker:
-        return
+def _get_resource_reconciler(hass: HomeAssistant) -> "LovelaceResourceReconciler":
+    """Return the reconciler shared by all Scrypted entries."""
+    if (reconciler := hass.data.get(_RESOURCE_RECONCILER)) is None:
+        # Imported on first use, Lovelace isn't needed unless resources are managed.
+        from .resources import LovelaceResourceReconciler
 
-    tracked_urls = tracker.pop(entry_id)
-    if not tracked_urls:
-        if not tracker:
-            hass.data.pop(_RESOURCE_TRACKER, None)
-        return
-
-    lovelace_data = hass.data.get(LL_DOMAIN)
-    if not lovelace_data or not lovelace_data.resources:
-        if not tracker:
-            hass.data.pop(_RESOURCE_TRACKER, None)
-        return
+        reconciler = hass.data[_RESOURCE_RECONCILER] = LovelaceResourceReconciler(hass)
+    return reconciler
 
-    resources: ResourceStorageCollection | ResourceYAMLCollection = lovelace_data.resources
-    if not resources.loaded:
-        await resources.async_load()
-        resources.loaded = True
 
-    for resource_url in tracked_urls:
-        # Only delete resources that are still present and managed via storage.
-        try:
-            resource_id = next(
-                data.get(CONF_ID)
-                for data in resources.async_items()
-                if data[CONF_URL] == resource_url
-            )
-        except StopIteration:
-            _LOGGER.debug(
-                "Scrypted resource %s was not found while unloading entry %s",
-                resource_url,
-                entry_id,
-            )
-            continue
+async def _async_register_lovelace_resource(
+    hass: HomeAssistant,
+    token: str,
+    entry_id: str,
+    versions: dict[str, str] | None = None,
+) -> None:
+    """Register the Lovelace resources used by the custom cards."""
+    await _get_resource_reconciler(hass).async_update_entry(
+        entry_id, _get_card_resource_definitions(token, versions)
+    )
 
-        if isinstance(resources, ResourceYAMLCollection):
-            _LOGGER.debug(
-                "Resources switched to YAML mode after registration, skipping automatic removal for %s",
-                resource_url,
-            )
-            continue
 
-        await resources.async_delete_item(resource_id)
-        _LOGGER.debug(
-            "Removed Scrypted Lovelace resource (resource ID %s) for entry %s",
-            resource_id,
-            entry_id,
-        )
-
-    if not tracker:
-        hass.data.pop(_RESOURCE_TRACKER, None)
+async def _async_unregister_lovelace_resource(
+    hass: HomeAssistant, entry_id: str
+) -> None:
+    """Remove any Lovelace resources created for this entry."""
+    await _get_resource_reconciler(hass).async_remove_entry(entry_id)
 
 
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     """Auth setup."""
     session = async_get_clientsession(hass, verify_ssl=False)
-    hass.http.register_view(ScryptedView(hass, session))
+    view = hass.data[_VIEW] = ScryptedView(hass, session)
+    hass.http.register_view(view)
 
     if DOMAIN in config:
+        from homeassistant.components.persistent_notification import async_create
+
         async_create(
             hass,
             (
@@ -200,53 +166,31 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     return True
 
 
-async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> bool:
-    """Set up a Scrypted config entry."""
-
-    @callback
-    def _reauth(data: dict[str, Any]) -> bool:
-        """Start Reauth flow."""
-        payload = {**config_entry.data, **config_entry.options, **data}
-        hass.async_create_task(
-            hass.config_entries.flow.async_init(
-                DOMAIN,
-                context={
-                    "source": SOURCE_REAUTH,
-                    "entry_id": config_entry.entry_id,
-                    "data": payload,
-                    "options": dict(config_entry.options),
-                },
-            )
-        )
-        return False
-
-    if not config_entry.data:
-        return _reauth(config_entry.options)
-
-    changed = await _async_ensure_entry_options(hass, config_entry)
-    if changed:
-        hass.async_create_task(
-            hass.config_entries.async_reload(config_entry.entry_id)
+@callback
+def _async_start_reauth(
+    hass: HomeAssistant, config_entry: ConfigEntry, data: dict[str, Any]
+) -> bool:
+    """Start Reauth flow."""
+    payload = {**config_entry.data, **config_entry.options, **data}
+    hass.async_create_task(
+        hass.config_entries.flow.async_init(
+            DOMAIN,
+            context={
+                "source": SOURCE_REAUTH,
+                "entry_id": config_entry.entry_id,
+                "data": payload,
+                "options": dict(config_entry.options),
+            },
         )
-        return False
-
-    session = async_get_clientsession(hass, verify_ssl=False)
-    try:
-        if not (token := await retrieve_token(config_entry.data, session)):
-            return _reauth(config_entry.data)
-    except Exception as e:
-        if isinstance(e, ClientConnectorError):
-            raise ConfigEntryNotReady("ClientConnectorError. Is the Scrypted host down? Retrying.")
-        raise e
-
-    hass.data.setdefault(DOMAIN, {})[token] = config_entry
-    config_entry.async_on_unload(
-        config_entry.add_update_listener(_async_update_listener)
     )
+    return False
 
-    if config_entry.options.get(CONF_AUTO_REGISTER_RESOURCES):
-        await _async_register_lovelace_resource(hass, token, config_entry.entry_id)
 
+@callback
+def _async_register_panel(
+    hass: HomeAssistant, config_entry: ConfigEntry, token: str
+) -> None:
+    """Register the sidebar panel served under the token's URL."""
     custom_panel_config = {
         "name": "ha-panel-scrypted",
         # "embed_iframe": True,
@@ -268,30 +212,292 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> b
         require_admin=False,
     )
 
-    # Set up token sensor
+
+def _get_loop_monitor(hass: HomeAssistant) -> "LoopLagMonitor":
+    """Return the event loop lag monitor shared by all Scrypted entries."""
+    if (monitor := hass.data.get(_LOOP_MONITOR)) is None:
+        # Imported on first use, most installations never enable the monitor.
+        from .loop_monitor import LoopLagMonitor
+
+        view: ScryptedView | None = hass.data.get(_VIEW)
+        monitor = hass.data[_LOOP_MONITOR] = LoopLagMonitor(
+            hass, view.activity if view is not None else ProxyActivity()
+        )
+    return monitor
+
+
+def _entry_hosts(config_entry: ConfigEntry) -> list[str]:
+    """Return the configured host and the hosts to fail over to, in order."""
+    try:
+        backups = parse_backup_hosts(config_entry.options.get(CONF_BACKUP_HOSTS, ""))
+    except ValueError:
+        _LOGGER.warning(
+            "Ignoring invalid Scrypted backup hosts of %s", config_entry.title
+        )
+        backups = []
+    return list(dict.fromkeys([config_entry.data[CONF_HOST], *backups]))
+
+
+async def _async_retrieve_token(hass: HomeAssistant, config_entry: ConfigEntry) -> str:
+    """Log in through the entry's hosts in order, skipping the unreachable ones."""
+    session = async_get_clientsession(hass, verify_ssl=False)
+    *backups, last = _entry_hosts(config_entry)
+    for host in backups:
+        try:
+            return await retrieve_token({**config_entry.data, CONF_HOST: host}, session)
+        except ClientConnectorError as err:
+            _LOGGER.debug("Unable to reach Scrypted at %s: %s", host, err)
+    return await retrieve_token({**config_entry.data, CONF_HOST: last}, session)
+
+
+def _create_endpoint_pool(
+    hass: HomeAssistant, config_entry: ConfigEntry
+) -> "EndpointPool | None":
+    """Create the pool of an entry with backup hosts."""
+    if len(hosts := _entry_hosts(config_entry)) < 2:
+        return None
+    # Imported on first use, most entries have a single host.
+    from .endpoints import EndpointPool
+
+    session = async_get_clientsession(hass, verify_ssl=False)
+
+    def _login(host: str) -> Awaitable[str]:
+        return retrieve_token({**config_entry.data, CONF_HOST: host}, session)
+
+    def _ping(host: str) -> Awaitable[None]:
+        return check_endpoint(host, session)
+
+    return EndpointPool(hass, config_entry.entry_id, hosts, _login, _ping)
+
+
+def _create_cluster_routes(
+    hass: HomeAssistant, config_entry: ConfigEntry, client: ScryptedClient
+) -> "ClusterRoutes | None":
+    """Create the cluster routes of an entry that sends media to workers."""
+    if not config_entry.options.get(CONF_CLUSTER_ROUTING):
+        return None
+    # Imported on first use, most servers run without workers.
+    from .cluster import ClusterRoutes
+
+    return ClusterRoutes(hass, client)
+
+
+def _get_token_store(hass: HomeAssistant) -> ScryptedTokenStore:
+    """Return the token store shared by all Scrypted entries."""
+    if (store := hass.data.get(_TOKEN_STORE)) is None:
+        store = hass.data[_TOKEN_STORE] = ScryptedTokenStore(hass)
+    return store
+
+
+async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> bool:
+    """Set up a Scrypted config entry.
+
+    When a token from a previous login is stored the entry is set up with it right
+    away and the login is validated in the background, so Home Assistant's startup
+    doesn't depend on how quickly Scrypted responds.
+    """
+    if not config_entry.data:
+        return _async_start_reauth(hass, config_entry, config_entry.options)
+
+    changed = await _async_ensure_entry_options(hass, config_entry)
+    if changed:
+        hass.async_create_task(
+            hass.config_entries.async_reload(config_entry.entry_id)
+        )
+        return False
+
+    token_store = _get_token_store(hass)
+    if token := await token_store.async_get(config_entry.entry_id):
+        validated = False
+    else:
+        try:
+            if not (token := await _async_retrieve_token(hass, config_entry)):
+                return _async_start_reauth(hass, config_entry, config_entry.data)
+        except Exception as e:
+            if isinstance(e, ClientConnectorError):
+                raise ConfigEntryNotReady("ClientConnectorError. Is the Scrypted host down? Retrying.")
+            raise e
+        await token_store.async_set(config_entry.entry_id, token)
+        validated = True
+
+    hass.data.setdefault(DOMAIN, {})[token] = config_entry
+    client = ScryptedClient(
+        async_get_clientsession(hass, verify_ssl=False), config_entry.data, token
+    )
+    devices = ScryptedDevices(
+        hass,
+        config_entry.entry_id,
+        client,
+        ScryptedDeviceStore(hass, config_entry.entry_id),
+    )
+    # Entities of the last run come back with their last state before Scrypted
+    # answers; discovery reconciles them with the live list.
+    await devices.async_restore()
+    entry_data = ScryptedEntryData(
+        client=client,
+        devices=devices,
+        events=ScryptedEventStream(
+            hass, config_entry.entry_id, client, devices=devices
+        ),
+    )
+    hass.data.setdefault(DATA_ENTRIES, {})[config_entry.entry_id] = entry_data
+    view: ScryptedView | None = hass.data.get(_VIEW)
+    if (pool := _create_endpoint_pool(hass, config_entry)) is not None:
+        entry_data.endpoints = pool
+        pool.async_start(config_entry)
+        if view is not None:
+            view.async_set_pool(config_entry.entry_id, pool)
+    if (routes := _create_cluster_routes(hass, config_entry, client)) is not None:
+        entry_data.cluster = entry_data.events.routes = client.routes = routes
+        routes.async_start(config_entry)
+        if view is not None:
+            view.async_set_routes(config_entry.entry_id, routes)
+    config_entry.async_on_unload(
+        config_entry.add_update_listener(_async_update_listener)
+    )
+
+    _async_register_panel(hass, config_entry, token)
+
+    if config_entry.options.get(CONF_LOOP_MONITOR):
+        monitor = entry_data.loop_monitor = _get_loop_monitor(hass)
+        monitor.async_add_entry(config_entry.entry_id)
+        config_entry.async_on_unload(
+            lambda: monitor.async_remove_entry(config_entry.entry_id)
+        )
+
+    # Set up the device entities, the token sensor and the loop lag sensors
     await hass.config_entries.async_forward_entry_setups(
         config_entry, PLATFORMS
     )
+    # Events are only subscribed to once the device list showed the API is there.
+    entry_data.devices.async_start(config_entry, entry_data.events.async_start)
+
+    config_entry.async_create_background_task(
+        hass,
+        _async_finish_setup(hass, config_entry, token, validated),
+        f"{DOMAIN} {config_entry.title} login",
+    )
     return True
 
 
+async def _async_finish_setup(
+    hass: HomeAssistant, config_entry: ConfigEntry, token: str, validated: bool
+) -> None:
+    """Validate a stored token and register the Lovelace resources."""
+    if not validated and (
+        token := await _async_validate_token(hass, config_entry, token)
+    ) is None:
+        return
+
+    if config_entry.options.get(CONF_AUTO_REGISTER_RESOURCES):
+        versions = await _async_get_resource_versions(hass, config_entry, token)
+        await _async_register_lovelace_resource(
+            hass, token, config_entry.entry_id, versions
+        )
+
+
+async def _async_validate_token(
+    hass: HomeAssistant, config_entry: ConfigEntry, token: str
+) -> str | None:
+    """Log in again and swap in the new token.
+
+    Connection problems and server errors are retried with backoff while the stored
+    token stays in use.
+    Returns the current token, or None if the credentials were rejected.
+    """
+    delay = _LOGIN_RETRY_MIN
+    while True:
+        try:
+            new_token = await _async_retrieve_token(hass, config_entry)
+        except ClientResponseError as err:
+            if err.status in (401, 403):
+                new_token = None
+                break
+            # Other statuses, like the 502s of a restarting Scrypted, are retried.
+            error: Exception = err
+        except ValueError:
+            new_token = None
+            break
+        except (ClientError, asyncio.TimeoutError) as err:
+            error = err
+        else:
+            break
+        _LOGGER.debug(
+            "Unable to log in to Scrypted (%s), retrying in %ss", error, delay
+        )
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, _LOGIN_RETRY_MAX)
+
+    if not new_token:
+        _async_start_reauth(hass, config_entry, config_entry.data)
+        return None
+
+    if new_token != token:
+        await _async_swap_token(hass, config_entry, token, new_token)
+    return new_token
+
+
+async def _async_swap_token(
+    hass: HomeAssistant, config_entry: ConfigEntry, old_token: str, new_token: str
+) -> None:
+    """Move the entry's routes, panel and sensor over to a new token."""
+    domain_data = hass.data[DOMAIN]
+    domain_data.pop(old_token, None)
+    domain_data[new_token] = config_entry
+    if entry_data := hass.data.get(DATA_ENTRIES, {}).get(config_entry.entry_id):
+        entry_data.client.token = new_token
+
+    async_remove_panel(hass, f"{DOMAIN}_{old_token}")
+    _async_register_panel(hass, config_entry, new_token)
+
+    await _get_token_store(hass).async_set(config_entry.entry_id, new_token)
+    async_dispatcher_send(
+        hass, SIGNAL_TOKEN_UPDATED.format(config_entry.entry_id), new_token
+    )
+
+
 async def async_unload_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> bool:
-    """Unload a config entry."""
+    """Unload a config entry.
+
+    The proxy stops admitting requests for the entry and gives those in flight a
+    grace period before cancelling them, so no stream or WebSocket relay outlives
+    the entry.
+    """
+    if not await hass.config_entries.async_unload_platforms(config_entry, PLATFORMS):
+        return False
+
     token = next(
         token
         for token, entry in hass.data[DOMAIN].items()
         if entry.entry_id == config_entry.entry_id
     )
 
-    await _async_unregister_lovelace_resource(hass, token, config_entry.entry_id)
+    view: ScryptedView | None = hass.data.get(_VIEW)
+    if view is not None:
+        await view.async_drain(config_entry.entry_id)
+
+    await _async_unregister_lovelace_resource(hass, config_entry.entry_id)
 
     hass.data[DOMAIN].pop(token)
     if not hass.data[DOMAIN]:
         hass.data.pop(DOMAIN)
+    if entry_data := hass.data.get(DATA_ENTRIES, {}).pop(config_entry.entry_id, None):
+        await entry_data.client.async_close()
     async_remove_panel(hass, f"{DOMAIN}_{token}")
+    if view is not None:
+        view.async_set_pool(config_entry.entry_id, None)
+        view.async_set_routes(config_entry.entry_id, None)
+        # The token is gone, a reload admits requests under its new setup.
+        view.async_admit(config_entry.entry_id)
     return True
 
 
+async def async_remove_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> None:
+    """Forget the stored token and device snapshot of a removed entry."""
+    await _get_token_store(hass).async_remove(config_entry.entry_id)
+    await ScryptedDeviceStore(hass, config_entry.entry_id).async_remove()
+
+
 async def _async_update_listener(hass: HomeAssistant, config_entry: ConfigEntry) -> None:
     """Ensure option keys stay in the options dict and reload on change."""
 
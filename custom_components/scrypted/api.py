@@ -0,0 +1,274 @@
+"""Client for the device API of a Scrypted server.
+
+The API isn't part of Scrypted itself: it is served by a matching server-side
+Home Assistant plugin, and its routes are listed in the README.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import TYPE_CHECKING, Any
+
+import aiohttp
+from aiohttp import ClientTimeout
+from homeassistant.const import CONF_HOST
+
+from .http import ScryptedEndpoint, create_unix_session, parse_endpoint
+
+if TYPE_CHECKING:
+    from .cluster import ClusterRoutes
+
+# Served by a Home Assistant plugin installed on the Scrypted server, not by
+# Scrypted itself.
+API_PATH = "endpoint/@scrypted/homeassistant/public/api"
+INTERFACE_CAMERA = "Camera"
+INTERFACE_BINARY_SENSOR = "BinarySensor"
+INTERFACE_OBJECT_DETECTOR = "ObjectDetector"
+INTERFACE_RTC_SIGNALING = "RTCSignalingChannel"
+INTERFACE_VIDEO_RECORDER = "VideoRecorder"
+TYPE_DOORBELL = "Doorbell"
+
+_TIMEOUT = ClientTimeout(total=30)
+# Clips listed per request when browsing recordings.
+RECORDINGS_PAGE_SIZE = 50
+
+
+@dataclass(frozen=True)
+class ScryptedDevice:
+    """A device managed by Scrypted."""
+
+    id: str
+    name: str
+    type: str = ""
+    interfaces: frozenset[str] = field(default_factory=frozenset)
+    # Last known property values, e.g. `motionDetected`, kept current by events.
+    state: dict[str, Any] = field(default_factory=dict, compare=False, hash=False)
+
+    @classmethod
+    def from_json(cls, data: dict[str, Any]) -> ScryptedDevice:
+        """Create a device from its API representation."""
+        return cls(
+            id=str(data["id"]),
+            name=data.get("name") or str(data["id"]),
+            type=data.get("type", ""),
+            interfaces=frozenset(data.get("interfaces", ())),
+            state=dict(data.get("state") or {}),
+        )
+
+    def as_json(self) -> dict[str, Any]:
+        """Return the device as stored in snapshots, without non-scalar states."""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "type": self.type,
+            "interfaces": sorted(self.interfaces),
+            "state": {
+                prop: value
+                for prop, value in self.state.items()
+                if value is None or isinstance(value, (str, int, float))
+            },
+        }
+
+
+@dataclass(frozen=True)
+class ScryptedClip:
+    """A recorded clip of an NVR camera."""
+
+    id: str
+    start: datetime
+    end: datetime
+    detection_classes: tuple[str, ...] = ()
+
+    @classmethod
+    def from_json(cls, data: dict[str, Any]) -> ScryptedClip:
+        """Create a clip from its API representation (times in milliseconds)."""
+        return cls(
+            id=str(data["id"]),
+            start=datetime.fromtimestamp(data["startTime"] / 1000).astimezone(),
+            end=datetime.fromtimestamp(data["endTime"] / 1000).astimezone(),
+            detection_classes=tuple(data.get("detectionClasses") or ()),
+        )
+
+
+@dataclass(frozen=True)
+class ScryptedClipPage:
+    """One page of a day's clips, newest first."""
+
+    clips: list[ScryptedClip]
+    # Opaque cursor of the following page, None on the last page.
+    next: str | None = None
+
+
+@dataclass(frozen=True)
+class ScryptedCluster:
+    """Worker nodes of a Scrypted cluster and the devices each one serves."""
+
+    # Host of each worker by id, in the forms of the configured host.
+    workers: dict[str, str] = field(default_factory=dict)
+    # Worker id of each device; devices on the server itself are left out.
+    devices: dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def from_json(cls, data: dict[str, Any]) -> ScryptedCluster:
+        """Create the topology from its API representation.
+
+        Workers without a usable host are left out, and so are their devices.
+        """
+        workers = {}
+        for worker in data.get("workers") or ():
+            try:
+                parse_endpoint(host := worker["host"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            workers[str(worker["id"])] = host
+        return cls(
+            workers,
+            {
+                str(device_id): str(worker_id)
+                for device_id, worker_id in (data.get("devices") or {}).items()
+                if str(worker_id) in workers
+            },
+        )
+
+
+def recording_path(device_id: str, clip_id: str, kind: str) -> str:
+    """Return the server path of a clip's `video` or `thumbnail`."""
+    return f"{API_PATH}/devices/{device_id}/recordings/{clip_id}/{kind}"
+
+
+class ScryptedClient:
+    """Authenticated access to the device API of one Scrypted server.
+
+    The token is replaced in place when a background login swaps it, so entities
+    holding the client keep working.
+    """
+
+    def __init__(
+        self, session: aiohttp.ClientSession, data: dict[str, Any], token: str
+    ) -> None:
+        """Initialize the client."""
+        self.token = token
+        self._session = session
+        self._endpoint: ScryptedEndpoint = parse_endpoint(data[CONF_HOST])
+        self._unix_session: aiohttp.ClientSession | None = None
+        # Set when the entry sends device media to cluster workers.
+        self.routes: ClusterRoutes | None = None
+
+    async def async_close(self) -> None:
+        """Close the session opened for a Unix socket endpoint."""
+        if self._unix_session is not None:
+            await self._unix_session.close()
+            self._unix_session = None
+
+    async def async_get_devices(self) -> list[ScryptedDevice]:
+        """Return the devices managed by Scrypted."""
+        async with self._request("devices") as resp:
+            return [ScryptedDevice.from_json(device) for device in await resp.json()]
+
+    async def async_get_snapshot(self, device_id: str) -> bytes:
+        """Return a JPEG snapshot of a camera."""
+        async with self._request(f"devices/{device_id}/snapshot") as resp:
+            return await resp.read()
+
+    async def async_get_recording_days(self, device_id: str) -> list[str]:
+        """Return the days (`YYYY-MM-DD`) a camera has recordings for, newest first."""
+        async with self._request(f"devices/{device_id}/recordings/days") as resp:
+            return [str(day) for day in await resp.json()]
+
+    async def async_get_recordings(
+        self,
+        device_id: str,
+        day: str,
+        cursor: str | None = None,
+        limit: int = RECORDINGS_PAGE_SIZE,
+    ) -> ScryptedClipPage:
+        """Return a page of a camera's clips on a day."""
+        params = {"day": day, "limit": str(limit)}
+        if cursor is not None:
+            params["cursor"] = cursor
+        async with self._request(
+            f"devices/{device_id}/recordings", params=params
+        ) as resp:
+            data = await resp.json()
+        return ScryptedClipPage(
+            [ScryptedClip.from_json(clip) for clip in data.get("clips", [])],
+            data.get("next"),
+        )
+
+    async def async_get_webrtc_answer(self, device_id: str, offer_sdp: str) -> str:
+        """Relay a WebRTC offer to a camera and return its answer.
+
+        Only the session description crosses this connection: the answer carries
+        the server's ICE candidates, and media then flows directly between the
+        browser and Scrypted. With cluster routing the offer goes to the worker
+        serving the camera, so the media comes from there; the server answers if
+        the worker can't be connected to.
+        """
+        path = f"devices/{device_id}/webrtc"
+        offer = {"type": "offer", "sdp": offer_sdp}
+        routes = self.routes
+        if (worker := routes and routes.host_for(f"{API_PATH}/{path}")) is not None:
+            try:
+                async with self._request(
+                    path, method="POST", json=offer, endpoint=parse_endpoint(worker)
+                ) as resp:
+                    return str((await resp.json())["sdp"])
+            except aiohttp.ClientConnectorError as err:
+                routes.async_report_failure(worker, err)
+        async with self._request(path, method="POST", json=offer) as resp:
+            return str((await resp.json())["sdp"])
+
+    async def async_get_cluster(self) -> ScryptedCluster:
+        """Return the cluster topology, empty if the server runs no workers."""
+        try:
+            async with self._request("cluster") as resp:
+                return ScryptedCluster.from_json(await resp.json())
+        except aiohttp.ClientResponseError as err:
+            # Plugin versions without cluster support.
+            if err.status != 404:
+                raise
+        return ScryptedCluster()
+
+    def ws_connect_events(self) -> Any:
+        """Open the device event subscription.
+
+        Each text frame carries one event or a JSON array of events shaped like
+        `{"id": "<device id>", "property": "motionDetected", "value": true}`.
+        """
+        return self._get_session().ws_connect(
+            f"{self._endpoint.base_url}/{API_PATH}/events",
+            headers={"Authorization": f"Bearer {self.token}"},
+            ssl=False,
+            heartbeat=30,
+        )
+
+    def _request(
+        self,
+        path: str,
+        method: str = "GET",
+        endpoint: ScryptedEndpoint | None = None,
+        **kwargs: Any,
+    ):
+        """Send an authenticated request for an API path, to the server by default."""
+        endpoint = endpoint or self._endpoint
+        return self._get_session(endpoint).request(
+            method,
+            f"{endpoint.base_url}/{API_PATH}/{path}",
+            headers={"Authorization": f"Bearer {self.token}"},
+            raise_for_status=True,
+            ssl=False,
+            timeout=_TIMEOUT,
+            **kwargs,
+        )
+
+    def _get_session(
+        self, endpoint: ScryptedEndpoint | None = None
+    ) -> aiohttp.ClientSession:
+        """Return the session that reaches an endpoint, the server by default."""
+        endpoint = endpoint or self._endpoint
+        if endpoint.socket_path is None:
+            return self._session
+        if self._unix_session is None or self._unix_session.closed:
+            self._unix_session = create_unix_session(endpoint.socket_path)
+        return self._unix_session
@@ -0,0 +1,134 @@
+"""Scrypted binary sensors."""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import Any
+
+from homeassistant.components.binary_sensor import (
+    BinarySensorDeviceClass,
+    BinarySensorEntity,
+    BinarySensorEntityDescription,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .api import INTERFACE_BINARY_SENSOR, TYPE_DOORBELL, ScryptedDevice
+from .entity import ScryptedDeviceEntity, async_setup_device_entities
+from .events import latest
+
+
+@dataclass(frozen=True, kw_only=True)
+class ScryptedBinarySensorEntityDescription(BinarySensorEntityDescription):
+    """Binary sensor backed by a Scrypted interface property."""
+
+    interface: str
+
+
+BINARY_SENSORS: tuple[ScryptedBinarySensorEntityDescription, ...] = (
+    ScryptedBinarySensorEntityDescription(
+        key="motionDetected",
+        interface="MotionSensor",
+        device_class=BinarySensorDeviceClass.MOTION,
+    ),
+    ScryptedBinarySensorEntityDescription(
+        key="occupied",
+        interface="OccupancySensor",
+        device_class=BinarySensorDeviceClass.OCCUPANCY,
+    ),
+    ScryptedBinarySensorEntityDescription(
+        key="entryOpen",
+        interface="EntrySensor",
+        device_class=BinarySensorDeviceClass.DOOR,
+    ),
+    ScryptedBinarySensorEntityDescription(
+        key="audioDetected",
+        interface="AudioSensor",
+        device_class=BinarySensorDeviceClass.SOUND,
+    ),
+    ScryptedBinarySensorEntityDescription(
+        key="flooded",
+        interface="FloodSensor",
+        device_class=BinarySensorDeviceClass.MOISTURE,
+    ),
+    ScryptedBinarySensorEntityDescription(
+        key="binaryState",
+        interface=INTERFACE_BINARY_SENSOR,
+    ),
+)
+
+
+def _descriptions(
+    device: ScryptedDevice,
+) -> Iterator[ScryptedBinarySensorEntityDescription]:
+    """Return the binary sensors a device supports."""
+    for description in BINARY_SENSORS:
+        if description.interface not in device.interfaces:
+            continue
+        # A doorbell's binary state is its button, surfaced as an event entity.
+        if (
+            description.interface == INTERFACE_BINARY_SENSOR
+            and device.type == TYPE_DOORBELL
+        ):
+            continue
+        yield description
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Set up Scrypted binary sensors from a config entry."""
+
+    def _entities(device: ScryptedDevice) -> list[ScryptedBinarySensor]:
+        return [
+            ScryptedBinarySensor(config_entry, device, description)
+            for description in _descriptions(device)
+        ]
+
+    async_setup_device_entities(hass, config_entry, async_add_entities, _entities)
+
+
+class ScryptedBinarySensor(ScryptedDeviceEntity, BinarySensorEntity):
+    """A binary property of a Scrypted device."""
+
+    entity_description: ScryptedBinarySensorEntityDescription
+
+    def __init__(
+        self,
+        config_entry: ConfigEntry,
+        device: ScryptedDevice,
+        description: ScryptedBinarySensorEntityDescription,
+    ) -> None:
+        """Initialize a ScryptedBinarySensor entity."""
+        super().__init__(config_entry, device, description.key)
+        self.entity_description = description
+        # Generic binary sensors are named after their device.
+        if description.device_class is None:
+            self._attr_name = None
+        self._attr_is_on = _is_on(device.state.get(description.key))
+
+    def _is_supported(self, device: ScryptedDevice) -> bool:
+        """Return True if the device still has the property."""
+        return self.entity_description in _descriptions(device)
+
+    @callback
+    def _async_apply_changes(self, changes: dict[str, list[Any]]) -> bool:
+        """Take the most recent value of the batch."""
+        if self.entity_description.key not in changes:
+            return False
+        is_on = _is_on(latest(changes, self.entity_description.key))
+        if is_on == self._attr_is_on:
+            return False
+        self._attr_is_on = is_on
+        return True
+
+
+def _is_on(value: Any) -> bool | None:
+    """Convert a property value, keeping unknown as None."""
+    if value is None:
+        return None
+    return bool(value)
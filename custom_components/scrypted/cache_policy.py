@@ -0,0 +1,217 @@
+"""Caching header policy for responses proxied from Scrypted."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Hashable
+from dataclasses import dataclass
+import hashlib
+import re
+
+from aiohttp import hdrs
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Directives that make a response uncacheable or force a round trip on every load.
+_WEAK_DIRECTIVES = ("no-store", "no-cache", "max-age=0", "must-revalidate")
+# Seconds a preflight answer is reused when Scrypted gives no Access-Control-Max-Age,
+# as browsers do, and at most; and how many answers an entry keeps.
+PREFLIGHT_DEFAULT_AGE = 5
+PREFLIGHT_MAX_AGE = 600
+PREFLIGHT_CACHE_SIZE = 64
+
+
+@dataclass(frozen=True)
+class HeaderRule:
+    """Rewrite the caching headers of matching proxied responses.
+
+    A rule matches when its path and query patterns (searched in the proxied path
+    and query string) and its content type prefixes all match. Unless `force` is
+    set, the Cache-Control header is only replaced when Scrypted sent none or a
+    weak one.
+    """
+
+    path: re.Pattern[str] | None = None
+    query: re.Pattern[str] | None = None
+    content_types: tuple[str, ...] = ()
+    cache_control: str | None = None
+    force: bool = False
+    strip_set_cookie: bool = False
+    add_etag: bool = False
+
+    def matches(self, path: str, content_type: str, query: str = "") -> bool:
+        """Return True if the rule applies to the response."""
+        if self.path is not None and not self.path.search(path):
+            return False
+        if self.query is not None and not self.query.search(query):
+            return False
+        if self.content_types and not content_type.startswith(self.content_types):
+            return False
+        return True
+
+    def apply(self, headers: dict[str, str]) -> None:
+        """Rewrite the response headers in place."""
+        if self.cache_control is not None:
+            current = get_header(headers, hdrs.CACHE_CONTROL)
+            if self.force or current is None or is_weak_cache_control(current):
+                pop_header(headers, hdrs.CACHE_CONTROL)
+                pop_header(headers, hdrs.PRAGMA)
+                pop_header(headers, hdrs.EXPIRES)
+                headers[hdrs.CACHE_CONTROL] = self.cache_control
+
+        if self.strip_set_cookie:
+            pop_header(headers, hdrs.SET_COOKIE)
+
+
+DEFAULT_HEADER_RULES: tuple[HeaderRule, ...] = (
+    # Lovelace resources are registered with a `?v=<content hash>` cache buster.
+    HeaderRule(
+        path=re.compile(r"/web-components\.(?:js|css)$"),
+        query=re.compile(r"(?:^|&)v="),
+        cache_control=IMMUTABLE,
+        force=True,
+        strip_set_cookie=True,
+    ),
+    # Bundles whose file name carries a content hash never change.
+    HeaderRule(
+        path=re.compile(
+            r"[.-][0-9a-fA-F]{8,}\.(?:m?js|css|woff2?|ttf|svg|png|jpe?g|webp|gif|ico)$"
+        ),
+        cache_control=IMMUTABLE,
+        force=True,
+        strip_set_cookie=True,
+    ),
+    # Thumbnails of recorded clips never change.
+    HeaderRule(
+        path=re.compile(r"/recordings/[^/]+/thumbnail$"),
+        content_types=("image/",),
+        cache_control=IMMUTABLE,
+        force=True,
+        strip_set_cookie=True,
+    ),
+    # Other static assets may change, but can be revalidated cheaply.
+    HeaderRule(
+        path=re.compile(r"\.(?:m?js|css|woff2?|ttf|svg|png|jpe?g|webp|gif|ico|json)$"),
+        cache_control=REVALIDATE,
+        strip_set_cookie=True,
+        add_etag=True,
+    ),
+)
+
+
+def find_rule(
+    rules: tuple[HeaderRule, ...], path: str, content_type: str, query: str = ""
+) -> HeaderRule | None:
+    """Return the first rule matching the response."""
+    return next(
+        (rule for rule in rules if rule.matches(path, content_type, query)), None
+    )
+
+
+def is_weak_cache_control(value: str) -> bool:
+    """Return True if the directives force a download or revalidation."""
+    directives = [directive.strip().lower() for directive in value.split(",")]
+    return any(directive in _WEAK_DIRECTIVES for directive in directives)
+
+
+def has_validator(headers: dict[str, str]) -> bool:
+    """Return True if the response can already be revalidated."""
+    return (
+        get_header(headers, hdrs.ETAG) is not None
+        or get_header(headers, hdrs.LAST_MODIFIED) is not None
+    )
+
+
+def body_etag(body: bytes) -> str:
+    """Return a weak ETag derived from the response body."""
+    return f'W/"{hashlib.sha1(body).hexdigest()[:20]}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Return True if an If-None-Match header matches the ETag."""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or etag[2:] in candidates
+
+
+def get_header(headers: dict[str, str], name: str) -> str | None:
+    """Case-insensitive header lookup."""
+    lower = name.lower()
+    return next(
+        (value for key, value in headers.items() if key.lower() == lower), None
+    )
+
+
+def pop_header(headers: dict[str, str], name: str) -> None:
+    """Case-insensitive header removal."""
+    lower = name.lower()
+    for key in [key for key in headers if key.lower() == lower]:
+        del headers[key]
+
+
+@dataclass(frozen=True)
+class Preflight:
+    """Status and headers of an answer to a CORS preflight request."""
+
+    status: int
+    headers: dict[str, str]
+    expires: float
+
+
+class PreflightCache:
+    """Bounded cache of the answers Scrypted gave to CORS preflight requests.
+
+    Keys identify what a browser asks about: the origin, method and headers. Only
+    successful answers allowing an origin are kept, for their Access-Control-Max-Age
+    capped at `PREFLIGHT_MAX_AGE`; the oldest are dropped beyond `max_entries`.
+    """
+
+    def __init__(self, max_entries: int = PREFLIGHT_CACHE_SIZE) -> None:
+        """Initialize the cache."""
+        self._max_entries = max_entries
+        self._preflights: OrderedDict[Hashable, Preflight] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        """Return the number of cached answers."""
+        return len(self._preflights)
+
+    def get(self, key: Hashable, now: float) -> Preflight | None:
+        """Return the answer cached for `key`, unless it expired by `now`."""
+        if (preflight := self._preflights.get(key)) is not None:
+            if preflight.expires > now:
+                self.hits += 1
+                return preflight
+            del self._preflights[key]
+        self.misses += 1
+        return None
+
+    def put(
+        self, key: Hashable, status: int, headers: dict[str, str], now: float
+    ) -> Preflight:
+        """Return an answer for `key`, keeping it if the browser may reuse it."""
+        age = _preflight_age(headers)
+        preflight = Preflight(status, headers, now + age)
+        if (
+            200 <= status < 300
+            and age > 0
+            and get_header(headers, hdrs.ACCESS_CONTROL_ALLOW_ORIGIN) is not None
+        ):
+            self._preflights.pop(key, None)
+            self._preflights[key] = preflight
+            while len(self._preflights) > self._max_entries:
+                self._preflights.popitem(last=False)
+        return preflight
+
+
+def _preflight_age(headers: dict[str, str]) -> int:
+    """Return the seconds a preflight answer may be reused."""
+    if (value := get_header(headers, hdrs.ACCESS_CONTROL_MAX_AGE)) is None:
+        return PREFLIGHT_DEFAULT_AGE
+    try:
+        return min(int(value), PREFLIGHT_MAX_AGE)
+    except ValueError:
+        return PREFLIGHT_DEFAULT_AGE
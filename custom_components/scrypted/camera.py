@@ -0,0 +1,157 @@
+"""Scrypted cameras."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any
+
+from aiohttp import ClientError
+
+from homeassistant.components.camera import Camera, CameraEntityFeature, StreamType
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .api import (
+    INTERFACE_CAMERA,
+    INTERFACE_RTC_SIGNALING,
+    ScryptedClient,
+    ScryptedDevice,
+)
+from .cache_policy import body_etag
+from .const import DATA_ENTRIES
+from .devices import PROPERTY_DEVICE
+from .entity import ScryptedDeviceEntity, async_setup_device_entities
+from .images import ImageVariantCache, Variant, resize_image
+from .models import ScryptedEntryData
+from .snapshots import SnapshotCache
+
+_LOGGER = logging.getLogger(__name__)
+
+# Resized snapshots kept per camera, for the few sizes dashboards ask for.
+SNAPSHOT_VARIANT_BYTES = 2 * 1024 * 1024
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Set up Scrypted cameras from a config entry."""
+    data: ScryptedEntryData = hass.data[DATA_ENTRIES][config_entry.entry_id]
+
+    def _entities(device: ScryptedDevice) -> list[ScryptedCamera]:
+        if INTERFACE_CAMERA not in device.interfaces:
+            return []
+        return [ScryptedCamera(config_entry, data.client, device)]
+
+    async_setup_device_entities(hass, config_entry, async_add_entities, _entities)
+
+
+class ScryptedCamera(ScryptedDeviceEntity, Camera):
+    """A camera managed by Scrypted.
+
+    Cameras offering WebRTC signaling are streamed with WebRTC: Home Assistant
+    only relays the offer and answer, and the video itself never passes through
+    it.
+    """
+
+    _attr_name = None
+    _attr_frontend_stream_type: StreamType | None = None
+    # Cache statistics change with every request, keep them out of the recorder.
+    _unrecorded_attributes = frozenset(
+        {
+            "snapshot_hits",
+            "snapshot_misses",
+            "snapshot_coalesced",
+            "snapshot_errors",
+            "snapshot_hit_rate",
+            "snapshot_latency_ms",
+            "snapshot_average_latency_ms",
+        }
+    )
+
+    def __init__(
+        self, config_entry: ConfigEntry, client: ScryptedClient, device: ScryptedDevice
+    ) -> None:
+        """Initialize a ScryptedCamera entity."""
+        super().__init__(config_entry, device)
+        self._client = client
+        self.snapshots = SnapshotCache(self._async_fetch_snapshot)
+        self._variants = ImageVariantCache(SNAPSHOT_VARIANT_BYTES)
+        self._set_stream_type(device)
+
+    def _is_supported(self, device: ScryptedDevice) -> bool:
+        """Return True if the device is still a camera."""
+        return INTERFACE_CAMERA in device.interfaces
+
+    def _set_stream_type(self, device: ScryptedDevice) -> bool:
+        """Stream with WebRTC if the device signals it. Return True if changed."""
+        webrtc = INTERFACE_RTC_SIGNALING in device.interfaces
+        if webrtc == (self._attr_frontend_stream_type == StreamType.WEB_RTC):
+            return False
+        if webrtc:
+            self._attr_frontend_stream_type = StreamType.WEB_RTC
+            self._attr_supported_features = CameraEntityFeature.STREAM
+        else:
+            self._attr_frontend_stream_type = None
+            self._attr_supported_features = CameraEntityFeature(0)
+        return True
+
+    @callback
+    def _async_apply_changes(self, changes: dict[str, list[Any]]) -> bool:
+        """Follow the device gaining or losing WebRTC signaling."""
+        if devices := changes.get(PROPERTY_DEVICE):
+            return self._set_stream_type(devices[-1])
+        return False
+
+    @property
+    def extra_state_attributes(self) -> dict[str, float | int | None]:
+        """Return the snapshot cache statistics."""
+        return self.snapshots.stats()
+
+    async def async_camera_image(
+        self, width: int | None = None, height: int | None = None
+    ) -> bytes | None:
+        """Return the latest snapshot, shared by all viewers for a short time.
+
+        With a width or height the snapshot is downscaled to fit, once per snapshot
+        and size.
+        """
+        try:
+            image = await self.snapshots.async_get()
+        except (ClientError, asyncio.TimeoutError) as err:
+            _LOGGER.debug("Unable to fetch a snapshot of %s: %s", self.entity_id, err)
+            return None
+        if width is None and height is None:
+            return image
+
+        async def _resize() -> Variant:
+            resized = await self.hass.async_add_executor_job(
+                resize_image, image, width, height
+            )
+            return resized or (image, self.content_type)
+
+        resized, _ = await self._variants.async_get(
+            (body_etag(image), width, height), _resize
+        )
+        return resized
+
+    async def async_handle_web_rtc_offer(self, offer_sdp: str) -> str | None:
+        """Relay the browser's offer to Scrypted and return the answer."""
+        if self._attr_frontend_stream_type != StreamType.WEB_RTC:
+            return None
+        try:
+            return await self._client.async_get_webrtc_answer(
+                self._device_id, offer_sdp
+            )
+        except (ClientError, KeyError, ValueError) as err:
+            raise HomeAssistantError(
+                f"Scrypted did not answer the WebRTC offer: {err}"
+            ) from err
+
+    async def _async_fetch_snapshot(self) -> bytes:
+        """Fetch a snapshot from Scrypted."""
+        return await self._client.async_get_snapshot(self._device_id)
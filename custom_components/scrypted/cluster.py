@@ -0,0 +1,131 @@
+"""Routing of device media to the Scrypted cluster worker that serves the device."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta
+import logging
+import re
+
+import aiohttp
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+
+from .api import API_PATH, ScryptedClient
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+REFRESH_INTERVAL = timedelta(minutes=5)
+# Snapshots, recordings and WebRTC signaling, served by the worker running the
+# device's plugin. Live video has no route of its own: it is the WebRTC media of
+# whoever answered the offer.
+_MEDIA_PATH = re.compile(
+    rf"^{re.escape(API_PATH)}/devices/(?P<device>[^/]+)/"
+    r"(snapshot|webrtc|recordings/[^/]+/(video|thumbnail))$"
+)
+
+
+class ClusterRoutes:
+    """Cached routes from an entry's devices to the cluster workers serving them.
+
+    The table is fetched at start and every `REFRESH_INTERVAL`, and again when the
+    topology changes: a device moving to a worker that isn't in the table, the
+    event subscription reconnecting, or a worker that couldn't be connected to.
+    Media of devices on a worker that couldn't be connected to goes through the
+    primary for `REFRESH_INTERVAL`; everything else always does.
+    """
+
+    def __init__(self, hass: HomeAssistant, client: ScryptedClient) -> None:
+        """Initialize the routes, empty until the first refresh."""
+        self.hass = hass
+        self._client = client
+        self.workers: dict[str, str] = {}
+        # Worker host of each device not served by the primary.
+        self.routes: dict[str, str] = {}
+        # Loop time each unreachable worker was last reported at.
+        self._down: dict[str, float] = {}
+        self._refresh: asyncio.Task | None = None
+        self._unsub_refresh: CALLBACK_TYPE | None = None
+
+    def host_for(self, path: str) -> str | None:
+        """Return the worker host to send a request for a path to, if any."""
+        if not self.routes or (match := _MEDIA_PATH.match(path)) is None:
+            return None
+        if (host := self.routes.get(match["device"])) is None:
+            return None
+        if (down := self._down.get(host)) is not None:
+            if self.hass.loop.time() - down < REFRESH_INTERVAL.total_seconds():
+                return None
+            del self._down[host]
+        return host
+
+    @callback
+    def async_move_device(self, device_id: str, worker_id: str | None) -> None:
+        """Follow a device that moved to another worker, or back to the primary."""
+        if not worker_id:
+            self.routes.pop(device_id, None)
+        elif (host := self.workers.get(worker_id)) is not None:
+            self.routes[device_id] = host
+        else:
+            self.async_request_refresh()
+
+    @callback
+    def async_report_failure(self, host: str, error: Exception) -> None:
+        """Send a worker's media through the primary for a while."""
+        known = host in self._down
+        self._down[host] = self.hass.loop.time()
+        if known:
+            return
+        _LOGGER.warning("Scrypted cluster worker %s is unreachable: %s", host, error)
+        self.async_request_refresh()
+
+    @callback
+    def async_request_refresh(self) -> None:
+        """Fetch the table again in the background, unless a fetch is running."""
+        if self._refresh is None or self._refresh.done():
+            self._refresh = self.hass.async_create_background_task(
+                self.async_refresh(), f"{DOMAIN} cluster topology"
+            )
+
+    @callback
+    def async_start(self, config_entry: ConfigEntry) -> None:
+        """Fetch the table now and every `REFRESH_INTERVAL` until the entry unloads."""
+        self.async_request_refresh()
+        self._unsub_refresh = async_track_time_interval(
+            self.hass, self._async_refresh_interval, REFRESH_INTERVAL
+        )
+        config_entry.async_on_unload(self.async_stop)
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop refreshing the table."""
+        if self._unsub_refresh is not None:
+            self._unsub_refresh()
+            self._unsub_refresh = None
+        if self._refresh is not None:
+            self._refresh.cancel()
+            self._refresh = None
+
+    async def _async_refresh_interval(self, _now: datetime) -> None:
+        """Run the periodic refresh."""
+        self.async_request_refresh()
+
+    async def async_refresh(self) -> None:
+        """Fetch the topology, keeping the current table if that fails."""
+        try:
+            cluster = await self._client.async_get_cluster()
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as err:
+            _LOGGER.debug("Unable to fetch the Scrypted cluster topology: %s", err)
+            return
+        self.workers = cluster.workers
+        self.routes = {
+            device_id: cluster.workers[worker_id]
+            for device_id, worker_id in cluster.devices.items()
+        }
+        self._down = {
+            host: down
+            for host, down in self._down.items()
+            if host in cluster.workers.values()
+        }
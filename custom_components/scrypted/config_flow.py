@@ -1,7 +1,9 @@
 """Config flow for Scrypted integration."""
 
+import asyncio
 from typing import Any
 
+import aiohttp
 import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.core import callback
@@ -18,10 +20,24 @@ from homeassistant.util import slugify
 
 from .const import (
     CONF_AUTO_REGISTER_RESOURCES,
+    CONF_BACKUP_HOSTS,
+    CONF_CLUSTER_ROUTING,
+    CONF_DIRECT_URL,
+    CONF_LOOP_MONITOR,
+    CONF_RESUMABLE_WEBSOCKETS,
     CONF_SCRYPTED_NVR,
+    CONF_STREAM_LAG_LIMIT,
+    CONF_TRUSTED_NETWORKS,
     DOMAIN,
 )
-from .http import retrieve_token
+from .http import (
+    PROBE_TIMEOUT,
+    EndpointProbe,
+    parse_backup_hosts,
+    parse_trusted_networks,
+    probe_endpoints,
+    retrieve_token,
+)
 
 
 def text_selector(type: selector.TextSelectorType) -> selector.TextSelector:
@@ -82,10 +98,11 @@ class ScryptedConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     def __init__(self) -> None:
         """Initialize flow."""
         self.data = {}
+        self.probes: list[EndpointProbe] = []
 
-    async def validate_input(self, data: dict[str, Any]) -> bool:
-        """Validate that the host is valid."""
-        session = async_get_clientsession(self.hass, verify_ssl=False)
+    @staticmethod
+    def _has_required_keys(data: dict[str, Any]) -> bool:
+        """Return True if the input has every field an entry needs."""
         required_keys = [
             CONF_HOST,
             CONF_ICON,
@@ -94,12 +111,17 @@ class ScryptedConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         ]
         if CONF_AUTO_REGISTER_RESOURCES in data:
             required_keys.append(CONF_AUTO_REGISTER_RESOURCES)
-        for key in required_keys:
-            if key not in data:
-                return False
+        return all(key in data for key in required_keys)
+
+    async def validate_input(self, data: dict[str, Any]) -> bool:
+        """Validate that the host is valid."""
+        if not self._has_required_keys(data):
+            return False
+        session = async_get_clientsession(self.hass, verify_ssl=False)
         try:
-            await retrieve_token(data, session)
-        except ValueError:
+            async with asyncio.timeout(PROBE_TIMEOUT):
+                await retrieve_token(data, session)
+        except (ValueError, aiohttp.ClientError, TimeoutError):
             return False
 
         return True
@@ -110,12 +132,22 @@ class ScryptedConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         """Handle user flow."""
         errors = {}
         if user_input is not None and CONF_USERNAME in user_input:
-            if await self.validate_input(user_input):
-                await self.async_set_unique_id(slugify(user_input[CONF_HOST]))
-                self._abort_if_unique_id_configured()
-                return self.async_create_entry(
-                    title=user_input[CONF_HOST], data=user_input
+            # Probes of an earlier submission don't vouch for this one.
+            self.probes = []
+            if self._has_required_keys(user_input):
+                self.probes = await probe_endpoints(
+                    user_input, async_get_clientsession(self.hass, verify_ssl=False)
+                )
+            hosts = list(
+                dict.fromkeys(
+                    probe.host for probe in self.probes if probe.latency is not None
                 )
+            )
+            if hosts:
+                self.data = user_input
+                if len(hosts) == 1 or self.source == config_entries.SOURCE_IMPORT:
+                    return await self._async_create_entry(hosts[0])
+                return await self.async_step_endpoint()
             errors["base"] = "invalid_host_or_credentials"
 
         return self.async_show_form(
@@ -131,6 +163,57 @@ class ScryptedConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     async_step_import = async_step_user
 
+    async def async_step_endpoint(
+        self, user_input: dict[str, Any] | None = None
+    ) -> config_entries.FlowResult:
+        """Let the user pick one of several endpoints that answered, fastest first."""
+        if user_input is not None:
+            return await self._async_create_entry(user_input[CONF_HOST])
+
+        options: dict[str, str] = {}
+        for probe in self.probes:
+            if probe.latency is not None and probe.host not in options:
+                options[probe.host] = f"{probe.host} ({probe.latency * 1000:.0f} ms)"
+        return self.async_show_form(
+            step_id="endpoint",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(CONF_HOST, default=next(iter(options))): (
+                        selector.SelectSelector(
+                            selector.SelectSelectorConfig(
+                                options=[
+                                    selector.SelectOptionDict(value=host, label=label)
+                                    for host, label in options.items()
+                                ]
+                            )
+                        )
+                    )
+                }
+            ),
+            description_placeholders={
+                "probes": "\n".join(
+                    f"- `{probe.address}`: "
+                    + (
+                        f"{probe.latency * 1000:.0f} ms"
+                        if probe.latency is not None
+                        else probe.error
+                    )
+                    for probe in self.probes
+                )
+            },
+        )
+
+    async def _async_create_entry(self, host: str) -> config_entries.FlowResult:
+        """Create the entry for the user input, reaching Scrypted through host.
+
+        The unique ID comes from the host the entry stores, which reauth compares.
+        """
+        await self.async_set_unique_id(slugify(host))
+        self._abort_if_unique_id_configured()
+        return self.async_create_entry(
+            title=self.data[CONF_HOST], data={**self.data, CONF_HOST: host}
+        )
+
     async def async_step_reauth(
         self, _: dict[str, Any] | None
     ) -> config_entries.FlowResult:
@@ -229,15 +312,38 @@ class ScryptedOptionsFlowHandler(config_entries.OptionsFlow):
         self, user_input: dict[str, Any] | None = None
     ) -> config_entries.FlowResult:
         """Handle general options."""
+        errors = {}
         if user_input is not None:
-            data = {
-                **self.config_entry.options,
-                CONF_AUTO_REGISTER_RESOURCES: user_input[
-                    CONF_AUTO_REGISTER_RESOURCES
-                ],
-                CONF_SCRYPTED_NVR: user_input[CONF_SCRYPTED_NVR],
-            }
-            return self.async_create_entry(data=data)
+            trusted_networks = user_input.get(CONF_TRUSTED_NETWORKS, "")
+            try:
+                parse_trusted_networks(trusted_networks)
+            except ValueError:
+                errors[CONF_TRUSTED_NETWORKS] = "invalid_trusted_networks"
+            if trusted_networks.strip() and not user_input.get(CONF_DIRECT_URL):
+                errors[CONF_DIRECT_URL] = "direct_url_required"
+            backup_hosts = user_input.get(CONF_BACKUP_HOSTS, "")
+            try:
+                parse_backup_hosts(backup_hosts)
+            except ValueError:
+                errors[CONF_BACKUP_HOSTS] = "invalid_backup_hosts"
+            if not errors:
+                data = {
+                    **self.config_entry.options,
+                    CONF_AUTO_REGISTER_RESOURCES: user_input[
+                        CONF_AUTO_REGISTER_RESOURCES
+                    ],
+                    CONF_SCRYPTED_NVR: user_input[CONF_SCRYPTED_NVR],
+                    CONF_TRUSTED_NETWORKS: trusted_networks,
+                    CONF_DIRECT_URL: user_input.get(CONF_DIRECT_URL, ""),
+                    CONF_LOOP_MONITOR: user_input.get(CONF_LOOP_MONITOR, False),
+                    CONF_STREAM_LAG_LIMIT: user_input.get(CONF_STREAM_LAG_LIMIT, 0),
+                    CONF_BACKUP_HOSTS: backup_hosts,
+                    CONF_CLUSTER_ROUTING: user_input.get(CONF_CLUSTER_ROUTING, False),
+                    CONF_RESUMABLE_WEBSOCKETS: user_input.get(
+                        CONF_RESUMABLE_WEBSOCKETS, False
+                    ),
+                }
+                return self.async_create_entry(data=data)
 
         current_auto = self.config_entry.options.get(
             CONF_AUTO_REGISTER_RESOURCES
@@ -261,6 +367,41 @@ class ScryptedOptionsFlowHandler(config_entries.OptionsFlow):
                         CONF_AUTO_REGISTER_RESOURCES, default=current_auto
                     ): bool,
                     vol.Required(CONF_SCRYPTED_NVR, default=current_nvr): bool,
+                    vol.Optional(
+                        CONF_TRUSTED_NETWORKS,
+                        default=self.config_entry.options.get(
+                            CONF_TRUSTED_NETWORKS, ""
+                        ),
+                    ): str,
+                    vol.Optional(
+                        CONF_DIRECT_URL,
+                        default=self.config_entry.options.get(CONF_DIRECT_URL, ""),
+                    ): str,
+                    vol.Optional(
+                        CONF_LOOP_MONITOR,
+                        default=self.config_entry.options.get(CONF_LOOP_MONITOR, False),
+                    ): bool,
+                    vol.Optional(
+                        CONF_STREAM_LAG_LIMIT,
+                        default=self.config_entry.options.get(CONF_STREAM_LAG_LIMIT, 0),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=10000)),
+                    vol.Optional(
+                        CONF_BACKUP_HOSTS,
+                        default=self.config_entry.options.get(CONF_BACKUP_HOSTS, ""),
+                    ): str,
+                    vol.Optional(
+                        CONF_CLUSTER_ROUTING,
+                        default=self.config_entry.options.get(
+                            CONF_CLUSTER_ROUTING, False
+                        ),
+                    ): bool,
+                    vol.Optional(
+                        CONF_RESUMABLE_WEBSOCKETS,
+                        default=self.config_entry.options.get(
+                            CONF_RESUMABLE_WEBSOCKETS, False
+                        ),
+                    ): bool,
                 }
             ),
+            errors=errors,
         )
@@ -3,3 +3,24 @@
 DOMAIN = "scrypted"
 CONF_SCRYPTED_NVR = "scrypted_nvr"
 CONF_AUTO_REGISTER_RESOURCES = "auto_register_resources"
+CONF_TRUSTED_NETWORKS = "trusted_networks"
+CONF_DIRECT_URL = "direct_url"
+CONF_LOOP_MONITOR = "loop_monitor"
+CONF_STREAM_LAG_LIMIT = "stream_lag_limit"
+CONF_BACKUP_HOSTS = "backup_hosts"
+CONF_CLUSTER_ROUTING = "cluster_routing"
+CONF_RESUMABLE_WEBSOCKETS = "resumable_websockets"
+
+SIGNAL_TOKEN_UPDATED = f"{DOMAIN}_{{}}_token_updated"
+SIGNAL_DEVICE_UPDATED = f"{DOMAIN}_{{}}_{{}}_device_updated"
+SIGNAL_LOOP_LAG = f"{DOMAIN}_loop_lag"
+SIGNAL_LOOP_MONITOR_OWNER = f"{DOMAIN}_loop_monitor_owner"
+SIGNAL_ENDPOINT_CHANGED = f"{DOMAIN}_{{}}_endpoint_changed"
+
+DEFAULT_HTTPS_PORT = "10443"
+DEFAULT_HTTP_PORT = "11080"
+TRANSPORT_HTTPS = "https"
+TRANSPORT_HTTP = "http"
+TRANSPORT_UNIX = "unix"
+
+DATA_ENTRIES = f"{DOMAIN}_entries"
@@ -0,0 +1,313 @@
+"""Device discovery shared by the Scrypted platforms."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+import logging
+from typing import Any
+
+from aiohttp import ClientError, ClientResponseError
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+
+from .api import ScryptedClient, ScryptedDevice
+from .const import DOMAIN, SIGNAL_DEVICE_UPDATED
+from .store import ScryptedDeviceStore
+
+_LOGGER = logging.getLogger(__name__)
+
+_DISCOVERY_RETRY_MIN = 5
+_DISCOVERY_RETRY_MAX = 300
+# Answers of a server without the device API plugin, or refusing the entry's
+# token: retrying won't change them.
+API_UNAVAILABLE_STATUSES = (401, 403, 404)
+
+# Event property carrying a device's descriptor, or None once it was removed.
+PROPERTY_DEVICE = "device"
+# Event property carrying the id of the cluster worker now serving a device, or
+# None when the server itself serves it.
+PROPERTY_CLUSTER_WORKER = "clusterWorkerId"
+
+DeviceListener = Callable[[list[ScryptedDevice]], None]
+
+
+def is_api_unavailable(err: Exception) -> bool:
+    """Return True if an API request failed because the API isn't served to us."""
+    return (
+        isinstance(err, ClientResponseError)
+        and err.status in API_UNAVAILABLE_STATUSES
+    )
+
+
+def device_identifier(entry_id: str, device_id: str) -> tuple[str, str]:
+    """Return the device registry identifier of a Scrypted device."""
+    return (DOMAIN, f"{entry_id}_{device_id}")
+
+
+class ScryptedDevices:
+    """The devices of one entry.
+
+    The list is fetched once in bulk, in the background and with retries, so a
+    slow or unreachable Scrypted server doesn't hold up Home Assistant's startup.
+    A server that doesn't serve the device API, like stock Scrypted without the
+    Home Assistant plugin, is asked once: its entry then has no devices and the
+    event stream isn't started.
+    After that the event stream delivers incremental changes: a `device` event
+    with a descriptor adds or updates a device and one without removes it. When
+    the event stream reconnects the list is fetched again and diffed, so changes
+    missed while disconnected are applied too.
+
+    With a store, the devices and their last known states are snapshotted to
+    disk. `async_restore` loads the snapshot at setup so entities come back
+    immediately, and the first live list is then applied to it as a diff.
+
+    Platforms register a listener that receives new and changed devices. Only the
+    device registry entries of devices that changed are touched.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry_id: str,
+        client: ScryptedClient,
+        store: ScryptedDeviceStore | None = None,
+    ) -> None:
+        """Initialize the device list."""
+        self.hass = hass
+        self._entry_id = entry_id
+        self._client = client
+        self._store = store
+        self._devices: asyncio.Future[list[ScryptedDevice]] = hass.loop.create_future()
+        self._by_id: dict[str, ScryptedDevice] = {}
+        self._listeners: list[DeviceListener] = []
+        # Changes that arrived before the initial list, applied on top of it.
+        self._early_changes: dict[str, dict[str, Any] | ScryptedDevice | None] = {}
+
+    def async_start(
+        self,
+        config_entry: ConfigEntry,
+        on_discovered: Callable[[ConfigEntry], None] | None = None,
+    ) -> None:
+        """Start fetching the device list, then call `on_discovered` if it came."""
+        config_entry.async_create_background_task(
+            self.hass,
+            self._async_start(config_entry, on_discovered),
+            f"{DOMAIN} {config_entry.title} device discovery",
+        )
+
+    async def _async_start(
+        self,
+        config_entry: ConfigEntry,
+        on_discovered: Callable[[ConfigEntry], None] | None,
+    ) -> None:
+        """Fetch the device list and hand over to what depends on the API."""
+        if await self._async_discover() and on_discovered is not None:
+            on_discovered(config_entry)
+
+    async def async_restore(self) -> None:
+        """Load the devices of the last run from the snapshot, if there is one."""
+        if self._store is None or self.loaded:
+            return
+        if devices := await self._store.async_load():
+            self._by_id = {device.id: device for device in devices}
+            self._devices.set_result(devices)
+
+    @property
+    def loaded(self) -> bool:
+        """Return True once the initial list was fetched or restored."""
+        return self._devices.done()
+
+    async def async_get(self) -> list[ScryptedDevice]:
+        """Wait for the device list."""
+        await asyncio.shield(self._devices)
+        return list(self._by_id.values())
+
+    @callback
+    def async_add_listener(self, listener: DeviceListener) -> CALLBACK_TYPE:
+        """Call `listener` with the current devices and later with new or changed ones."""
+        self._listeners.append(listener)
+        if self.loaded and self._by_id:
+            listener(list(self._by_id.values()))
+
+        @callback
+        def _remove() -> None:
+            self._listeners.remove(listener)
+
+        return _remove
+
+    async def _async_discover(self) -> bool:
+        """Fetch the device list. Return False if the server has no device API."""
+        if (devices := await self._async_fetch()) is None:
+            return False
+        if self.loaded:
+            # Reconcile the devices restored from the snapshot.
+            self._async_sync(devices)
+            self._async_remove_stale_registry_devices()
+            return True
+        self._by_id = {device.id: device for device in devices}
+        self._async_remove_stale_registry_devices()
+        self._devices.set_result(devices)
+        if self._by_id:
+            self._async_notify(list(self._by_id.values()))
+        self._async_schedule_save()
+        if early := self._early_changes:
+            self._early_changes = {}
+            self.async_apply_changes(early)
+        return True
+
+    async def async_resync(self) -> None:
+        """Fetch the list again and apply the difference."""
+        if not self.loaded:
+            return
+        if (devices := await self._async_fetch()) is not None:
+            self._async_sync(devices)
+
+    @callback
+    def _async_sync(self, devices: list[ScryptedDevice]) -> None:
+        """Apply a complete device list as a diff against the known devices."""
+        listed = {device.id for device in devices}
+        changes: dict[str, dict[str, Any] | ScryptedDevice | None] = {
+            device_id: None for device_id in self._by_id if device_id not in listed
+        }
+        changes.update((device.id, device) for device in devices)
+        self.async_apply_changes(changes)
+
+    async def _async_fetch(self) -> list[ScryptedDevice] | None:
+        """Fetch the device list, retrying with backoff.
+
+        Return None, without retrying, if the server doesn't serve the device API
+        or refuses the token.
+        """
+        delay = _DISCOVERY_RETRY_MIN
+        while True:
+            try:
+                return await self._client.async_get_devices()
+            except (ClientError, asyncio.TimeoutError) as err:
+                if is_api_unavailable(err):
+                    _LOGGER.warning(
+                        "Scrypted doesn't serve the Home Assistant device API "
+                        "(%s), so its devices aren't set up; install the "
+                        "server-side plugin and reload the entry",
+                        err,
+                    )
+                    return None
+                _LOGGER.debug(
+                    "Unable to list Scrypted devices (%s), retrying in %ss", err, delay
+                )
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, _DISCOVERY_RETRY_MAX)
+
+    @callback
+    def async_apply_changes(
+        self, changes: dict[str, dict[str, Any] | ScryptedDevice | None]
+    ) -> None:
+        """Apply added, updated (descriptor) and removed (None) devices."""
+        if not self.loaded:
+            self._early_changes.update(changes)
+            return
+
+        changed: list[ScryptedDevice] = []
+        for device_id, descriptor in changes.items():
+            if descriptor is None:
+                if self._by_id.pop(device_id, None) is not None:
+                    self._async_remove_registry_device(device_id)
+                continue
+            device = (
+                descriptor
+                if isinstance(descriptor, ScryptedDevice)
+                else ScryptedDevice.from_json({"id": device_id, **descriptor})
+            )
+            if (previous := self._by_id.get(device.id)) is None:
+                self._by_id[device.id] = device
+                changed.append(device)
+                continue
+            # States the descriptor changed reach the entities like events do;
+            # states it doesn't carry are kept.
+            updates = {
+                prop: [value]
+                for prop, value in device.state.items()
+                if previous.state.get(prop) != value
+            }
+            for prop, value in previous.state.items():
+                device.state.setdefault(prop, value)
+            self._by_id[device.id] = device
+            if previous != device:
+                changed.append(device)
+                self._async_update_registry_device(previous, device)
+                # Let the device's entities drop interfaces it no longer has.
+                updates[PROPERTY_DEVICE] = [device]
+            if updates:
+                async_dispatcher_send(
+                    self.hass,
+                    SIGNAL_DEVICE_UPDATED.format(self._entry_id, device.id),
+                    updates,
+                )
+
+        if changed:
+            self._async_notify(changed)
+        if changes:
+            self._async_schedule_save()
+
+    @callback
+    def async_update_states(self, device_id: str, changes: dict[str, list[Any]]) -> None:
+        """Remember the latest property values of a device from a batch of events."""
+        if (device := self._by_id.get(device_id)) is None:
+            return
+        for prop, values in changes.items():
+            device.state[prop] = values[-1]
+        self._async_schedule_save()
+
+    @callback
+    def _async_schedule_save(self) -> None:
+        """Snapshot the devices after the store's save delay."""
+        if self._store is not None:
+            self._store.async_schedule_save(self._by_id.values)
+
+    @callback
+    def _async_notify(self, devices: list[ScryptedDevice]) -> None:
+        """Hand new or changed devices to the platforms."""
+        for listener in list(self._listeners):
+            listener(devices)
+
+    @callback
+    def _async_update_registry_device(
+        self, previous: ScryptedDevice, device: ScryptedDevice
+    ) -> None:
+        """Update the name and model of a registered device if they changed."""
+        if (previous.name, previous.type) == (device.name, device.type):
+            return
+        registry = dr.async_get(self.hass)
+        if entry := registry.async_get_device(
+            identifiers={device_identifier(self._entry_id, device.id)}
+        ):
+            registry.async_update_device(
+                entry.id, name=device.name, model=device.type or None
+            )
+
+    @callback
+    def _async_remove_registry_device(self, device_id: str) -> None:
+        """Remove a device, and with it its entities, from this entry."""
+        registry = dr.async_get(self.hass)
+        if entry := registry.async_get_device(
+            identifiers={device_identifier(self._entry_id, device_id)}
+        ):
+            registry.async_update_device(
+                entry.id, remove_config_entry_id=self._entry_id
+            )
+
+    @callback
+    def _async_remove_stale_registry_devices(self) -> None:
+        """Remove devices registered by an earlier run that Scrypted no longer has."""
+        registry = dr.async_get(self.hass)
+        current = {
+            device_identifier(self._entry_id, device_id) for device_id in self._by_id
+        }
+        for entry in dr.async_entries_for_config_entry(registry, self._entry_id):
+            if entry.identifiers and not entry.identifiers & current:
+                registry.async_update_device(
+                    entry.id, remove_config_entry_id=self._entry_id
+                )
@@ -0,0 +1,208 @@
+"""Failover and latency weighted selection between the hosts of a config entry."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import logging
+import random
+
+import aiohttp
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.event import async_track_time_interval
+
+from .const import DOMAIN, SIGNAL_ENDPOINT_CHANGED
+from .http import PROBE_TIMEOUT
+
+_LOGGER = logging.getLogger(__name__)
+
+HEALTH_INTERVAL = timedelta(seconds=30)
+# How long a host's token is used before the health check logs in again.
+TOKEN_REFRESH_INTERVAL = timedelta(hours=1)
+# Weight of the newest check time in a host's running latency.
+LATENCY_SMOOTHING = 0.3
+# Floor for latencies in the weights, so a host on the same machine doesn't take
+# every request from one a millisecond away.
+_MIN_LATENCY = 0.001
+
+
+@dataclass
+class EndpointHealth:
+    """What the health checks and the proxy learned about one host."""
+
+    host: str
+    # Hosts start out healthy, in configured order, until the first check.
+    healthy: bool = True
+    # Running health check time in seconds, None until a check went through.
+    latency: float | None = None
+    # Token of the host's own login, the host may be a separate Scrypted server.
+    token: str | None = None
+    # Loop time of that login.
+    logged_in: float = 0.0
+    error: str | None = None
+
+
+class EndpointPool:
+    """Health of an entry's Scrypted hosts, and the host each request goes to.
+
+    Every `HEALTH_INTERVAL` each host is checked with an unauthenticated request,
+    which measures its latency. A host without a token, one whose token is older
+    than `TOKEN_REFRESH_INTERVAL` or one that refused its token logs in first; the
+    login isn't part of the latency. New requests go to a healthy host picked with weights
+    inverse to the latencies; a host whose connection fails is marked unhealthy at
+    once and requests move on to the next one. WebSocket relays keep the host they
+    connected to for their lifetime.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry_id: str,
+        hosts: list[str],
+        login: Callable[[str], Awaitable[str]],
+        ping: Callable[[str], Awaitable[None]],
+    ) -> None:
+        """Initialize the pool with the hosts in configured order."""
+        self.hass = hass
+        self.entry_id = entry_id
+        self._config_entry: ConfigEntry | None = None
+        self.endpoints = [EndpointHealth(host) for host in hosts]
+        self._by_host = {health.host: health for health in self.endpoints}
+        self._login = login
+        self._ping = ping
+        self._unsub_check: CALLBACK_TYPE | None = None
+
+    @property
+    def active(self) -> str:
+        """Return the host most new requests go to."""
+        return self.select(weighted=False)[0]
+
+    def token(self, host: str) -> str | None:
+        """Return the token of a pooled host's own login, if it logged in yet."""
+        if (health := self._by_host.get(host)) is None:
+            return None
+        return health.token
+
+    def select(self, weighted: bool = True) -> list[str]:
+        """Return the hosts to try for a new request, in order.
+
+        First is a healthy host, picked by latency (at random with weights inverse
+        to it, unless `weighted` is False). The other healthy hosts follow fastest
+        first, then the unhealthy ones as a last resort.
+        """
+        healthy = [health for health in self.endpoints if health.healthy]
+        measured = sorted(
+            (health for health in healthy if health.latency is not None),
+            key=lambda health: health.latency,
+        )
+        ordered = measured + [health for health in healthy if health.latency is None]
+        if weighted and len(measured) > 1:
+            first = random.choices(
+                measured,
+                weights=[1 / max(health.latency, _MIN_LATENCY) for health in measured],
+            )[0]
+            ordered.remove(first)
+            ordered.insert(0, first)
+        ordered += [health for health in self.endpoints if not health.healthy]
+        return [health.host for health in ordered]
+
+    @callback
+    def async_report_failure(self, host: str, error: Exception) -> None:
+        """Take a host that couldn't be connected to out of rotation."""
+        health = self._by_host[host]
+        health.error = str(error)
+        if not health.healthy:
+            return
+        health.healthy = False
+        _LOGGER.warning("Scrypted host %s is unreachable: %s", host, error)
+        self._async_changed()
+
+    @callback
+    def async_report_unauthorized(self, host: str) -> None:
+        """Log in to a host again that refused its token."""
+        if (health := self._by_host.get(host)) is None or health.token is None:
+            return
+        _LOGGER.debug("Scrypted host %s refused its token, logging in again", host)
+        health.token = None
+        if self._config_entry is not None:
+            self._config_entry.async_create_background_task(
+                self.hass,
+                self._async_recheck_host(health),
+                f"{DOMAIN} {self._config_entry.title} login to {host}",
+            )
+
+    async def _async_recheck_host(self, health: EndpointHealth) -> None:
+        """Check a single host and report the outcome."""
+        await self._async_check_host(health)
+        self._async_changed()
+
+    @callback
+    def async_start(self, config_entry: ConfigEntry) -> None:
+        """Check the hosts now and every `HEALTH_INTERVAL` until the entry unloads."""
+        self._config_entry = config_entry
+        config_entry.async_create_background_task(
+            self.hass, self.async_check(), f"{DOMAIN} {config_entry.title} health check"
+        )
+        self._unsub_check = async_track_time_interval(
+            self.hass, self._async_check_interval, HEALTH_INTERVAL
+        )
+        config_entry.async_on_unload(self.async_stop)
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop the periodic health checks."""
+        if self._unsub_check is not None:
+            self._unsub_check()
+            self._unsub_check = None
+
+    async def _async_check_interval(self, _now: datetime) -> None:
+        """Run the periodic health check."""
+        await self.async_check()
+
+    async def async_check(self) -> None:
+        """Check every host at once and update their health."""
+        await asyncio.gather(
+            *(self._async_check_host(health) for health in self.endpoints)
+        )
+        self._async_changed()
+
+    async def _async_check_host(self, health: EndpointHealth) -> None:
+        """Check one host, logging in first if its token is missing or old."""
+        loop = asyncio.get_running_loop()
+        try:
+            async with asyncio.timeout(PROBE_TIMEOUT):
+                if (
+                    health.token is None
+                    or loop.time() - health.logged_in
+                    >= TOKEN_REFRESH_INTERVAL.total_seconds()
+                ):
+                    health.token = await self._login(health.host)
+                    health.logged_in = loop.time()
+                started = loop.time()
+                await self._ping(health.host)
+        except (aiohttp.ClientError, TimeoutError, ValueError) as err:
+            if health.healthy:
+                _LOGGER.warning(
+                    "Scrypted host %s failed its health check: %s", health.host, err
+                )
+            health.healthy = False
+            health.error = str(err) or type(err).__name__
+            return
+
+        latency = loop.time() - started
+        if health.latency is not None:
+            latency = health.latency + LATENCY_SMOOTHING * (latency - health.latency)
+        if not health.healthy:
+            _LOGGER.info("Scrypted host %s is back", health.host)
+        health.healthy = True
+        health.latency = latency
+        health.error = None
+
+    @callback
+    def _async_changed(self) -> None:
+        """Tell the entry's sensor the health of its hosts changed."""
+        async_dispatcher_send(self.hass, SIGNAL_ENDPOINT_CHANGED.format(self.entry_id))
@@ -0,0 +1,114 @@
+"""Base entity for Scrypted devices."""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .api import ScryptedDevice
+from .const import DATA_ENTRIES, SIGNAL_DEVICE_UPDATED
+from .devices import PROPERTY_DEVICE, device_identifier
+from .models import ScryptedEntryData
+
+
+@callback
+def async_setup_device_entities(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+    entities_for_device: Callable[[ScryptedDevice], Iterable[ScryptedDeviceEntity]],
+) -> None:
+    """Add a platform's entities for the entry's devices as they become known.
+
+    Entities are created for the initial device list in one batch and later for
+    added or changed devices, skipping those that already exist.
+    """
+    data: ScryptedEntryData = hass.data[DATA_ENTRIES][config_entry.entry_id]
+    known: set[str] = set()
+
+    @callback
+    def _async_add(devices: list[ScryptedDevice]) -> None:
+        entities = []
+        for device in devices:
+            for entity in entities_for_device(device):
+                unique_id = entity.unique_id
+                if unique_id in known:
+                    continue
+                known.add(unique_id)
+                entity.async_on_remove(
+                    lambda unique_id=unique_id: known.discard(unique_id)
+                )
+                entities.append(entity)
+        if entities:
+            async_add_entities(entities)
+
+    config_entry.async_on_unload(data.devices.async_add_listener(_async_add))
+
+
+class ScryptedDeviceEntity(Entity):
+    """An entity of a Scrypted device, updated by the entry's event stream."""
+
+    _attr_has_entity_name = True
+    _attr_should_poll = False
+
+    def __init__(
+        self, config_entry: ConfigEntry, device: ScryptedDevice, key: str | None = None
+    ) -> None:
+        """Initialize the entity."""
+        super().__init__()
+        self._entry_id = config_entry.entry_id
+        self._device_id = device.id
+        identifier = device_identifier(config_entry.entry_id, device.id)
+        self._attr_unique_id = f"{identifier[1]}_{key}" if key else identifier[1]
+        self._attr_device_info = DeviceInfo(
+            identifiers={identifier},
+            manufacturer="Scrypted",
+            model=device.type or None,
+            name=device.name,
+        )
+
+    async def async_added_to_hass(self) -> None:
+        """Follow the device's events."""
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass,
+                SIGNAL_DEVICE_UPDATED.format(self._entry_id, self._device_id),
+                self._async_device_updated,
+            )
+        )
+
+    @callback
+    def _async_device_updated(self, changes: dict[str, list[Any]]) -> None:
+        """Apply a batch of property changes, writing state if they apply."""
+        if (devices := changes.get(PROPERTY_DEVICE)) and not self._is_supported(
+            devices[-1]
+        ):
+            self._async_remove_unsupported()
+            return
+        if self._async_apply_changes(changes):
+            self.async_write_ha_state()
+
+    @callback
+    def _async_remove_unsupported(self) -> None:
+        """Remove the entity after its device lost the interface behind it."""
+        if self.registry_entry is not None:
+            er.async_get(self.hass).async_remove(self.entity_id)
+        else:
+            self.hass.async_create_task(self.async_remove(force_remove=True))
+
+    def _is_supported(self, device: ScryptedDevice) -> bool:
+        """Return True if the device still provides this entity."""
+        return True
+
+    @callback
+    def _async_apply_changes(self, changes: dict[str, list[Any]]) -> bool:
+        """Update the entity from a batch. Return True if its state changed."""
+        return False
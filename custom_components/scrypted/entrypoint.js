@@ -1,44 +1,38 @@
-import {
-    LitElement,
-    html,
-    css,
-} from "./lit-core.min.js";
-
-class ExamplePanel extends LitElement {
-    static get properties() {
-        return {
-            hass: { type: Object },
-            narrow: { type: Boolean },
-            panel: { type: Object },
-        };
-    }
-
-    render() {
-        return html`
-        <div style="height: 100%; display: flex; flex-direction: column;">
-            <div style="display: flex; align-items: center;">
-                <ha-menu-button
-                slot="navigationIcon"
-                .hass=${this.hass}
-                .narrow=${this.narrow}
-                ></ha-menu-button>
-                ${this.narrow ? html`
-                    <div>Home Assistant: Scrypted</div>
-                ` : ""}
-            </div>
-            <div style="flex: 1; position: relative;">
-                <iframe
-                    title="Scrypted"
-                    src="/api/__DOMAIN__/__TOKEN__/entrypoint.html"
-                    allow="fullscreen"
-                ></iframe>
-            </div>
-        </div>
-    `;
-    }
+// The panel loads the Scrypted UI into its iframe in a single navigation.
+// The proxy prefix (or the Scrypted origin for clients on a trusted network)
+// and the default UI path are filled in by the server.
+const BASE_URL = "__BASE_URL__";
+const PROXY_URL = "/api/__DOMAIN__/__TOKEN__";
+const DEFAULT_URL = "__DEFAULT_URL__";
+
+function resolveUrl() {
+    const search = new URLSearchParams(window.location.search);
+    let url = search.get("url") || DEFAULT_URL;
+    if (url.startsWith(PROXY_URL + "/"))
+        url = BASE_URL + url.substring(PROXY_URL.length);
+    return { url, reload: !!search.get("reload") };
+}
 
-    static get styles() {
-        return css`
+const template = document.createElement("template");
+template.innerHTML = `
+    <style>
+        :host {
+            display: block;
+            height: 100%;
+        }
+        .container {
+            height: 100%;
+            display: flex;
+            flex-direction: column;
+        }
+        .toolbar {
+            display: flex;
+            align-items: center;
+        }
+        .content {
+            flex: 1;
+            position: relative;
+        }
         iframe {
             border: 0;
             width: 100%;
@@ -46,7 +40,63 @@ class ExamplePanel extends LitElement {
             height: 100%;
             background-color: var(--primary-background-color);
         }
-    `;
+    </style>
+    <div class="container">
+        <div class="toolbar">
+            <ha-menu-button slot="navigationIcon"></ha-menu-button>
+            <div class="title" hidden>Home Assistant: Scrypted</div>
+        </div>
+        <div class="content">
+            <iframe title="Scrypted" allow="fullscreen"></iframe>
+        </div>
+    </div>
+`;
+
+class ScryptedPanel extends HTMLElement {
+    constructor() {
+        super();
+        this.attachShadow({ mode: "open" }).appendChild(template.content.cloneNode(true));
+        this._menuButton = this.shadowRoot.querySelector("ha-menu-button");
+        this._title = this.shadowRoot.querySelector(".title");
+        this._iframe = this.shadowRoot.querySelector("iframe");
+    }
+
+    connectedCallback() {
+        if (this._iframe.src)
+            return;
+        const { url, reload } = resolveUrl();
+        this._iframe.src = url;
+        // navigating within the companion app seems to require a window reload.
+        // maybe due to trapping url/history changes?
+        if (reload)
+            setTimeout(() => this._iframe.src = url, 100);
+    }
+
+    set hass(hass) {
+        this._hass = hass;
+        this._menuButton.hass = hass;
+    }
+
+    get hass() {
+        return this._hass;
+    }
+
+    set narrow(narrow) {
+        this._narrow = narrow;
+        this._menuButton.narrow = narrow;
+        this._title.hidden = !narrow;
+    }
+
+    get narrow() {
+        return this._narrow;
+    }
+
+    set panel(panel) {
+        this._panel = panel;
+    }
+
+    get panel() {
+        return this._panel;
     }
 }
-customElements.define("ha-panel-scrypted", ExamplePanel);
+customElements.define("ha-panel-scrypted", ScryptedPanel);
@@ -0,0 +1,136 @@
+"""Scrypted events."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.event import (
+    EventDeviceClass,
+    EventEntity,
+    EventEntityDescription,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .api import (
+    INTERFACE_BINARY_SENSOR,
+    INTERFACE_OBJECT_DETECTOR,
+    TYPE_DOORBELL,
+    ScryptedDevice,
+)
+from .entity import ScryptedDeviceEntity, async_setup_device_entities
+
+EVENT_RING = "ring"
+DETECTION_CLASSES = ("person", "vehicle", "animal", "package", "face")
+DETECTION_OTHER = "object"
+
+DOORBELL = EventEntityDescription(
+    key="binaryState",
+    translation_key="doorbell",
+    device_class=EventDeviceClass.DOORBELL,
+    event_types=[EVENT_RING],
+)
+DETECTION = EventEntityDescription(
+    key="detections",
+    translation_key="detection",
+    event_types=[*DETECTION_CLASSES, DETECTION_OTHER],
+)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Set up Scrypted events from a config entry."""
+
+    def _entities(device: ScryptedDevice) -> list[ScryptedDeviceEntity]:
+        return [
+            cls(config_entry, device)
+            for cls in (ScryptedDoorbellEvent, ScryptedDetectionEvent)
+            if cls.supports(device)
+        ]
+
+    async_setup_device_entities(hass, config_entry, async_add_entities, _entities)
+
+
+class ScryptedDoorbellEvent(ScryptedDeviceEntity, EventEntity):
+    """The button of a Scrypted doorbell."""
+
+    entity_description = DOORBELL
+
+    def __init__(self, config_entry: ConfigEntry, device: ScryptedDevice) -> None:
+        """Initialize a ScryptedDoorbellEvent entity."""
+        super().__init__(config_entry, device, DOORBELL.key)
+        self._pressed = bool(device.state.get(DOORBELL.key))
+
+    @staticmethod
+    def supports(device: ScryptedDevice) -> bool:
+        """Return True if the device is a doorbell with a button."""
+        return (
+            device.type == TYPE_DOORBELL
+            and INTERFACE_BINARY_SENSOR in device.interfaces
+        )
+
+    def _is_supported(self, device: ScryptedDevice) -> bool:
+        """Return True if the device still has its button."""
+        return self.supports(device)
+
+    @callback
+    def _async_apply_changes(self, changes: dict[str, list[Any]]) -> bool:
+        """Fire once if the button was pressed at any point in the batch."""
+        if not (values := changes.get(DOORBELL.key)):
+            return False
+        rang = False
+        for value in values:
+            pressed = bool(value)
+            rang = rang or (pressed and not self._pressed)
+            self._pressed = pressed
+        if rang:
+            self._trigger_event(EVENT_RING)
+        return rang
+
+
+class ScryptedDetectionEvent(ScryptedDeviceEntity, EventEntity):
+    """Objects detected by a Scrypted camera."""
+
+    entity_description = DETECTION
+
+    def __init__(self, config_entry: ConfigEntry, device: ScryptedDevice) -> None:
+        """Initialize a ScryptedDetectionEvent entity."""
+        super().__init__(config_entry, device, DETECTION.key)
+
+    @staticmethod
+    def supports(device: ScryptedDevice) -> bool:
+        """Return True if the device detects objects."""
+        return INTERFACE_OBJECT_DETECTOR in device.interfaces
+
+    def _is_supported(self, device: ScryptedDevice) -> bool:
+        """Return True if the device still detects objects."""
+        return self.supports(device)
+
+    @callback
+    def _async_apply_changes(self, changes: dict[str, list[Any]]) -> bool:
+        """Fire once for the batch, with every class detected in it."""
+        if not (values := changes.get(DETECTION.key)):
+            return False
+        classes: list[str] = []
+        for value in values:
+            # Anything not shaped like an ObjectsDetected result is skipped.
+            if not isinstance(value, dict) or not isinstance(
+                detections := value.get("detections"), list
+            ):
+                continue
+            for detection in detections:
+                if not isinstance(detection, dict):
+                    continue
+                name = detection.get("className")
+                name = name if name in DETECTION_CLASSES else DETECTION_OTHER
+                if name not in classes:
+                    classes.append(name)
+        if not classes:
+            return False
+        # The most recent detection names the event, the rest ride along.
+        self._trigger_event(classes[-1], {"classes": classes, "count": len(values)})
+        return True
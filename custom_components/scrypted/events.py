@@ -0,0 +1,195 @@
+"""Push subscription to the events of all devices of a Scrypted server."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from typing import TYPE_CHECKING, Any
+
+from aiohttp import ClientError, WSMsgType
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+
+from .api import ScryptedClient
+from .const import DOMAIN, SIGNAL_DEVICE_UPDATED
+from .devices import (
+    PROPERTY_CLUSTER_WORKER,
+    PROPERTY_DEVICE,
+    ScryptedDevices,
+    is_api_unavailable,
+)
+
+if TYPE_CHECKING:
+    from .cluster import ClusterRoutes
+
+_LOGGER = logging.getLogger(__name__)
+
+# Longest an event waits so a burst can be folded into one update.
+EVENT_FLUSH_INTERVAL = 0.05
+# Values kept per property and flush; older ones in a burst are dropped.
+MAX_BATCH_VALUES = 64
+
+_RECONNECT_MIN = 1
+_RECONNECT_MAX = 60
+
+
+class ScryptedEventStream:
+    """One websocket subscription delivering every device event of an entry.
+
+    Events are collected per device and property and flushed at most once per
+    `flush_interval`. Each flush sends one dispatcher signal per device carrying the
+    values every property took since the previous flush, in arrival order, so an
+    entity writes its state once per flush however many events arrived.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry_id: str,
+        client: ScryptedClient,
+        flush_interval: float = EVENT_FLUSH_INTERVAL,
+        devices: ScryptedDevices | None = None,
+    ) -> None:
+        """Initialize the stream."""
+        self.hass = hass
+        self._entry_id = entry_id
+        self._client = client
+        self._devices = devices
+        self._flush_interval = flush_interval
+        self._pending: dict[str, dict[str, list[Any]]] = {}
+        self._flush_handle: asyncio.TimerHandle | asyncio.Handle | None = None
+        # Set when the entry routes media to cluster workers.
+        self.routes: ClusterRoutes | None = None
+        self.connected = False
+        self.received = 0
+        self.flushes = 0
+        self.updates = 0
+
+    def async_start(self, config_entry: ConfigEntry) -> None:
+        """Keep the subscription open until the entry unloads."""
+        config_entry.async_create_background_task(
+            self.hass,
+            self._async_run(),
+            f"{DOMAIN} {config_entry.title} events",
+        )
+        config_entry.async_on_unload(self._async_cancel_flush)
+
+    async def _async_run(self) -> None:
+        """Connect, read events and reconnect with backoff.
+
+        A handshake the server refuses with 401, 403 or 404 ends the subscription:
+        the device API is gone, or the token was refused.
+        """
+        delay = _RECONNECT_MIN
+        reconnect = False
+        while True:
+            try:
+                async with self._client.ws_connect_events() as ws:
+                    self.connected = True
+                    delay = _RECONNECT_MIN
+                    if reconnect and self.routes is not None:
+                        # Devices may have moved between workers meanwhile.
+                        self.routes.async_request_refresh()
+                    if reconnect and self._devices is not None:
+                        # Catch up on devices changed while disconnected.
+                        await self._devices.async_resync()
+                    reconnect = True
+                    async for msg in ws:
+                        if msg.type == WSMsgType.TEXT:
+                            self._async_receive(msg.data)
+                        elif msg.type == WSMsgType.ERROR:
+                            break
+            except (ClientError, asyncio.TimeoutError) as err:
+                if is_api_unavailable(err):
+                    _LOGGER.warning(
+                        "Scrypted refused the device event subscription (%s), "
+                        "device states won't update until the entry is reloaded",
+                        err,
+                    )
+                    return
+                _LOGGER.debug("Scrypted event subscription failed: %s", err)
+            finally:
+                self.connected = False
+            _LOGGER.debug("Reconnecting to Scrypted events in %ss", delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, _RECONNECT_MAX)
+
+    @callback
+    def _async_receive(self, data: str) -> None:
+        """Decode a frame of events."""
+        try:
+            events = json.loads(data)
+        except ValueError:
+            _LOGGER.debug("Ignoring malformed Scrypted event frame: %s", data[:200])
+            return
+        self.async_process(events if isinstance(events, list) else [events])
+
+    @callback
+    def async_process(self, events: list[dict[str, Any]]) -> None:
+        """Queue events for the next flush."""
+        for event in events:
+            try:
+                device_id = str(event["id"])
+                prop = event["property"]
+            except (KeyError, TypeError):
+                continue
+            values = self._pending.setdefault(device_id, {}).setdefault(prop, [])
+            values.append(event.get("value"))
+            if len(values) > MAX_BATCH_VALUES:
+                del values[0]
+            self.received += 1
+
+        if self._pending and self._flush_handle is None:
+            if self._flush_interval:
+                self._flush_handle = self.hass.loop.call_later(
+                    self._flush_interval, self._async_flush
+                )
+            else:
+                self._flush_handle = self.hass.loop.call_soon(self._async_flush)
+
+    @callback
+    def _async_flush(self) -> None:
+        """Send one update per device with everything queued since the last flush."""
+        self._flush_handle = None
+        pending, self._pending = self._pending, {}
+        self.flushes += 1
+        lifecycle = {
+            device_id: changes.pop(PROPERTY_DEVICE)[-1]
+            for device_id, changes in pending.items()
+            if PROPERTY_DEVICE in changes
+        }
+        if lifecycle and self._devices is not None:
+            self._devices.async_apply_changes(lifecycle)
+        for device_id, changes in pending.items():
+            if self.routes is not None and PROPERTY_CLUSTER_WORKER in changes:
+                self.routes.async_move_device(
+                    device_id, latest(changes, PROPERTY_CLUSTER_WORKER)
+                )
+            if not changes:
+                continue
+            if self._devices is not None:
+                self._devices.async_update_states(device_id, changes)
+            self.updates += 1
+            async_dispatcher_send(
+                self.hass,
+                SIGNAL_DEVICE_UPDATED.format(self._entry_id, device_id),
+                changes,
+            )
+
+    @callback
+    def _async_cancel_flush(self) -> None:
+        """Drop queued events."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._pending.clear()
+
+
+def latest(changes: dict[str, list[Any]], prop: str, default: Any = None) -> Any:
+    """Return the most recent value of a property in an update."""
+    if values := changes.get(prop):
+        return values[-1]
+    return default
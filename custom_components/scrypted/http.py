@@ -1,44 +1,390 @@
 """The Scrypted integration."""
 
 import asyncio
+import hashlib
 import logging
-from collections.abc import Iterable
+from collections.abc import AsyncIterator, Callable, Iterable, Mapping
+from contextlib import AbstractAsyncContextManager, AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass
 from functools import lru_cache
-from ipaddress import ip_address
+from ipaddress import IPv4Network, IPv6Network, ip_address, ip_network
 import os
-from typing import Any
+import re
+import socket
+from typing import TYPE_CHECKING, Any, NoReturn, TypeVar
 from urllib.parse import quote
 import aiohttp
 from aiohttp import ClientTimeout, hdrs, web
-from aiohttp.web_exceptions import HTTPBadGateway, HTTPBadRequest
+from aiohttp.web_exceptions import (
+    HTTPBadGateway,
+    HTTPBadRequest,
+    HTTPFound,
+    HTTPNotFound,
+    HTTPServiceUnavailable,
+)
 from homeassistant.components.http import HomeAssistantView
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_HOST, CONF_PASSWORD, CONF_USERNAME
-from homeassistant.core import HomeAssistant
-from multidict import CIMultiDict
+from homeassistant.const import (
+    CONF_HOST,
+    CONF_PASSWORD,
+    CONF_USERNAME,
+    EVENT_HOMEASSISTANT_CLOSE,
+)
+from homeassistant.core import Event, HomeAssistant
+from homeassistant.helpers.http import request_handler_factory
+from multidict import CIMultiDict, MultiDict
 from yarl import URL
 
-from .const import DOMAIN, CONF_SCRYPTED_NVR
+from .cache_policy import (
+    DEFAULT_HEADER_RULES,
+    HeaderRule,
+    PreflightCache,
+    body_etag,
+    etag_matches,
+    find_rule,
+    get_header,
+    has_validator,
+    pop_header,
+)
+from .const import (
+    CONF_DIRECT_URL,
+    CONF_RESUMABLE_WEBSOCKETS,
+    CONF_SCRYPTED_NVR,
+    CONF_STREAM_LAG_LIMIT,
+    CONF_TRUSTED_NETWORKS,
+    DEFAULT_HTTP_PORT,
+    DEFAULT_HTTPS_PORT,
+    DOMAIN,
+    TRANSPORT_HTTP,
+    TRANSPORT_HTTPS,
+    TRANSPORT_UNIX,
+)
+from .images import ImageVariantCache, Variant, parse_size, resize_image, variant_etag
+
+if TYPE_CHECKING:
+    from .cluster import ClusterRoutes
+    from .endpoints import EndpointPool
 
 _LOGGER = logging.getLogger(__name__)
+_T = TypeVar("_T")
 
+_MAX_PRELOAD_LINKS = 16
+_ASSET_TAG = re.compile(r"<(script|link)\b([^>]*)>", re.IGNORECASE)
+_ASSET_ATTR = re.compile(r"\b(rel|href|src|type)=[\"']([^\"']+)[\"']", re.IGNORECASE)
+# Seconds the requests of an unloading entry get to finish before they are cancelled.
+DRAIN_TIMEOUT = 5
+# Seconds a login through a candidate endpoint may take, and how long the other
+# candidates may still answer once one succeeded.
+PROBE_TIMEOUT = 3
+PROBE_GRACE = 0.5
+
+# POST with `{"paths": [...]}` to fetch many thumbnails in one response.
+BATCH_THUMBNAILS_PATH = "thumbnails/batch"
+MAX_BATCH_PATHS = 100
+# Upstream requests one batch runs at the same time.
+BATCH_FAN_OUT = 6
+_BATCH_TIMEOUT = ClientTimeout(total=30)
+# Paths remembered per entry as answering with a stream, so a lagging loop can
+# refuse them before Scrypted is asked.
+_STREAM_PATHS_MAX = 256
+# Query parameters asking the proxy for a downscaled image.
+_SIZE_PARAMS = ("width", "height")
+# Conditional and partial request headers that don't apply to the full-size source.
+_SOURCE_ONLY_HEADERS = frozenset(
+    name.lower()
+    for name in (hdrs.IF_NONE_MATCH, hdrs.IF_MODIFIED_SINCE, hdrs.IF_RANGE, hdrs.RANGE)
+)
+# Request headers a CORS preflight asks about, part of its cache key.
+_PREFLIGHT_HEADERS = (
+    hdrs.ORIGIN,
+    hdrs.ACCESS_CONTROL_REQUEST_METHOD,
+    hdrs.ACCESS_CONTROL_REQUEST_HEADERS,
+)
+# Headers of the batch request itself that don't apply to its upstream GETs.
+_BATCH_SKIPPED_HEADERS = _SOURCE_ONLY_HEADERS | frozenset(
+    name.lower() for name in (hdrs.CONTENT_TYPE, hdrs.ACCEPT)
+)
+
+
+@dataclass
+class ProxyActivity:
+    """Streaming work of the proxy, sampled by the event loop lag monitor."""
+
+    # Streamed responses and WebSocket relays currently open.
+    streams: int = 0
+    writes: int = 0
+    bytes_written: int = 0
+    # New streams refused because the loop lagged past the entry's limit.
+    streams_refused: int = 0
+    # WebSocket relays that got their upstream back after losing it.
+    relays_resumed: int = 0
+    # Recent event loop lag in seconds, kept current while the monitor runs.
+    loop_lag: float = 0.0
+
+
+@dataclass(frozen=True)
+class ScryptedEndpoint:
+    """Upstream transport used to reach a Scrypted server."""
+
+    transport: str
+    host: str
+    port: str
+    socket_path: str | None = None
+
+    @property
+    def base_url(self) -> str:
+        """Return the origin requests are sent to."""
+        if self.transport == TRANSPORT_UNIX:
+            # The connector ignores the host, it only needs a well formed URL.
+            return "http://localhost"
+        return f"{self.transport}://{self.host}:{self.port}"
+
+
+def parse_endpoint(host: str) -> ScryptedEndpoint:
+    """Parse the configured host into an upstream endpoint.
+
+    Accepted forms are a bare `ip[:port]` (HTTPS, the historical default),
+    `https://ip[:port]`, `http://ip[:port]` for plain HTTP and
+    `unix:/path/to/scrypted.sock` for a Unix domain socket.
+    """
+    host = host.strip()
+    if host.startswith(f"{TRANSPORT_UNIX}:"):
+        socket_path = host[len(TRANSPORT_UNIX) + 1 :]
+        if socket_path.startswith("//"):
+            socket_path = socket_path[2:]
+        if not socket_path.startswith("/"):
+            raise ValueError("invalid Scrypted socket path")
+        return ScryptedEndpoint(TRANSPORT_UNIX, "localhost", "", socket_path)
+
+    if "://" in host:
+        url = URL(host)
+        if url.scheme not in (TRANSPORT_HTTP, TRANSPORT_HTTPS) or not url.host:
+            raise ValueError("invalid Scrypted host")
+        default_port = (
+            DEFAULT_HTTP_PORT if url.scheme == TRANSPORT_HTTP else DEFAULT_HTTPS_PORT
+        )
+        port = str(url.port) if url.explicit_port else default_port
+        ip = f"[{url.host}]" if ":" in url.host else url.host
+        return ScryptedEndpoint(url.scheme, ip, port)
 
-async def retrieve_token(data: dict[str, Any], session: aiohttp.ClientSession) -> str:
-    """Retrieve token from Scrypted server."""
-    username = data[CONF_USERNAME]
-    password = data.get(CONF_PASSWORD, "")
-    host = data[CONF_HOST]
     ipport = host.split(":")
     if len(ipport) > 2:
-        raise Exception("invalid Scrypted host")
+        raise ValueError("invalid Scrypted host")
     ip = ipport[0]
     if len(ipport) == 2:
         port = ipport[1]
     else:
-        port = "10443"
+        port = DEFAULT_HTTPS_PORT
+    return ScryptedEndpoint(TRANSPORT_HTTPS, ip, port)
+
+
+def parse_trusted_networks(value: str) -> list[IPv4Network | IPv6Network]:
+    """Parse a comma separated list of subnets allowed to bypass the proxy."""
+    return [
+        ip_network(network.strip(), strict=False)
+        for network in value.split(",")
+        if network.strip()
+    ]
+
+
+def parse_backup_hosts(value: str) -> list[str]:
+    """Parse a comma separated list of hosts to fail over to, in order."""
+    hosts = [host.strip() for host in value.split(",") if host.strip()]
+    for host in hosts:
+        parse_endpoint(host)
+    return hosts
+
+
+def create_unix_session(socket_path: str) -> aiohttp.ClientSession:
+    """Create a client session bound to a Scrypted Unix domain socket."""
+    return aiohttp.ClientSession(connector=aiohttp.UnixConnector(path=socket_path))
+
+
+@asynccontextmanager
+async def _endpoint_session(
+    session: aiohttp.ClientSession, endpoint: ScryptedEndpoint
+) -> AsyncIterator[aiohttp.ClientSession]:
+    """Yield a session that reaches the endpoint, opening one for Unix sockets."""
+    if endpoint.socket_path is None:
+        yield session
+        return
+
+    async with create_unix_session(endpoint.socket_path) as unix_session:
+        yield unix_session
+
+
+async def retrieve_token(data: dict[str, Any], session: aiohttp.ClientSession) -> str:
+    """Retrieve token from Scrypted server."""
+    endpoint = parse_endpoint(data[CONF_HOST])
+    async with _endpoint_session(session, endpoint) as endpoint_session:
+        return await _retrieve_token(data, endpoint_session, endpoint)
+
+
+async def check_endpoint(host: str, session: aiohttp.ClientSession) -> None:
+    """Check that a Scrypted host answers, without logging in.
+
+    Asked without credentials, the login route only says the client isn't logged
+    in, which spares the server the password check of a login.
+    """
+    endpoint = parse_endpoint(host)
+    async with _endpoint_session(session, endpoint) as endpoint_session:
+        async with endpoint_session.get(
+            f"{endpoint.base_url}/login", raise_for_status=True, verify_ssl=False
+        ) as resp:
+            await resp.read()
+
+
+@dataclass(frozen=True)
+class EndpointProbe:
+    """Outcome of logging in through one candidate endpoint.
+
+    `host` is the value to configure and `address` the origin that was tried;
+    they differ when a host name was resolved to each of its addresses.
+    """
+
+    host: str
+    address: str
+    # Seconds the login took, None if it failed or was cut off.
+    latency: float | None = None
+    error: str | None = None
+
+
+async def _resolve_addresses(host: str) -> list[str]:
+    """Return the IPv4 and IPv6 addresses of a host name, or the host if it is one."""
+    try:
+        ip_address(host.strip("[]"))
+    except ValueError:
+        pass
+    else:
+        return [host]
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            host, None, type=socket.SOCK_STREAM
+        )
+    except OSError:
+        return [host]
+    addresses = dict.fromkeys(
+        f"[{info[4][0]}]" if info[0] == socket.AF_INET6 else info[4][0]
+        for info in infos
+    )
+    return list(addresses) or [host]
+
+
+async def _candidate_endpoints(host: str) -> list[tuple[str, ScryptedEndpoint]]:
+    """Return the hosts worth trying for a configured host, with their endpoints.
+
+    Besides the host as given these are the default HTTPS port and, for a host
+    already entered as plain HTTP, the default plain HTTP port, each through every
+    address the host name resolves to. Logins send the credentials, so an HTTPS
+    host is never tried in cleartext.
+    """
+    endpoint = parse_endpoint(host)
+    if endpoint.socket_path is not None:
+        return [(host, endpoint)]
+    candidates = [
+        (endpoint.transport, endpoint.port),
+        (TRANSPORT_HTTPS, DEFAULT_HTTPS_PORT),
+    ]
+    if endpoint.transport == TRANSPORT_HTTP:
+        candidates.append((TRANSPORT_HTTP, DEFAULT_HTTP_PORT))
+    transports = dict.fromkeys(candidates)
+    addresses = await _resolve_addresses(endpoint.host)
+    return [
+        (
+            host
+            if (transport, port) == (endpoint.transport, endpoint.port)
+            else f"{transport}://{endpoint.host}:{port}",
+            ScryptedEndpoint(transport, address, port),
+        )
+        for transport, port in transports
+        for address in addresses
+    ]
+
+
+async def probe_endpoints(
+    data: dict[str, Any],
+    session: aiohttp.ClientSession,
+    timeout: float = PROBE_TIMEOUT,
+    grace: float = PROBE_GRACE,
+) -> list[EndpointProbe]:
+    """Log in through every candidate endpoint of the host at once.
+
+    Return the outcomes, fastest first. Logins still pending `grace` seconds
+    after the first success, or `timeout` seconds after the start, are cancelled,
+    so a mistyped or firewalled host doesn't wait for the OS connect timeout.
+    """
+    candidates = await _candidate_endpoints(data[CONF_HOST])
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+
+    async def _probe(endpoint: ScryptedEndpoint) -> float:
+        async with _endpoint_session(session, endpoint) as endpoint_session:
+            await _retrieve_token(data, endpoint_session, endpoint)
+        return loop.time() - started
+
+    tasks = {
+        asyncio.create_task(_probe(endpoint)): (host, endpoint)
+        for host, endpoint in candidates
+    }
+    deadline = started + timeout
+    pending = set(tasks)
+    while pending:
+        done, pending = await asyncio.wait(
+            pending,
+            timeout=max(0, deadline - loop.time()),
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        if not done:
+            break
+        if any(task.exception() is None for task in done):
+            deadline = min(deadline, loop.time() + grace)
+    for task in pending:
+        task.cancel()
+    # Closes the connections of the cancelled logins before returning.
+    await asyncio.gather(*pending, return_exceptions=True)
+
+    probes = []
+    for task, (host, endpoint) in tasks.items():
+        address = endpoint.base_url if endpoint.socket_path is None else host
+        if task.cancelled():
+            probes.append(EndpointProbe(host, address, error="timeout"))
+        elif (err := task.exception()) is not None:
+            probes.append(EndpointProbe(host, address, error=type(err).__name__))
+        else:
+            probes.append(EndpointProbe(host, address, latency=task.result()))
+    return sorted(
+        probes, key=lambda probe: (probe.latency is None, probe.latency or 0)
+    )
+
+
+async def retrieve_content_hash(
+    data: dict[str, Any], session: aiohttp.ClientSession, token: str, path: str
+) -> str:
+    """Return a short content hash of a file served by the Scrypted server."""
+    endpoint = parse_endpoint(data[CONF_HOST])
+    hasher = hashlib.sha256()
+    async with _endpoint_session(session, endpoint) as endpoint_session:
+        async with endpoint_session.get(
+            f"{endpoint.base_url}/{path}",
+            headers={"Authorization": f"Bearer {token}"},
+            raise_for_status=True,
+            ssl=False,
+            timeout=ClientTimeout(total=30),
+        ) as resp:
+            async for chunk in resp.content.iter_chunked(65536):
+                hasher.update(chunk)
+    return hasher.hexdigest()[:12]
+
+
+async def _retrieve_token(
+    data: dict[str, Any], session: aiohttp.ClientSession, endpoint: ScryptedEndpoint
+) -> str:
+    """Log in to Scrypted over the given session."""
+    username = data[CONF_USERNAME]
+    password = data.get(CONF_PASSWORD, "")
 
     resp = await session.get(
-        f"https://{ip}:{port}/login",
+        f"{endpoint.base_url}/login",
         headers={"authorization": aiohttp.BasicAuth(username, password).encode()},
         json={"username": username},
         raise_for_status=True,
@@ -58,39 +404,181 @@ class ScryptedView(HomeAssistantView):
     url = "/api/scrypted/{token}/{path:.*}"
     requires_auth = False
 
-    def __init__(self, hass: HomeAssistant, session: aiohttp.ClientSession) -> None:
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        session: aiohttp.ClientSession,
+        header_rules: tuple[HeaderRule, ...] = DEFAULT_HEADER_RULES,
+    ) -> None:
         """Initialize a Hass.io ingress view."""
         self.hass = hass
         self._session = session
-        self.lit_core = asyncio.Future[str]()
-        self.entrypoint_js = asyncio.Future[str]()
-        self.entrypoint_html = asyncio.Future[str]()
-        hass.async_add_executor_job(lambda: self.load_files(session.loop))
-
-    def load_files(self, loop: asyncio.AbstractEventLoop):
-        lit_core = str(open(os.path.join(os.path.dirname(__file__), "lit-core.min.js")).read())
-        entrypoint_js = str(open(os.path.join(os.path.dirname(__file__), "entrypoint.js")).read())
-        entrypoint_html = str(open(os.path.join(os.path.dirname(__file__), "entrypoint.html")).read())
-        loop.call_soon_threadsafe(lambda: self.lit_core.set_result(lit_core))
-        loop.call_soon_threadsafe(lambda: self.entrypoint_js.set_result(entrypoint_js))
-        loop.call_soon_threadsafe(lambda: self.entrypoint_html.set_result(entrypoint_html))
+        self._header_rules = header_rules
+        self._unix_sessions: dict[str, aiohttp.ClientSession] = {}
+        # Link headers for the critical assets of each token's Scrypted UI page.
+        self._preload_links: dict[str, list[str]] = {}
+        # Panel assets are read from disk on first use, not on Home Assistant's startup path.
+        self._assets: dict[str, asyncio.Future[str]] = {}
+        self._variants = ImageVariantCache()
+        # Request tasks in flight per entry, and the entries that stopped admitting.
+        self._inflight: dict[str, set[asyncio.Task]] = {}
+        self._draining: set[str] = set()
+        # Hosts of the entries that have more than one, by entry.
+        self._pools: dict[str, "EndpointPool"] = {}
+        # Cluster workers serving the devices of the entries that route to them.
+        self._routes: dict[str, "ClusterRoutes"] = {}
+        # Scrypted's answers to CORS preflights, by entry.
+        self._preflights: dict[str, PreflightCache] = {}
+        # Paths that answered with a stream, by entry, oldest first.
+        self._stream_paths: dict[str, dict[str, None]] = {}
+        self.activity = ProxyActivity()
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, self._async_close)
+
+    async def _async_asset(self, name: str) -> str:
+        """Return a bundled panel file, reading it from disk once."""
+        if (future := self._assets.get(name)) is None:
+            future = self._assets[name] = self.hass.async_add_executor_job(
+                _read_asset, name
+            )
+        try:
+            return await asyncio.shield(future)
+        except OSError:
+            # Don't cache the failure, the next request tries again.
+            if self._assets.get(name) is future:
+                del self._assets[name]
+            raise
+
+    async def async_drain(self, entry_id: str, timeout: float = DRAIN_TIMEOUT) -> None:
+        """Finish an unloading entry's requests, cancelling them after `timeout`.
+
+        New requests for the entry are refused from now on, until `async_admit`.
+        Cancelled streams and WebSocket relays close their connections.
+        """
+        self._draining.add(entry_id)
+        if not (tasks := self._inflight.get(entry_id)):
+            return
+        _, pending = await asyncio.wait(set(tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            _LOGGER.debug(
+                "Cancelled %s Scrypted requests of %s", len(pending), entry_id
+            )
+            await asyncio.wait(pending)
+
+    def async_admit(self, entry_id: str) -> None:
+        """Accept requests for an entry again, after it was drained.
+
+        The entry's cached preflight answers are dropped, its setup may change.
+        """
+        self._draining.discard(entry_id)
+        self._preflights.pop(entry_id, None)
+        self._stream_paths.pop(entry_id, None)
+
+    def async_set_pool(self, entry_id: str, pool: "EndpointPool | None") -> None:
+        """Spread an entry's requests over the hosts of a pool, or stop doing so."""
+        if pool is None:
+            self._pools.pop(entry_id, None)
+        else:
+            self._pools[entry_id] = pool
+
+    def async_set_routes(self, entry_id: str, routes: "ClusterRoutes | None") -> None:
+        """Send an entry's device media to cluster workers, or stop doing so."""
+        if routes is None:
+            self._routes.pop(entry_id, None)
+        else:
+            self._routes[entry_id] = routes
+
+    async def _async_close(self, event: Event) -> None:
+        """Close the sessions opened for Unix socket endpoints."""
+        sessions = list(self._unix_sessions.values())
+        self._unix_sessions.clear()
+        for session in sessions:
+            await session.close()
+
+    def _pool(self, token: str) -> "EndpointPool | None":
+        """Return the pool of the token's entry, if it has more than one host."""
+        entry: ConfigEntry = self.hass.data[DOMAIN][token]
+        return self._pools.get(entry.entry_id)
+
+    def _cluster(self, token: str) -> "ClusterRoutes | None":
+        """Return the cluster routes of the token's entry, if it uses them."""
+        entry: ConfigEntry = self.hass.data[DOMAIN][token]
+        return self._routes.get(entry.entry_id)
+
+    def _hosts(self, token: str) -> list[str]:
+        """Return the hosts a new request for the token tries, in order."""
+        if (pool := self._pool(token)) is not None:
+            return pool.select()
+        entry: ConfigEntry = self.hass.data[DOMAIN][token]
+        return [entry.data[CONF_HOST]]
+
+    def _endpoint(self, token: str) -> ScryptedEndpoint:
+        """Return the upstream endpoint most requests for a token go to."""
+        if (pool := self._pool(token)) is not None:
+            return parse_endpoint(pool.active)
+        entry: ConfigEntry = self.hass.data[DOMAIN][token]
+        return parse_endpoint(entry.data[CONF_HOST])
+
+    def _get_session(self, endpoint: ScryptedEndpoint) -> aiohttp.ClientSession:
+        """Return the client session that reaches an endpoint."""
+        if endpoint.socket_path is None:
+            return self._session
+
+        session = self._unix_sessions.get(endpoint.socket_path)
+        if session is None or session.closed:
+            session = create_unix_session(endpoint.socket_path)
+            self._unix_sessions[endpoint.socket_path] = session
+        return session
+
+    def _ui_path(self, token: str) -> str:
+        """Return the path of the Scrypted UI shown in the panel."""
+        entry: ConfigEntry = self.hass.data[DOMAIN][token]
+        if entry.options.get(CONF_SCRYPTED_NVR, entry.data.get(CONF_SCRYPTED_NVR, False)):
+            return "/endpoint/@scrypted/nvr/public/"
+        return "/endpoint/@scrypted/core/public/"
+
+    def _direct_origin(self, request: web.Request, token: str) -> str | None:
+        """Return the Scrypted origin if the client may bypass the proxy.
+
+        Clients in one of the entry's trusted networks talk to Scrypted directly so
+        Home Assistant stays out of the media path. `request.remote` and
+        `request.scheme` already honor X-Forwarded-For and X-Forwarded-Proto when
+        Home Assistant is configured to trust the proxy.
+
+        Only the direct URL is used: the configured host is usually served with a
+        self-signed certificate the browser won't load in the panel's iframe. A
+        plain HTTP origin under an HTTPS frontend would be blocked as mixed
+        content, so those clients stay on the proxy.
+        """
+        entry: ConfigEntry = self.hass.data[DOMAIN][token]
+        if not (networks := entry.options.get(CONF_TRUSTED_NETWORKS)):
+            return None
+        if not (origin := entry.options.get(CONF_DIRECT_URL)):
+            return None
+        if request.scheme == TRANSPORT_HTTPS and URL(origin).scheme != TRANSPORT_HTTPS:
+            return None
+
+        try:
+            client_ip = ip_address(request.remote or "")
+            trusted = parse_trusted_networks(networks)
+        except ValueError:
+            return None
+
+        if any(client_ip in network for network in trusted):
+            return origin.rstrip("/")
+        return None
 
     @lru_cache
-    def _create_url(self, token: str, path: str) -> str:
+    def _create_url(self, host: str, path: str) -> str:
         """Create URL to service."""
-        entry: ConfigEntry = self.hass.data[DOMAIN][token]
-        host = entry.data[CONF_HOST]
-        ipport = host.split(":")
-        if len(ipport) > 2:
-            raise Exception("invalid Scrypted host")
-        ip = ipport[0]
-        if len(ipport) == 2:
-            port = ipport[1]
-        else:
-            port = "10443"
+        try:
+            endpoint = parse_endpoint(host)
+        except ValueError as err:
+            raise HTTPBadRequest() from err
 
         base_path = "/"
-        url = f"https://{ip}:{port}/{quote(path)}"
+        url = f"{endpoint.base_url}/{quote(path)}"
 
         try:
             if not URL(url).path.startswith(base_path):
@@ -100,14 +588,83 @@ class ScryptedView(HomeAssistantView):
 
         return url
 
+    @asynccontextmanager
+    async def _upstream(
+        self,
+        token: str,
+        path: str,
+        headers: dict[str, str] | CIMultiDict,
+        connect: Callable[
+            [aiohttp.ClientSession, str], AbstractAsyncContextManager[_T]
+        ],
+    ) -> AsyncIterator[_T]:
+        """Connect upstream through the first of the token's hosts that answers.
+
+        Device media goes to the cluster worker serving the device first, the
+        token's hosts follow. `connect` opens the request or WebSocket to a URL.
+        Only failed connections move on to the next host: nothing was sent yet, so
+        any request can be retried. A pooled host refusing its token has the pool
+        log in to it again.
+        """
+        pool = self._pool(token)
+        hosts = self._hosts(token)
+        routes = self._cluster(token)
+        if (worker := routes and routes.host_for(path)) is not None:
+            hosts = [worker, *hosts]
+        async with AsyncExitStack() as stack:
+            for host in hosts:
+                url = self._create_url(host, path)
+                upstream_token = pool and pool.token(host) or token
+                headers["Authorization"] = f"Bearer {upstream_token}"
+                session = self._get_session(parse_endpoint(host))
+                try:
+                    upstream = await stack.enter_async_context(connect(session, url))
+                except aiohttp.WSServerHandshakeError as err:
+                    if pool is not None and err.status == 401:
+                        pool.async_report_unauthorized(host)
+                    raise
+                except aiohttp.ClientConnectorError as err:
+                    if routes is not None and host == worker:
+                        routes.async_report_failure(host, err)
+                    elif pool is not None:
+                        pool.async_report_failure(host, err)
+                    if host == hosts[-1]:
+                        raise
+                    _LOGGER.debug("Failing over %s from %s: %s", path, host, err)
+                    continue
+                if pool is not None and getattr(upstream, "status", None) == 401:
+                    # The host's token expired, or the host restarted without it.
+                    pool.async_report_unauthorized(host)
+                break
+            yield upstream
+
     async def _handle(
         self, request: web.Request, token: str, path: str
+    ) -> web.Response | web.StreamResponse | web.WebSocketResponse:
+        """Admit a request for a loaded entry and track it until it finishes."""
+        if (entry := self.hass.data.get(DOMAIN, {}).get(token)) is None:
+            raise HTTPNotFound()
+        if entry.entry_id in self._draining:
+            raise HTTPServiceUnavailable(headers={hdrs.RETRY_AFTER: str(DRAIN_TIMEOUT)})
+
+        task = asyncio.current_task()
+        inflight = self._inflight.setdefault(entry.entry_id, set())
+        inflight.add(task)
+        try:
+            return await self._route(request, token, path)
+        finally:
+            inflight.discard(task)
+            if not inflight:
+                self._inflight.pop(entry.entry_id, None)
+
+    async def _route(
+        self, request: web.Request, token: str, path: str
     ) -> web.Response | web.StreamResponse | web.WebSocketResponse:
         """Route data to Hass.io ingress service."""
         try:
             if path == "lit-core.min.js":
                 response = web.Response(
-                    body=await self.lit_core,
+                    body=await self._async_asset("lit-core.min.js"),
                     headers={
                         "Content-Type": "text/javascript",
                         "Cache-Control": "no-store, max-age=0",
@@ -116,21 +673,45 @@ class ScryptedView(HomeAssistantView):
                 return response
 
             if path == "entrypoint.js":
-                body = (await self.entrypoint_js).replace("__DOMAIN__", DOMAIN).replace("__TOKEN__", token)
-                response = web.Response(
-                    body=body,
-                    headers={
-                        "Content-Type": "text/javascript",
-                        "Cache-Control": "no-store, max-age=0",
-                    },
+                direct_origin = self._direct_origin(request, token)
+                base_url = direct_origin or f"/api/{DOMAIN}/{token}"
+                body = (
+                    (await self._async_asset("entrypoint.js"))
+                    .replace("__DOMAIN__", DOMAIN)
+                    .replace("__TOKEN__", token)
+                    .replace("__BASE_URL__", base_url)
+                    .replace("__DEFAULT_URL__", f"{base_url}{self._ui_path(token)}")
                 )
+                headers = {
+                    "Content-Type": "text/javascript",
+                    "Cache-Control": "no-store, max-age=0",
+                }
+                # Let the browser fetch the UI's assets while it builds the panel.
+                if direct_origin:
+                    headers[hdrs.LINK] = f"<{direct_origin}>; rel=preconnect"
+                elif links := self._preload_links.get(token):
+                    headers[hdrs.LINK] = ", ".join(links)
+                response = web.Response(body=body, headers=headers)
                 return response
 
             if path == "entrypoint.html":
-                body = (await self.entrypoint_html).replace("__DOMAIN__", DOMAIN).replace("__TOKEN__", token)
+                # Callers that pass the target explicitly get a server-side redirect.
+                if (target := request.query.get("url")) and not request.query.get("reload"):
+                    if target.startswith(f"/api/{DOMAIN}/{token}/"):
+                        raise HTTPFound(
+                            target,
+                            headers={"Cache-Control": "no-store, max-age=0"},
+                        )
+                    raise HTTPBadRequest()
+
+                body = (await self._async_asset("entrypoint.html")).replace("__DOMAIN__", DOMAIN).replace("__TOKEN__", token)
                 entry: ConfigEntry = self.hass.data[DOMAIN][token]
                 if entry.options.get(CONF_SCRYPTED_NVR, entry.data.get(CONF_SCRYPTED_NVR, False)):
                     body = body.replace("core", "nvr")
+                body = body.replace(
+                    "__BASE_URL__",
+                    self._direct_origin(request, token) or f"/api/{DOMAIN}/{token}",
+                )
 
                 response = web.Response(
                     body=body,
@@ -141,6 +722,14 @@ class ScryptedView(HomeAssistantView):
                 )
                 return response
 
+            if path == BATCH_THUMBNAILS_PATH and request.method == hdrs.METH_POST:
+                return await self._handle_thumbnail_batch(request, token)
+
+            if request.method == hdrs.METH_OPTIONS and (
+                key := _preflight_key(request, path)
+            ):
+                return await self._handle_preflight(request, token, path, key)
+
             # Websocket
             if _is_websocket(request):
                 return await self._handle_websocket(request, token, path)
@@ -158,7 +747,21 @@ class ScryptedView(HomeAssistantView):
     put = _handle
     delete = _handle
     patch = _handle
-    # options = _handle
+    head = _handle
+
+    def register(
+        self, hass: HomeAssistant, app: web.Application, router: web.UrlDispatcher
+    ) -> None:
+        """Register the view, with OPTIONS on a route of its own ahead of it.
+
+        Home Assistant's CORS answers the preflights to its views' routes itself,
+        and only for the origins it is configured with; preflights to Scrypted get
+        Scrypted's answer.
+        """
+        router.add_resource(self.url, name="api:scrypted:options").add_route(
+            hdrs.METH_OPTIONS, request_handler_factory(hass, self, self._handle)
+        )
+        super().register(hass, app, router)
 
     async def _handle_websocket(
         self, request: web.Request, token: str, path: str
@@ -173,69 +776,181 @@ class ScryptedView(HomeAssistantView):
         else:
             req_protocols = ()
 
+        # Every relay is a stream: refused before the handshake and Scrypted.
+        if self._streams_limited(token):
+            self._refuse_stream(path)
+
         ws_server = web.WebSocketResponse(
             protocols=req_protocols, autoclose=False, autoping=False, max_msg_size=4194304 * 4
         )
         await ws_server.prepare(request)
 
         # Preparing
-        url = self._create_url(token, path)
         source_header = _init_header(request)
-        source_header["Authorization"] = f"Bearer {token}"
-
-        # Support GET query
-        if request.query_string:
-            url = f"{url}?{request.query_string}"
-
-        # Start proxy
-        async with self._session.ws_connect(
-            url,
-            verify_ssl=False,
-            headers=source_header,
-            protocols=req_protocols,
-            autoclose=False,
-            autoping=False,
-            max_msg_size=4194304 * 4
-        ) as ws_client:
-            # Proxy requests
-            await asyncio.wait(
-                [
-                    asyncio.create_task(_websocket_forward(ws_server, ws_client)),
-                    asyncio.create_task(_websocket_forward(ws_client, ws_server)),
-                ],
-                return_when=asyncio.FIRST_COMPLETED,
+
+        def _connect(
+            session: aiohttp.ClientSession, url: str
+        ) -> AbstractAsyncContextManager[aiohttp.ClientWebSocketResponse]:
+            # Support GET query
+            if request.query_string:
+                url = f"{url}?{request.query_string}"
+            return session.ws_connect(
+                url,
+                verify_ssl=False,
+                headers=source_header,
+                protocols=req_protocols,
+                autoclose=False,
+                autoping=False,
+                max_msg_size=4194304 * 4
             )
 
+        if self._resumable(token):
+            # Imported on first use, resumable relays are opt-in.
+            from .relay import ResumableRelay, is_resumable
+
+            if is_resumable(request):
+                relay = ResumableRelay(
+                    ws_server,
+                    lambda: self._upstream(token, path, source_header, _connect),
+                    self.activity,
+                )
+                self.activity.streams += 1
+                try:
+                    await relay.async_run()
+                finally:
+                    self.activity.streams -= 1
+                return ws_server
+
+        # Start proxy, on one host for the relay's lifetime
+        async with self._upstream(token, path, source_header, _connect) as ws_client:
+            # Proxy requests
+            forwards = [
+                asyncio.create_task(_websocket_forward(ws_server, ws_client)),
+                asyncio.create_task(
+                    _websocket_forward(ws_client, ws_server, self.activity)
+                ),
+            ]
+            self.activity.streams += 1
+            try:
+                await asyncio.wait(forwards, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                self.activity.streams -= 1
+                # Don't leave the other direction running on a finished relay.
+                for forward in forwards:
+                    forward.cancel()
+                await asyncio.wait(forwards)
+
         return ws_server
 
     async def _handle_request(
         self, request: web.Request, token: str, path: str
     ) -> web.Response | web.StreamResponse:
         """Ingress route for request."""
-        url = self._create_url(token, path)
+        entry_id = self.hass.data[DOMAIN][token].entry_id
+        stream_paths = self._stream_paths.setdefault(entry_id, {})
+        # Paths known to stream are refused before Scrypted is asked; others can
+        # only be told apart by the answer.
+        if path in stream_paths and self._streams_limited(token):
+            self._refuse_stream(path)
+
+        def _connector(
+            source_header: dict[str, str] | CIMultiDict, params: Mapping[str, str]
+        ) -> Callable[
+            [aiohttp.ClientSession, str],
+            AbstractAsyncContextManager[aiohttp.ClientResponse],
+        ]:
+            def _connect(
+                session: aiohttp.ClientSession, url: str
+            ) -> AbstractAsyncContextManager[aiohttp.ClientResponse]:
+                return session.request(
+                    request.method,
+                    url,
+                    verify_ssl=False,
+                    headers=source_header,
+                    params=params,
+                    allow_redirects=False,
+                    data=request.content,
+                    timeout=ClientTimeout(total=None),
+                    skip_auto_headers={hdrs.CONTENT_TYPE},
+                )
+
+            return _connect
+
+        if request.method == hdrs.METH_GET and any(
+            name in request.query for name in _SIZE_PARAMS
+        ):
+            try:
+                size = parse_size(*(request.query.get(name) for name in _SIZE_PARAMS))
+            except ValueError as err:
+                raise HTTPBadRequest() from err
+            # The variant is built from the full source, whatever the client has.
+            source_header = {
+                name: value
+                for name, value in _init_header(request).items()
+                if name.lower() not in _SOURCE_ONLY_HEADERS
+            }
+            params = MultiDict(
+                (name, value)
+                for name, value in request.query.items()
+                if name not in _SIZE_PARAMS
+            )
+            connect = _connector(source_header, params)
+            async with self._upstream(token, path, source_header, connect) as result:
+                if (
+                    result.status == 200
+                    and result.content_type.startswith("image/")
+                    and _is_buffered(result)
+                ):
+                    headers = _response_header(result)
+                    if rule := find_rule(
+                        self._header_rules,
+                        path,
+                        result.content_type,
+                        request.query_string,
+                    ):
+                        rule.apply(headers)
+                    return await self._async_resized_response(
+                        request,
+                        path,
+                        headers,
+                        await result.read(),
+                        result.content_type,
+                        size,
+                    )
+            # Not an image the proxy resizes: the size parameters and the client's
+            # headers are Scrypted's to handle.
+
         source_header = _init_header(request)
-        source_header["Authorization"] = f"Bearer {token}"
-
-        async with self._session.request(
-            request.method,
-            url,
-            verify_ssl=False,
-            headers=source_header,
-            params=request.query,
-            allow_redirects=False,
-            data=request.content,
-            timeout=ClientTimeout(total=None),
-            skip_auto_headers={hdrs.CONTENT_TYPE},
-        ) as result:
+        connect = _connector(source_header, request.query)
+        async with self._upstream(token, path, source_header, connect) as result:
             headers = _response_header(result)
+            rule = None
+            if result.status == 200:
+                if rule := find_rule(
+                    self._header_rules, path, result.content_type, request.query_string
+                ):
+                    rule.apply(headers)
+
+            if request.method == hdrs.METH_HEAD:
+                return _head_response(result, headers)
 
             # Simple request
-            if (
-                hdrs.CONTENT_LENGTH in result.headers
-                and int(result.headers.get(hdrs.CONTENT_LENGTH, 0)) < 4194000
-            ) or result.status in (204, 304):
+            if _is_buffered(result):
                 # Return Response
                 body = await result.read()
+                if (
+                    result.status == 200
+                    and result.content_type == "text/html"
+                    and f"/{path}" == self._ui_path(token)
+                ):
+                    self._preload_links[token] = _extract_preload_links(
+                        body.decode(result.charset or "utf-8", "replace"),
+                        f"/api/{DOMAIN}/{token}/{path}",
+                    )
+                if rule and rule.add_etag and not has_validator(headers):
+                    etag = headers[hdrs.ETAG] = body_etag(body)
+                    if etag_matches(request.headers.get(hdrs.IF_NONE_MATCH), etag):
+                        return web.Response(status=304, headers=headers)
                 return web.Response(
                     headers=headers,
                     status=result.status,
@@ -244,13 +959,22 @@ class ScryptedView(HomeAssistantView):
                 )
 
             # Stream response
+            stream_paths[path] = None
+            if len(stream_paths) > _STREAM_PATHS_MAX:
+                del stream_paths[next(iter(stream_paths))]
+            if self._streams_limited(token):
+                self._refuse_stream(path)
             response = web.StreamResponse(status=result.status, headers=headers)
             response.content_type = result.content_type
 
+            activity = self.activity
+            activity.streams += 1
             try:
                 await response.prepare(request)
                 async for data in result.content.iter_chunked(4096):
                     await response.write(data)
+                    activity.writes += 1
+                    activity.bytes_written += len(data)
 
             except (
                 aiohttp.ClientError,
@@ -258,9 +982,204 @@ class ScryptedView(HomeAssistantView):
                 ConnectionResetError,
             ) as err:
                 _LOGGER.debug("Stream error %s: %s", path, err)
+                # The headers are out, so only a cut connection tells the client the
+                # body is incomplete; ending it cleanly would pass off a truncated body.
+                if request.transport is not None:
+                    request.transport.abort()
+            finally:
+                activity.streams -= 1
 
             return response
 
+    async def _handle_preflight(
+        self, request: web.Request, token: str, path: str, key: tuple[str, ...]
+    ) -> web.Response:
+        """Answer a CORS preflight, asking Scrypted once per origin and request."""
+        entry: ConfigEntry = self.hass.data[DOMAIN][token]
+        cache = self._preflights.setdefault(entry.entry_id, PreflightCache())
+        now = self.hass.loop.time()
+        if (preflight := cache.get(key, now)) is None:
+            source_header = _init_header(request)
+
+            def _connect(
+                session: aiohttp.ClientSession, url: str
+            ) -> AbstractAsyncContextManager[aiohttp.ClientResponse]:
+                return session.options(
+                    url,
+                    verify_ssl=False,
+                    headers=source_header,
+                    params=request.query,
+                    allow_redirects=False,
+                )
+
+            async with self._upstream(token, path, source_header, _connect) as result:
+                # Browsers ignore the body of a preflight answer.
+                preflight = cache.put(
+                    key, result.status, _response_header(result), now
+                )
+        return web.Response(status=preflight.status, headers=preflight.headers)
+
+    def _resumable(self, token: str) -> bool:
+        """Return True if the entry's WebSocket relays outlive upstream restarts."""
+        entry: ConfigEntry = self.hass.data[DOMAIN][token]
+        return bool(entry.options.get(CONF_RESUMABLE_WEBSOCKETS))
+
+    def _streams_limited(self, token: str) -> bool:
+        """Return True if the loop lags past the entry's limit for new streams."""
+        entry: ConfigEntry = self.hass.data[DOMAIN][token]
+        limit = entry.options.get(CONF_STREAM_LAG_LIMIT)
+        return bool(limit) and self.activity.loop_lag * 1000 >= limit
+
+    def _refuse_stream(self, path: str) -> NoReturn:
+        """Refuse a new stream while the loop lags."""
+        self.activity.streams_refused += 1
+        _LOGGER.debug("Event loop lagging, refusing stream %s", path)
+        raise HTTPServiceUnavailable(headers={hdrs.RETRY_AFTER: "1"})
+
+    async def _async_resized_response(
+        self,
+        request: web.Request,
+        path: str,
+        headers: dict[str, str],
+        body: bytes,
+        content_type: str,
+        size: tuple[int | None, int | None],
+    ) -> web.Response:
+        """Answer with a downscaled variant of an image.
+
+        Variants are cached by the source's ETag (or a hash of its body) and the
+        requested size, and resized in the executor. The variant's ETag is derived
+        from the same key, so revalidations are answered without resizing.
+        """
+        source_etag = get_header(headers, hdrs.ETAG) or body_etag(body)
+        for name in (hdrs.ETAG, hdrs.CONTENT_RANGE, hdrs.ACCEPT_RANGES):
+            pop_header(headers, name)
+        etag = headers[hdrs.ETAG] = variant_etag(source_etag, *size)
+        if etag_matches(request.headers.get(hdrs.IF_NONE_MATCH), etag):
+            return web.Response(status=304, headers=headers)
+
+        variant_body, variant_type = await self._async_variant(
+            path, source_etag, body, content_type, size
+        )
+        return web.Response(
+            headers=headers, content_type=variant_type, body=variant_body
+        )
+
+    async def _async_variant(
+        self,
+        path: str,
+        source_etag: str,
+        body: bytes,
+        content_type: str,
+        size: tuple[int | None, int | None],
+    ) -> Variant:
+        """Return the cached variant of an image, resizing it in the executor."""
+
+        async def _resize() -> Variant:
+            resized = await self.hass.async_add_executor_job(
+                resize_image, body, *size
+            )
+            return resized or (body, content_type)
+
+        return await self._variants.async_get((path, source_etag, size), _resize)
+
+    async def _handle_thumbnail_batch(
+        self, request: web.Request, token: str
+    ) -> web.Response:
+        """Fetch several images upstream and return them in one response.
+
+        The JSON body lists server `paths` (optionally with a query) and may ask for
+        a `width` and `height` applied to each image. Up to `BATCH_FAN_OUT` upstream
+        requests run at once. The response is `multipart/form-data` with one part
+        per image, named by its path, in request order; images that failed are left
+        out. Browsers parse it with `Response.formData()`.
+        """
+        try:
+            data = await request.json()
+            paths = data["paths"]
+            if (
+                not isinstance(paths, list)
+                or not 0 < len(paths) <= MAX_BATCH_PATHS
+                or not all(isinstance(item, str) for item in paths)
+            ):
+                raise ValueError("invalid paths")
+            size = None
+            if any(data.get(name) is not None for name in _SIZE_PARAMS):
+                size = parse_size(
+                    *(
+                        None if data.get(name) is None else str(data[name])
+                        for name in _SIZE_PARAMS
+                    )
+                )
+        except (ValueError, KeyError, TypeError) as err:
+            raise HTTPBadRequest() from err
+
+        source_header = _init_header(request)
+        source_header = {
+            name: value
+            for name, value in source_header.items()
+            if name.lower() not in _BATCH_SKIPPED_HEADERS
+        }
+        semaphore = asyncio.Semaphore(BATCH_FAN_OUT)
+
+        async def _fetch(item: str) -> Variant | None:
+            async with semaphore:
+                return await self._async_fetch_batch_item(
+                    token, item, source_header, size
+                )
+
+        results = await asyncio.gather(*(_fetch(item) for item in paths))
+        writer = aiohttp.MultipartWriter("form-data")
+        for item, result in zip(paths, results):
+            if result is None:
+                continue
+            part = writer.append(result[0], {hdrs.CONTENT_TYPE: result[1]})
+            part.set_content_disposition("form-data", name=item, filename=item)
+        return web.Response(
+            body=writer, headers={hdrs.CACHE_CONTROL: "no-store"}
+        )
+
+    async def _async_fetch_batch_item(
+        self,
+        token: str,
+        item: str,
+        headers: dict[str, str],
+        size: tuple[int | None, int | None] | None,
+    ) -> Variant | None:
+        """Fetch one image of a batch. Return None if it isn't available."""
+        path, _, query = item.partition("?")
+        # Each item may go to another host, with that host's token.
+        headers = dict(headers)
+
+        def _connect(
+            session: aiohttp.ClientSession, url: str
+        ) -> AbstractAsyncContextManager[aiohttp.ClientResponse]:
+            return session.get(
+                f"{url}?{query}" if query else url,
+                headers=headers,
+                ssl=False,
+                allow_redirects=False,
+                timeout=_BATCH_TIMEOUT,
+            )
+
+        try:
+            async with self._upstream(token, path, headers, _connect) as result:
+                if result.status != 200:
+                    return None
+                body = await result.read()
+                content_type = result.content_type
+                etag = result.headers.get(hdrs.ETAG)
+        except HTTPBadRequest:
+            return None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+            _LOGGER.debug("Batch error with %s: %s", item, err)
+            return None
+        if size is None or not content_type.startswith("image/"):
+            return body, content_type
+        return await self._async_variant(
+            path, etag or body_etag(body), body, content_type, size
+        )
+
 
 def _init_header(request: web.Request) -> CIMultiDict | dict[str, str]:
     """Create initial header."""
@@ -327,6 +1246,83 @@ def _response_header(response: aiohttp.ClientResponse) -> dict[str, str]:
     return headers
 
 
+def _is_buffered(response: aiohttp.ClientResponse) -> bool:
+    """Return True if the response body is small enough to be read at once."""
+    return (
+        hdrs.CONTENT_LENGTH in response.headers
+        and int(response.headers.get(hdrs.CONTENT_LENGTH, 0)) < 4194000
+    ) or response.status in (204, 304)
+
+
+def _head_response(
+    response: aiohttp.ClientResponse, headers: dict[str, str]
+) -> web.Response:
+    """Answer a HEAD request with the upstream's headers, reading no body."""
+    # GETs are decoded on the way through, so an encoded length doesn't apply.
+    if response.headers.get(hdrs.CONTENT_ENCODING, "identity") == "identity":
+        if (length := response.headers.get(hdrs.CONTENT_LENGTH)) is not None:
+            headers[hdrs.CONTENT_LENGTH] = length
+    if hdrs.CONTENT_TYPE in response.headers:
+        headers[hdrs.CONTENT_TYPE] = response.headers[hdrs.CONTENT_TYPE]
+    return web.Response(status=response.status, headers=headers)
+
+
+def _preflight_key(request: web.Request, path: str) -> tuple[str, ...] | None:
+    """Return the cache key of a CORS preflight, or None for other OPTIONS requests.
+
+    Scrypted's plugins set their own CORS policy, so the key has the plugin too.
+    """
+    if hdrs.ORIGIN not in request.headers:
+        return None
+    if hdrs.ACCESS_CONTROL_REQUEST_METHOD not in request.headers:
+        return None
+    # `endpoint/@scope/name/...` or `endpoint/name/...`
+    parts = path.split("/")
+    depth = 3 if len(parts) > 1 and parts[1].startswith("@") else 2
+    scope = "/".join(parts[:depth])
+    return (scope, *(request.headers.get(name, "") for name in _PREFLIGHT_HEADERS))
+
+
+def _read_asset(name: str) -> str:
+    """Read a file bundled with the integration."""
+    with open(os.path.join(os.path.dirname(__file__), name), encoding="utf-8") as file:
+        return file.read()
+
+
+def _extract_preload_links(html: str, page_url: str) -> list[str]:
+    """Build Link preload headers for the scripts and styles a page loads."""
+    links: list[str] = []
+    page = URL(page_url)
+
+    def _add(href: str, rel: str, as_type: str | None) -> None:
+        url = page.join(URL(href))
+        # Only same-origin assets share the cache with the proxied iframe.
+        if url.is_absolute() or len(links) >= _MAX_PRELOAD_LINKS:
+            return
+        link = f"<{url}>; rel={rel}"
+        if as_type:
+            link = f"{link}; as={as_type}"
+        links.append(link)
+
+    for tag, raw_attrs in _ASSET_TAG.findall(html):
+        attrs = {key.lower(): value for key, value in _ASSET_ATTR.findall(raw_attrs)}
+        if tag.lower() == "script":
+            if "src" not in attrs:
+                continue
+            if attrs.get("type", "").lower() == "module":
+                _add(attrs["src"], "modulepreload", None)
+            else:
+                _add(attrs["src"], "preload", "script")
+        elif "href" in attrs:
+            rel = attrs.get("rel", "").lower()
+            if rel == "stylesheet":
+                _add(attrs["href"], "preload", "style")
+            elif rel == "modulepreload":
+                _add(attrs["href"], "modulepreload", None)
+
+    return links
+
+
 def _is_websocket(request: web.Request) -> bool:
     """Return True if request is a websocket."""
     headers = request.headers
@@ -339,10 +1335,16 @@ def _is_websocket(request: web.Request) -> bool:
     return False
 
 
-async def _websocket_forward(ws_from, ws_to):
-    """Handle websocket message directly."""
+async def _websocket_forward(ws_from, ws_to, activity: ProxyActivity | None = None):
+    """Handle websocket message directly, counting the data sent to `activity`."""
     try:
         async for msg in ws_from:
+            if activity is not None and msg.type in (
+                aiohttp.WSMsgType.TEXT,
+                aiohttp.WSMsgType.BINARY,
+            ):
+                activity.writes += 1
+                activity.bytes_written += len(msg.data)
             if msg.type == aiohttp.WSMsgType.TEXT:
                 await ws_to.send_str(msg.data)
             elif msg.type == aiohttp.WSMsgType.BINARY:
@@ -0,0 +1,139 @@
+"""Downscaled variants of images served by Scrypted."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+import hashlib
+import io
+
+# Largest width or height a client may ask for.
+MAX_DIMENSION = 4096
+# Total size of the resized variants kept in memory.
+VARIANT_CACHE_BYTES = 16 * 1024 * 1024
+JPEG_QUALITY = 80
+
+Variant = tuple[bytes, str]
+
+
+def parse_size(width: str | None, height: str | None) -> tuple[int | None, int | None]:
+    """Parse the `width` and `height` query values. Raise ValueError if invalid."""
+    size = tuple(None if value is None else int(value) for value in (width, height))
+    if all(value is None for value in size) or any(
+        value is not None and not 0 < value <= MAX_DIMENSION for value in size
+    ):
+        raise ValueError("invalid image size")
+    return size  # type: ignore[return-value]
+
+
+def variant_etag(source_etag: str, width: int | None, height: int | None) -> str:
+    """Return the ETag of a variant, known before it is resized."""
+    digest = hashlib.sha1(f"{source_etag}|{width}x{height}".encode()).hexdigest()
+    return f'W/"{digest[:20]}"'
+
+
+def resize_image(body: bytes, width: int | None, height: int | None) -> Variant | None:
+    """Downscale an image to fit in the box, keeping its aspect ratio.
+
+    Return None if the image already fits, can't be decoded or has more pixels
+    than Pillow decodes safely. JPEGs are decoded at a reduced DCT scale, so most
+    of the full-size decode is skipped. This is CPU bound and must run in the
+    executor.
+    """
+    # Pillow is only needed once a resized image is requested.
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(io.BytesIO(body)) as image:
+            source_format = image.format
+            box = (width or image.width, height or image.height)
+            if image.width <= box[0] and image.height <= box[1]:
+                return None
+            if source_format == "JPEG":
+                image.draft("RGB", box)
+            image.thumbnail(box)
+            output = io.BytesIO()
+            if source_format == "JPEG" or image.mode not in ("RGBA", "LA", "P"):
+                image.convert("RGB").save(output, "JPEG", quality=JPEG_QUALITY)
+                return output.getvalue(), "image/jpeg"
+            image.save(output, "PNG", optimize=True)
+            return output.getvalue(), "image/png"
+    except (
+        Image.DecompressionBombError,
+        UnidentifiedImageError,
+        OSError,
+        ValueError,
+    ):
+        return None
+
+
+class ImageVariantCache:
+    """Bounded LRU cache of resized images.
+
+    Keys identify the source by ETag and the requested size. Concurrent requests
+    for a missing variant share one resize, and the least recently used variants
+    are dropped once `max_bytes` is exceeded.
+    """
+
+    def __init__(self, max_bytes: int = VARIANT_CACHE_BYTES) -> None:
+        """Initialize the cache."""
+        self._max_bytes = max_bytes
+        self._variants: OrderedDict[Hashable, Variant] = OrderedDict()
+        self._inflight: dict[Hashable, asyncio.Future[Variant]] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        """Return the number of cached variants."""
+        return len(self._variants)
+
+    @property
+    def size(self) -> int:
+        """Return the bytes held by the cached variants."""
+        return self._bytes
+
+    async def async_get(
+        self, key: Hashable, create: Callable[[], Awaitable[Variant]]
+    ) -> Variant:
+        """Return the cached variant for `key`, creating it with `create()` once."""
+        if (variant := self._variants.get(key)) is not None:
+            self._variants.move_to_end(key)
+            self.hits += 1
+            return variant
+        if (future := self._inflight.get(key)) is not None:
+            self.hits += 1
+            return await asyncio.shield(future)
+
+        self.misses += 1
+        # The resize runs in its own task, so a cancelled caller doesn't cancel it
+        # for everyone waiting on it.
+        task = self._inflight[key] = asyncio.get_running_loop().create_task(
+            self._async_create(key, create)
+        )
+        # A failure nobody waits for anymore isn't worth a warning.
+        task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return await asyncio.shield(task)
+
+    async def _async_create(
+        self, key: Hashable, create: Callable[[], Awaitable[Variant]]
+    ) -> Variant:
+        """Create a variant and keep it."""
+        try:
+            variant = await create()
+        finally:
+            del self._inflight[key]
+        self._put(key, variant)
+        return variant
+
+    def _put(self, key: Hashable, variant: Variant) -> None:
+        """Store a variant, evicting the least recently used ones."""
+        size = len(variant[0])
+        if size > self._max_bytes:
+            return
+        self._variants[key] = variant
+        self._bytes += size
+        while self._bytes > self._max_bytes:
+            _, evicted = self._variants.popitem(last=False)
+            self._bytes -= len(evicted[0])
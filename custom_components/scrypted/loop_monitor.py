@@ -0,0 +1,190 @@
+"""Event loop lag, correlated with the proxy's streaming work."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import NamedTuple
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.event import async_track_time_interval
+
+from .const import SIGNAL_LOOP_LAG, SIGNAL_LOOP_MONITOR_OWNER
+from .http import ProxyActivity
+
+# Seconds between samples; each sample's lag is how late its timer ran.
+SAMPLE_INTERVAL = 0.05
+# Samples later than this (seconds) count as spikes.
+SPIKE_LAG = 0.05
+# Seconds of samples the statistics cover, and how often they are published.
+WINDOW = 60
+REPORT_INTERVAL = timedelta(seconds=10)
+# Samples making up the recent lag that limits new streams, about a second.
+RECENT_SAMPLES = 20
+
+
+class _Sample(NamedTuple):
+    """One lag measurement and the proxy work done since the previous one."""
+
+    lag: float
+    streams: int
+    writes: int
+    bytes_written: int
+
+
+@dataclass(frozen=True)
+class LoopLagStats:
+    """Event loop lag over the last window and what the proxy did meanwhile.
+
+    Lags are in seconds. Write sizes are the mean bytes per proxied write, over
+    the whole window and over the intervals that ended in a spike.
+    """
+
+    lag_p99: float
+    lag_max: float
+    spikes: int
+    spikes_with_streams: int
+    streams: int
+    streams_during_spikes: float
+    write_size: float
+    write_size_during_spikes: float
+    bytes_per_second: float
+    streams_refused: int
+
+
+def summarize(samples: list[_Sample], activity: ProxyActivity) -> LoopLagStats:
+    """Summarize a window of samples."""
+    lags = sorted(sample.lag for sample in samples)
+    spikes = [sample for sample in samples if sample.lag > SPIKE_LAG]
+    seconds = sum(SAMPLE_INTERVAL + sample.lag for sample in samples)
+    return LoopLagStats(
+        lag_p99=lags[min(len(lags) - 1, int(len(lags) * 0.99))] if lags else 0.0,
+        lag_max=lags[-1] if lags else 0.0,
+        spikes=len(spikes),
+        spikes_with_streams=sum(1 for sample in spikes if sample.streams),
+        streams=activity.streams,
+        streams_during_spikes=(
+            sum(sample.streams for sample in spikes) / len(spikes) if spikes else 0.0
+        ),
+        write_size=_write_size(samples),
+        write_size_during_spikes=_write_size(spikes),
+        bytes_per_second=(
+            sum(sample.bytes_written for sample in samples) / seconds
+            if seconds
+            else 0.0
+        ),
+        streams_refused=activity.streams_refused,
+    )
+
+
+def _write_size(samples: list[_Sample]) -> float:
+    """Return the mean bytes per write of the samples."""
+    if not (writes := sum(sample.writes for sample in samples)):
+        return 0.0
+    return sum(sample.bytes_written for sample in samples) / writes
+
+
+class LoopLagMonitor:
+    """Measure how late the event loop runs timers while entries want it.
+
+    A timer is scheduled every `SAMPLE_INTERVAL` and the delay it runs with is
+    recorded together with the streams open and the bytes the proxy wrote since
+    the previous sample, so lag spikes can be told apart from proxy traffic.
+    Statistics are published with `SIGNAL_LOOP_LAG` every `REPORT_INTERVAL`, and
+    the recent lag is kept on the proxy's activity for stream admission.
+
+    Sampling costs one timer callback per interval and runs only while at least
+    one entry enabled the monitor.
+    """
+
+    def __init__(self, hass: HomeAssistant, activity: ProxyActivity) -> None:
+        """Initialize the monitor."""
+        self.hass = hass
+        self.activity = activity
+        self.stats: LoopLagStats | None = None
+        self._samples: deque[_Sample] = deque(maxlen=int(WINDOW / SAMPLE_INTERVAL))
+        # Entries that enabled the monitor, in the order they did.
+        self._entries: dict[str, None] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self._unsub_report: CALLBACK_TYPE | None = None
+        self._expected = 0.0
+        self._writes = 0
+        self._bytes_written = 0
+
+    @property
+    def running(self) -> bool:
+        """Return True while sampling."""
+        return self._timer is not None
+
+    @property
+    def owner(self) -> str | None:
+        """Return the entry the monitor's sensors belong to, the first to enable it."""
+        return next(iter(self._entries), None)
+
+    @callback
+    def async_add_entry(self, entry_id: str) -> None:
+        """Start sampling for an entry, if no other entry already did."""
+        self._entries[entry_id] = None
+        if self._timer is not None:
+            return
+        self._writes = self.activity.writes
+        self._bytes_written = self.activity.bytes_written
+        self._schedule(self.hass.loop.time())
+        self._unsub_report = async_track_time_interval(
+            self.hass, self._async_report, REPORT_INTERVAL
+        )
+
+    @callback
+    def async_remove_entry(self, entry_id: str) -> None:
+        """Stop sampling once no entry wants it, or hand the sensors on."""
+        owner = self.owner
+        self._entries.pop(entry_id, None)
+        if self._entries:
+            if self.owner != owner:
+                async_dispatcher_send(self.hass, SIGNAL_LOOP_MONITOR_OWNER)
+            return
+        if self._timer is None:
+            return
+        self._timer.cancel()
+        self._timer = None
+        if self._unsub_report is not None:
+            self._unsub_report()
+            self._unsub_report = None
+        self._samples.clear()
+        self.stats = None
+        self.activity.loop_lag = 0.0
+
+    def _schedule(self, now: float) -> None:
+        """Schedule the next sample."""
+        self._expected = now + SAMPLE_INTERVAL
+        self._timer = self.hass.loop.call_at(self._expected, self._sample)
+
+    @callback
+    def _sample(self) -> None:
+        """Record how late this timer ran and the proxy work since the last one."""
+        now = self.hass.loop.time()
+        activity = self.activity
+        self._samples.append(
+            _Sample(
+                max(0.0, now - self._expected),
+                activity.streams,
+                activity.writes - self._writes,
+                activity.bytes_written - self._bytes_written,
+            )
+        )
+        self._writes = activity.writes
+        self._bytes_written = activity.bytes_written
+        activity.loop_lag = max(
+            sample.lag for sample in islice(reversed(self._samples), RECENT_SAMPLES)
+        )
+        self._schedule(now)
+
+    @callback
+    def _async_report(self, _now: datetime | None = None) -> None:
+        """Publish the statistics of the window."""
+        self.stats = summarize(list(self._samples), self.activity)
+        async_dispatcher_send(self.hass, SIGNAL_LOOP_LAG, self.stats)
@@ -0,0 +1,211 @@
+"""Browse and play the recordings of Scrypted NVR cameras."""
+
+from __future__ import annotations
+
+import asyncio
+
+from aiohttp import ClientError
+
+from homeassistant.components.media_player import BrowseError, MediaClass, MediaType
+from homeassistant.components.media_source import (
+    BrowseMediaSource,
+    MediaSource,
+    MediaSourceItem,
+    PlayMedia,
+    Unresolvable,
+)
+from homeassistant.core import HomeAssistant
+
+from .api import (
+    INTERFACE_VIDEO_RECORDER,
+    ScryptedClip,
+    ScryptedDevice,
+    recording_path,
+)
+from .const import DATA_ENTRIES, DOMAIN
+from .models import ScryptedEntryData
+
+CLIP_MIME_TYPE = "video/mp4"
+# Identifier part marking a clip, as opposed to a day or a page of a day.
+_CLIP = "clip"
+
+
+async def async_get_media_source(hass: HomeAssistant) -> ScryptedMediaSource:
+    """Set up the Scrypted media source."""
+    return ScryptedMediaSource(hass)
+
+
+class ScryptedMediaSource(MediaSource):
+    """NVR recordings, browsed as camera, day and clips.
+
+    Identifiers are `entry/device` for a camera, `entry/device/day` for the first
+    page of a day, `entry/device/day/cursor` for a following page and
+    `entry/device/clip/clip_id` for a clip. Every level is fetched only when it is
+    expanded, and a day is listed one page at a time with a "More" item leading to
+    the next page, so months of recordings are never loaded at once.
+
+    Clips and thumbnails are served through the entry's proxy view. Range requests
+    pass through it, so players can seek, and clip thumbnails get immutable caching
+    headers.
+    """
+
+    name = "Scrypted"
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the media source."""
+        super().__init__(DOMAIN)
+        self.hass = hass
+
+    async def async_resolve_media(self, item: MediaSourceItem) -> PlayMedia:
+        """Resolve a clip to its proxied URL."""
+        parts = (item.identifier or "").split("/", 3)
+        if len(parts) != 4 or parts[2] != _CLIP:
+            raise Unresolvable(f"Unknown Scrypted media item: {item.identifier}")
+        entry_id, device_id, _, clip_id = parts
+        if (data := self._entry_data(entry_id)) is None:
+            raise Unresolvable(f"Scrypted entry {entry_id} is not loaded")
+        return PlayMedia(
+            self._proxy_url(data, recording_path(device_id, clip_id, "video")),
+            CLIP_MIME_TYPE,
+        )
+
+    async def async_browse_media(self, item: MediaSourceItem) -> BrowseMediaSource:
+        """Browse one level of the recordings."""
+        if not item.identifier:
+            return await self._async_browse_cameras()
+
+        parts = item.identifier.split("/", 3)
+        data = self._entry_data(parts[0])
+        if len(parts) < 2 or data is None or not data.devices.loaded:
+            raise BrowseError(f"Unknown Scrypted media item: {item.identifier}")
+        device = next(
+            (
+                device
+                for device in await data.devices.async_get()
+                if device.id == parts[1]
+            ),
+            None,
+        )
+        if device is None or len(parts) > 2 and parts[2] == _CLIP:
+            raise BrowseError(f"Unknown Scrypted media item: {item.identifier}")
+
+        try:
+            if len(parts) == 2:
+                return await self._async_browse_days(data, parts[0], device)
+            return await self._async_browse_clips(
+                data, parts[0], device, parts[2], parts[3] if len(parts) == 4 else None
+            )
+        except (ClientError, asyncio.TimeoutError) as err:
+            raise BrowseError(f"Unable to browse Scrypted recordings: {err}") from err
+
+    def _entry_data(self, entry_id: str) -> ScryptedEntryData | None:
+        """Return the runtime data of a loaded entry."""
+        return self.hass.data.get(DATA_ENTRIES, {}).get(entry_id)
+
+    async def _async_browse_cameras(self) -> BrowseMediaSource:
+        """List the recording cameras of every loaded entry."""
+        entries = self.hass.data.get(DATA_ENTRIES, {})
+        children = []
+        for entry_id, data in entries.items():
+            if not data.devices.loaded:
+                continue
+            entry = self.hass.config_entries.async_get_entry(entry_id)
+            for device in await data.devices.async_get():
+                if INTERFACE_VIDEO_RECORDER not in device.interfaces:
+                    continue
+                title = device.name
+                if len(entries) > 1 and entry is not None:
+                    title = f"{entry.title}: {title}"
+                children.append(
+                    _directory(f"{entry_id}/{device.id}", title, MediaClass.DIRECTORY)
+                )
+        children.sort(key=lambda child: child.title)
+        return _directory(
+            None, self.name or DOMAIN, MediaClass.APP, children, MediaClass.DIRECTORY
+        )
+
+    async def _async_browse_days(
+        self, data: ScryptedEntryData, entry_id: str, device: ScryptedDevice
+    ) -> BrowseMediaSource:
+        """List the days a camera recorded, without their clips."""
+        days = await data.client.async_get_recording_days(device.id)
+        return _directory(
+            f"{entry_id}/{device.id}",
+            device.name,
+            MediaClass.DIRECTORY,
+            [
+                _directory(f"{entry_id}/{device.id}/{day}", day, MediaClass.DIRECTORY)
+                for day in days
+            ],
+            MediaClass.DIRECTORY,
+        )
+
+    async def _async_browse_clips(
+        self,
+        data: ScryptedEntryData,
+        entry_id: str,
+        device: ScryptedDevice,
+        day: str,
+        cursor: str | None,
+    ) -> BrowseMediaSource:
+        """List one page of a day's clips."""
+        page = await data.client.async_get_recordings(device.id, day, cursor)
+        base = f"{entry_id}/{device.id}"
+        children = [self._clip(data, base, device.id, clip) for clip in page.clips]
+        if page.next is not None:
+            children.append(
+                _directory(f"{base}/{day}/{page.next}", "More", MediaClass.DIRECTORY)
+            )
+        identifier = f"{base}/{day}" if cursor is None else f"{base}/{day}/{cursor}"
+        return _directory(
+            identifier,
+            f"{device.name} {day}",
+            MediaClass.DIRECTORY,
+            children,
+            MediaClass.VIDEO,
+        )
+
+    def _clip(
+        self, data: ScryptedEntryData, base: str, device_id: str, clip: ScryptedClip
+    ) -> BrowseMediaSource:
+        """Return the playable item of a clip."""
+        title = clip.start.strftime("%H:%M:%S")
+        if clip.detection_classes:
+            title = f"{title} {', '.join(clip.detection_classes)}"
+        return BrowseMediaSource(
+            domain=DOMAIN,
+            identifier=f"{base}/{_CLIP}/{clip.id}",
+            media_class=MediaClass.VIDEO,
+            media_content_type=CLIP_MIME_TYPE,
+            title=title,
+            can_play=True,
+            can_expand=False,
+            thumbnail=self._proxy_url(
+                data, recording_path(device_id, clip.id, "thumbnail")
+            ),
+        )
+
+    def _proxy_url(self, data: ScryptedEntryData, path: str) -> str:
+        """Return the URL of a server path behind the proxy view."""
+        return f"/api/{DOMAIN}/{data.client.token}/{path}"
+
+
+def _directory(
+    identifier: str | None,
+    title: str,
+    media_class: MediaClass,
+    children: list[BrowseMediaSource] | None = None,
+    children_media_class: MediaClass | None = None,
+) -> BrowseMediaSource:
+    """Return an expandable item."""
+    return BrowseMediaSource(
+        domain=DOMAIN,
+        identifier=identifier,
+        media_class=media_class,
+        media_content_type=MediaType.VIDEO if identifier else MediaType.APP,
+        title=title,
+        can_play=False,
+        can_expand=True,
+        children=children,
+        children_media_class=children_media_class,
+    )
@@ -0,0 +1,30 @@
+"""Runtime data of a Scrypted config entry."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from .api import ScryptedClient
+from .devices import ScryptedDevices
+from .events import ScryptedEventStream
+
+if TYPE_CHECKING:
+    from .cluster import ClusterRoutes
+    from .endpoints import EndpointPool
+    from .loop_monitor import LoopLagMonitor
+
+
+@dataclass
+class ScryptedEntryData:
+    """Connections shared by the platforms of one config entry."""
+
+    client: ScryptedClient
+    devices: ScryptedDevices
+    events: ScryptedEventStream
+    # Set when the entry has backup hosts.
+    endpoints: EndpointPool | None = None
+    # Set when the entry routes device media to cluster workers.
+    cluster: ClusterRoutes | None = None
+    # Set when the entry enabled the event loop lag monitor shared by all entries.
+    loop_monitor: LoopLagMonitor | None = None
@@ -0,0 +1,202 @@
+"""WebSocket relay that keeps the client connected while Scrypted restarts."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from collections.abc import Callable
+from contextlib import AbstractAsyncContextManager, suppress
+import logging
+import random
+
+import aiohttp
+from aiohttp import WSCloseCode, WSMessage, WSMsgType, web
+
+from .http import ProxyActivity
+
+_LOGGER = logging.getLogger(__name__)
+
+# Bytes of client messages held while the upstream is away, and how long the
+# relay tries to get it back before closing the client's socket.
+RESUME_BUFFER = 256 * 1024
+RESUME_TIMEOUT = 60
+# Bounds of the randomized delay before each reconnect, doubling per attempt.
+_BACKOFF_MIN = 0.5
+_BACKOFF_MAX = 5
+# Closes of a server going away, rather than ending the session.
+_GOING_AWAY = frozenset(
+    {
+        WSCloseCode.GOING_AWAY,
+        WSCloseCode.INTERNAL_ERROR,
+        WSCloseCode.SERVICE_RESTART,
+        WSCloseCode.TRY_AGAIN_LATER,
+    }
+)
+_DATA = (WSMsgType.TEXT, WSMsgType.BINARY)
+
+
+def is_resumable(request: web.Request) -> bool:
+    """Return True if a WebSocket keeps no session on the server.
+
+    Engine.io sessions live in the server process and are gone after a restart,
+    so their clients have to start over; other sockets pick up where they were.
+    """
+    return "EIO" not in request.query
+
+
+class ResumableRelay:
+    """Relay between a client's WebSocket and Scrypted that outlives restarts.
+
+    When the upstream connection is lost, or the server closes it because it is
+    going away, the client's socket stays open and the relay reconnects with
+    randomized exponential backoff, so clients don't all come back at once. The
+    messages the client sends meanwhile are held, up to `RESUME_BUFFER` bytes, and
+    sent in order once the upstream is back; the relay answers pings itself.
+
+    The client closing, the server ending the session, a full buffer and the
+    upstream staying away for `RESUME_TIMEOUT` seconds end the relay.
+    """
+
+    def __init__(
+        self,
+        downstream: web.WebSocketResponse,
+        connect: Callable[
+            [], AbstractAsyncContextManager[aiohttp.ClientWebSocketResponse]
+        ],
+        activity: ProxyActivity,
+    ) -> None:
+        """Initialize the relay for a prepared client socket."""
+        self._downstream = downstream
+        self._connect = connect
+        self._activity = activity
+        self._upstream: aiohttp.ClientWebSocketResponse | None = None
+        self._held: deque[WSMessage] = deque()
+        self._held_size = 0
+
+    async def async_run(self) -> None:
+        """Relay until the client or the server ends the session."""
+        reader = asyncio.create_task(self._async_read_downstream())
+        try:
+            await self._async_relay_upstream(reader)
+        finally:
+            reader.cancel()
+            await asyncio.wait([reader])
+            if not self._downstream.closed:
+                await self._downstream.close()
+
+    async def _async_relay_upstream(self, reader: asyncio.Task) -> None:
+        """Connect upstream and forward its messages, again after each loss."""
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        deadline: float | None = None
+        while True:
+            closed: WSMessage | None = None
+            try:
+                async with self._connect() as upstream:
+                    if deadline is not None:
+                        self._activity.relays_resumed += 1
+                        _LOGGER.debug("Resumed WebSocket relay after %s tries", attempt)
+                    attempt, deadline = 0, None
+                    # Held messages go out before any new ones.
+                    while self._held:
+                        await _send(upstream, self._held[0])
+                        self._held_size -= len(self._held.popleft().data)
+                    self._upstream = upstream
+                    forward = asyncio.create_task(self._async_forward(upstream))
+                    try:
+                        await asyncio.wait(
+                            [forward, reader], return_when=asyncio.FIRST_COMPLETED
+                        )
+                    finally:
+                        self._upstream = None
+                        forward.cancel()
+                        await asyncio.wait([forward])
+                    closed = None if forward.cancelled() else forward.result()
+            except (aiohttp.ClientError, ConnectionResetError) as err:
+                _LOGGER.debug("WebSocket relay lost its upstream: %s", err)
+
+            if reader.done():
+                return
+            if closed is not None and closed.data not in _GOING_AWAY:
+                # The server ended the session.
+                await self._downstream.close(code=closed.data, message=closed.extra)
+                return
+
+            if deadline is None:
+                deadline = loop.time() + RESUME_TIMEOUT
+            delay = random.uniform(0, min(_BACKOFF_MAX, _BACKOFF_MIN * 2**attempt))
+            attempt += 1
+            if loop.time() + delay > deadline:
+                _LOGGER.debug("Giving up on a WebSocket relay after %s tries", attempt)
+                await self._downstream.close(code=WSCloseCode.SERVICE_RESTART)
+                return
+            await asyncio.wait([reader], timeout=delay)
+
+    async def _async_forward(
+        self, upstream: aiohttp.ClientWebSocketResponse
+    ) -> WSMessage | None:
+        """Forward upstream messages to the client.
+
+        Return the server's close message, or None if the connection was lost.
+        """
+        activity = self._activity
+        while True:
+            message = await upstream.receive()
+            if message.type in _DATA:
+                await _send(self._downstream, message)
+                activity.writes += 1
+                activity.bytes_written += len(message.data)
+            elif message.type == WSMsgType.PING:
+                await self._downstream.ping(message.data)
+            elif message.type == WSMsgType.PONG:
+                await self._downstream.pong(message.data)
+            elif message.type == WSMsgType.CLOSE:
+                return message
+            else:
+                return None
+
+    async def _async_read_downstream(self) -> None:
+        """Forward client messages upstream, holding them while it is away."""
+        async for message in self._downstream:
+            upstream = self._upstream
+            if message.type in _DATA:
+                if upstream is not None:
+                    try:
+                        await _send(upstream, message)
+                        continue
+                    except ConnectionResetError:
+                        pass
+                if not self._hold(message):
+                    await self._downstream.close(
+                        code=WSCloseCode.TRY_AGAIN_LATER, message=b"buffer full"
+                    )
+                    return
+            elif message.type == WSMsgType.PING:
+                if upstream is None or upstream.closed:
+                    await self._downstream.pong(message.data)
+                    continue
+                with suppress(ConnectionResetError):
+                    await upstream.ping(message.data)
+            elif message.type == WSMsgType.PONG and upstream is not None:
+                with suppress(ConnectionResetError):
+                    await upstream.pong(message.data)
+
+    def _hold(self, message: WSMessage) -> bool:
+        """Hold a client message for the next upstream. Return False if full."""
+        size = len(message.data)
+        if self._held_size + size > RESUME_BUFFER:
+            _LOGGER.debug("WebSocket relay buffer full, closing the client's socket")
+            return False
+        self._held.append(message)
+        self._held_size += size
+        return True
+
+
+async def _send(
+    ws: web.WebSocketResponse | aiohttp.ClientWebSocketResponse, message: WSMessage
+) -> None:
+    """Send a text or binary message."""
+    if message.type == WSMsgType.TEXT:
+        await ws.send_str(message.data)
+    else:
+        await ws.send_bytes(message.data)
@@ -0,0 +1,190 @@
+"""Lovelace resource management for the Scrypted cards."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from homeassistant.components.lovelace.const import (
+    CONF_RESOURCE_TYPE_WS,
+    DOMAIN as LL_DOMAIN,
+)
+from homeassistant.components.lovelace.resources import (
+    ResourceStorageCollection,
+    ResourceYAMLCollection,
+)
+from homeassistant.const import CONF_ID, CONF_URL
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_KEY = f"{DOMAIN}.lovelace_resources"
+STORAGE_VERSION = 1
+
+
+def strip_version(url: str) -> str:
+    """Return a resource URL without its version query."""
+    return url.split("?", 1)[0]
+
+
+class LovelaceResourceReconciler:
+    """Keep the Lovelace resources of every Scrypted entry in sync.
+
+    Each config entry declares the resources it wants. A reconcile pass loads the
+    Lovelace collection once, indexes it by URL (ignoring the `?v=` version query),
+    diffs the desired resources of all entries against it and applies the creates,
+    updates and deletes in one batch. Passes are serialized by a lock so entries that
+    set up concurrently can't race each other into duplicate resources.
+
+    The URLs created for each entry are persisted, so resources created before a
+    restart are still removed when their entry is unloaded later.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the reconciler."""
+        self.hass = hass
+        self._store: Store[dict[str, dict[str, list[str]]]] = Store(
+            hass, STORAGE_VERSION, STORAGE_KEY
+        )
+        self._lock = asyncio.Lock()
+        self._desired: dict[str, list[tuple[str, str]]] = {}
+        self._tracked: dict[str, set[str]] | None = None
+
+    async def async_update_entry(
+        self, entry_id: str, definitions: list[tuple[str, str]]
+    ) -> None:
+        """Declare the `(type, url)` resources an entry needs and reconcile."""
+        self._desired[entry_id] = definitions
+        await self.async_reconcile()
+
+    async def async_remove_entry(self, entry_id: str) -> None:
+        """Drop an entry's resources and reconcile."""
+        self._desired.pop(entry_id, None)
+        await self.async_reconcile()
+
+    async def async_reconcile(self) -> None:
+        """Apply the difference between desired and registered resources."""
+        async with self._lock:
+            tracked = await self._async_load_tracked()
+            changed = await self._async_apply(tracked)
+            if changed:
+                await self._store.async_save(
+                    {
+                        "entries": {
+                            entry_id: sorted(urls)
+                            for entry_id, urls in tracked.items()
+                            if urls
+                        }
+                    }
+                )
+
+    async def _async_load_tracked(self) -> dict[str, set[str]]:
+        """Load the persisted URLs created per entry."""
+        if self._tracked is None:
+            data = await self._store.async_load() or {}
+            self._tracked = {
+                entry_id: set(urls)
+                for entry_id, urls in data.get("entries", {}).items()
+            }
+        return self._tracked
+
+    async def _async_apply(self, tracked: dict[str, set[str]]) -> bool:
+        """Apply creates, updates and deletes. Return True if tracking changed."""
+        lovelace_data = self.hass.data.get(LL_DOMAIN)
+        if not lovelace_data or not lovelace_data.resources:
+            # Nothing can be touched without Lovelace; forget what unloaded entries
+            # created so the tracker doesn't grow forever.
+            stale = [entry_id for entry_id in tracked if entry_id not in self._desired]
+            for entry_id in stale:
+                del tracked[entry_id]
+            return bool(stale)
+
+        resources: ResourceStorageCollection | ResourceYAMLCollection = (
+            lovelace_data.resources
+        )
+        if not resources.loaded:
+            await resources.async_load()
+            resources.loaded = True
+
+        yaml_mode = isinstance(resources, ResourceYAMLCollection)
+        index = {strip_version(data[CONF_URL]): data for data in resources.async_items()}
+        changed = False
+
+        desired: dict[str, tuple[str, str, str]] = {}
+        for entry_id, definitions in self._desired.items():
+            for resource_type, url in definitions:
+                desired[strip_version(url)] = (entry_id, resource_type, url)
+
+        for base_url, (entry_id, resource_type, url) in desired.items():
+            if (current := index.get(base_url)) is None:
+                if yaml_mode:
+                    _LOGGER.warning(
+                        "Scrypted Lovelace resource can't automatically be registered "
+                        "because this Home Assistant instance manages resources via "
+                        "YAML. Please register the following resource manually:\n"
+                        "  - url: %s\n    type: %s",
+                        url,
+                        resource_type,
+                    )
+                    continue
+                data = await resources.async_create_item(
+                    {CONF_RESOURCE_TYPE_WS: resource_type, CONF_URL: url}
+                )
+                index[base_url] = data
+                tracked.setdefault(entry_id, set()).add(base_url)
+                changed = True
+                _LOGGER.debug(
+                    "Registered Scrypted Lovelace resource (resource ID %s) for entry %s",
+                    data.get(CONF_ID),
+                    entry_id,
+                )
+            elif current[CONF_URL] != url and url != base_url and not yaml_mode:
+                # The bundle changed upstream, bump the cache buster in place.
+                await resources.async_update_item(
+                    current[CONF_ID],
+                    {CONF_RESOURCE_TYPE_WS: resource_type, CONF_URL: url},
+                )
+                _LOGGER.debug(
+                    "Updated Scrypted Lovelace resource (resource ID %s) to %s",
+                    current[CONF_ID],
+                    url,
+                )
+
+        for entry_id in list(tracked):
+            for base_url in list(tracked[entry_id]):
+                owner = desired.get(base_url)
+                if owner is not None and owner[0] == entry_id:
+                    continue
+                tracked[entry_id].discard(base_url)
+                changed = True
+                if owner is not None:
+                    # Another entry wants the same URL; hand the resource over.
+                    tracked.setdefault(owner[0], set()).add(base_url)
+                    continue
+                if (current := index.get(base_url)) is None:
+                    _LOGGER.debug(
+                        "Scrypted resource %s was not found while unloading entry %s",
+                        base_url,
+                        entry_id,
+                    )
+                    continue
+                if yaml_mode:
+                    _LOGGER.debug(
+                        "Resources switched to YAML mode after registration, "
+                        "skipping automatic removal for %s",
+                        base_url,
+                    )
+                    continue
+                await resources.async_delete_item(current[CONF_ID])
+                _LOGGER.debug(
+                    "Removed Scrypted Lovelace resource (resource ID %s) for entry %s",
+                    current[CONF_ID],
+                    entry_id,
+                )
+            if not tracked[entry_id]:
+                del tracked[entry_id]
+
+        return changed
@@ -1,12 +1,32 @@
 """Representation of Z-Wave sensors."""
 
-from homeassistant.components.sensor import SensorEntity
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorStateClass,
+)
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_HOST
-from homeassistant.core import HomeAssistant
+from homeassistant.const import CONF_HOST, UnitOfTime
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import DOMAIN
+from .const import (
+    DATA_ENTRIES,
+    DOMAIN,
+    SIGNAL_ENDPOINT_CHANGED,
+    SIGNAL_LOOP_LAG,
+    SIGNAL_LOOP_MONITOR_OWNER,
+    SIGNAL_TOKEN_UPDATED,
+)
+
+if TYPE_CHECKING:
+    from .endpoints import EndpointPool
+    from .loop_monitor import LoopLagMonitor, LoopLagStats
 
 
 async def async_setup_entry(
@@ -20,7 +40,43 @@ async def async_setup_entry(
         for token, entry in hass.data[DOMAIN].items()
         if entry.entry_id == config_entry.entry_id
     )
-    async_add_entities([ScryptedTokenSensor(config_entry, token)])
+    entities: list[SensorEntity] = [ScryptedTokenSensor(config_entry, token)]
+    entry_data = hass.data.get(DATA_ENTRIES, {}).get(config_entry.entry_id)
+    if entry_data is not None and entry_data.endpoints is not None:
+        entities.append(ScryptedEndpointSensor(config_entry, entry_data.endpoints))
+    async_add_entities(entities)
+    if entry_data is not None and entry_data.loop_monitor is not None:
+        _async_add_loop_monitor_sensors(
+            hass, config_entry, entry_data.loop_monitor, async_add_entities
+        )
+
+
+@callback
+def _async_add_loop_monitor_sensors(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    monitor: LoopLagMonitor,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Add the sensors of the monitor shared by all entries, if the entry owns it.
+
+    The sensors belong to the first entry that enabled the monitor, and move to
+    the next one when that entry unloads.
+    """
+    added = False
+
+    @callback
+    def _async_owner_changed() -> None:
+        nonlocal added
+        if added or monitor.owner != config_entry.entry_id:
+            return
+        added = True
+        async_add_entities([ScryptedLoopLagSensor(), ScryptedProxyStreamsSensor()])
+
+    config_entry.async_on_unload(
+        async_dispatcher_connect(hass, SIGNAL_LOOP_MONITOR_OWNER, _async_owner_changed)
+    )
+    _async_owner_changed()
 
 
 class ScryptedTokenSensor(SensorEntity):
@@ -32,9 +88,157 @@ class ScryptedTokenSensor(SensorEntity):
         token: str,
     ) -> None:
         """Initialize a ScryptedTokenSensor entity."""
+        self._entry_id = config_entry.entry_id
         self._attr_name = f"{DOMAIN.title()} token: {config_entry.data[CONF_HOST]}"
         self._attr_unique_id = config_entry.data[CONF_HOST]
         self._attr_native_value = token
         self._attr_icon = "mdi:shield-key"
         self._attr_should_poll = False
         self._attr_extra_state_attributes = {CONF_HOST: config_entry.data[CONF_HOST]}
+
+    async def async_added_to_hass(self) -> None:
+        """Follow token changes after a background login."""
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass,
+                SIGNAL_TOKEN_UPDATED.format(self._entry_id),
+                self._async_token_updated,
+            )
+        )
+
+    @callback
+    def _async_token_updated(self, token: str) -> None:
+        """Update the sensor with the new token."""
+        self._attr_native_value = token
+        self.async_write_ha_state()
+
+
+class ScryptedEndpointSensor(SensorEntity):
+    """The host most proxied requests go to, with the health of every host."""
+
+    _attr_should_poll = False
+    _attr_icon = "mdi:server-network"
+    _unrecorded_attributes = frozenset({"endpoints"})
+
+    def __init__(self, config_entry: ConfigEntry, pool: EndpointPool) -> None:
+        """Initialize the sensor."""
+        self._pool = pool
+        self._attr_name = f"{DOMAIN.title()} active endpoint"
+        self._attr_unique_id = f"{config_entry.entry_id}_active_endpoint"
+        self._update()
+
+    async def async_added_to_hass(self) -> None:
+        """Follow health checks and failovers."""
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass,
+                SIGNAL_ENDPOINT_CHANGED.format(self._pool.entry_id),
+                self._async_changed,
+            )
+        )
+
+    @callback
+    def _async_changed(self) -> None:
+        """Update the sensor from the pool."""
+        self._update()
+        self.async_write_ha_state()
+
+    def _update(self) -> None:
+        """Show the active host and how each host is doing."""
+        self._attr_native_value = self._pool.active
+        self._attr_extra_state_attributes = {
+            "endpoints": [
+                {
+                    CONF_HOST: health.host,
+                    "healthy": health.healthy,
+                    "latency_ms": (
+                        None
+                        if health.latency is None
+                        else round(health.latency * 1000, 1)
+                    ),
+                    "error": health.error,
+                }
+                for health in self._pool.endpoints
+            ]
+        }
+
+
+class _ScryptedLoopMonitorSensor(SensorEntity):
+    """A sensor updated with each report of the event loop lag monitor."""
+
+    _attr_should_poll = False
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(self, key: str, name: str) -> None:
+        """Initialize the sensor."""
+        self._attr_name = f"{DOMAIN.title()} {name}"
+        self._attr_unique_id = f"{DOMAIN}_{key}"
+
+    async def async_added_to_hass(self) -> None:
+        """Follow the monitor's reports."""
+        self.async_on_remove(
+            async_dispatcher_connect(self.hass, SIGNAL_LOOP_LAG, self._async_report)
+        )
+
+    @callback
+    def _async_report(self, stats: LoopLagStats) -> None:
+        """Update the sensor from a report."""
+        self._update(stats)
+        self.async_write_ha_state()
+
+    def _update(self, stats: LoopLagStats) -> None:
+        """Set the state and attributes from a report."""
+
+
+class ScryptedLoopLagSensor(_ScryptedLoopMonitorSensor):
+    """99th percentile event loop lag, with the proxy's share of the spikes."""
+
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_suggested_display_precision = 1
+    _attr_icon = "mdi:timer-alert-outline"
+    _unrecorded_attributes = frozenset(
+        {
+            "lag_max_ms",
+            "spikes",
+            "spikes_with_streams",
+            "streams_during_spikes",
+            "write_size",
+            "write_size_during_spikes",
+        }
+    )
+
+    def __init__(self) -> None:
+        """Initialize the sensor."""
+        super().__init__("loop_lag", "event loop lag")
+
+    def _update(self, stats: LoopLagStats) -> None:
+        """Show the lag and what the proxy streamed during spikes."""
+        self._attr_native_value = round(stats.lag_p99 * 1000, 2)
+        self._attr_extra_state_attributes = {
+            "lag_max_ms": round(stats.lag_max * 1000, 2),
+            "spikes": stats.spikes,
+            "spikes_with_streams": stats.spikes_with_streams,
+            "streams_during_spikes": round(stats.streams_during_spikes, 2),
+            "write_size": round(stats.write_size),
+            "write_size_during_spikes": round(stats.write_size_during_spikes),
+        }
+
+
+class ScryptedProxyStreamsSensor(_ScryptedLoopMonitorSensor):
+    """Streams and WebSocket relays open through the proxy."""
+
+    _attr_icon = "mdi:transit-connection-variant"
+    _unrecorded_attributes = frozenset({"bytes_per_second", "streams_refused"})
+
+    def __init__(self) -> None:
+        """Initialize the sensor."""
+        super().__init__("proxy_streams", "proxy streams")
+
+    def _update(self, stats: LoopLagStats) -> None:
+        """Show the open streams and the proxied throughput."""
+        self._attr_native_value = stats.streams
+        self._attr_extra_state_attributes = {
+            "bytes_per_second": round(stats.bytes_per_second),
+            "streams_refused": stats.streams_refused,
+        }
@@ -0,0 +1,114 @@
+"""Snapshot cache shared by everything that asks a camera for an image."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+import time
+from typing import Any
+
+SNAPSHOT_TTL = 10.0
+
+
+class SnapshotCache:
+    """Cache a camera's latest snapshot for a short time.
+
+    Requests within `ttl` of the last fetch are served from the cache, and requests
+    arriving while a fetch is running wait for that fetch instead of starting their
+    own. Dashboards polling the same camera therefore cost one upstream snapshot per
+    period no matter how many are open. If a refresh fails the previous image is
+    served until a later refresh succeeds.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], Awaitable[bytes]],
+        ttl: float = SNAPSHOT_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Initialize the cache."""
+        self._fetch = fetch
+        self._ttl = ttl
+        self._clock = clock
+        self._image: bytes | None = None
+        self._fetched_at = 0.0
+        self._inflight: asyncio.Future[bytes] | None = None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.last_latency: float | None = None
+        self._total_latency = 0.0
+
+    @property
+    def hit_rate(self) -> float | None:
+        """Return the share of requests that didn't start an upstream fetch."""
+        requests = self.hits + self.coalesced + self.misses
+        if not requests:
+            return None
+        return (self.hits + self.coalesced) / requests
+
+    @property
+    def average_latency(self) -> float | None:
+        """Return the average duration of successful upstream fetches."""
+        fetches = self.misses - self.errors
+        if fetches <= 0:
+            return None
+        return self._total_latency / fetches
+
+    def stats(self) -> dict[str, Any]:
+        """Return the cache statistics as state attributes."""
+        return {
+            "snapshot_hits": self.hits,
+            "snapshot_misses": self.misses,
+            "snapshot_coalesced": self.coalesced,
+            "snapshot_errors": self.errors,
+            "snapshot_hit_rate": _round(self.hit_rate, 3),
+            "snapshot_latency_ms": _round(self.last_latency, 1, 1000),
+            "snapshot_average_latency_ms": _round(self.average_latency, 1, 1000),
+        }
+
+    def invalidate(self) -> None:
+        """Make the next request fetch a fresh snapshot."""
+        self._fetched_at = 0.0
+
+    async def async_get(self) -> bytes:
+        """Return a snapshot no older than the TTL."""
+        if self._image is not None and self._clock() - self._fetched_at < self._ttl:
+            self.hits += 1
+            return self._image
+
+        if self._inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(self._inflight)
+
+        self.misses += 1
+        # The fetch runs in its own task, so a cancelled caller doesn't cancel it for
+        # everyone waiting on it.
+        self._inflight = asyncio.get_running_loop().create_task(self._async_refresh())
+        return await asyncio.shield(self._inflight)
+
+    async def _async_refresh(self) -> bytes:
+        """Fetch a snapshot upstream."""
+        started = self._clock()
+        try:
+            image = await self._fetch()
+        except Exception:
+            self.errors += 1
+            self._inflight = None
+            if self._image is not None:
+                return self._image
+            raise
+        self.last_latency = self._clock() - started
+        self._total_latency += self.last_latency
+        self._image = image
+        self._fetched_at = self._clock()
+        self._inflight = None
+        return image
+
+
+def _round(value: float | None, digits: int, scale: float = 1) -> float | None:
+    """Scale and round an optional statistic."""
+    if value is None:
+        return None
+    return round(value * scale, digits)
@@ -0,0 +1,105 @@
+"""Persistent storage for the Scrypted integration."""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .api import ScryptedDevice
+from .const import DOMAIN
+
+TOKEN_STORAGE_KEY = f"{DOMAIN}.tokens"
+TOKEN_STORAGE_VERSION = 1
+
+DEVICES_STORAGE_KEY = f"{DOMAIN}.{{}}.devices"
+DEVICES_STORAGE_VERSION = 1
+# Seconds to collect changes before writing the device snapshot.
+DEVICES_SAVE_DELAY = 10
+
+
+class ScryptedTokenStore:
+    """Remember the last good login token of each config entry.
+
+    Setup uses the stored token right away and validates the login in the
+    background, so Home Assistant doesn't wait for Scrypted while booting.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the token store."""
+        self._store: Store[dict[str, dict[str, str]]] = Store(
+            hass, TOKEN_STORAGE_VERSION, TOKEN_STORAGE_KEY, private=True
+        )
+        self._tokens: dict[str, str] | None = None
+
+    async def _async_tokens(self) -> dict[str, str]:
+        """Return the cached tokens, loading them on first use."""
+        if self._tokens is None:
+            data = await self._store.async_load() or {}
+            self._tokens = dict(data.get("tokens", {}))
+        return self._tokens
+
+    async def async_get(self, entry_id: str) -> str | None:
+        """Return the stored token of an entry."""
+        return (await self._async_tokens()).get(entry_id)
+
+    async def async_set(self, entry_id: str, token: str) -> None:
+        """Store the token of an entry."""
+        tokens = await self._async_tokens()
+        if tokens.get(entry_id) == token:
+            return
+        tokens[entry_id] = token
+        await self._store.async_save({"tokens": tokens})
+
+    async def async_remove(self, entry_id: str) -> None:
+        """Forget the token of an entry."""
+        tokens = await self._async_tokens()
+        if tokens.pop(entry_id, None) is not None:
+            await self._store.async_save({"tokens": tokens})
+
+
+class ScryptedDeviceStore:
+    """Snapshot of an entry's devices and their last known states.
+
+    Setup restores the devices from it, so entities exist with their last state
+    as soon as Home Assistant starts instead of after Scrypted answers. Writes
+    are debounced and serialized by the storage helper in the executor.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the device store."""
+        self._store: Store[dict[str, list[dict[str, Any]]]] = Store(
+            hass, DEVICES_STORAGE_VERSION, DEVICES_STORAGE_KEY.format(entry_id)
+        )
+        self._scheduled = False
+
+    async def async_load(self) -> list[ScryptedDevice]:
+        """Return the devices of the last snapshot."""
+        data = await self._store.async_load() or {}
+        return [ScryptedDevice.from_json(device) for device in data.get("devices", [])]
+
+    @callback
+    def async_schedule_save(
+        self, devices: Callable[[], Iterable[ScryptedDevice]]
+    ) -> None:
+        """Write the devices returned by `devices()` after the save delay.
+
+        A pending write isn't pushed back by later changes, so a busy event stream
+        still gets its states written every `DEVICES_SAVE_DELAY` seconds.
+        """
+        if self._scheduled:
+            return
+        self._scheduled = True
+
+        @callback
+        def _data() -> dict[str, list[dict[str, Any]]]:
+            self._scheduled = False
+            return {"devices": [device.as_json() for device in devices()]}
+
+        self._store.async_delay_save(_data, DEVICES_SAVE_DELAY)
+
+    async def async_remove(self) -> None:
+        """Delete the snapshot."""
+        await self._store.async_remove()
@@ -0,0 +1,89 @@
+"""Compare fetching a timeline's thumbnails one by one and in one batch.
+
+Forty 320x180 thumbnails are fetched through the proxy, each taking 5 ms
+upstream. Individually, the client uses six connections like a browser does
+per host. In a batch, the proxy fetches them upstream with the same fan-out
+and returns them in one multipart response. The proxy adds a round trip per
+request of 0 ms (LAN) and 50 ms (remote client).
+"""
+
+from __future__ import annotations
+
+import asyncio
+
+from aiohttp import ClientSession, MultipartReader, TCPConnector
+
+from custom_components.scrypted.http import BATCH_THUMBNAILS_PATH
+
+from ..stand_in import ProxyUnderTest, StandInScrypted, make_jpeg
+from .harness import Measurement, report
+
+THUMBNAILS = 40
+ITERATIONS = 5
+BROWSER_CONNECTIONS = 6
+RECORDINGS = "endpoint/@scrypted/homeassistant/public/api/devices/1/recordings"
+PATHS = [f"{RECORDINGS}/{index}/thumbnail" for index in range(THUMBNAILS)]
+
+
+async def _individually(session: ClientSession, prefix: str) -> int:
+    """Fetch every thumbnail with its own request."""
+
+    async def _get(path: str) -> int:
+        async with session.get(f"{prefix}/{path}") as resp:
+            return len(await resp.read())
+
+    return len(await asyncio.gather(*(_get(path) for path in PATHS)))
+
+
+async def _batched(session: ClientSession, prefix: str) -> int:
+    """Fetch every thumbnail in one batch."""
+    async with session.post(
+        f"{prefix}/{BATCH_THUMBNAILS_PATH}", json={"paths": PATHS}
+    ) as resp:
+        reader = MultipartReader.from_response(resp)
+        count = 0
+        while (part := await reader.next()) is not None:
+            await part.read()
+            count += 1
+    return count
+
+
+async def _measure(latency: float) -> list[Measurement]:
+    """Time both ways with a client round trip of `latency` seconds."""
+    server = StandInScrypted()
+    server.thumbnail = make_jpeg(320, 180)
+    server.thumbnail_delay = 0.005
+    proxy = ProxyUnderTest(await server.start_tcp(), latency=latency)
+    prefix = await proxy.start()
+    label = f"{latency * 1000:.0f} ms round trip"
+    measurements = []
+    try:
+        for name, fetch in (("individual GETs", _individually), ("batch", _batched)):
+            measurement = Measurement(f"{name}, {label}")
+            requests = len(server.requests)
+            async with ClientSession(
+                connector=TCPConnector(limit=BROWSER_CONNECTIONS)
+            ) as session:
+                for _ in range(ITERATIONS):
+                    with measurement.run():
+                        assert await fetch(session, prefix) == THUMBNAILS
+            measurement.extra["upstream/run"] = (
+                len(server.requests) - requests
+            ) / ITERATIONS
+            measurements.append(measurement)
+    finally:
+        await proxy.close()
+        await server.close()
+    return measurements
+
+
+async def main() -> None:
+    """Run the thumbnail batch benchmark."""
+    measurements = []
+    for latency in (0.0, 0.05):
+        measurements.extend(await _measure(latency))
+    report("Thumbnail batch", measurements)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
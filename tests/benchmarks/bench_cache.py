@@ -0,0 +1,104 @@
+"""Count the requests a repeat panel load sends through the proxy.
+
+A minimal browser cache honors max-age/immutable and revalidates with
+If-None-Match, which is enough to compare the proxy with its header policy
+disabled against the default rules.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+import re
+import time
+
+from aiohttp import ClientSession
+
+from custom_components.scrypted.cache_policy import DEFAULT_HEADER_RULES
+
+from ..stand_in import UI_HTML, StandInScrypted
+from .harness import Measurement, ProxyUnderTest, report
+
+UI_PATH = "/endpoint/@scrypted/core/public/"
+
+
+@dataclass
+class _Cached:
+    body: bytes
+    etag: str | None
+    fresh_until: float
+
+
+class BrowserCache:
+    """Just enough of an HTTP cache to count network requests."""
+
+    def __init__(self, session: ClientSession) -> None:
+        self._session = session
+        self._entries: dict[str, _Cached] = {}
+        self.requests = 0
+        self.bytes = 0
+
+    async def get(self, url: str) -> bytes:
+        cached = self._entries.get(url)
+        if cached and cached.fresh_until > time.monotonic():
+            return cached.body
+
+        headers = {"If-None-Match": cached.etag} if cached and cached.etag else {}
+        self.requests += 1
+        async with self._session.get(url, headers=headers) as resp:
+            body = await resp.read()
+            self.bytes += len(body)
+            if resp.status == 304 and cached:
+                return cached.body
+            max_age = re.search(r"max-age=(\d+)", resp.headers.get("Cache-Control", ""))
+            self._entries[url] = _Cached(
+                body,
+                resp.headers.get("ETag"),
+                time.monotonic() + (int(max_age.group(1)) if max_age else 0),
+            )
+            return body
+
+
+async def _load_panel(cache: BrowserCache, prefix: str) -> None:
+    """Load the UI page and its assets."""
+    await cache.get(f"{prefix}{UI_PATH}")
+    assets = re.findall(r'(?:src|href)="\./([^"]+)"', UI_HTML)
+    extra = ["assets/logo.svg", "assets/fonts.css"]
+    await asyncio.gather(*(cache.get(f"{prefix}{UI_PATH}{a}") for a in assets + extra))
+
+
+async def _measure(name: str, rules) -> Measurement:
+    """Measure a cold load followed by a repeat load."""
+    server = StandInScrypted()
+    proxy = ProxyUnderTest(await server.start_tcp())
+    prefix = await proxy.start()
+    proxy.view._header_rules = rules  # type: ignore[union-attr]
+    measurement = Measurement(name)
+    try:
+        async with ClientSession() as session:
+            cache = BrowserCache(session)
+            await _load_panel(cache, prefix)
+            cache.requests = cache.bytes = 0
+            with measurement.run():
+                await _load_panel(cache, prefix)
+    finally:
+        await proxy.close()
+        await server.close()
+    measurement.extra["requests"] = cache.requests
+    measurement.extra["bytes"] = cache.bytes
+    return measurement
+
+
+async def main() -> None:
+    """Run the repeat-load benchmark."""
+    report(
+        "Repeat panel load",
+        [
+            await _measure("no header policy", ()),
+            await _measure("default header policy", DEFAULT_HEADER_RULES),
+        ],
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,197 @@
+"""Measure device discovery at 10, 100 and 500 devices.
+
+Every stand-in device is a camera with motion and object detection, which
+makes three entities per device. For each size the integration is set up in a
+test Home Assistant instance against the stand-in server and timed until every
+entity has a state. Then a push diff adding five devices and removing five is
+sent over the event socket, timed until applied, with the device registry
+writes it caused counted. Finally Home Assistant is restarted on the same
+storage while the server holds the device list, and timed until every entity
+has its state again from the device snapshot.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import tempfile
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.const import (
+    CONF_HOST,
+    CONF_ICON,
+    CONF_NAME,
+    CONF_PASSWORD,
+    CONF_USERNAME,
+)
+from homeassistant.helpers import device_registry as dr
+from homeassistant.loader import DATA_CUSTOM_COMPONENTS
+from homeassistant.setup import async_setup_component
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_capture_events,
+    async_test_home_assistant,
+)
+
+import custom_components.scrypted as scrypted
+from custom_components.scrypted.const import DOMAIN
+from custom_components.scrypted.devices import device_identifier
+
+from ..stand_in import StandInScrypted
+from .harness import Measurement, report
+
+SIZES = (10, 100, 500)
+ENTITIES_PER_DEVICE = 3
+DIFF = 5
+PLATFORMS = ("binary_sensor", "camera", "event", "sensor")
+
+
+def _device(index: int) -> dict:
+    """Return the descriptor of a stand-in camera."""
+    return {
+        "id": str(index),
+        "name": f"Camera {index}",
+        "type": "Camera",
+        "interfaces": ["Camera", "MotionSensor", "ObjectDetector"],
+        "state": {"motionDetected": False},
+    }
+
+
+async def _wait_for(predicate, timeout: float = 60) -> None:
+    """Wait until `predicate()` is true."""
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() > deadline:
+            raise TimeoutError
+        await asyncio.sleep(0.001)
+
+
+def _scrypted_states(hass) -> int:
+    """Count the states of Scrypted device entities."""
+    return sum(
+        1
+        for state in hass.states.async_all(PLATFORMS[:3])
+        if state.attributes.get("friendly_name", "").startswith("Camera ")
+    )
+
+
+def _applied(registry: dr.DeviceRegistry, entry_id: str, size: int) -> bool:
+    """Return True once the diff's devices were added and removed."""
+    return all(
+        registry.async_get_device({device_identifier(entry_id, str(size + index))})
+        for index in range(DIFF)
+    ) and not any(
+        registry.async_get_device({device_identifier(entry_id, str(index))})
+        for index in range(DIFF)
+    )
+
+
+async def _async_start(hass, host: str, entry_id: str | None = None):
+    """Prepare a test instance and add the Scrypted entry."""
+    hass.data.pop(DATA_CUSTOM_COMPONENTS)
+    hass.http = SimpleNamespace(register_view=lambda view: None)
+    # The panel's dependencies are stubbed out; mark them and the integration
+    # as set up so its entity platforms can load.
+    hass.config.components.update({"http", "frontend", DOMAIN})
+    for platform in PLATFORMS:
+        await async_setup_component(hass, platform, {})
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        entry_id=entry_id,
+        data={
+            CONF_HOST: host,
+            CONF_ICON: "mdi:cctv",
+            CONF_NAME: "Scrypted",
+            CONF_USERNAME: "user",
+            CONF_PASSWORD: "pass",
+        },
+        options=dict(scrypted._OPTION_DEFAULTS),
+    )
+    entry.add_to_hass(hass)
+    await scrypted.async_setup(hass, {})
+    return entry
+
+
+async def _async_stop(hass) -> None:
+    """Cancel the entry's connections and stop, writing pending storage."""
+    for task in list(hass._background_tasks):
+        task.cancel()
+    await hass.async_stop(force=True)
+
+
+async def _measure(size: int) -> list[Measurement]:
+    """Time a cold setup, a push diff and a warm restart with `size` devices."""
+    server = StandInScrypted()
+    server.devices = [_device(index) for index in range(size)]
+    host = await server.start_tcp()
+    setup = Measurement(f"setup, {size} devices")
+    diff = Measurement(f"diff +{DIFF}/-{DIFF}, {size} devices")
+    warm = Measurement(f"warm start, {size} devices")
+    expected = size * ENTITIES_PER_DEVICE
+    with tempfile.TemporaryDirectory() as storage_dir, patch.object(
+        scrypted, "async_register_built_in_panel"
+    ):
+        async with async_test_home_assistant(storage_dir=storage_dir) as hass:
+            entry = await _async_start(hass, host)
+            with setup.run():
+                await scrypted.async_setup_entry(hass, entry)
+                entry.mock_state(hass, ConfigEntryState.LOADED)
+                await _wait_for(lambda: _scrypted_states(hass) == expected)
+            setup.extra["entities"] = expected
+            setup.extra["list requests"] = _list_requests(server)
+
+            await server.event_connected.wait()
+            registry = dr.async_get(hass)
+            registry_events = async_capture_events(
+                hass, dr.EVENT_DEVICE_REGISTRY_UPDATED
+            )
+            events = [
+                {
+                    "id": str(size + index),
+                    "property": "device",
+                    "value": _device(size + index),
+                }
+                for index in range(DIFF)
+            ] + [
+                {"id": str(index), "property": "device", "value": None}
+                for index in range(DIFF)
+            ]
+            with diff.run():
+                await server.send_events(events)
+                await _wait_for(lambda: _applied(registry, entry.entry_id, size))
+            await hass.async_block_till_done()
+            diff.extra["registry writes"] = len(registry_events)
+            await _async_stop(hass)
+
+        # Restart against a server that doesn't answer the device list yet.
+        server.devices_gate.clear()
+        async with async_test_home_assistant(storage_dir=storage_dir) as hass:
+            entry = await _async_start(hass, host, entry.entry_id)
+            with warm.run():
+                await scrypted.async_setup_entry(hass, entry)
+                entry.mock_state(hass, ConfigEntryState.LOADED)
+                await _wait_for(lambda: _scrypted_states(hass) == expected)
+            warm.extra["entities"] = expected
+            server.devices_gate.set()
+            await _async_stop(hass)
+    await server.close()
+    return [setup, diff, warm]
+
+
+def _list_requests(server: StandInScrypted) -> int:
+    """Count the device list requests the server received."""
+    return sum(1 for request in server.requests if request.path.endswith("/devices"))
+
+
+async def main() -> None:
+    """Run the device discovery benchmark."""
+    measurements = []
+    for size in SIZES:
+        measurements.extend(await _measure(size))
+    report("Device discovery", measurements)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
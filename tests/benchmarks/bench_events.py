@@ -0,0 +1,117 @@
+"""Measure event fan-in from a burst of device events.
+
+The stand-in server pushes `RATE` events per second spread over `DEVICES`
+devices for `DURATION` seconds, in small frames like a busy detector would. A
+listener per device stands in for the entities (one state write per update it
+receives). Each event carries its send time, so the latency from the server
+sending an event to the update that carries it is measured end to end.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import statistics
+import tempfile
+import time
+
+from aiohttp import ClientSession
+from homeassistant.const import CONF_HOST
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from pytest_homeassistant_custom_component.common import async_test_home_assistant
+
+from custom_components.scrypted.api import ScryptedClient
+from custom_components.scrypted.const import SIGNAL_DEVICE_UPDATED
+from custom_components.scrypted.events import EVENT_FLUSH_INTERVAL, ScryptedEventStream
+
+from ..stand_in import StandInScrypted
+from .harness import Measurement, report
+
+DEVICES = 10
+RATE = 1000
+DURATION = 2.0
+FRAME = 5
+
+
+async def _source(server: StandInScrypted) -> int:
+    """Send the burst and return the number of events sent."""
+    frames = int(RATE * DURATION / FRAME)
+    interval = DURATION / frames
+    start = time.perf_counter()
+    sent = 0
+    for frame in range(frames):
+        events = []
+        for _ in range(FRAME):
+            events.append(
+                {
+                    "id": str(sent % DEVICES),
+                    "property": "detections",
+                    "value": {"sent": time.perf_counter()},
+                }
+            )
+            sent += 1
+        await server.send_events(events)
+        next_frame = start + (frame + 1) * interval
+        await asyncio.sleep(max(0, next_frame - time.perf_counter()))
+    return sent
+
+
+async def _measure(name: str, flush_interval: float) -> Measurement:
+    """Run one burst through the event stream."""
+    server = StandInScrypted()
+    host = await server.start_tcp()
+    measurement = Measurement(name)
+    latencies: list[float] = []
+    writes = 0
+
+    def _listener(changes: dict) -> None:
+        nonlocal writes
+        writes += 1
+        now = time.perf_counter()
+        latencies.extend(now - value["sent"] for value in changes["detections"])
+
+    with tempfile.TemporaryDirectory() as storage_dir:
+        async with async_test_home_assistant(storage_dir=storage_dir) as hass:
+            for device in range(DEVICES):
+                async_dispatcher_connect(
+                    hass, SIGNAL_DEVICE_UPDATED.format("bench", str(device)), _listener
+                )
+            async with ClientSession() as session:
+                client = ScryptedClient(session, {CONF_HOST: host}, "token")
+                stream = ScryptedEventStream(hass, "bench", client, flush_interval)
+                task = asyncio.ensure_future(stream._async_run())
+                await server.event_connected.wait()
+                with measurement.run():
+                    sent = await _source(server)
+                    while stream.received < sent:
+                        await asyncio.sleep(0.01)
+                    await asyncio.sleep(flush_interval + 0.01)
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+            await hass.async_stop(force=True)
+    await server.close()
+
+    latencies.sort()
+    measurement.extra["events"] = sent
+    measurement.extra["writes"] = writes
+    measurement.extra["writes/dev/s"] = writes / DEVICES / DURATION
+    measurement.extra["p50 ms"] = statistics.median(latencies) * 1000
+    measurement.extra["p99 ms"] = latencies[int(len(latencies) * 0.99)] * 1000
+    return measurement
+
+
+async def main() -> None:
+    """Run the event benchmark."""
+    report(
+        f"{RATE} events/s over {DEVICES} devices for {DURATION:.0f} s",
+        [
+            await _measure("flush every iteration", 0),
+            await _measure(
+                f"flush every {EVENT_FLUSH_INTERVAL * 1000:.0f} ms",
+                EVENT_FLUSH_INTERVAL,
+            ),
+        ],
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
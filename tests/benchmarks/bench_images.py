@@ -0,0 +1,75 @@
+"""Measure downscaled thumbnails served by the proxy.
+
+A 1920x1080 camera JPEG is fetched through the proxy at full size and with
+`?width=640` and `?width=320`. For each, the first request (resized in the
+executor) and the repeated requests (served from the variant cache) are
+timed. Each row also reports the bytes sent, the time those bytes take on a
+10 Mbit/s remote link, and the time the client needs to decode the image.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import time
+
+from aiohttp import ClientSession
+from PIL import Image
+
+from ..stand_in import ProxyUnderTest, StandInScrypted, make_jpeg
+from .harness import Measurement, report
+
+ITERATIONS = 20
+LINK_BITS_PER_SECOND = 10_000_000
+THUMBNAIL = "endpoint/@scrypted/homeassistant/public/api/devices/1/recordings/1/thumbnail"
+
+
+def _decode_ms(body: bytes) -> float:
+    """Return the time a client takes to decode an image."""
+    started = time.perf_counter()
+    with Image.open(io.BytesIO(body)) as image:
+        image.load()
+    return (time.perf_counter() - started) * 1000
+
+
+async def _measure(
+    session: ClientSession, prefix: str, query: str
+) -> tuple[Measurement, Measurement]:
+    """Time the first and the repeated requests of one variant."""
+    label = query or "full size"
+    first = Measurement(f"first request, {label}")
+    repeated = Measurement(f"repeated request, {label}")
+    url = f"{prefix}/{THUMBNAIL}?{query}"
+    with first.run():
+        async with session.get(url) as resp:
+            body = await resp.read()
+    for _ in range(ITERATIONS):
+        with repeated.run():
+            async with session.get(url) as resp:
+                await resp.read()
+    for measurement in (first, repeated):
+        measurement.extra["KiB"] = len(body) / 1024
+        measurement.extra["link ms"] = len(body) * 8 / LINK_BITS_PER_SECOND * 1000
+        measurement.extra["decode ms"] = _decode_ms(body)
+    return first, repeated
+
+
+async def main() -> None:
+    """Run the thumbnail resizing benchmark."""
+    server = StandInScrypted()
+    server.thumbnail = make_jpeg(1920, 1080)
+    proxy = ProxyUnderTest(await server.start_tcp())
+    prefix = await proxy.start()
+    measurements = []
+    try:
+        async with ClientSession() as session:
+            for query in ("", "width=640", "width=320"):
+                measurements.extend(await _measure(session, prefix, query))
+    finally:
+        await proxy.close()
+        await server.close()
+    report("Thumbnail resizing", measurements)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
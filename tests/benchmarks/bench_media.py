@@ -0,0 +1,89 @@
+"""Measure browsing NVR recordings on large synthetic clip sets.
+
+The stand-in server holds 7 days of 100 clips, 90 days of 1000 clips and 365
+days of 500 clips for one camera. Each browse level of the media source is
+timed against it: the camera (its days), the first page of the newest day and
+the page after it. Listing a whole day unpaginated is timed for comparison.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+from aiohttp import ClientSession
+from homeassistant.components.media_source import MediaSourceItem
+from homeassistant.const import CONF_HOST
+
+from custom_components.scrypted.api import ScryptedClient, ScryptedDevice
+from custom_components.scrypted.const import DATA_ENTRIES, DOMAIN
+from custom_components.scrypted.media_source import ScryptedMediaSource
+
+from ..stand_in import StandInScrypted, make_recordings
+from .harness import Measurement, report
+
+SETS = ((7, 100), (90, 1000), (365, 500))
+ITERATIONS = 20
+CAMERA = ScryptedDevice("1", "Camera", "Camera", frozenset({"VideoRecorder"}))
+
+
+async def _measure(days: int, per_day: int) -> list[Measurement]:
+    """Time each browse level with `days` days of `per_day` clips."""
+    server = StandInScrypted()
+    server.recordings[CAMERA.id] = make_recordings(days, per_day)
+    host = await server.start_tcp()
+    label = f"{days * per_day} clips"
+    camera = Measurement(f"camera, {label}")
+    first = Measurement(f"day, first page, {label}")
+    following = Measurement(f"day, next page, {label}")
+    whole = Measurement(f"day, unpaginated, {label}")
+
+    async def _devices() -> list[ScryptedDevice]:
+        return [CAMERA]
+
+    async with ClientSession() as session:
+        client = ScryptedClient(session, {CONF_HOST: host}, "token")
+        hass = SimpleNamespace(
+            data={
+                DATA_ENTRIES: {
+                    "entry": SimpleNamespace(
+                        client=client,
+                        devices=SimpleNamespace(loaded=True, async_get=_devices),
+                    )
+                }
+            }
+        )
+        source = ScryptedMediaSource(hass)
+
+        async def _browse(identifier: str):
+            return await source.async_browse_media(
+                MediaSourceItem(hass, DOMAIN, identifier, None)
+            )
+
+        for _ in range(ITERATIONS):
+            with camera.run():
+                root = await _browse("entry/1")
+            with first.run():
+                day = await _browse(root.children[0].identifier)
+            with following.run():
+                await _browse(day.children[-1].identifier)
+            with whole.run():
+                await client.async_get_recordings(
+                    CAMERA.id, root.children[0].title, limit=per_day
+                )
+        camera.extra["items"] = len(root.children)
+        first.extra["items"] = len(day.children)
+    await server.close()
+    return [camera, first, following, whole]
+
+
+async def main() -> None:
+    """Run the media browsing benchmark."""
+    measurements = []
+    for days, per_day in SETS:
+        measurements.extend(await _measure(days, per_day))
+    report("NVR recording browse", measurements)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
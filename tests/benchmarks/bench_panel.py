@@ -0,0 +1,87 @@
+"""Measure how long the sidebar panel takes to reach the Scrypted UI.
+
+A scripted "browser" walks the requests the panel triggers, adding a fixed
+round trip per serialized request so the numbers reflect a remote client.
+The legacy chain (panel module, lit-core, entrypoint.html, JS redirect) is
+replayed next to the current one (panel module straight to the UI, with the
+UI's assets preloaded in parallel).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import re
+
+from aiohttp import ClientSession
+
+from ..stand_in import StandInScrypted
+from .harness import Measurement, ProxyUnderTest, report
+
+RTT = 0.05
+ITERATIONS = 5
+
+
+async def _fetch(session: ClientSession, url: str) -> tuple[str, str]:
+    """Fetch a URL after one simulated round trip."""
+    await asyncio.sleep(RTT)
+    async with session.get(url) as resp:
+        return await resp.text(), resp.headers.get("Link", "")
+
+
+async def _legacy(session: ClientSession, prefix: str) -> int:
+    """Replay the panel -> lit-core -> iframe -> redirect chain."""
+    await _fetch(session, f"{prefix}/entrypoint.js")
+    await _fetch(session, f"{prefix}/lit-core.min.js")
+    await _fetch(session, f"{prefix}/entrypoint.html")
+    html, _ = await _fetch(session, f"{prefix}/endpoint/@scrypted/core/public/")
+    await _assets(session, prefix, html)
+    return 4
+
+
+async def _current(session: ClientSession, prefix: str, origin: str) -> int:
+    """Follow the panel module straight into the UI."""
+    js, link = await _fetch(session, f"{prefix}/entrypoint.js")
+    default_url = re.search(r'DEFAULT_URL = "([^"]+)"', js).group(1)  # type: ignore[union-attr]
+    preloads = [origin + url for url in re.findall(r"<([^>]+)>", link)]
+    # Preloads start as soon as the module response arrives.
+    await asyncio.gather(
+        _fetch(session, origin + default_url),
+        *(_fetch(session, url) for url in preloads),
+    )
+    return 2
+
+
+async def _assets(session: ClientSession, prefix: str, html: str) -> None:
+    """Fetch the UI's assets after its HTML was parsed."""
+    base = f"{prefix}/endpoint/@scrypted/core/public/"
+    urls = [base + src[2:] for src in re.findall(r'(?:src|href)="(\./[^"]+)"', html)]
+    await asyncio.gather(*(_fetch(session, url) for url in urls))
+
+
+async def main() -> None:
+    """Run the panel benchmark."""
+    server = StandInScrypted()
+    proxy = ProxyUnderTest(await server.start_tcp())
+    prefix = await proxy.start()
+    legacy = Measurement("legacy chain")
+    current = Measurement("single navigation")
+    try:
+        async with ClientSession() as session:
+            # Warm the preload table the way a first panel open does.
+            await _fetch(session, f"{prefix}/endpoint/@scrypted/core/public/")
+            for _ in range(ITERATIONS):
+                with legacy.run():
+                    legacy.extra["hops"] = await _legacy(session, prefix)
+                with current.run():
+                    current.extra["hops"] = await _current(
+                        session, prefix, proxy.base_url
+                    )
+    finally:
+        await proxy.close()
+        await server.close()
+
+    report(f"Panel to Scrypted UI, {RTT * 1000:.0f} ms round trip", [legacy, current])
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+"""Measure what media players probing a clip before playing it cost.
+
+A cross-origin player sends a CORS preflight, then probes the clip for its
+length and type before asking for ranges. The probe is replayed as a GET whose
+body is read in full, as players do when HEAD isn't answered, and as a HEAD.
+Preflights are replayed with Scrypted allowing no reuse, so each goes upstream,
+and with its usual Access-Control-Max-Age, so the proxy answers from its cache.
+Scrypted takes `UPSTREAM_LATENCY` seconds to answer any request.
+"""
+
+from __future__ import annotations
+
+import asyncio
+
+from aiohttp import ClientSession
+
+from ..stand_in import StandInScrypted
+from .harness import Measurement, ProxyUnderTest, report
+
+CLIP_SIZE = 8 * 1024 * 1024
+UPSTREAM_LATENCY = 0.01
+ITERATIONS = 20
+PREFLIGHT = {
+    "Origin": "https://player.example",
+    "Access-Control-Request-Method": "GET",
+    "Access-Control-Request-Headers": "range",
+}
+
+
+async def _probe(session: ClientSession, method: str, url: str) -> int:
+    """Probe a clip and return the body bytes received."""
+    async with session.request(method, url) as resp:
+        resp.raise_for_status()
+        return len(await resp.read())
+
+
+async def _preflight(session: ClientSession, url: str) -> None:
+    """Send a CORS preflight for a range request."""
+    async with session.options(url, headers=PREFLIGHT) as resp:
+        resp.raise_for_status()
+
+
+async def main() -> None:
+    """Run the probe benchmark."""
+    server = StandInScrypted()
+    server.faults.latency = UPSTREAM_LATENCY
+    proxy = ProxyUnderTest(await server.start_tcp())
+    prefix = await proxy.start()
+    url = f"{prefix}/endpoint/clip.mp4?size={CLIP_SIZE}"
+    measurements = []
+    try:
+        async with ClientSession() as session:
+            for method in ("GET", "HEAD"):
+                measurement = Measurement(f"probe by {method}")
+                received = 0
+                for _ in range(ITERATIONS):
+                    with measurement.run():
+                        received += await _probe(session, method, url)
+                measurement.extra["KiB/probe"] = received / ITERATIONS / 1024
+                measurements.append(measurement)
+
+            preflights = ((0, "preflight to Scrypted"), (600, "cached preflight"))
+            for max_age, name in preflights:
+                server.preflight_max_age = max_age
+                measurement = Measurement(name)
+                before = len(server.requests)
+                for _ in range(ITERATIONS):
+                    with measurement.run():
+                        await _preflight(session, url)
+                measurement.extra["upstream"] = len(server.requests) - before
+                measurements.append(measurement)
+    finally:
+        await proxy.close()
+        await server.close()
+
+    report(
+        f"Probing an {CLIP_SIZE // 1024 // 1024} MiB clip, "
+        f"Scrypted answering in {UPSTREAM_LATENCY * 1000:.0f} ms",
+        measurements,
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
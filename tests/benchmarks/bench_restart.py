@@ -0,0 +1,100 @@
+"""Measure what a Scrypted restart costs the WebSocket clients of the proxy.
+
+`CLIENTS` sockets are opened through the proxy, then the stand-in server is
+stopped for `DOWNTIME` seconds and started again on the same port. Without
+resumable relays every socket closes and its client reconnects every `RETRY`
+seconds, as a panel does; with them the sockets stay open and the relays come
+back with jittered backoff. Reported are the handshakes the restarted server
+takes, the most of them in any `WINDOW`, the reconnects the clients had to make
+and how long after the restart every client's socket reached Scrypted again.
+The sockets are plain ones: engine.io sessions, as the Scrypted panel opens,
+aren't resumed and fare as without resumable relays.
+"""
+
+from __future__ import annotations
+
+import asyncio
+
+from aiohttp import ClientSession
+
+from custom_components.scrypted.const import CONF_RESUMABLE_WEBSOCKETS
+
+from ..stand_in import StandInScrypted
+from .harness import Measurement, ProxyUnderTest, report
+
+# Below the 100 connections per host of the proxy session, as in Home Assistant.
+CLIENTS = 80
+DOWNTIME = 1.0
+RETRY = 0.1
+WINDOW = 0.1
+
+
+async def _client(session: ClientSession, url: str, reconnects: list[int]) -> None:
+    """Keep a socket open, reconnecting every `RETRY` seconds once it closes."""
+    while True:
+        try:
+            async with session.ws_connect(url) as ws:
+                await ws.receive()
+        except (OSError, asyncio.TimeoutError):
+            pass
+        reconnects.append(1)
+        await asyncio.sleep(RETRY)
+
+
+async def _restart(resumable: bool) -> Measurement:
+    """Restart the server under `CLIENTS` sockets and measure the recovery."""
+    measurement = Measurement("resumable relays" if resumable else "plain relays")
+    server = StandInScrypted()
+    await server.start_tcp()
+    proxy = ProxyUnderTest(
+        f"http://127.0.0.1:{server.port}", {CONF_RESUMABLE_WEBSOCKETS: resumable}
+    )
+    prefix = await proxy.start()
+    restarted = StandInScrypted()
+    loop = asyncio.get_running_loop()
+    try:
+        async with ClientSession() as session:
+            url = f"{prefix}/endpoint/ws"
+            reconnects: list[int] = []
+            clients = [
+                asyncio.create_task(_client(session, url, reconnects))
+                for _ in range(CLIENTS)
+            ]
+            while len(server.requests) < CLIENTS:
+                await asyncio.sleep(0.01)
+
+            await server.close()
+            await asyncio.sleep(DOWNTIME)
+            with measurement.run():
+                await restarted.start_tcp(port=server.port)
+                start = loop.time()
+                peak = seen = 0
+                while len(restarted.requests) < CLIENTS:
+                    await asyncio.sleep(WINDOW)
+                    count = len(restarted.requests)
+                    peak, seen = max(peak, count - seen), count
+                    if loop.time() - start > 60:
+                        raise TimeoutError("clients never came back")
+            for client in clients:
+                client.cancel()
+            await asyncio.wait(clients)
+            measurement.extra["handshakes"] = len(restarted.requests)
+            measurement.extra[f"peak/{WINDOW * 1000:.0f}ms"] = peak
+            measurement.extra["reconnects"] = len(reconnects)
+    finally:
+        await proxy.close()
+        await restarted.close()
+    return measurement
+
+
+async def main() -> None:
+    """Run the restart benchmark."""
+    measurements = [await _restart(False), await _restart(True)]
+    report(
+        f"{CLIENTS} WebSockets across a {DOWNTIME:.0f} s Scrypted restart",
+        measurements,
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+"""Count upstream snapshots while several dashboards poll the same camera.
+
+Each dashboard asks for the camera image once per polling period with a random
+offset, like picture cards refreshing independently. Requests go straight
+upstream, through the snapshot cache with a TTL of zero (only concurrent
+requests are coalesced) and through the cache with a TTL of one period.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+
+from aiohttp import ClientSession
+from homeassistant.const import CONF_HOST
+
+from custom_components.scrypted.api import ScryptedClient
+from custom_components.scrypted.snapshots import SNAPSHOT_TTL, SnapshotCache
+
+from ..stand_in import StandInScrypted
+from .harness import Measurement, report
+
+DASHBOARDS = 10
+PERIODS = 3
+# Scaled down from HA's 10 s picture refresh so the benchmark runs quickly.
+PERIOD = 0.5
+SNAPSHOT_LATENCY = 0.05
+
+
+class _Uncached:
+    """Fetch every request upstream."""
+
+    def __init__(self, client: ScryptedClient) -> None:
+        self._client = client
+        self.hit_rate = 0.0
+        self.average_latency = None
+
+    async def async_get(self) -> bytes:
+        return await self._client.async_get_snapshot("1")
+
+
+async def _dashboard(cache: SnapshotCache | _Uncached, rng: random.Random) -> None:
+    """Request the image once per period."""
+    for _ in range(PERIODS):
+        await asyncio.sleep(rng.uniform(0, PERIOD))
+        await cache.async_get()
+
+
+async def _measure(name: str, ttl: float | None) -> Measurement:
+    """Poll one camera from all dashboards."""
+    server = StandInScrypted()
+    server.snapshot_delay = SNAPSHOT_LATENCY
+    host = await server.start_tcp()
+    measurement = Measurement(name)
+    try:
+        async with ClientSession() as session:
+            client = ScryptedClient(session, {CONF_HOST: host}, "token")
+            cache: SnapshotCache | _Uncached = (
+                _Uncached(client)
+                if ttl is None
+                else SnapshotCache(lambda: client.async_get_snapshot("1"), ttl=ttl)
+            )
+            rng = random.Random(0)
+            with measurement.run():
+                await asyncio.gather(
+                    *(_dashboard(cache, rng) for _ in range(DASHBOARDS))
+                )
+    finally:
+        await server.close()
+    measurement.extra["upstream"] = server.snapshots.get("1", 0)
+    measurement.extra["hit rate"] = cache.hit_rate or 0.0
+    measurement.extra["latency ms"] = (cache.average_latency or 0.0) * 1000
+    return measurement
+
+
+async def main() -> None:
+    """Run the snapshot benchmark."""
+    report(
+        f"{DASHBOARDS} dashboards x {PERIODS} periods",
+        [
+            await _measure("no cache", None),
+            await _measure("ttl 0 (coalescing only)", 0),
+            await _measure("ttl = period", PERIOD),
+        ],
+    )
+    print(f"(the integration uses a {SNAPSHOT_TTL:.0f} s TTL)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
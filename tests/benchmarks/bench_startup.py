@@ -0,0 +1,158 @@
+"""Measure what the integration costs Home Assistant's startup.
+
+Two parts:
+- Per-module import cost of `custom_components.scrypted` in a fresh
+  interpreter (`-X importtime`), with the modules Home Assistant has already
+  imported by the time it loads the integration (the `http` and `frontend`
+  dependencies) imported first so only the integration's own cost is counted.
+- Wall time of `async_setup` and `async_setup_entry` against the stand-in
+  server with a slow login, once for a first setup and once with the token
+  stored by it. The stored-token setup is checked against `SETUP_BUDGET`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+import subprocess
+import sys
+import tempfile
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.const import (
+    CONF_HOST,
+    CONF_ICON,
+    CONF_NAME,
+    CONF_PASSWORD,
+    CONF_USERNAME,
+)
+from homeassistant.loader import DATA_CUSTOM_COMPONENTS
+from homeassistant.setup import async_setup_component
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_test_home_assistant,
+)
+
+import custom_components.scrypted as scrypted
+from custom_components.scrypted.const import DOMAIN
+
+from ..stand_in import StandInScrypted
+from .harness import Measurement, report
+
+ROOT = Path(__file__).parents[2]
+PREIMPORTED = (
+    "homeassistant.config_entries",
+    "homeassistant.helpers.aiohttp_client",
+    "homeassistant.helpers.storage",
+    "homeassistant.components.http",
+    "homeassistant.components.frontend",
+)
+LOGIN_DELAY = 0.25
+SETUP_BUDGET = 0.05
+TOP_MODULES = 10
+
+
+def _import_times() -> list[tuple[str, int, int]]:
+    """Return `(module, self us, cumulative us)` for modules the integration imports."""
+    code = "; ".join(f"import {module}" for module in PREIMPORTED)
+    code = f"{code}; print('-- scrypted --', file=__import__('sys').stderr); import custom_components.scrypted"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        check=True,
+        cwd=ROOT,
+        text=True,
+    )
+    lines = result.stderr.split("-- scrypted --", 1)[1].splitlines()
+    times = []
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, cumulative, module = line[len("import time:") :].split("|")
+        if own.strip().isdigit():
+            times.append((module.strip(), int(own), int(cumulative)))
+    return times
+
+
+def _import_measurements() -> list[Measurement]:
+    """Report the integration's import cost, most expensive modules first."""
+    times = _import_times()
+    measurements = []
+    for module, own, cumulative in sorted(times, key=lambda item: -item[2])[
+        :TOP_MODULES
+    ]:
+        measurement = Measurement(module)
+        measurement.wall.append(cumulative / 1e6)
+        measurement.cpu.append(own / 1e6)
+        measurements.append(measurement)
+    return measurements
+
+
+async def _setup_times(host: str) -> tuple[Measurement, Measurement, Measurement]:
+    """Time async_setup and a first and a stored-token async_setup_entry."""
+    setup = Measurement("async_setup")
+    first = Measurement("async_setup_entry (login)")
+    stored = Measurement("async_setup_entry (stored)")
+    with tempfile.TemporaryDirectory() as storage_dir:
+        async with async_test_home_assistant(storage_dir=storage_dir) as hass:
+            hass.data.pop(DATA_CUSTOM_COMPONENTS)
+            hass.http = SimpleNamespace(register_view=lambda view: None)
+            # Sensor is set up by core long before the integration in a real start.
+            await async_setup_component(hass, "sensor", {})
+            entry = MockConfigEntry(
+                domain=DOMAIN,
+                data={
+                    CONF_HOST: host,
+                    CONF_ICON: "mdi:cctv",
+                    CONF_NAME: "Scrypted",
+                    CONF_USERNAME: "user",
+                    CONF_PASSWORD: "pass",
+                },
+                options=dict(scrypted._OPTION_DEFAULTS),
+            )
+            entry.add_to_hass(hass)
+            # The event subscription runs until the entry unloads; it isn't part of
+            # the setup, and waiting for the background tasks would never end.
+            with patch.object(scrypted, "async_register_built_in_panel"), patch.object(
+                scrypted, "async_remove_panel"
+            ), patch.object(scrypted.ScryptedEventStream, "async_start"):
+                with setup.run():
+                    await scrypted.async_setup(hass, {})
+                for measurement in (first, stored):
+                    with measurement.run():
+                        await scrypted.async_setup_entry(hass, entry)
+                        entry.mock_state(hass, ConfigEntryState.LOADED)
+                    await hass.async_block_till_done()
+                    await asyncio.gather(*hass._background_tasks)
+                    await hass.config_entries.async_unload(entry.entry_id)
+            await hass.async_stop(force=True)
+    return setup, first, stored
+
+
+async def main() -> None:
+    """Run the startup benchmark."""
+    measurements = _import_measurements()
+    report("Import cost (wall = cumulative, cpu = self)", measurements)
+    print()
+
+    server = StandInScrypted()
+    server.login_delay = LOGIN_DELAY
+    try:
+        host = await server.start_tcp()
+        setup, first, stored = await _setup_times(host)
+    finally:
+        await server.close()
+    report(f"Setup with a {LOGIN_DELAY * 1000:.0f} ms login", [setup, first, stored])
+    print()
+    elapsed = stored.wall[0]
+    verdict = "within" if elapsed <= SETUP_BUDGET else "OVER"
+    print(
+        f"stored-token setup {elapsed * 1000:.2f} ms, {verdict} the "
+        f"{SETUP_BUDGET * 1000:.0f} ms budget"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+"""Compare upstream throughput and CPU cost of the Scrypted transports.
+
+HA pays the client side of every proxied byte, so this measures how long the
+integration's session takes to pull a payload over HTTPS, plain HTTP and a
+Unix domain socket from the local stand-in server. The stand-in runs in the
+same process, so the CPU column covers both ends of the connection.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+
+import aiohttp
+
+from custom_components.scrypted.http import create_unix_session, parse_endpoint
+
+from ..stand_in import StandInScrypted
+from .harness import Measurement, report
+
+PAYLOAD = 64 * 1024 * 1024
+ITERATIONS = 5
+
+
+async def _measure(name: str, host: str) -> Measurement:
+    """Download the payload repeatedly through the given host."""
+    endpoint = parse_endpoint(host)
+    if endpoint.socket_path:
+        session = create_unix_session(endpoint.socket_path)
+    else:
+        session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=False))
+
+    measurement = Measurement(name)
+    async with session:
+        for _ in range(ITERATIONS):
+            with measurement.run():
+                async with session.get(
+                    f"{endpoint.base_url}/endpoint/blob", params={"size": PAYLOAD}
+                ) as resp:
+                    async for _chunk in resp.content.iter_chunked(4096):
+                        pass
+    measurement.extra["MB/s"] = PAYLOAD / 1e6 / (sum(measurement.wall) / ITERATIONS)
+    return measurement
+
+
+async def main() -> None:
+    """Run the transport benchmark."""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, start in (
+            ("https", lambda server: server.start_tcp(tls=True)),
+            ("http", lambda server: server.start_tcp()),
+            ("unix", lambda server: server.start_unix(os.path.join(tmp, "s.sock"))),
+        ):
+            server = StandInScrypted()
+            host = await start(server)
+            try:
+                results.append(await _measure(name, host))
+            finally:
+                await server.close()
+
+    report(f"Upstream transport, {PAYLOAD // 2**20} MiB per iteration", results)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+"""Measure WebRTC signaling against streaming video through the proxy.
+
+A WebRTC session costs Home Assistant one offer/answer exchange with Scrypted,
+timed here through a camera entity against the stand-in signaling server, with
+the server answering at once and after 20 ms of ICE gathering. For contrast,
+4 MiB of video (about 8 s of a 4 Mbit/s stream) is read through the proxy
+view, which is what every proxied viewer costs Home Assistant's event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+
+from aiohttp import ClientSession
+from homeassistant.const import CONF_HOST
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.scrypted.api import ScryptedClient, ScryptedDevice
+from custom_components.scrypted.camera import ScryptedCamera
+from custom_components.scrypted.const import DOMAIN
+
+from ..stand_in import ProxyUnderTest, StandInScrypted
+from .harness import Measurement, report
+
+ITERATIONS = 50
+VIDEO_BYTES = 4 * 1024 * 1024
+OFFER = (
+    "v=0\r\no=- 4611731400430051336 2 IN IP4 127.0.0.1\r\ns=-\r\nt=0 0\r\n"
+    "m=video 9 UDP/TLS/RTP/SAVPF 96\r\na=setup:actpass\r\na=rtpmap:96 H264/90000\r\n"
+)
+DEVICE = ScryptedDevice(
+    "1", "Front Door", "Doorbell", frozenset({"Camera", "RTCSignalingChannel"})
+)
+
+
+async def _signaling(server: StandInScrypted, host: str) -> list[Measurement]:
+    """Time offer/answer exchanges through a camera entity."""
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_HOST: host})
+    measurements = []
+    async with ClientSession() as session:
+        client = ScryptedClient(session, {CONF_HOST: host}, "token")
+        entity = ScryptedCamera(entry, client, DEVICE)
+        for delay in (0.0, 0.02):
+            server.signaling_delay = delay
+            measurement = Measurement(f"WebRTC offer/answer, {delay * 1000:.0f} ms ICE")
+            for _ in range(ITERATIONS):
+                with measurement.run():
+                    answer = await entity.async_handle_web_rtc_offer(OFFER)
+            measurement.extra["bytes via HA"] = len(OFFER) + len(answer or "")
+            measurements.append(measurement)
+    return measurements
+
+
+async def _proxied(host: str) -> Measurement:
+    """Time reading a stream's worth of bytes through the proxy view."""
+    proxy = ProxyUnderTest(host)
+    prefix = await proxy.start()
+    measurement = Measurement("proxied video, 4 MiB")
+    try:
+        async with ClientSession() as session:
+            for _ in range(5):
+                with measurement.run():
+                    async with session.get(
+                        f"{prefix}/endpoint/video", params={"size": str(VIDEO_BYTES)}
+                    ) as resp:
+                        received = len(await resp.read())
+            measurement.extra["bytes via HA"] = received
+    finally:
+        await proxy.close()
+    return measurement
+
+
+async def main() -> None:
+    """Run the WebRTC signaling benchmark."""
+    server = StandInScrypted()
+    server.devices[0] = {
+        **server.devices[0],
+        "interfaces": ["Camera", "RTCSignalingChannel"],
+    }
+    host = await server.start_tcp()
+    try:
+        measurements = await _signaling(server, host)
+        measurements.append(await _proxied(host))
+    finally:
+        await server.close()
+    report("WebRTC signaling", measurements)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
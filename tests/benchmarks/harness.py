@@ -0,0 +1,57 @@
+"""Tiny benchmark harness for the Scrypted integration.
+
+Benchmarks are plain modules named `bench_*.py` so pytest does not collect
+them. Run one with `python -m tests.benchmarks.bench_transport`.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import statistics
+import time
+
+from ..stand_in import ProxyUnderTest
+
+__all__ = ["Measurement", "ProxyUnderTest", "report"]
+
+
+@dataclass
+class Measurement:
+    """Wall clock and process CPU time of a benchmarked block."""
+
+    name: str
+    wall: list[float] = field(default_factory=list)
+    cpu: list[float] = field(default_factory=list)
+    extra: dict[str, float] = field(default_factory=dict)
+
+    @contextmanager
+    def run(self) -> Iterator[None]:
+        """Time one iteration."""
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            self.wall.append(time.perf_counter() - wall)
+            self.cpu.append(time.process_time() - cpu)
+
+    def row(self) -> str:
+        """Format the median of all iterations as a report row."""
+        columns = [
+            f"{self.name:<40}",
+            f"wall {statistics.median(self.wall) * 1000:9.2f} ms",
+            f"cpu {statistics.median(self.cpu) * 1000:9.2f} ms",
+        ]
+        columns.extend(f"{key} {value:10.2f}" for key, value in self.extra.items())
+        return "  ".join(columns)
+
+
+def report(title: str, measurements: list[Measurement]) -> None:
+    """Print a benchmark report."""
+    print(title)
+    print("-" * len(title))
+    for measurement in measurements:
+        print(measurement.row())
+
@@ -3,14 +3,21 @@
 import importlib
 from types import SimpleNamespace
 
+from aiohttp import ClientSession
 import pytest
+import pytest_socket
 from homeassistant import loader
 
 pytest_plugins = ["pytest_homeassistant_custom_component"]
 
 import custom_components.scrypted as scrypted  # noqa: E402
 from custom_components.scrypted import config_flow  # noqa: E402
-from custom_components.scrypted.const import DOMAIN  # noqa: E402
+from custom_components.scrypted.const import DATA_ENTRIES, DOMAIN  # noqa: E402
+from custom_components.scrypted.devices import ScryptedDevices  # noqa: E402
+from custom_components.scrypted.http import EndpointProbe  # noqa: E402
+from custom_components.scrypted.models import ScryptedEntryData  # noqa: E402
+
+from .stand_in import ProxyUnderTest, StandInScrypted  # noqa: E402
 
 @pytest.fixture(autouse=True)
 def _register_scrypted_flow(hass):
@@ -38,5 +45,98 @@ def _patch_retrieve_token(monkeypatch):
     async def _fake_retrieve(data, session):
         return "token"
 
+    async def _fake_probe(data, session):
+        return [EndpointProbe(data["host"], data["host"], latency=0.01)]
+
     monkeypatch.setattr(scrypted, "retrieve_token", _fake_retrieve)
     monkeypatch.setattr(config_flow, "retrieve_token", _fake_retrieve)
+    monkeypatch.setattr(config_flow, "probe_endpoints", _fake_probe)
+
+
+@pytest.fixture(autouse=True)
+def _patch_retrieve_content_hash(monkeypatch):
+    """Return a canned bundle hash unless a test overrides the patch."""
+
+    async def _fake_hash(data, session, token, path):
+        return f"hash-{path.rsplit('.', 1)[-1]}"
+
+    monkeypatch.setattr(scrypted, "retrieve_content_hash", _fake_hash)
+
+
+@pytest.fixture(autouse=True)
+def _patch_device_connections(monkeypatch):
+    """Keep entry setups from discovering devices or subscribing to events."""
+    monkeypatch.setattr(
+        scrypted.ScryptedDevices, "async_start", lambda self, entry, *args: None
+    )
+    monkeypatch.setattr(
+        scrypted.ScryptedEventStream, "async_start", lambda self, entry: None
+    )
+
+
+@pytest.fixture
+def setup_entry_devices(hass):
+    """Return a helper that gives an entry a fetched device list."""
+
+    async def _setup(entry, devices, client=None) -> ScryptedDevices:
+        async def _get_devices():
+            return list(devices)
+
+        scrypted_devices = ScryptedDevices(
+            hass, entry.entry_id, SimpleNamespace(async_get_devices=_get_devices)
+        )
+        await scrypted_devices._async_discover()
+        hass.data.setdefault(DATA_ENTRIES, {})[entry.entry_id] = ScryptedEntryData(
+            client=client, devices=scrypted_devices, events=None
+        )
+        return scrypted_devices
+
+    return _setup
+
+
+@pytest.fixture
+def allow_unix_connect(socket_enabled):
+    """Allow connecting to the local stand-in server, including Unix sockets."""
+    pytest_socket.socket_allow_hosts(["127.0.0.1"], allow_unix_socket=True)
+
+
+@pytest.fixture
+async def server(allow_unix_connect):
+    """Serve the stand-in over TCP."""
+    server = StandInScrypted()
+    await server.start_tcp()
+    yield server
+    await server.close()
+
+
+@pytest.fixture
+async def start_servers(allow_unix_connect):
+    """Return a helper serving more stand-ins over TCP, closed after the test."""
+    servers: list[StandInScrypted] = []
+
+    async def _start(count: int) -> list[StandInScrypted]:
+        started = [StandInScrypted() for _ in range(count)]
+        servers.extend(started)
+        for server in started:
+            await server.start_tcp()
+        return started
+
+    yield _start
+    for server in servers:
+        await server.close()
+
+
+@pytest.fixture
+def proxy_options() -> dict:
+    """Return the entry options of the proxy fixture, none unless overridden."""
+    return {}
+
+
+@pytest.fixture
+async def proxy(server, proxy_options):
+    """Proxy the stand-in, yielding the proxy, the entry prefix and a client."""
+    proxy = ProxyUnderTest(f"http://127.0.0.1:{server.port}", proxy_options)
+    prefix = await proxy.start()
+    async with ClientSession() as session:
+        yield proxy, prefix, session
+    await proxy.close()
@@ -0,0 +1,649 @@
+"""Local stand-ins for a Scrypted server and the HA proxy, used by tests and benchmarks."""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+import datetime
+import io
+import json
+import mimetypes
+import os
+import ssl
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Any
+
+from aiohttp import ClientSession, WSMsgType, hdrs, web
+from homeassistant.const import CONF_HOST
+
+from custom_components.scrypted.api import API_PATH
+from custom_components.scrypted.const import DOMAIN
+from custom_components.scrypted.http import ScryptedView
+
+TOKEN = "token"
+CHUNK = b"\0" * 65536
+UI_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<script type="module" crossorigin src="./assets/index-4f2a9c1e.js"></script>
+<link rel="stylesheet" href="./assets/index-9b7d3e20.css">
+</head>
+<body><div id="app"></div></body>
+</html>
+"""
+# JPEG start/end markers around filler bytes.
+SNAPSHOT = b"\xff\xd8\xff\xe0" + b"\0" * 1024 + b"\xff\xd9"
+VIDEO = bytes(range(256)) * 256
+# Answer to every WebRTC offer, carrying the server's ICE candidate inline.
+WEBRTC_ANSWER = (
+    "v=0\r\no=scrypted 1 1 IN IP4 127.0.0.1\r\ns=-\r\nt=0 0\r\n"
+    "m=video 9 UDP/TLS/RTP/SAVPF 96\r\na=setup:active\r\n"
+    "a=candidate:1 1 udp 2130706431 127.0.0.1 50000 typ host\r\n"
+    "a=end-of-candidates\r\n"
+)
+DEVICES = [
+    {
+        "id": "1",
+        "name": "Front Door",
+        "type": "Doorbell",
+        "interfaces": ["Camera", "VideoCamera"],
+    },
+    {
+        "id": "2",
+        "name": "Driveway",
+        "type": "Camera",
+        "interfaces": ["Camera", "VideoCamera"],
+    },
+    {"id": "3", "name": "Porch Light", "type": "Light", "interfaces": ["OnOff"]},
+]
+
+
+def make_jpeg(width: int, height: int) -> bytes:
+    """Return a camera-like JPEG: a gradient with sensor noise."""
+    from PIL import Image
+
+    gradient = Image.linear_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), 32)
+    image = Image.merge("RGB", (gradient, Image.blend(gradient, noise, 0.3), noise))
+    output = io.BytesIO()
+    image.save(output, "JPEG", quality=85)
+    return output.getvalue()
+
+
+def make_recordings(
+    days: int, per_day: int, end: datetime.datetime | None = None
+) -> list[dict[str, Any]]:
+    """Return `per_day` ten second clips on each of the `days` days before `end`."""
+    end = end or datetime.datetime(2024, 3, 31, tzinfo=datetime.timezone.utc)
+    start = end - datetime.timedelta(days=days)
+    step = 86400 / per_day
+    return [
+        {
+            "id": f"{day}-{index}",
+            "startTime": int((start.timestamp() + day * 86400 + index * step) * 1000),
+            "endTime": int((start.timestamp() + day * 86400 + index * step + 10) * 1000),
+            "detectionClasses": ["person"] if index % 2 else [],
+        }
+        for day in range(days)
+        for index in range(per_day)
+    ]
+
+
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+
+def create_self_signed_context() -> ssl.SSLContext:
+    """Create a server TLS context with a throwaway self-signed certificate."""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        cert_path = os.path.join(tmp, "cert.pem")
+        key_path = os.path.join(tmp, "key.pem")
+        with open(cert_path, "wb") as file:
+            file.write(cert.public_bytes(serialization.Encoding.PEM))
+        with open(key_path, "wb") as file:
+            file.write(
+                key.private_bytes(
+                    serialization.Encoding.PEM,
+                    serialization.PrivateFormat.PKCS8,
+                    serialization.NoEncryption(),
+                )
+            )
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        context.load_cert_chain(cert_path, key_path)
+    return context
+
+
+@dataclass
+class Faults:
+    """Faults a `StandInScrypted` injects, all off by default.
+
+    - `latency`: seconds before any request is handled.
+    - `first_byte_delay`: seconds a streamed body stalls after its headers.
+    - `bandwidth`: bytes per second streamed bodies are capped at.
+    - `reset_after`: bytes of a streamed body or of echoed WebSocket frames after
+      which the connection is reset.
+    - `tls_handshake_delay`: seconds a TLS connection waits for its handshake,
+      if set before the server starts.
+    - `drop_frames`: every nth WebSocket frame is not echoed.
+    - `close_code`: WebSocket close code the server ends the socket with after
+      echoing a frame.
+    """
+
+    latency: float = 0.0
+    first_byte_delay: float = 0.0
+    bandwidth: int | None = None
+    reset_after: int | None = None
+    tls_handshake_delay: float = 0.0
+    drop_frames: int | None = None
+    close_code: int | None = None
+
+
+class StandInScrypted:
+    """Minimal Scrypted look-alike served over TCP, TLS or a Unix socket.
+
+    Routes:
+    - `/login` returns a canned token.
+    - `/endpoint/@scrypted/{core,nvr}/public/` returns a UI page with hashed assets.
+    - `/endpoint/ws` echoes websocket frames, pinging every `ws_heartbeat` seconds
+      if set.
+    - `/{API_PATH}/devices` lists `devices` once `devices_gate` is set,
+      `.../devices/{id}/snapshot` returns `SNAPSHOT` after `snapshot_delay` seconds.
+    - `.../devices/{id}/webrtc` answers an SDP offer after `signaling_delay`
+      seconds, for devices with `RTCSignalingChannel`.
+    - `/{API_PATH}/events` is the event websocket, fed by `send_events`.
+    - `/{API_PATH}/cluster` returns the `cluster` topology, 404 while it is None.
+    - `/{API_PATH}/devices/{id}/recordings[/days]` pages through `recordings`,
+      `.../recordings/{clip}/thumbnail` returns `thumbnail` and `.../video` serves
+      `VIDEO` with range support.
+    - `/endpoint/{path}` streams `?size=` zero bytes (default 1 KiB), or that
+      many every 10 ms until the client leaves with `?live`.
+    - OPTIONS on any path lets any origin through a CORS preflight, to be reused
+      for `preflight_max_age` seconds if set.
+
+    Set the fields of `faults` to degrade the network and the server.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the stand-in."""
+        self.faults = Faults()
+        self.app = web.Application(middlewares=[self._inject_latency])
+        self.app.router.add_route(hdrs.METH_OPTIONS, "/{path:.*}", self._preflight)
+        self.app.router.add_get("/login", self._login)
+        self.app.router.add_get("/endpoint/ws", self._websocket)
+        self.app.router.add_get(f"/{API_PATH}/devices", self._devices)
+        self.app.router.add_get(f"/{API_PATH}/events", self._events)
+        self.app.router.add_get(f"/{API_PATH}/cluster", self._cluster)
+        self.app.router.add_get(f"/{API_PATH}/devices/{{id}}/snapshot", self._snapshot)
+        self.app.router.add_post(f"/{API_PATH}/devices/{{id}}/webrtc", self._webrtc)
+        recordings = f"/{API_PATH}/devices/{{id}}/recordings"
+        self.app.router.add_get(recordings, self._recordings)
+        self.app.router.add_get(f"{recordings}/days", self._recording_days)
+        self.app.router.add_get(f"{recordings}/{{clip}}/thumbnail", self._thumbnail)
+        self.app.router.add_get(f"{recordings}/{{clip}}/video", self._video)
+        self.app.router.add_get(
+            "/endpoint/{plugin:@scrypted/(core|nvr)}/public/", self._ui
+        )
+        self.app.router.add_route("*", "/endpoint/{path:.*}", self._endpoint)
+        self.requests: list[web.Request] = []
+        # Seconds /login takes to answer, to model a slow or busy server.
+        self.login_delay = 0.0
+        self.devices: list[dict[str, Any]] = [dict(device) for device in DEVICES]
+        # Cleared to hold device list requests, as a server still starting would.
+        self.devices_gate = asyncio.Event()
+        self.devices_gate.set()
+        self.snapshot_delay = 0.0
+        self.snapshots: dict[str, int] = {}
+        self.signaling_delay = 0.0
+        self.webrtc_offers: list[str] = []
+        # Clips per device id, shaped like `make_recordings` returns them.
+        self.recordings: dict[str, list[dict[str, Any]]] = {}
+        self.thumbnail = SNAPSHOT
+        self.thumbnail_delay = 0.0
+        self.thumbnails_active = 0
+        self.max_thumbnails_active = 0
+        # Shaped like `{"workers": [{"id", "host"}], "devices": {id: worker id}}`.
+        self.cluster: dict[str, Any] | None = None
+        self.ws_heartbeat: float | None = None
+        self.preflight_max_age: int | None = 600
+        self.event_sockets: list[web.WebSocketResponse] = []
+        self.event_connected = asyncio.Event()
+        self._runner: web.AppRunner | None = None
+        self._handshake_relay: asyncio.Server | None = None
+        self._relayed: set[asyncio.StreamWriter] = set()
+        self._site_port: int | None = None
+        self.port: int | None = None
+        self.socket_path: str | None = None
+
+    async def start_tcp(self, *, tls: bool = False, port: int = 0) -> str:
+        """Serve on a localhost port, ephemeral by default, and return the host.
+
+        With `faults.tls_handshake_delay` set beforehand, TLS connections pass
+        through a relay that holds them that long before their handshake.
+        """
+        site = await self._start(
+            lambda runner: web.TCPSite(
+                runner,
+                "127.0.0.1",
+                port,
+                ssl_context=create_self_signed_context() if tls else None,
+            )
+        )
+        self.port = site._server.sockets[0].getsockname()[1]  # type: ignore[union-attr]
+        if not tls:
+            return f"http://127.0.0.1:{self.port}"
+        if not self.faults.tls_handshake_delay:
+            return f"https://127.0.0.1:{self.port}"
+        self._site_port = self.port
+        self._handshake_relay = await asyncio.start_server(
+            self._relay_handshake, "127.0.0.1", 0
+        )
+        self.port = self._handshake_relay.sockets[0].getsockname()[1]
+        return f"https://127.0.0.1:{self.port}"
+
+    async def start_unix(self, path: str) -> str:
+        """Serve on a Unix domain socket and return the configured host."""
+        await self._start(lambda runner: web.UnixSite(runner, path))
+        self.socket_path = path
+        return f"unix:{path}"
+
+    async def _start(self, site_factory) -> web.BaseSite:
+        """Start the runner with the given site."""
+        # Stop handlers whose client went away, and cut the connections still
+        # open when stopping, as Scrypted would.
+        self._runner = web.AppRunner(
+            self.app, handler_cancellation=True, shutdown_timeout=0.1
+        )
+        await self._runner.setup()
+        site = site_factory(self._runner)
+        await site.start()
+        return site
+
+    async def close(self) -> None:
+        """Stop serving."""
+        if self._handshake_relay is not None:
+            self._handshake_relay.close()
+            for writer in list(self._relayed):
+                writer.transport.abort()
+            await self._handshake_relay.wait_closed()
+            self._handshake_relay = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _relay_handshake(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Pass a TLS connection through to the site, after the handshake delay."""
+        self._relayed.add(writer)
+        try:
+            await asyncio.sleep(self.faults.tls_handshake_delay)
+            site_reader, site_writer = await asyncio.open_connection(
+                "127.0.0.1", self._site_port
+            )
+        except ConnectionError:
+            writer.transport.abort()
+            self._relayed.discard(writer)
+            return
+        self._relayed.add(site_writer)
+
+        async def _pipe(
+            source: asyncio.StreamReader, sink: asyncio.StreamWriter
+        ) -> None:
+            try:
+                while data := await source.read(65536):
+                    sink.write(data)
+                    await sink.drain()
+            except ConnectionError:
+                pass
+            finally:
+                sink.close()
+                self._relayed.discard(sink)
+
+        await asyncio.gather(_pipe(reader, site_writer), _pipe(site_reader, writer))
+
+    @web.middleware
+    async def _inject_latency(
+        self, request: web.Request, handler
+    ) -> web.StreamResponse:
+        """Hold every request for `faults.latency` seconds."""
+        if self.faults.latency:
+            await asyncio.sleep(self.faults.latency)
+        return await handler(request)
+
+    async def _stream_body(
+        self, request: web.Request, response: web.StreamResponse, size: int, live: bool
+    ) -> bool:
+        """Write `size` zero bytes, or that many every 10 ms while `live`.
+
+        The body faults apply. Return False if the connection was reset.
+        """
+        faults = self.faults
+        step = min(size, len(CHUNK))
+        # A capped body goes out 10 ms of bandwidth at a time, like a slow link.
+        if faults.bandwidth:
+            step = max(1, min(step, faults.bandwidth // 100))
+        sent = 0
+        if faults.first_byte_delay:
+            await asyncio.sleep(faults.first_byte_delay)
+        while live or sent < size:
+            chunk = CHUNK[: step if live else min(step, size - sent)]
+            if faults.reset_after is not None:
+                chunk = chunk[: faults.reset_after - sent]
+            await response.write(chunk)
+            sent += len(chunk)
+            if faults.reset_after is not None and sent >= faults.reset_after:
+                request.transport.abort()  # type: ignore[union-attr]
+                return False
+            if faults.bandwidth:
+                await asyncio.sleep(len(chunk) / faults.bandwidth)
+            if live:
+                await asyncio.sleep(0.01)
+        return True
+
+    async def _login(self, request: web.Request) -> web.Response:
+        """Return a canned login token."""
+        self.requests.append(request)
+        if self.login_delay:
+            await asyncio.sleep(self.login_delay)
+        return web.json_response({"token": TOKEN})
+
+    async def _devices(self, request: web.Request) -> web.Response:
+        """Return the device list."""
+        self.requests.append(request)
+        await self.devices_gate.wait()
+        return web.json_response(self.devices)
+
+    async def _cluster(self, request: web.Request) -> web.Response:
+        """Return the cluster topology."""
+        self.requests.append(request)
+        if self.cluster is None:
+            raise web.HTTPNotFound()
+        return web.json_response(self.cluster)
+
+    async def _snapshot(self, request: web.Request) -> web.Response:
+        """Return a camera snapshot."""
+        self.requests.append(request)
+        device_id = request.match_info["id"]
+        if not any(device["id"] == device_id for device in self.devices):
+            raise web.HTTPNotFound()
+        self.snapshots[device_id] = self.snapshots.get(device_id, 0) + 1
+        if self.snapshot_delay:
+            await asyncio.sleep(self.snapshot_delay)
+        return web.Response(body=SNAPSHOT, content_type="image/jpeg")
+
+    async def _webrtc(self, request: web.Request) -> web.Response:
+        """Answer a WebRTC offer for a device with signaling."""
+        self.requests.append(request)
+        device_id = request.match_info["id"]
+        if not any(
+            device["id"] == device_id
+            and "RTCSignalingChannel" in device["interfaces"]
+            for device in self.devices
+        ):
+            raise web.HTTPNotFound()
+        offer = await request.json()
+        self.webrtc_offers.append(offer["sdp"])
+        if self.signaling_delay:
+            await asyncio.sleep(self.signaling_delay)
+        return web.json_response({"type": "answer", "sdp": WEBRTC_ANSWER})
+
+    async def _recording_days(self, request: web.Request) -> web.Response:
+        """Return the days a device has clips for, newest first."""
+        self.requests.append(request)
+        clips = self.recordings.get(request.match_info["id"], [])
+        days = sorted({clip["startTime"] // 86400000 for clip in clips}, reverse=True)
+        return web.json_response(
+            [
+                datetime.date.fromordinal(_EPOCH_ORDINAL + day).isoformat()
+                for day in days
+            ]
+        )
+
+    async def _recordings(self, request: web.Request) -> web.Response:
+        """Return a page of a day's clips, newest first."""
+        self.requests.append(request)
+        day = datetime.datetime.fromisoformat(request.query["day"]).replace(
+            tzinfo=datetime.timezone.utc
+        )
+        start = int(day.timestamp() * 1000)
+        end = start + 86400000
+        limit = int(request.query["limit"])
+        offset = int(request.query.get("cursor", 0))
+        clips = sorted(
+            (
+                clip
+                for clip in self.recordings.get(request.match_info["id"], [])
+                if start <= clip["startTime"] < end
+            ),
+            key=lambda clip: clip["startTime"],
+            reverse=True,
+        )
+        page = clips[offset : offset + limit]
+        more = offset + limit < len(clips)
+        return web.json_response(
+            {"clips": page, "next": str(offset + limit) if more else None}
+        )
+
+    async def _thumbnail(self, request: web.Request) -> web.Response:
+        """Return a clip thumbnail after `thumbnail_delay` seconds."""
+        self.requests.append(request)
+        if request.match_info["clip"] == "missing":
+            raise web.HTTPNotFound()
+        self.thumbnails_active += 1
+        self.max_thumbnails_active = max(
+            self.max_thumbnails_active, self.thumbnails_active
+        )
+        try:
+            if self.thumbnail_delay:
+                await asyncio.sleep(self.thumbnail_delay)
+        finally:
+            self.thumbnails_active -= 1
+        return web.Response(body=self.thumbnail, content_type="image/jpeg")
+
+    async def _video(self, request: web.Request) -> web.Response:
+        """Return a clip, or the requested byte range of it."""
+        self.requests.append(request)
+        headers = {hdrs.ACCEPT_RANGES: "bytes"}
+        if hdrs.RANGE not in request.headers:
+            return web.Response(body=VIDEO, content_type="video/mp4", headers=headers)
+        start, stop, _ = request.http_range.indices(len(VIDEO))
+        headers[hdrs.CONTENT_RANGE] = f"bytes {start}-{stop - 1}/{len(VIDEO)}"
+        return web.Response(
+            status=206, body=VIDEO[start:stop], content_type="video/mp4", headers=headers
+        )
+
+    async def _events(self, request: web.Request) -> web.WebSocketResponse:
+        """Hold an event subscription open."""
+        self.requests.append(request)
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.event_sockets.append(ws)
+        self.event_connected.set()
+        try:
+            async for _ in ws:
+                pass
+        finally:
+            self.event_sockets.remove(ws)
+            if not self.event_sockets:
+                self.event_connected.clear()
+        return ws
+
+    async def send_events(self, events: list[dict[str, Any]]) -> None:
+        """Send one frame of events to every subscriber."""
+        data = json.dumps(events)
+        for ws in list(self.event_sockets):
+            await ws.send_str(data)
+
+    async def drop_event_sockets(self) -> None:
+        """Close every event subscription, as a restarting server would."""
+        for ws in list(self.event_sockets):
+            await ws.close()
+
+    async def _ui(self, request: web.Request) -> web.Response:
+        """Return the UI page."""
+        self.requests.append(request)
+        return web.Response(text=UI_HTML, content_type="text/html")
+
+    async def _endpoint(self, request: web.Request) -> web.StreamResponse:
+        """Stream the requested number of bytes, or endlessly with `?live`."""
+        self.requests.append(request)
+        size = int(request.query.get("size", 1024))
+        content_type, _ = mimetypes.guess_type(request.path)
+        response = web.StreamResponse(
+            headers={"Content-Type": content_type or "application/octet-stream"}
+        )
+        live = "live" in request.query
+        if not live:
+            response.content_length = size
+        await response.prepare(request)
+        if request.method == hdrs.METH_HEAD:
+            return response
+        try:
+            if await self._stream_body(request, response, size, live):
+                await response.write_eof()
+        except ConnectionResetError:
+            pass
+        return response
+
+    async def _preflight(self, request: web.Request) -> web.Response:
+        """Allow the origin, method and headers a CORS preflight asks about."""
+        self.requests.append(request)
+        if (origin := request.headers.get(hdrs.ORIGIN)) is None:
+            return web.Response(status=204, headers={hdrs.ALLOW: "GET, HEAD, OPTIONS"})
+        headers = {
+            hdrs.ACCESS_CONTROL_ALLOW_ORIGIN: origin,
+            hdrs.ACCESS_CONTROL_ALLOW_METHODS: request.headers.get(
+                hdrs.ACCESS_CONTROL_REQUEST_METHOD, ""
+            ),
+            hdrs.ACCESS_CONTROL_ALLOW_HEADERS: request.headers.get(
+                hdrs.ACCESS_CONTROL_REQUEST_HEADERS, ""
+            ),
+            hdrs.VARY: hdrs.ORIGIN,
+        }
+        if self.preflight_max_age is not None:
+            headers[hdrs.ACCESS_CONTROL_MAX_AGE] = str(self.preflight_max_age)
+        return web.Response(status=204, headers=headers)
+
+    async def _websocket(self, request: web.Request) -> web.WebSocketResponse:
+        """Echo websocket frames back to the client."""
+        self.requests.append(request)
+        ws = web.WebSocketResponse(heartbeat=self.ws_heartbeat)
+        await ws.prepare(request)
+        faults = self.faults
+        frames = echoed = 0
+        async for msg in ws:
+            frames += 1
+            if faults.drop_frames and frames % faults.drop_frames == 0:
+                continue
+            if msg.type == WSMsgType.TEXT:
+                await ws.send_str(msg.data)
+            elif msg.type == WSMsgType.BINARY:
+                await ws.send_bytes(msg.data)
+            echoed += len(msg.data)
+            if faults.reset_after is not None and echoed >= faults.reset_after:
+                request.transport.abort()  # type: ignore[union-attr]
+                break
+            if faults.close_code is not None:
+                await ws.close(code=faults.close_code)
+                break
+        return ws
+
+
+async def serve_view(
+    view: ScryptedView, latency: float = 0.0
+) -> tuple[web.AppRunner, str]:
+    """Mount a view on a bare aiohttp app. Return its runner and base URL."""
+
+    async def _route(request: web.Request) -> web.StreamResponse:
+        if latency:
+            await asyncio.sleep(latency)
+        # The view answers OPTIONS on a route of its own.
+        if request.method == hdrs.METH_OPTIONS:
+            handler = view._handle
+        else:
+            handler = getattr(view, request.method.lower())
+        return await handler(
+            request, request.match_info["token"], request.match_info["path"]
+        )
+
+    app = web.Application()
+    app.router.add_route("*", "/api/scrypted/{token}/{path:.*}", _route)
+    # Like Home Assistant's server, cancel handlers whose client went away.
+    runner = web.AppRunner(app, handler_cancellation=True)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore[union-attr]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+async def wait_released(view: ScryptedView, timeout: float = 1.0) -> float:
+    """Wait until the view holds no request or stream. Return how long that took."""
+    started = time.perf_counter()
+    while view._inflight or view.activity.streams:
+        assert time.perf_counter() - started < timeout, "request never released"
+        await asyncio.sleep(0.005)
+    return time.perf_counter() - started
+
+
+class ProxyUnderTest:
+    """ScryptedView mounted on a bare aiohttp app, without a full HA instance."""
+
+    def __init__(
+        self, host: str, options: dict[str, Any] | None = None, latency: float = 0.0
+    ) -> None:
+        """Initialize the proxy for a single entry.
+
+        `latency` delays every response, modelling the round trip of a remote client.
+        """
+        self.entry = SimpleNamespace(
+            entry_id="bench", data={CONF_HOST: host}, options=options or {}
+        )
+        self._runner: web.AppRunner | None = None
+        self.session: ClientSession | None = None
+        self.view: ScryptedView | None = None
+        self.base_url = ""
+        self.latency = latency
+
+    async def start(self) -> str:
+        """Start serving and return the proxy prefix for the entry."""
+        loop = asyncio.get_running_loop()
+        hass = SimpleNamespace(
+            data={DOMAIN: {TOKEN: self.entry}},
+            loop=loop,
+            async_add_executor_job=lambda target, *args: loop.run_in_executor(
+                None, target, *args
+            ),
+            async_create_background_task=lambda coro, name: loop.create_task(coro),
+            bus=SimpleNamespace(async_listen_once=lambda *args: None),
+        )
+        self.session = ClientSession()
+        self.view = ScryptedView(hass, self.session)
+        self._runner, self.base_url = await serve_view(self.view, self.latency)
+        return f"{self.base_url}/api/{DOMAIN}/{TOKEN}"
+
+    async def close(self) -> None:
+        """Stop serving."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+        if self.session is not None:
+            await self.session.close()
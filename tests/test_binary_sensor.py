@@ -0,0 +1,86 @@
+"""Tests for the Scrypted binary sensors."""
+
+from __future__ import annotations
+
+from homeassistant.const import CONF_HOST, STATE_OFF, STATE_ON
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.scrypted import binary_sensor
+from custom_components.scrypted.api import ScryptedDevice
+from custom_components.scrypted.const import DOMAIN, SIGNAL_DEVICE_UPDATED
+
+CAMERA = ScryptedDevice(
+    "1",
+    "Driveway",
+    "Camera",
+    frozenset({"Camera", "MotionSensor", "AudioSensor"}),
+    {"motionDetected": False},
+)
+DOORBELL = ScryptedDevice(
+    "2", "Front Door", "Doorbell", frozenset({"BinarySensor", "MotionSensor"})
+)
+CONTACT = ScryptedDevice("3", "Gate", "Sensor", frozenset({"BinarySensor"}))
+
+
+def test_descriptions_follow_interfaces():
+    """Test which binary sensors each device gets."""
+    keys = lambda device: [d.key for d in binary_sensor._descriptions(device)]  # noqa: E731
+    assert keys(CAMERA) == ["motionDetected", "audioDetected"]
+    assert keys(DOORBELL) == ["motionDetected"]
+    assert keys(CONTACT) == ["binaryState"]
+
+
+async def test_binary_sensor_writes_once_per_batch(hass):
+    """Test that a batch of events results in a single state write."""
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_HOST: "example"})
+    description = binary_sensor.BINARY_SENSORS[0]
+    entity = binary_sensor.ScryptedBinarySensor(entry, CAMERA, description)
+    assert entity.is_on is False
+    assert entity.unique_id == f"{entry.entry_id}_1_motionDetected"
+    entity.hass = hass
+    entity.entity_id = "binary_sensor.driveway_motion"
+    await entity.async_added_to_hass()
+
+    writes = []
+    entity.async_write_ha_state = lambda: writes.append(entity.is_on)
+    signal = SIGNAL_DEVICE_UPDATED.format(entry.entry_id, "1")
+    async_dispatcher_send(hass, signal, {"motionDetected": [True, False, True]})
+    async_dispatcher_send(hass, signal, {"motionDetected": [True]})
+    async_dispatcher_send(hass, signal, {"audioDetected": [True]})
+    assert writes == [True]
+
+
+async def test_binary_sensor_state(hass):
+    """Test the written state and the unknown default."""
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_HOST: "example"})
+    entity = binary_sensor.ScryptedBinarySensor(
+        entry, CONTACT, binary_sensor.BINARY_SENSORS[-1]
+    )
+    assert entity.is_on is None
+    entity.hass = hass
+    entity.entity_id = "binary_sensor.gate"
+    await entity.async_added_to_hass()
+    signal = SIGNAL_DEVICE_UPDATED.format(entry.entry_id, "3")
+    async_dispatcher_send(hass, signal, {"binaryState": [1]})
+    assert hass.states.get("binary_sensor.gate").state == STATE_ON
+    async_dispatcher_send(hass, signal, {"binaryState": [0]})
+    assert hass.states.get("binary_sensor.gate").state == STATE_OFF
+
+
+async def test_setup_adds_binary_sensors(hass, setup_entry_devices):
+    """Test that every supported property gets a binary sensor."""
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_HOST: "example"})
+    entry.add_to_hass(hass)
+    await setup_entry_devices(entry, [CAMERA, DOORBELL, CONTACT])
+    added = []
+    await binary_sensor.async_setup_entry(hass, entry, added.extend)
+    assert [entity.unique_id.split("_", 1)[1] for entity in added] == [
+        "1_motionDetected",
+        "1_audioDetected",
+        "2_motionDetected",
+        "3_binaryState",
+    ]
+    assert added[0]._is_supported(CAMERA)
+    assert not added[0]._is_supported(CONTACT)
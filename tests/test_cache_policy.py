@@ -0,0 +1,136 @@
+"""Tests for the proxied response header policy."""
+
+from __future__ import annotations
+
+import re
+
+import pytest
+
+from custom_components.scrypted import cache_policy
+from custom_components.scrypted.cache_policy import (
+    DEFAULT_HEADER_RULES,
+    IMMUTABLE,
+    PREFLIGHT_DEFAULT_AGE,
+    PREFLIGHT_MAX_AGE,
+    REVALIDATE,
+    HeaderRule,
+    PreflightCache,
+)
+
+
+@pytest.mark.parametrize(
+    ("path", "expected"),
+    [
+        ("endpoint/@scrypted/core/public/assets/index-4f2a9c1e.js", IMMUTABLE),
+        ("endpoint/@scrypted/nvr/public/assets/chunk.9b7d3e20a1.css", IMMUTABLE),
+        ("endpoint/@scrypted/nvr/assets/web-components.js", REVALIDATE),
+        ("endpoint/@scrypted/core/public/", None),
+    ],
+)
+def test_default_rules(path, expected):
+    """Test which default rule applies to common Scrypted paths."""
+    rule = cache_policy.find_rule(DEFAULT_HEADER_RULES, path, "text/javascript")
+    assert (rule.cache_control if rule else None) == expected
+
+
+def test_versioned_resources_are_immutable():
+    """Test that cache-busted Lovelace resources are cached forever."""
+    path = "endpoint/@scrypted/nvr/assets/web-components.js"
+    rule = cache_policy.find_rule(DEFAULT_HEADER_RULES, path, "text/javascript", "v=abc")
+    assert rule.cache_control == IMMUTABLE
+    rule = cache_policy.find_rule(DEFAULT_HEADER_RULES, path, "text/javascript", "x=1")
+    assert rule.cache_control == REVALIDATE
+
+
+def test_rule_matches_content_type():
+    """Test content type prefixes."""
+    rule = HeaderRule(content_types=("image/",))
+    assert rule.matches("anything", "image/jpeg")
+    assert not rule.matches("anything", "text/html")
+    assert not HeaderRule(path=re.compile(r"\.js$")).matches("a.css", "text/css")
+
+
+def test_apply_replaces_weak_cache_control():
+    """Test that weak directives are replaced and caching blockers dropped."""
+    rule = HeaderRule(cache_control=REVALIDATE, strip_set_cookie=True)
+    headers = {
+        "cache-control": "no-store",
+        "Pragma": "no-cache",
+        "Expires": "0",
+        "Set-Cookie": "a=b",
+        "X-Other": "1",
+    }
+    rule.apply(headers)
+    assert headers == {"Cache-Control": REVALIDATE, "X-Other": "1"}
+
+
+def test_apply_keeps_strong_cache_control_unless_forced():
+    """Test that Scrypted's own strong caching is respected."""
+    headers = {"Cache-Control": "max-age=600"}
+    HeaderRule(cache_control=REVALIDATE).apply(headers)
+    assert headers == {"Cache-Control": "max-age=600"}
+
+    HeaderRule(cache_control=IMMUTABLE, force=True).apply(headers)
+    assert headers == {"Cache-Control": IMMUTABLE}
+
+    headers = {"Set-Cookie": "a=b"}
+    HeaderRule().apply(headers)
+    assert headers == {"Set-Cookie": "a=b"}
+
+
+def test_is_weak_cache_control():
+    """Test detection of directives that defeat caching."""
+    assert cache_policy.is_weak_cache_control("private, max-age=0")
+    assert cache_policy.is_weak_cache_control("No-Cache")
+    assert not cache_policy.is_weak_cache_control("public, max-age=3600")
+
+
+def test_validators_and_etags():
+    """Test ETag generation and If-None-Match matching."""
+    assert not cache_policy.has_validator({})
+    assert cache_policy.has_validator({"etag": '"x"'})
+    assert cache_policy.has_validator({"Last-Modified": "Mon"})
+
+    etag = cache_policy.body_etag(b"body")
+    assert etag.startswith('W/"') and etag == cache_policy.body_etag(b"body")
+    assert etag != cache_policy.body_etag(b"other")
+    assert cache_policy.etag_matches(etag, etag)
+    assert cache_policy.etag_matches(f'"a", {etag[2:]}', etag)
+    assert cache_policy.etag_matches("*", etag)
+    assert not cache_policy.etag_matches(None, etag)
+    assert not cache_policy.etag_matches('"other"', etag)
+
+
+def test_preflight_cache():
+    """Test which preflight answers are kept, for how long, and eviction."""
+    cache = PreflightCache(max_entries=2)
+    allowed = {"Access-Control-Allow-Origin": "https://a"}
+    assert cache.get("a", 0) is None
+
+    preflight = cache.put("a", 204, {**allowed, "Access-Control-Max-Age": "60"}, 0)
+    assert cache.get("a", 59) is preflight
+    assert cache.get("a", 60) is None
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    cache.put("a", 204, allowed, 0)
+    assert cache.get("a", PREFLIGHT_DEFAULT_AGE - 1) is not None
+    cache.put("a", 204, {**allowed, "access-control-max-age": "86400"}, 0)
+    assert cache.get("a", PREFLIGHT_MAX_AGE - 1) is not None
+    assert cache.get("a", PREFLIGHT_MAX_AGE) is None
+    cache.put("a", 204, {**allowed, "Access-Control-Max-Age": "soon"}, 0)
+    assert cache.get("a", PREFLIGHT_DEFAULT_AGE) is None
+
+    # Refusals, failures and answers not to be reused are passed on only.
+    assert cache.put("b", 204, {}, 0).status == 204
+    assert cache.put("c", 403, allowed, 0).status == 403
+    cache.put("d", 204, {**allowed, "Access-Control-Max-Age": "0"}, 0)
+    assert len(cache) == 0
+
+    cache.put("a", 204, allowed, 0)
+    cache.put("b", 204, allowed, 0)
+    cache.put("a", 204, allowed, 1)
+    cache.put("c", 204, allowed, 1)
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 1) is not None
+    assert cache.get("c", 1) is not None
@@ -0,0 +1,217 @@
+"""Tests for the Scrypted camera platform."""
+
+from __future__ import annotations
+
+import asyncio
+import io
+
+from aiohttp import ClientError, ClientSession, TCPConnector
+from PIL import Image
+import pytest
+from homeassistant.components.camera import CameraEntityFeature, StreamType
+from homeassistant.const import CONF_HOST
+from homeassistant.exceptions import HomeAssistantError
+
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.scrypted import camera
+from custom_components.scrypted.api import API_PATH, ScryptedClient, ScryptedDevice
+from custom_components.scrypted.cluster import ClusterRoutes
+from custom_components.scrypted.const import DOMAIN
+from custom_components.scrypted.devices import PROPERTY_DEVICE
+
+from .stand_in import DEVICES, SNAPSHOT, WEBRTC_ANSWER, StandInScrypted, make_jpeg
+
+CAMERA = ScryptedDevice("1", "Front Door", "Doorbell", frozenset({"Camera"}))
+WEBRTC_CAMERA = ScryptedDevice(
+    "1", "Front Door", "Doorbell", frozenset({"Camera", "RTCSignalingChannel"})
+)
+OFFER = "v=0\r\no=- 1 2 IN IP4 0.0.0.0\r\ns=-\r\nt=0 0\r\n"
+LIGHT = ScryptedDevice("3", "Porch Light", "Light", frozenset({"OnOff"}))
+
+
+class FakeClient:
+    """Device API double."""
+
+    def __init__(self) -> None:
+        self.snapshots = 0
+        self.snapshot_error: Exception | None = None
+        self.image = b"jpeg"
+
+    async def async_get_snapshot(self, device_id):
+        self.snapshots += 1
+        if self.snapshot_error:
+            raise self.snapshot_error
+        return self.image
+
+
+async def test_setup_adds_only_cameras(hass, setup_entry_devices):
+    """Test that devices without the Camera interface are skipped."""
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_HOST: "example"})
+    entry.add_to_hass(hass)
+    await setup_entry_devices(entry, [CAMERA, LIGHT], FakeClient())
+    added = []
+    await camera.async_setup_entry(hass, entry, added.extend)
+    assert [entity.unique_id for entity in added] == [f"{entry.entry_id}_1"]
+    assert added[0].device_info["name"] == "Front Door"
+    assert added[0]._is_supported(CAMERA)
+    assert not added[0]._is_supported(LIGHT)
+
+
+async def test_camera_image_is_cached(hass):
+    """Test that repeated image requests share one snapshot."""
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_HOST: "example"})
+    client = FakeClient()
+    entity = camera.ScryptedCamera(entry, client, CAMERA)
+    images = await asyncio.gather(*(entity.async_camera_image() for _ in range(10)))
+    assert images == [b"jpeg"] * 10
+    assert client.snapshots == 1
+    assert entity.extra_state_attributes["snapshot_hit_rate"] == 0.9
+    assert "snapshot_hits" in entity._unrecorded_attributes
+
+
+async def test_camera_image_is_resized_once_per_size(hass):
+    """Test that sized requests get a downscaled, cached snapshot."""
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_HOST: "example"})
+    client = FakeClient()
+    client.image = make_jpeg(1280, 720)
+    entity = camera.ScryptedCamera(entry, client, CAMERA)
+    entity.hass = hass
+    images = await asyncio.gather(
+        *(entity.async_camera_image(width=320) for _ in range(5))
+    )
+    assert Image.open(io.BytesIO(images[0])).size == (320, 180)
+    assert images.count(images[0]) == 5
+    assert entity._variants.misses == 1
+    assert await entity.async_camera_image() == client.image
+    # A snapshot that can't be decoded is served as it is.
+    client.image = b"jpeg"
+    entity.snapshots.invalidate()
+    assert await entity.async_camera_image(width=320) == b"jpeg"
+
+
+async def test_camera_image_error_returns_none(hass):
+    """Test that an unreachable camera yields no image."""
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_HOST: "example"})
+    client = FakeClient()
+    client.snapshot_error = ClientError("down")
+    entity = camera.ScryptedCamera(entry, client, CAMERA)
+    entity.entity_id = "camera.front_door"
+    assert await entity.async_camera_image() is None
+
+
+def test_stream_type_follows_signaling():
+    """Test that only cameras with WebRTC signaling stream, and follow changes."""
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_HOST: "example"})
+    entity = camera.ScryptedCamera(entry, FakeClient(), CAMERA)
+    assert entity.frontend_stream_type is None
+    assert entity.supported_features == CameraEntityFeature(0)
+
+    assert entity._async_apply_changes({PROPERTY_DEVICE: [WEBRTC_CAMERA]})
+    assert entity.frontend_stream_type == StreamType.WEB_RTC
+    assert entity.supported_features == CameraEntityFeature.STREAM
+    assert not entity._async_apply_changes({PROPERTY_DEVICE: [WEBRTC_CAMERA]})
+    assert not entity._async_apply_changes({"motionDetected": [True]})
+    assert entity._async_apply_changes({PROPERTY_DEVICE: [CAMERA]})
+    assert entity.frontend_stream_type is None
+
+
+async def test_webrtc_offer_is_relayed(allow_unix_connect):
+    """Test that only the offer and answer cross the entry's connection."""
+    server = StandInScrypted()
+    server.devices[0] = {
+        **server.devices[0],
+        "interfaces": ["Camera", "RTCSignalingChannel"],
+    }
+    host = await server.start_tcp()
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_HOST: host})
+    async with ClientSession() as session:
+        client = ScryptedClient(session, {CONF_HOST: host}, "token")
+        try:
+            entity = camera.ScryptedCamera(entry, client, WEBRTC_CAMERA)
+            assert await entity.async_handle_web_rtc_offer(OFFER) == WEBRTC_ANSWER
+            assert server.webrtc_offers == [OFFER]
+            assert server.requests[-1].headers["Authorization"] == "Bearer token"
+
+            # Cameras without signaling leave the offer unanswered.
+            plain = camera.ScryptedCamera(entry, client, CAMERA)
+            assert await plain.async_handle_web_rtc_offer(OFFER) is None
+            assert len(server.webrtc_offers) == 1
+
+            # The server refuses offers for a device without signaling.
+            driveway = ScryptedDevice(
+                "2", "Driveway", "Camera", WEBRTC_CAMERA.interfaces
+            )
+            other = camera.ScryptedCamera(entry, client, driveway)
+            with pytest.raises(HomeAssistantError):
+                await other.async_handle_web_rtc_offer(OFFER)
+            await server.close()
+            with pytest.raises(HomeAssistantError):
+                await entity.async_handle_web_rtc_offer(OFFER)
+        finally:
+            await client.async_close()
+            await server.close()
+
+
+async def test_webrtc_offer_goes_to_cluster_worker(hass, allow_unix_connect):
+    """Test that offers go to the camera's worker, and to the server without it."""
+    server = StandInScrypted()
+    worker = StandInScrypted()
+    for stand_in in (server, worker):
+        stand_in.devices[0] = {
+            **stand_in.devices[0],
+            "interfaces": ["Camera", "RTCSignalingChannel"],
+        }
+    host = await server.start_tcp()
+    worker_host = await worker.start_tcp()
+    server.cluster = {
+        "workers": [{"id": "w1", "host": worker_host}],
+        "devices": {"1": "w1"},
+    }
+    # Without pooled connections, the closed worker can't be connected to.
+    async with ClientSession(connector=TCPConnector(force_close=True)) as session:
+        client = ScryptedClient(session, {CONF_HOST: host}, "token")
+        client.routes = ClusterRoutes(hass, client)
+        try:
+            await client.routes.async_refresh()
+            assert await client.async_get_webrtc_answer("1", OFFER) == WEBRTC_ANSWER
+            assert worker.webrtc_offers == [OFFER]
+            assert worker.requests[-1].headers["Authorization"] == "Bearer token"
+            assert server.webrtc_offers == []
+
+            await worker.close()
+            assert await client.async_get_webrtc_answer("1", OFFER) == WEBRTC_ANSWER
+            assert server.webrtc_offers == [OFFER]
+            assert client.routes.host_for(f"{API_PATH}/devices/1/webrtc") is None
+            await asyncio.gather(*hass._background_tasks)
+        finally:
+            await client.async_close()
+            await server.close()
+
+
+@pytest.mark.parametrize("transport", ["http", "unix"])
+async def test_client_against_stand_in(allow_unix_connect, tmp_path, transport):
+    """Test the device API client over TCP and Unix sockets."""
+    server = StandInScrypted()
+    if transport == "unix":
+        host = await server.start_unix(str(tmp_path / "scrypted.sock"))
+    else:
+        host = await server.start_tcp()
+    async with ClientSession() as session:
+        client = ScryptedClient(session, {CONF_HOST: host}, "token")
+        try:
+            devices = await client.async_get_devices()
+            assert [device.id for device in devices] == [d["id"] for d in DEVICES]
+            assert "Camera" in devices[0].interfaces
+            assert await client.async_get_snapshot("1") == SNAPSHOT
+            assert server.requests[-1].headers["Authorization"] == "Bearer token"
+        finally:
+            await client.async_close()
+            await server.close()
+
+
+def test_device_from_json_defaults():
+    """Test parsing a sparse device."""
+    device = ScryptedDevice.from_json({"id": 7})
+    assert device == ScryptedDevice("7", "7")
+    assert device.interfaces == frozenset()
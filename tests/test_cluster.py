@@ -0,0 +1,168 @@
+"""Tests for routing device media to Scrypted cluster workers."""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from aiohttp import ClientError, ClientResponseError, ClientSession
+from homeassistant.const import CONF_HOST
+from homeassistant.util import dt as dt_util
+
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_fire_time_changed,
+)
+
+from custom_components.scrypted import cluster
+from custom_components.scrypted.api import (
+    API_PATH,
+    ScryptedClient,
+    ScryptedCluster,
+    recording_path,
+)
+from custom_components.scrypted.cluster import ClusterRoutes
+from custom_components.scrypted.const import DOMAIN
+
+from .stand_in import StandInScrypted
+
+TOPOLOGY = ScryptedCluster(
+    workers={"w1": "http://10.0.0.5:11080", "w2": "10.0.0.6"},
+    devices={"1": "w1", "2": "w2"},
+)
+
+
+def _client(*topologies: ScryptedCluster | Exception) -> SimpleNamespace:
+    """Return a client answering with each topology in turn, then the last."""
+    answers = list(topologies)
+    calls = []
+
+    async def _get_cluster() -> ScryptedCluster:
+        calls.append(None)
+        answer = answers.pop(0) if len(answers) > 1 else answers[0]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    return SimpleNamespace(async_get_cluster=_get_cluster, calls=calls)
+
+
+async def test_topology_from_the_server(allow_unix_connect):
+    """Test parsing the topology, and servers without cluster support."""
+    server = StandInScrypted()
+    host = await server.start_tcp()
+    try:
+        async with ClientSession() as session:
+            client = ScryptedClient(session, {CONF_HOST: host}, "token")
+            assert await client.async_get_cluster() == ScryptedCluster()
+
+            server.cluster = {
+                "workers": [
+                    {"id": "w1", "name": "Garage", "host": "http://10.0.0.5:11080"},
+                    {"id": 2, "host": "10.0.0.6"},
+                    {"id": "w3", "host": "ftp://10.0.0.7"},
+                    {"id": "w4"},
+                ],
+                "devices": {"1": "w1", "2": 2, "3": "w3", "4": "gone"},
+            }
+            assert await client.async_get_cluster() == ScryptedCluster(
+                workers={"w1": "http://10.0.0.5:11080", "2": "10.0.0.6"},
+                devices={"1": "w1", "2": "2"},
+            )
+            assert server.requests[-1].headers["Authorization"] == "Bearer token"
+
+            def _unavailable(path: str):
+                raise ClientResponseError(SimpleNamespace(real_url=path), (), status=503)
+
+            client._request = _unavailable
+            with pytest.raises(ClientResponseError):
+                await client.async_get_cluster()
+    finally:
+        await server.close()
+
+
+async def test_media_paths_follow_the_table(hass):
+    """Test which paths go to a worker, and devices moving between workers."""
+    client = _client(TOPOLOGY)
+    routes = ClusterRoutes(hass, client)
+    snapshot = f"{API_PATH}/devices/1/snapshot"
+    assert routes.host_for(snapshot) is None
+
+    await routes.async_refresh()
+    assert routes.host_for(snapshot) == "http://10.0.0.5:11080"
+    assert routes.host_for(recording_path("2", "c1", "video")) == "10.0.0.6"
+    assert routes.host_for(recording_path("2", "c1", "thumbnail")) == "10.0.0.6"
+    assert routes.host_for(f"{API_PATH}/devices/2/webrtc") == "10.0.0.6"
+    # Device metadata, other devices and other plugins stay on the primary.
+    assert routes.host_for(f"{API_PATH}/devices/1/recordings/days") is None
+    assert routes.host_for(f"{API_PATH}/devices/3/snapshot") is None
+    assert routes.host_for(f"{API_PATH}/devices") is None
+    assert routes.host_for("endpoint/@scrypted/nvr/public/") is None
+
+    # Known workers are followed at once, unknown ones are looked up.
+    routes.async_move_device("1", "w2")
+    assert routes.host_for(snapshot) == "10.0.0.6"
+    routes.async_move_device("1", None)
+    assert routes.host_for(snapshot) is None
+    assert len(client.calls) == 1
+    routes.async_move_device("1", "w9")
+    routes.async_move_device("2", "w9")
+    await asyncio.gather(*hass._background_tasks)
+    assert len(client.calls) == 2
+
+
+async def test_unreachable_workers_and_failed_refreshes(hass):
+    """Test that a failed worker is bypassed for a while, and failed refreshes."""
+    moved = ScryptedCluster(workers={"w2": "10.0.0.6"}, devices={"1": "w2"})
+    client = _client(TOPOLOGY, ClientError("refused"), TOPOLOGY, moved)
+    routes = ClusterRoutes(hass, client)
+    await routes.async_refresh()
+    worker = "http://10.0.0.5:11080"
+    snapshot = f"{API_PATH}/devices/1/snapshot"
+
+    routes.async_report_failure(worker, ClientError("refused"))
+    routes.async_report_failure(worker, ClientError("refused"))
+    assert routes.host_for(snapshot) is None
+    assert routes.host_for(f"{API_PATH}/devices/2/snapshot") == "10.0.0.6"
+    # The refresh failed: the table is kept, the worker stays bypassed.
+    await asyncio.gather(*hass._background_tasks)
+    assert len(client.calls) == 2
+    assert routes.host_for(snapshot) is None
+
+    # Still listed, the worker is bypassed until its time is up.
+    await routes.async_refresh()
+    assert routes.host_for(snapshot) is None
+    routes._down[worker] -= cluster.REFRESH_INTERVAL.total_seconds()
+    assert routes.host_for(snapshot) == worker
+    assert routes._down == {}
+
+    # Workers no longer listed are forgotten.
+    routes.async_report_failure(worker, ClientError("refused"))
+    await asyncio.gather(*hass._background_tasks)
+    assert routes.host_for(snapshot) == "10.0.0.6"
+    assert routes._down == {}
+
+
+async def test_refreshes_run_while_the_entry_is_loaded(hass):
+    """Test the first refresh at start, the periodic ones and stopping."""
+    client = _client(TOPOLOGY)
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_HOST: "a"})
+    entry.add_to_hass(hass)
+    routes = ClusterRoutes(hass, client)
+    routes.async_start(entry)
+    await asyncio.gather(*hass._background_tasks)
+    assert routes.routes == {"1": "http://10.0.0.5:11080", "2": "10.0.0.6"}
+
+    async_fire_time_changed(hass, dt_util.utcnow() + cluster.REFRESH_INTERVAL)
+    await hass.async_block_till_done()
+    await asyncio.gather(*hass._background_tasks)
+    assert len(client.calls) == 2
+
+    routes.async_request_refresh()
+    for unload in entry._on_unload:
+        unload()
+    await asyncio.gather(*hass._background_tasks, return_exceptions=True)
+    async_fire_time_changed(hass, dt_util.utcnow() + 2 * cluster.REFRESH_INTERVAL)
+    await hass.async_block_till_done()
+    assert len(client.calls) == 2
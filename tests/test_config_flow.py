@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import asyncio
 from unittest.mock import AsyncMock
 
 import pytest
@@ -20,9 +21,12 @@ from pytest_homeassistant_custom_component.common import MockConfigEntry
 from custom_components.scrypted import config_flow
 from custom_components.scrypted.const import (
     CONF_AUTO_REGISTER_RESOURCES,
+    CONF_DIRECT_URL,
     CONF_SCRYPTED_NVR,
+    CONF_TRUSTED_NETWORKS,
     DOMAIN,
 )
+from custom_components.scrypted.http import EndpointProbe
 
 
 CREDENTIALS_INPUT = {
@@ -58,10 +62,10 @@ async def test_user_flow_creates_entry(hass):
 @pytest.mark.asyncio
 async def test_user_flow_invalid_credentials_shows_error(hass, monkeypatch):
     """Test case for test_user_flow_invalid_credentials_shows_error."""
-    async def _raise(*args, **kwargs):
-        raise ValueError
+    async def _fail(data, session):
+        return [EndpointProbe(data[CONF_HOST], data[CONF_HOST], error="ValueError")]
 
-    monkeypatch.setattr(config_flow, "retrieve_token", _raise)
+    monkeypatch.setattr(config_flow, "probe_endpoints", _fail)
     init_result = await hass.config_entries.flow.async_init(
         DOMAIN, context={"source": config_entries.SOURCE_USER}
     )
@@ -209,6 +213,54 @@ async def test_options_flow_updates_entry(hass):
     assert result["data"][CONF_SCRYPTED_NVR] is True
 
 
+@pytest.mark.asyncio
+async def test_options_flow_rejects_invalid_trusted_networks(hass):
+    """Test that malformed trusted networks keep the form open."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        options={
+            CONF_AUTO_REGISTER_RESOURCES: False,
+            CONF_SCRYPTED_NVR: False,
+        },
+    )
+    entry.add_to_hass(hass)
+    init_result = await hass.config_entries.options.async_init(entry.entry_id)
+    result = await hass.config_entries.options.async_configure(
+        init_result["flow_id"],
+        {
+            CONF_AUTO_REGISTER_RESOURCES: False,
+            CONF_SCRYPTED_NVR: False,
+            CONF_TRUSTED_NETWORKS: "192.168.1.0/24, not-a-subnet",
+        },
+    )
+    assert result["type"] == FlowResultType.FORM
+    assert result["errors"][CONF_TRUSTED_NETWORKS] == "invalid_trusted_networks"
+
+
+@pytest.mark.asyncio
+async def test_options_flow_requires_direct_url_with_trusted_networks(hass):
+    """Test that trusted networks need the URL their clients load Scrypted from."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        options={
+            CONF_AUTO_REGISTER_RESOURCES: False,
+            CONF_SCRYPTED_NVR: False,
+        },
+    )
+    entry.add_to_hass(hass)
+    init_result = await hass.config_entries.options.async_init(entry.entry_id)
+    result = await hass.config_entries.options.async_configure(
+        init_result["flow_id"],
+        {
+            CONF_AUTO_REGISTER_RESOURCES: False,
+            CONF_SCRYPTED_NVR: False,
+            CONF_TRUSTED_NETWORKS: "192.168.1.0/24",
+        },
+    )
+    assert result["type"] == FlowResultType.FORM
+    assert result["errors"] == {CONF_DIRECT_URL: "direct_url_required"}
+
+
 @pytest.mark.asyncio
 async def test_options_flow_defaults_to_entry_data(hass):
     """Test case for test_options_flow_defaults_to_entry_data."""
@@ -241,7 +293,7 @@ async def test_options_flow_respects_existing_options(hass):
     entry.add_to_hass(hass)
     result = await hass.config_entries.options.async_init(entry.entry_id)
     schema_keys = list(result["data_schema"].schema.keys())
-    auto_field, nvr_field = schema_keys
+    auto_field, nvr_field = schema_keys[:2]
     assert auto_field.default() is False
     assert nvr_field.default() is False
 
@@ -299,3 +351,96 @@ async def test_validate_input_missing_field_returns_false(hass):
     flow.hass = hass
     data = {CONF_HOST: "example", CONF_ICON: "mdi:test"}
     assert await flow.validate_input(data) is False
+
+
+def _flow(hass, source: str = config_entries.SOURCE_USER) -> config_flow.ScryptedConfigFlow:
+    """Create a config flow outside the flow manager."""
+    flow = config_flow.ScryptedConfigFlow()
+    flow.hass = hass
+    flow.handler = DOMAIN
+    flow.flow_id = "flow"
+    flow.context = {"source": source}
+    return flow
+
+
+def _probes(monkeypatch, *probes: EndpointProbe) -> None:
+    """Make the flow's endpoint probing return the given outcomes."""
+
+    async def _probe(data, session):
+        return list(probes)
+
+    monkeypatch.setattr(config_flow, "probe_endpoints", _probe)
+
+
+PROBES = (
+    EndpointProbe("https://example:10443", "https://192.0.2.1:10443", latency=0.004),
+    EndpointProbe(
+        "https://example:10443", "https://[2001:db8::1]:10443", latency=0.006
+    ),
+    EndpointProbe("http://example:11080", "http://192.0.2.1:11080", latency=0.012),
+    EndpointProbe("example", "https://192.0.2.1:10443", error="timeout"),
+)
+
+
+@pytest.mark.asyncio
+async def test_user_flow_offers_working_endpoints_fastest_first(hass, monkeypatch):
+    """Test that several working endpoints are offered with their latency."""
+    _probes(monkeypatch, *PROBES)
+    flow = _flow(hass)
+    result = await flow.async_step_user(dict(USER_INPUT))
+    assert result["type"] == FlowResultType.FORM
+    assert result["step_id"] == "endpoint"
+    host_field = next(iter(result["data_schema"].schema))
+    assert host_field.default() == "https://example:10443"
+    options = result["data_schema"].schema[host_field].config["options"]
+    assert options == [
+        {"value": "https://example:10443", "label": "https://example:10443 (4 ms)"},
+        {"value": "http://example:11080", "label": "http://example:11080 (12 ms)"},
+    ]
+    assert result["description_placeholders"]["probes"].splitlines() == [
+        "- `https://192.0.2.1:10443`: 4 ms",
+        "- `https://[2001:db8::1]:10443`: 6 ms",
+        "- `http://192.0.2.1:11080`: 12 ms",
+        "- `https://192.0.2.1:10443`: timeout",
+    ]
+
+    result = await flow.async_step_endpoint({CONF_HOST: "http://example:11080"})
+    assert result["type"] == FlowResultType.CREATE_ENTRY
+    assert result["title"] == "example"
+    assert result["data"] == {**USER_INPUT, CONF_HOST: "http://example:11080"}
+    assert flow.unique_id == "http_example_11080"
+
+
+@pytest.mark.asyncio
+async def test_import_flow_takes_fastest_endpoint(hass, monkeypatch):
+    """Test that imports, with nobody to ask, configure the fastest endpoint."""
+    _probes(monkeypatch, *PROBES)
+    result = await _flow(hass, config_entries.SOURCE_IMPORT).async_step_import(
+        dict(USER_INPUT)
+    )
+    assert result["type"] == FlowResultType.CREATE_ENTRY
+    assert result["data"][CONF_HOST] == "https://example:10443"
+
+
+@pytest.mark.asyncio
+async def test_user_flow_without_required_fields_skips_probing(hass, monkeypatch):
+    """Test that incomplete input is rejected without touching the network."""
+    _probes(monkeypatch, *PROBES)
+    flow = _flow(hass)
+    flow.probes = list(PROBES)
+    result = await flow.async_step_user({CONF_HOST: "example", CONF_USERNAME: "user"})
+    assert result["type"] == FlowResultType.FORM
+    assert result["errors"]["base"] == "invalid_host_or_credentials"
+    assert flow.probes == []
+
+
+@pytest.mark.asyncio
+async def test_validate_input_times_out(hass, monkeypatch):
+    """Test that reauth doesn't wait on an unresponsive host."""
+    monkeypatch.setattr(config_flow, "PROBE_TIMEOUT", 0.01)
+
+    async def _hang(data, session):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(config_flow, "retrieve_token", _hang)
+    assert await _flow(hass).validate_input(dict(USER_INPUT)) is False
@@ -0,0 +1,304 @@
+"""Tests for the shared Scrypted device discovery."""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import replace
+from datetime import timedelta
+from types import SimpleNamespace
+
+from aiohttp import ClientError, ClientResponseError
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.util import dt as dt_util
+
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_capture_events,
+    async_fire_time_changed,
+)
+
+from custom_components.scrypted import devices as scrypted_devices
+from custom_components.scrypted.api import ScryptedDevice
+from custom_components.scrypted.const import DOMAIN, SIGNAL_DEVICE_UPDATED
+from custom_components.scrypted.devices import ScryptedDevices, device_identifier
+from custom_components.scrypted.store import (
+    DEVICES_STORAGE_KEY,
+    DEVICES_STORAGE_VERSION,
+    ScryptedDeviceStore,
+)
+
+CAMERA = ScryptedDevice("1", "Front Door", "Camera", frozenset({"Camera"}))
+
+
+class FakeClient:
+    """Device list double that fails a few times first."""
+
+    def __init__(self, failures: int = 0, error: Exception | None = None) -> None:
+        self.failures = failures
+        self.error = error or ClientError("down")
+        self.calls = 0
+        self.state: dict = {}
+
+    async def async_get_devices(self):
+        self.calls += 1
+        if self.failures:
+            self.failures -= 1
+            raise self.error
+        return [replace(CAMERA, state=dict(self.state))]
+
+
+def _status_error(status: int) -> ClientResponseError:
+    """Return the error of a request the server answered with a status."""
+    return ClientResponseError(
+        SimpleNamespace(real_url="devices"), (), status=status, message="Not Found"
+    )
+
+
+async def test_discovery_retries_and_is_shared(hass, monkeypatch):
+    """Test that every waiter gets the list from one successful fetch."""
+    monkeypatch.setattr(scrypted_devices, "_DISCOVERY_RETRY_MIN", 0.001)
+    client = FakeClient(failures=2)
+    devices = ScryptedDevices(hass, "entry", client)
+    waiters = [asyncio.ensure_future(devices.async_get()) for _ in range(3)]
+    await devices._async_discover()
+    assert await asyncio.gather(*waiters) == [[CAMERA]] * 3
+    assert client.calls == 3
+
+
+async def test_server_errors_are_retried(hass, monkeypatch):
+    """Test that a server error is retried like an unreachable server."""
+    monkeypatch.setattr(scrypted_devices, "_DISCOVERY_RETRY_MIN", 0.001)
+    client = FakeClient(failures=1, error=_status_error(502))
+    devices = ScryptedDevices(hass, "entry", client)
+    assert await devices._async_discover()
+    assert client.calls == 2
+
+
+async def test_missing_device_api_is_asked_once(hass, caplog):
+    """Test that a server without the plugin's API isn't asked again."""
+    client = FakeClient(failures=2, error=_status_error(404))
+    devices = ScryptedDevices(hass, "entry", client)
+    assert not await devices._async_discover()
+    assert client.calls == 1
+    assert not devices.loaded
+    assert caplog.text.count("doesn't serve the Home Assistant device API") == 1
+
+
+async def test_cancelled_waiter_does_not_cancel_discovery(hass):
+    """Test that a platform unloading early doesn't break the others."""
+    devices = ScryptedDevices(hass, "entry", FakeClient())
+    waiter = asyncio.ensure_future(devices.async_get())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await devices._async_discover()
+    assert await devices.async_get() == [CAMERA]
+
+
+async def test_async_start_runs_discovery_in_background(hass, monkeypatch):
+    """Test that starting discovery doesn't wait for the device list."""
+    monkeypatch.undo()
+    entry = MockConfigEntry(domain=DOMAIN)
+    entry.add_to_hass(hass)
+    discovered = []
+    devices = ScryptedDevices(hass, "entry", FakeClient())
+    devices.async_start(entry, discovered.append)
+    assert await devices.async_get() == [CAMERA]
+    await asyncio.gather(*hass._background_tasks)
+    assert discovered == [entry]
+
+    # Without the device API, what depends on it isn't started.
+    devices = ScryptedDevices(
+        hass, "entry", FakeClient(failures=1, error=_status_error(401))
+    )
+    devices.async_start(entry, discovered.append)
+    devices.async_start(entry)
+    await asyncio.gather(*hass._background_tasks)
+    assert discovered == [entry]
+
+
+def _register(hass, entry, device_id: str, name: str = "Old"):
+    """Register a device for the entry as an earlier run would have."""
+    return dr.async_get(hass).async_get_or_create(
+        config_entry_id=entry.entry_id,
+        identifiers={device_identifier(entry.entry_id, device_id)},
+        name=name,
+    )
+
+
+async def test_discovery_removes_stale_registry_devices(hass):
+    """Test that devices gone from Scrypted are removed, others untouched."""
+    entry = MockConfigEntry(domain=DOMAIN)
+    entry.add_to_hass(hass)
+    kept = _register(hass, entry, "1", "Front Door")
+    stale = _register(hass, entry, "9")
+    updates = async_capture_events(hass, dr.EVENT_DEVICE_REGISTRY_UPDATED)
+    devices = ScryptedDevices(hass, entry.entry_id, FakeClient())
+    await devices._async_discover()
+    await hass.async_block_till_done()
+    registry = dr.async_get(hass)
+    assert registry.async_get(kept.id) is not None
+    assert registry.async_get(stale.id) is None
+    assert [event.data["device_id"] for event in updates] == [stale.id]
+
+
+async def test_incremental_changes(hass):
+    """Test adding, updating and removing devices from push events."""
+    entry = MockConfigEntry(domain=DOMAIN)
+    entry.add_to_hass(hass)
+    devices = ScryptedDevices(hass, entry.entry_id, FakeClient())
+    await devices._async_discover()
+    notified: list[list[str]] = []
+    unsub = devices.async_add_listener(
+        lambda changed: notified.append([device.id for device in changed])
+    )
+    assert notified == [["1"]]
+    device_updates = []
+    async_dispatcher_connect(
+        hass, SIGNAL_DEVICE_UPDATED.format(entry.entry_id, "1"), device_updates.append
+    )
+    registered = _register(hass, entry, "1", "Front Door")
+    updates = async_capture_events(hass, dr.EVENT_DEVICE_REGISTRY_UPDATED)
+
+    # An unchanged descriptor touches nothing.
+    devices.async_apply_changes(
+        {"1": {"name": "Front Door", "type": "Camera", "interfaces": ["Camera"]}}
+    )
+    # A new device is handed to the platforms.
+    devices.async_apply_changes({"2": {"name": "Porch", "interfaces": ["Camera"]}})
+    assert notified[-1] == ["2"]
+    # A renamed device updates its registry entry and its entities.
+    devices.async_apply_changes(
+        {"1": {"name": "Doorbell", "type": "Camera", "interfaces": ["Camera"]}}
+    )
+    assert notified[-1] == ["1"]
+    assert device_updates[-1]["device"][0].name == "Doorbell"
+    # A new interface reaches the platforms without touching the registry.
+    devices.async_apply_changes(
+        {"1": {"name": "Doorbell", "type": "Camera", "interfaces": ["Camera", "X"]}}
+    )
+    # Removing an unknown device is a no-op, a known one leaves the registry.
+    devices.async_apply_changes({"7": None, "1": None})
+    await hass.async_block_till_done()
+
+    assert len(notified) == 4
+    assert [event.data["action"] for event in updates] == ["update", "remove"]
+    assert dr.async_get(hass).async_get(registered.id) is None
+    assert [device.id for device in await devices.async_get()] == ["2"]
+    unsub()
+    devices.async_apply_changes({"3": {"name": "Gate"}})
+    assert len(notified) == 4
+
+
+async def test_changes_before_initial_list_are_applied_after(hass):
+    """Test that push events racing the initial fetch aren't lost."""
+    devices = ScryptedDevices(hass, "entry", FakeClient())
+    devices.async_apply_changes({"1": None, "2": {"name": "Porch"}})
+    await devices.async_resync()
+    await devices._async_discover()
+    assert [device.id for device in await devices.async_get()] == ["2"]
+
+
+async def test_resync_applies_the_difference(hass):
+    """Test that a reconnect catches up with changes missed meanwhile."""
+    client = FakeClient()
+    devices = ScryptedDevices(hass, "entry", client)
+    await devices._async_discover()
+    notified = []
+    devices.async_add_listener(notified.append)
+    await devices.async_resync()
+    assert len(notified) == 1
+
+    porch = ScryptedDevice("2", "Porch")
+
+    async def _changed():
+        return [porch]
+
+    client.async_get_devices = _changed
+    await devices.async_resync()
+    assert notified[-1] == [porch]
+    assert await devices.async_get() == [porch]
+
+    # A server that lost the device API keeps the devices it had.
+    client.async_get_devices = FakeClient(1, _status_error(404)).async_get_devices
+    await devices.async_resync()
+    assert await devices.async_get() == [porch]
+
+
+async def test_restore_then_reconcile_with_live_list(hass, hass_storage):
+    """Test that snapshot devices come back at once and are then reconciled."""
+    entry = MockConfigEntry(domain=DOMAIN)
+    entry.add_to_hass(hass)
+    hass_storage[DEVICES_STORAGE_KEY.format(entry.entry_id)] = {
+        "version": DEVICES_STORAGE_VERSION,
+        "data": {
+            "devices": [
+                {
+                    "id": "1",
+                    "name": "Front Door",
+                    "type": "Camera",
+                    "interfaces": ["Camera"],
+                    "state": {"motionDetected": True},
+                },
+                {"id": "9", "name": "Gone", "interfaces": []},
+            ]
+        },
+    }
+    _register(hass, entry, "9")
+    client = FakeClient()
+    devices = ScryptedDevices(
+        hass, entry.entry_id, client, ScryptedDeviceStore(hass, entry.entry_id)
+    )
+    await devices.async_restore()
+    assert devices.loaded
+    assert client.calls == 0
+    restored = await devices.async_get()
+    assert [device.id for device in restored] == ["1", "9"]
+    assert restored[0].state == {"motionDetected": True}
+
+    notified = []
+    devices.async_add_listener(notified.append)
+    device_updates = []
+    async_dispatcher_connect(
+        hass, SIGNAL_DEVICE_UPDATED.format(entry.entry_id, "1"), device_updates.append
+    )
+    client.state = {"motionDetected": False}
+    await devices._async_discover()
+    # The unchanged camera isn't re-added, but its live state is applied.
+    assert len(notified) == 1
+    assert device_updates == [{"motionDetected": [False]}]
+    assert [device.id for device in await devices.async_get()] == ["1"]
+    assert not dr.async_get(hass).devices
+
+
+async def test_snapshot_is_saved_debounced(hass, hass_storage):
+    """Test that changes and event states are written once after the delay."""
+    store = ScryptedDeviceStore(hass, "entry")
+    devices = ScryptedDevices(hass, "entry", FakeClient(), store)
+    await devices.async_restore()
+    assert not devices.loaded
+    await devices._async_discover()
+    await devices.async_restore()
+    devices.async_update_states("1", {"motionDetected": [True, False]})
+    devices.async_update_states("1", {"detections": [[{"className": "person"}]]})
+    devices.async_update_states("7", {"motionDetected": [True]})
+    key = DEVICES_STORAGE_KEY.format("entry")
+    assert key not in hass_storage
+
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=11))
+    await hass.async_block_till_done()
+    assert hass_storage[key]["data"] == {
+        "devices": [
+            {
+                "id": "1",
+                "name": "Front Door",
+                "type": "Camera",
+                "interfaces": ["Camera"],
+                "state": {"motionDetected": False},
+            }
+        ]
+    }
+    assert [device.id for device in await store.async_load()] == ["1"]
+
+    await store.async_remove()
+    assert key not in hass_storage
@@ -0,0 +1,201 @@
+"""Tests for failover between the hosts of an entry."""
+
+from __future__ import annotations
+
+import asyncio
+
+from aiohttp import ClientError
+from homeassistant.const import CONF_HOST
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.util import dt as dt_util
+
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_fire_time_changed,
+)
+
+from custom_components.scrypted import endpoints
+from custom_components.scrypted.const import DOMAIN, SIGNAL_ENDPOINT_CHANGED
+from custom_components.scrypted.endpoints import EndpointPool
+
+
+def _pool(hass, login=None, ping=None) -> EndpointPool:
+    """Create a pool of three hosts."""
+
+    async def _login(host: str) -> str:
+        return f"token-{host}"
+
+    async def _ping(host: str) -> None:
+        pass
+
+    return EndpointPool(hass, "entry", ["a", "b", "c"], login or _login, ping or _ping)
+
+
+def _changes(hass) -> list[None]:
+    """Record the pool's change signals."""
+    changes = []
+    async_dispatcher_connect(
+        hass, SIGNAL_ENDPOINT_CHANGED.format("entry"), lambda: changes.append(None)
+    )
+    return changes
+
+
+async def test_select_by_health_and_latency(hass, monkeypatch):
+    """Test the order hosts are tried in, and the weights of the first pick."""
+    pool = _pool(hass)
+    # Before the first check, the configured order.
+    assert pool.select() == ["a", "b", "c"]
+    assert pool.active == "a"
+
+    a, b, c = pool.endpoints
+    a.latency, b.latency, c.latency = 0.04, 0.0001, 0.002
+    a.healthy = False
+    assert pool.select(weighted=False) == ["b", "c", "a"]
+    assert pool.active == "b"
+
+    picks = []
+
+    def _choices(population, weights):
+        picks.append(
+            [(health.host, weight) for health, weight in zip(population, weights)]
+        )
+        return [population[-1]]
+
+    monkeypatch.setattr(endpoints.random, "choices", _choices)
+    assert pool.select() == ["c", "b", "a"]
+    # Latencies under a millisecond weigh like one.
+    assert picks == [[("b", 1000), ("c", 500)]]
+
+    # A single measured host needs no pick.
+    c.healthy = False
+    assert pool.select() == ["b", "a", "c"]
+    assert len(picks) == 1
+
+    b.healthy = False
+    assert pool.select() == ["a", "b", "c"]
+    assert pool.active == "a"
+
+
+async def test_health_check(hass, monkeypatch):
+    """Test that checks time pings, log in when needed and take hosts in and out."""
+    monkeypatch.setattr(endpoints, "PROBE_TIMEOUT", 0.05)
+    down = {"b"}
+    logins = []
+
+    async def _login(host: str) -> str:
+        logins.append(host)
+        if host in down:
+            raise ClientError("refused")
+        # Logins are slow, a password check; c's never finishes in time.
+        await asyncio.sleep(1 if host == "c" else 0.02)
+        return f"token-{host}-{logins.count(host)}"
+
+    async def _ping(host: str) -> None:
+        if host in down:
+            raise ClientError("refused")
+
+    pool = _pool(hass, _login, _ping)
+    changes = _changes(hass)
+    await pool.async_check()
+    a, b, c = pool.endpoints
+    assert (a.healthy, a.token, a.error) == (True, "token-a-1", None)
+    # Only the ping is timed.
+    assert a.latency < 0.02
+    assert (b.healthy, b.token, b.error) == (False, None, "refused")
+    assert (c.healthy, c.error) == (False, "TimeoutError")
+    assert pool.token("a") == "token-a-1"
+    assert pool.token("worker") is None
+    assert pool.select() == ["a", "b", "c"]
+    assert len(changes) == 1
+
+    # Latency is averaged, and a host that answers again is back. Hosts with a
+    # token are only pinged, the others log in.
+    a.latency = 1.0
+    down.clear()
+    await pool.async_check()
+    assert a.latency < 1.0 - endpoints.LATENCY_SMOOTHING * 0.9
+    assert (a.token, b.healthy, b.error) == ("token-a-1", True, None)
+    assert logins == ["a", "b", "c", "b", "c"]
+    assert len(changes) == 2
+
+    # A host that stops answering pings keeps its token for when it is back.
+    down.add("a")
+    await pool.async_check()
+    assert (a.healthy, a.token, a.error) == (False, "token-a-1", "refused")
+    assert len(logins) == 6
+
+    # Tokens are renewed once they are old.
+    down.clear()
+    a.logged_in -= endpoints.TOKEN_REFRESH_INTERVAL.total_seconds()
+    await pool.async_check()
+    assert (a.healthy, a.token) == (True, "token-a-2")
+
+
+async def test_refused_token_logs_in_again(hass):
+    """Test that a host refusing its token logs in again in the background."""
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_HOST: "a"})
+    entry.add_to_hass(hass)
+    logins = []
+
+    async def _login(host: str) -> str:
+        logins.append(host)
+        return f"token-{len(logins)}"
+
+    pool = _pool(hass, _login)
+    # Not started yet, or without a token: nothing to renew.
+    pool.async_report_unauthorized("a")
+    pool.async_start(entry)
+    await asyncio.gather(*hass._background_tasks)
+    changes = _changes(hass)
+    pool.async_report_unauthorized("a")
+    pool.async_report_unauthorized("a")
+    pool.async_report_unauthorized("worker")
+    assert pool.token("a") is None
+    await asyncio.gather(*hass._background_tasks)
+    assert pool.token("a") == "token-4"
+    assert logins == ["a", "b", "c", "a"]
+    assert len(changes) == 1
+    pool.async_stop()
+
+
+async def test_report_failure(hass):
+    """Test that a failed connection takes a host out of rotation at once."""
+    pool = _pool(hass)
+    changes = _changes(hass)
+    pool.async_report_failure("a", ClientError("refused"))
+    pool.async_report_failure("a", ClientError("still refused"))
+    assert pool.active == "b"
+    assert pool.endpoints[0].error == "still refused"
+    assert len(changes) == 1
+
+
+async def test_checks_run_while_the_entry_is_loaded(hass):
+    """Test the first check at start, the periodic ones and stopping."""
+    logins = []
+    pings = []
+
+    async def _login(host: str) -> str:
+        logins.append(host)
+        return "token"
+
+    async def _ping(host: str) -> None:
+        pings.append(host)
+
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_HOST: "a"})
+    entry.add_to_hass(hass)
+    pool = _pool(hass, _login, _ping)
+    pool.async_start(entry)
+    await asyncio.gather(*hass._background_tasks)
+    assert logins == pings == ["a", "b", "c"]
+
+    async_fire_time_changed(hass, dt_util.utcnow() + endpoints.HEALTH_INTERVAL)
+    await hass.async_block_till_done()
+    assert pings == ["a", "b", "c"] * 2
+    assert len(logins) == 3
+
+    for unload in entry._on_unload:
+        unload()
+    pool.async_stop()
+    async_fire_time_changed(hass, dt_util.utcnow() + 2 * endpoints.HEALTH_INTERVAL)
+    await hass.async_block_till_done()
+    assert len(pings) == 6
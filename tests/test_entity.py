@@ -0,0 +1,96 @@
+"""Tests for the Scrypted device entity base."""
+
+from __future__ import annotations
+
+from unittest.mock import AsyncMock
+
+from homeassistant.const import CONF_HOST
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.scrypted.api import ScryptedDevice
+from custom_components.scrypted.const import DOMAIN, SIGNAL_DEVICE_UPDATED
+from custom_components.scrypted.entity import (
+    ScryptedDeviceEntity,
+    async_setup_device_entities,
+)
+
+CAMERA = ScryptedDevice("1", "Driveway", "Camera", frozenset({"Camera"}))
+
+
+class OnlyCameras(ScryptedDeviceEntity):
+    """Entity supported by devices with the Camera interface."""
+
+    def _is_supported(self, device: ScryptedDevice) -> bool:
+        return "Camera" in device.interfaces
+
+
+async def test_entities_are_added_once_per_unique_id(hass, setup_entry_devices):
+    """Test that changed devices don't duplicate entities, removed ones return."""
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_HOST: "example"})
+    entry.add_to_hass(hass)
+    devices = await setup_entry_devices(entry, [CAMERA])
+    batches: list[list[ScryptedDeviceEntity]] = []
+    async_setup_device_entities(
+        hass, entry, batches.append, lambda device: [OnlyCameras(entry, device)]
+    )
+    assert len(batches) == 1
+    devices.async_apply_changes({"1": {"name": "Renamed", "interfaces": ["Camera"]}})
+    devices.async_apply_changes({"2": {"name": "Porch"}})
+    assert [entity.unique_id for entity in batches[1]] == [f"{entry.entry_id}_2"]
+
+    # Once removed, the entity is created again for the next change.
+    entity = batches[0][0]
+    entity.hass = hass
+    entity.entity_id = "camera.driveway"
+    await entity.async_remove()
+    devices.async_apply_changes({"1": {"name": "Again", "interfaces": ["Camera"]}})
+    assert [entity.unique_id for entity in batches[2]] == [f"{entry.entry_id}_1"]
+
+
+async def test_unsupported_registered_entity_is_removed(hass):
+    """Test that losing an interface removes the registered entity."""
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_HOST: "example"})
+    entry.add_to_hass(hass)
+    registry = er.async_get(hass)
+    registry_entry = registry.async_get_or_create(
+        "camera", DOMAIN, f"{entry.entry_id}_1", config_entry=entry
+    )
+    entity = OnlyCameras(entry, CAMERA)
+    entity.hass = hass
+    entity.entity_id = registry_entry.entity_id
+    entity.registry_entry = registry_entry
+    await entity.async_added_to_hass()
+    signal = SIGNAL_DEVICE_UPDATED.format(entry.entry_id, "1")
+    async_dispatcher_send(hass, signal, {"device": [CAMERA]})
+    assert registry.async_get(registry_entry.entity_id) is not None
+    async_dispatcher_send(hass, signal, {"device": [ScryptedDevice("1", "Driveway")]})
+    assert registry.async_get(registry_entry.entity_id) is None
+
+
+async def test_unsupported_unregistered_entity_is_removed(hass, monkeypatch):
+    """Test that an entity without a registry entry removes itself."""
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_HOST: "example"})
+    entity = OnlyCameras(entry, CAMERA)
+    entity.hass = hass
+    entity.entity_id = "camera.driveway"
+    remove = AsyncMock()
+    monkeypatch.setattr(entity, "async_remove", remove)
+    await entity.async_added_to_hass()
+    async_dispatcher_send(
+        hass,
+        SIGNAL_DEVICE_UPDATED.format(entry.entry_id, "1"),
+        {"device": [ScryptedDevice("1", "Driveway")]},
+    )
+    await hass.async_block_till_done()
+    remove.assert_awaited_once_with(force_remove=True)
+
+
+async def test_base_entity_ignores_updates(hass):
+    """Test the defaults of the base entity."""
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_HOST: "example"})
+    entity = ScryptedDeviceEntity(entry, CAMERA)
+    assert entity._is_supported(ScryptedDevice("1", "Driveway"))
+    assert not entity._async_apply_changes({"x": [1]})
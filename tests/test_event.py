@@ -0,0 +1,99 @@
+"""Tests for the Scrypted event entities."""
+
+from __future__ import annotations
+
+from homeassistant.const import CONF_HOST
+
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.scrypted import event
+from custom_components.scrypted.api import ScryptedDevice
+from custom_components.scrypted.const import DOMAIN
+
+DOORBELL = ScryptedDevice(
+    "2", "Front Door", "Doorbell", frozenset({"BinarySensor", "ObjectDetector"})
+)
+
+
+def _entity(cls):
+    """Create an entity recording the events it fires."""
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_HOST: "example"})
+    entity = cls(entry, DOORBELL)
+    triggered = []
+    entity._trigger_event = lambda event_type, attributes=None: triggered.append(
+        (event_type, attributes)
+    )
+    return entity, triggered
+
+
+def test_doorbell_rings_once_per_batch():
+    """Test that a press inside a batch rings exactly once."""
+    entity, triggered = _entity(event.ScryptedDoorbellEvent)
+    assert entity._async_apply_changes({"binaryState": [True, False, True, False]})
+    assert triggered == [("ring", None)]
+    assert not entity._async_apply_changes({"binaryState": [False]})
+    assert not entity._async_apply_changes({"motionDetected": [True]})
+
+
+def test_doorbell_held_does_not_ring_again():
+    """Test that a button still held isn't a new ring."""
+    entity, triggered = _entity(event.ScryptedDoorbellEvent)
+    entity._async_apply_changes({"binaryState": [True]})
+    assert not entity._async_apply_changes({"binaryState": [True]})
+    assert len(triggered) == 1
+
+
+def test_detections_fire_once_with_all_classes():
+    """Test that a detection burst fires one event naming every class."""
+    entity, triggered = _entity(event.ScryptedDetectionEvent)
+    assert entity._async_apply_changes(
+        {
+            "detections": [
+                {"detections": [{"className": "person"}, {"className": "dog"}]},
+                None,
+                {"detections": [{"className": "person"}]},
+                {"detections": [{"className": "vehicle"}]},
+            ]
+        }
+    )
+    assert triggered == [
+        ("vehicle", {"classes": ["person", "object", "vehicle"], "count": 4})
+    ]
+    assert entity.unique_id.endswith("_2_detections")
+
+
+def test_empty_detections_do_not_fire():
+    """Test that frames without detections are ignored."""
+    entity, triggered = _entity(event.ScryptedDetectionEvent)
+    assert not entity._async_apply_changes({"detections": [{"detections": []}]})
+    assert not entity._async_apply_changes({"other": [1]})
+    assert not triggered
+
+
+def test_malformed_detections_are_skipped():
+    """Test that values not shaped like detection results don't raise."""
+    entity, triggered = _entity(event.ScryptedDetectionEvent)
+    assert not entity._async_apply_changes(
+        {"detections": ["person", 1, {"detections": "person"}, {"detections": [2]}]}
+    )
+    assert entity._async_apply_changes(
+        {"detections": [[], {"detections": ["dog", {"className": "person"}]}]}
+    )
+    assert triggered == [("person", {"classes": ["person"], "count": 2})]
+
+
+async def test_setup_adds_events(hass, setup_entry_devices):
+    """Test that doorbells and object detectors get event entities."""
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_HOST: "example"})
+    entry.add_to_hass(hass)
+    camera = ScryptedDevice("1", "Driveway", "Camera", frozenset({"BinarySensor"}))
+    await setup_entry_devices(entry, [DOORBELL, camera])
+    added = []
+    await event.async_setup_entry(hass, entry, added.extend)
+    assert [type(entity) for entity in added] == [
+        event.ScryptedDoorbellEvent,
+        event.ScryptedDetectionEvent,
+    ]
+    assert all(entity._is_supported(DOORBELL) for entity in added)
+    assert not any(entity._is_supported(camera) for entity in added)
+
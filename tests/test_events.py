@@ -0,0 +1,297 @@
+"""Tests for the Scrypted event subscription."""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+from aiohttp import ClientSession, WSServerHandshakeError
+from homeassistant.const import CONF_HOST
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.scrypted import events as scrypted_events
+from custom_components.scrypted.api import ScryptedClient
+from custom_components.scrypted.const import DOMAIN, SIGNAL_DEVICE_UPDATED
+from custom_components.scrypted.events import (
+    MAX_BATCH_VALUES,
+    ScryptedEventStream,
+    latest,
+)
+
+from .stand_in import StandInScrypted
+
+
+def _listen(hass, device_id: str) -> list[dict]:
+    """Collect the updates dispatched for a device."""
+    updates: list[dict] = []
+    async_dispatcher_connect(
+        hass, SIGNAL_DEVICE_UPDATED.format("entry", device_id), updates.append
+    )
+    return updates
+
+
+async def test_burst_is_flushed_once_per_device(hass):
+    """Test that a burst becomes one update per device."""
+    stream = ScryptedEventStream(hass, "entry", None, flush_interval=0.01)
+    first = _listen(hass, "1")
+    second = _listen(hass, "2")
+    for value in range(300):
+        stream.async_process(
+            [
+                {"id": "1", "property": "motionDetected", "value": value % 2 == 0},
+                {"id": 2, "property": "detections", "value": {"n": value}},
+            ]
+        )
+    assert not first
+    await asyncio.sleep(0.02)
+    assert len(first) == len(second) == 1
+    assert latest(first[0], "motionDetected") is False
+    assert len(second[0]["detections"]) == MAX_BATCH_VALUES
+    assert latest(second[0], "detections") == {"n": 299}
+    assert (stream.received, stream.flushes, stream.updates) == (600, 1, 2)
+
+
+async def test_zero_interval_flushes_on_next_iteration(hass):
+    """Test flushing without a delay."""
+    stream = ScryptedEventStream(hass, "entry", None, flush_interval=0)
+    updates = _listen(hass, "1")
+    stream.async_process([{"id": "1", "property": "motionDetected", "value": True}])
+    await asyncio.sleep(0)
+    assert updates == [{"motionDetected": [True]}]
+
+
+async def test_malformed_events_are_ignored(hass):
+    """Test that bad frames and events don't break the stream."""
+    stream = ScryptedEventStream(hass, "entry", None, flush_interval=0)
+    updates = _listen(hass, "1")
+    stream._async_receive("not json")
+    stream._async_receive('[{"id": "1"}, "text", {"id": "1", "property": "flooded"}]')
+    await asyncio.sleep(0)
+    assert updates == [{"flooded": [None]}]
+    assert latest(updates[0], "missing", "default") == "default"
+
+
+async def test_cancel_flush_drops_pending(hass):
+    """Test that unloading drops queued events."""
+    stream = ScryptedEventStream(hass, "entry", None, flush_interval=0.01)
+    updates = _listen(hass, "1")
+    stream.async_process([{"id": "1", "property": "motionDetected", "value": True}])
+    stream._async_cancel_flush()
+    await asyncio.sleep(0.02)
+    assert not updates
+
+
+async def test_subscription_against_stand_in(hass, allow_unix_connect, monkeypatch):
+    """Test receiving events and reconnecting after the server drops the socket."""
+    monkeypatch.setattr(scrypted_events, "_RECONNECT_MIN", 0.01)
+    server = StandInScrypted()
+    host = await server.start_tcp()
+    updates = _listen(hass, "1")
+    async with ClientSession() as session:
+        client = ScryptedClient(session, {CONF_HOST: host}, "token")
+        stream = ScryptedEventStream(hass, "entry", client, flush_interval=0)
+        task = asyncio.ensure_future(stream._async_run())
+        try:
+            await asyncio.wait_for(server.event_connected.wait(), 5)
+            assert stream.connected
+            await server.send_events([{"id": "1", "property": "motionDetected", "value": True}])
+            await server.drop_event_sockets()
+            await asyncio.sleep(0.05)
+            await asyncio.wait_for(server.event_connected.wait(), 5)
+            await server.send_events([{"id": "1", "property": "motionDetected", "value": False}])
+            for _ in range(100):
+                if len(updates) == 2:
+                    break
+                await asyncio.sleep(0.01)
+            assert updates == [
+                {"motionDetected": [True]},
+                {"motionDetected": [False]},
+            ]
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await server.close()
+
+
+async def test_subscription_retries_unreachable_server(hass, monkeypatch):
+    """Test that connection errors are retried."""
+    attempts = []
+
+    class _Client:
+        def ws_connect_events(self):
+            attempts.append(1)
+            raise scrypted_events.ClientError("down")
+
+    monkeypatch.setattr(scrypted_events, "_RECONNECT_MIN", 0.001)
+    stream = ScryptedEventStream(hass, "entry", _Client())
+    task = asyncio.ensure_future(stream._async_run())
+    await asyncio.sleep(0.05)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    assert len(attempts) >= 3
+    assert not stream.connected
+
+
+async def test_subscription_refused_by_the_server_ends(hass, monkeypatch, caplog):
+    """Test that a server without the event route isn't asked again."""
+    attempts = []
+
+    class _Client:
+        def ws_connect_events(self):
+            attempts.append(1)
+            raise WSServerHandshakeError(
+                SimpleNamespace(real_url="events"), (), status=404, message="Not Found"
+            )
+
+    monkeypatch.setattr(scrypted_events, "_RECONNECT_MIN", 0.001)
+    stream = ScryptedEventStream(hass, "entry", _Client())
+    await asyncio.wait_for(stream._async_run(), 1)
+    assert attempts == [1]
+    assert not stream.connected
+    assert "refused the device event subscription" in caplog.text
+
+
+async def test_socket_errors_reconnect(hass, monkeypatch):
+    """Test that an error on the socket ends the connection and reconnects."""
+    attempts = []
+    frames = [
+        SimpleNamespace(type=scrypted_events.WSMsgType.ERROR, data=None),
+        SimpleNamespace(
+            type=scrypted_events.WSMsgType.TEXT,
+            data='[{"id": "1", "property": "on", "value": true}]',
+        ),
+    ]
+
+    class _Socket:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *args):
+            return None
+
+        async def __aiter__(self):
+            for frame in frames:
+                yield frame
+
+    class _Client:
+        def ws_connect_events(self):
+            attempts.append(1)
+            return _Socket()
+
+    monkeypatch.setattr(scrypted_events, "_RECONNECT_MIN", 0.001)
+    updates = _listen(hass, "1")
+    stream = ScryptedEventStream(hass, "entry", _Client(), flush_interval=0)
+    task = asyncio.ensure_future(stream._async_run())
+    await asyncio.sleep(0.05)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    assert len(attempts) >= 2
+    # Frames after the error aren't read.
+    await hass.async_block_till_done()
+    assert updates == []
+
+
+async def test_async_start_subscribes_until_unload(hass, monkeypatch):
+    """Test that the subscription runs as a background task of the entry."""
+    monkeypatch.undo()
+    entry = MockConfigEntry(domain=DOMAIN)
+    entry.add_to_hass(hass)
+    runs = []
+
+    async def _run():
+        runs.append(1)
+
+    stream = ScryptedEventStream(hass, "entry", None, flush_interval=0.01)
+    monkeypatch.setattr(stream, "_async_run", _run)
+    stream.async_start(entry)
+    await hass.async_block_till_done()
+    await asyncio.gather(*hass._background_tasks)
+    stream.async_process([{"id": "1", "property": "motionDetected", "value": True}])
+    assert stream._flush_handle is not None
+    for unload in entry._on_unload:
+        unload()
+    assert runs == [1]
+    assert stream._flush_handle is None
+
+
+async def test_device_changes_go_to_the_device_list(hass):
+    """Test that add/update/remove events reach the device list, not entities."""
+    applied = []
+    states = []
+    devices = SimpleNamespace(
+        async_apply_changes=applied.append,
+        async_update_states=lambda device_id, changes: states.append(device_id),
+    )
+    stream = ScryptedEventStream(hass, "entry", None, flush_interval=0, devices=devices)
+    updates = _listen(hass, "1")
+    stream.async_process(
+        [
+            {"id": "1", "property": "device", "value": {"name": "Old"}},
+            {"id": "1", "property": "device", "value": {"name": "New"}},
+            {"id": "2", "property": "device", "value": None},
+            {"id": "1", "property": "motionDetected", "value": True},
+        ]
+    )
+    await asyncio.sleep(0)
+    assert applied == [{"1": {"name": "New"}, "2": None}]
+    assert states == ["1"]
+    assert updates == [{"motionDetected": [True]}]
+
+
+async def test_devices_moving_between_cluster_workers(hass):
+    """Test that worker changes reach the cluster routes and the entities."""
+    moves = []
+    stream = ScryptedEventStream(hass, "entry", None, flush_interval=0)
+    stream.routes = SimpleNamespace(
+        async_move_device=lambda device_id, worker_id: moves.append(
+            (device_id, worker_id)
+        )
+    )
+    updates = _listen(hass, "1")
+    stream.async_process(
+        [
+            {"id": "1", "property": "clusterWorkerId", "value": "w1"},
+            {"id": "1", "property": "clusterWorkerId", "value": "w2"},
+            {"id": "2", "property": "motionDetected", "value": True},
+        ]
+    )
+    await asyncio.sleep(0)
+    assert moves == [("1", "w2")]
+    assert updates == [{"clusterWorkerId": ["w1", "w2"]}]
+
+
+async def test_reconnect_resyncs_devices(hass, allow_unix_connect, monkeypatch):
+    """Test that the device list and cluster routes are fetched after a reconnect."""
+    monkeypatch.setattr(scrypted_events, "_RECONNECT_MIN", 0.01)
+    server = StandInScrypted()
+    host = await server.start_tcp()
+    resyncs = []
+
+    async def _resync():
+        resyncs.append(1)
+
+    devices = SimpleNamespace(async_resync=_resync)
+    refreshes = []
+    async with ClientSession() as session:
+        client = ScryptedClient(session, {CONF_HOST: host}, "token")
+        stream = ScryptedEventStream(hass, "entry", client, devices=devices)
+        stream.routes = SimpleNamespace(
+            async_request_refresh=lambda: refreshes.append(1)
+        )
+        task = asyncio.ensure_future(stream._async_run())
+        try:
+            await asyncio.wait_for(server.event_connected.wait(), 5)
+            assert not resyncs
+            await server.drop_event_sockets()
+            for _ in range(100):
+                if resyncs:
+                    break
+                await asyncio.sleep(0.01)
+            assert resyncs == [1]
+            assert refreshes == [1]
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await server.close()
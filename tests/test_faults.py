@@ -0,0 +1,131 @@
+"""Proxy behavior under the faults the stand-in Scrypted server injects."""
+
+from __future__ import annotations
+
+import time
+
+import pytest
+from aiohttp import ClientConnectorError, ClientPayloadError, ClientSession, WSMsgType
+from homeassistant.const import CONF_HOST, CONF_USERNAME
+
+from custom_components.scrypted.http import retrieve_token
+
+from .stand_in import TOKEN, StandInScrypted, wait_released
+
+
+async def test_latency_is_paid_once(server, proxy):
+    """Test that each proxied request costs one upstream round trip."""
+    proxy, prefix, session = proxy
+    server.faults.latency = 0.1
+    for params in ({"size": 1024}, {"size": 5 * 2**20}):
+        started = time.perf_counter()
+        async with session.get(f"{prefix}/endpoint/x", params=params) as resp:
+            assert len(await resp.read()) == params["size"]
+        assert 0.1 <= time.perf_counter() - started < 0.4
+
+
+async def test_capped_bandwidth_is_streamed_through(server, proxy):
+    """Test that a slow large body reaches the client as it arrives."""
+    proxy, prefix, session = proxy
+    view = proxy.view
+    server.faults.bandwidth = 10_000_000
+    size = 4_200_000
+    started = time.perf_counter()
+    async with session.get(f"{prefix}/endpoint/x", params={"size": size}) as resp:
+        await resp.content.readany()
+        first_byte = time.perf_counter() - started
+        received = len(await resp.read())
+    elapsed = time.perf_counter() - started
+    assert received > 0
+    assert elapsed >= size / server.faults.bandwidth
+    # Not buffered until the end, and written in bounded chunks.
+    assert first_byte < elapsed / 4
+    assert view.activity.bytes_written / view.activity.writes <= 4096
+    await wait_released(view, 0.5)
+
+
+async def test_stalled_body_is_released_when_the_client_leaves(server, proxy):
+    """Test that a client leaving a stalled stream frees the proxy at once."""
+    proxy, prefix, session = proxy
+    view = proxy.view
+    server.faults.first_byte_delay = 30
+    started = time.perf_counter()
+    resp = await session.get(f"{prefix}/endpoint/x", params={"live": ""})
+    assert resp.status == 200
+    assert time.perf_counter() - started < 0.5
+    assert view.activity.streams == 1
+    resp.close()
+    assert await wait_released(view, 1) < 1
+
+
+async def test_mid_body_reset_reaches_the_client(server, proxy):
+    """Test that a reset upstream body is never passed off as complete."""
+    proxy, prefix, session = proxy
+    view = proxy.view
+    server.faults.reset_after = 10_000
+    # Buffered bodies fail before anything was sent.
+    async with session.get(f"{prefix}/endpoint/x", params={"size": 50_000}) as resp:
+        assert resp.status == 502
+    # Streamed bodies already sent their headers, so the connection is cut.
+    started = time.perf_counter()
+    async with session.get(f"{prefix}/endpoint/x", params={"live": ""}) as resp:
+        assert resp.status == 200
+        with pytest.raises(ClientPayloadError):
+            await resp.read()
+    assert time.perf_counter() - started < 1
+    await wait_released(view, 0.5)
+
+
+async def test_websocket_relay_with_dropped_frames_and_reset(server, proxy):
+    """Test that lost frames don't stall the relay and a reset closes it."""
+    proxy, prefix, session = proxy
+    view = proxy.view
+    server.faults.drop_frames = 3
+    async with session.ws_connect(f"{prefix}/endpoint/ws") as ws:
+        for index in range(6):
+            await ws.send_str(str(index))
+        assert [(await ws.receive(timeout=1)).data for _ in range(4)] == [
+            "0",
+            "1",
+            "3",
+            "4",
+        ]
+        server.faults.reset_after = 1
+        await ws.send_str("last")
+        assert (await ws.receive(timeout=1)).data == "last"
+        started = time.perf_counter()
+        assert (await ws.receive(timeout=1)).type in (
+            WSMsgType.CLOSE,
+            WSMsgType.CLOSED,
+        )
+        assert time.perf_counter() - started < 0.5
+    await wait_released(view, 0.5)
+
+
+async def test_tls_handshake_delay_is_paid_once(allow_unix_connect):
+    """Test that logins reuse the slow TLS connection."""
+    server = StandInScrypted()
+    server.faults.tls_handshake_delay = 0.2
+    host = await server.start_tcp(tls=True)
+    data = {CONF_HOST: host, CONF_USERNAME: "user"}
+    try:
+        async with ClientSession() as session:
+            started = time.perf_counter()
+            assert await retrieve_token(data, session) == TOKEN
+            assert 0.2 <= time.perf_counter() - started < 0.6
+            started = time.perf_counter()
+            assert await retrieve_token(data, session) == TOKEN
+            assert time.perf_counter() - started < 0.1
+    finally:
+        await server.close()
+
+
+async def test_unreachable_server_fails_fast(server):
+    """Test that setup learns at once that Scrypted is down."""
+    data = {CONF_HOST: f"http://127.0.0.1:{server.port}", CONF_USERNAME: "user"}
+    await server.close()
+    started = time.perf_counter()
+    async with ClientSession() as session:
+        with pytest.raises(ClientConnectorError):
+            await retrieve_token(data, session)
+    assert time.perf_counter() - started < 1
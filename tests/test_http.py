@@ -0,0 +1,887 @@
+"""Tests for the Scrypted proxy helpers."""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import socket
+from types import SimpleNamespace
+from urllib.parse import quote
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import make_mocked_request
+from aiohttp.web_exceptions import HTTPBadRequest, HTTPFound
+from PIL import Image
+from homeassistant.components.http.cors import setup_cors
+from homeassistant.const import CONF_HOST, CONF_PASSWORD, CONF_USERNAME
+
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.scrypted import http
+from custom_components.scrypted.api import API_PATH, ScryptedClient, recording_path
+from custom_components.scrypted.cache_policy import IMMUTABLE
+from custom_components.scrypted.cluster import ClusterRoutes
+from custom_components.scrypted.const import (
+    CONF_DIRECT_URL,
+    CONF_SCRYPTED_NVR,
+    CONF_STREAM_LAG_LIMIT,
+    CONF_TRUSTED_NETWORKS,
+    DOMAIN,
+)
+from custom_components.scrypted.endpoints import EndpointPool
+from custom_components.scrypted.http import (
+    ScryptedEndpoint,
+    ScryptedView,
+    parse_endpoint,
+    parse_trusted_networks,
+)
+
+from .stand_in import TOKEN, VIDEO, StandInScrypted, make_jpeg, wait_released
+
+
+@pytest.mark.parametrize(
+    ("host", "expected"),
+    [
+        ("192.168.1.124", ScryptedEndpoint("https", "192.168.1.124", "10443")),
+        ("192.168.1.124:9443", ScryptedEndpoint("https", "192.168.1.124", "9443")),
+        ("https://scrypted.local", ScryptedEndpoint("https", "scrypted.local", "10443")),
+        ("http://192.168.1.124", ScryptedEndpoint("http", "192.168.1.124", "11080")),
+        ("http://[fd00::1]:8080", ScryptedEndpoint("http", "[fd00::1]", "8080")),
+        (
+            "unix:/run/scrypted.sock",
+            ScryptedEndpoint("unix", "localhost", "", "/run/scrypted.sock"),
+        ),
+        (
+            "unix:///run/scrypted.sock",
+            ScryptedEndpoint("unix", "localhost", "", "/run/scrypted.sock"),
+        ),
+    ],
+)
+def test_parse_endpoint(host, expected):
+    """Test the supported host forms."""
+    assert parse_endpoint(host) == expected
+
+
+@pytest.mark.parametrize("host", ["a:b:c", "ftp://host", "unix:relative.sock"])
+def test_parse_endpoint_invalid(host):
+    """Test that malformed hosts raise ValueError."""
+    with pytest.raises(ValueError):
+        parse_endpoint(host)
+
+
+def test_endpoint_base_url():
+    """Test the origin used for each transport."""
+    assert parse_endpoint("1.2.3.4").base_url == "https://1.2.3.4:10443"
+    assert parse_endpoint("http://1.2.3.4").base_url == "http://1.2.3.4:11080"
+    assert parse_endpoint("unix:/tmp/s.sock").base_url == "http://localhost"
+
+
+def test_parse_trusted_networks():
+    """Test parsing the comma separated trusted networks option."""
+    networks = parse_trusted_networks("192.168.1.0/24, 10.0.0.1 ,, fd00::/8")
+    assert [str(network) for network in networks] == [
+        "192.168.1.0/24",
+        "10.0.0.1/32",
+        "fd00::/8",
+    ]
+    assert parse_trusted_networks("") == []
+    with pytest.raises(ValueError):
+        parse_trusted_networks("192.168.1.0/24, lan")
+
+
+def test_parse_backup_hosts():
+    """Test parsing the comma separated backup hosts option."""
+    assert http.parse_backup_hosts(" 10.0.0.2, ,http://vpn:11080,unix:/s.sock") == [
+        "10.0.0.2",
+        "http://vpn:11080",
+        "unix:/s.sock",
+    ]
+    assert http.parse_backup_hosts("") == []
+    with pytest.raises(ValueError):
+        http.parse_backup_hosts("10.0.0.2, ftp://vpn")
+
+
+def _view(hass, host: str, options: dict) -> ScryptedView:
+    """Create a view without scheduling the asset loads."""
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_HOST: host}, options=options)
+    hass.data.setdefault(DOMAIN, {})["token"] = entry
+    view = ScryptedView.__new__(ScryptedView)
+    view.hass = hass
+    view._pools = {}
+    view._routes = {}
+    return view
+
+
+@pytest.mark.parametrize(
+    ("host", "options", "scheme", "remote", "expected"),
+    [
+        ("192.168.1.124", {}, "http", "192.168.1.20", None),
+        # Without a direct URL, the self-signed host isn't put in the iframe.
+        (
+            "192.168.1.124",
+            {CONF_TRUSTED_NETWORKS: "192.168.1.0/24"},
+            "http",
+            "192.168.1.20",
+            None,
+        ),
+        (
+            "unix:/run/s.sock",
+            {
+                CONF_TRUSTED_NETWORKS: "192.168.1.0/24",
+                CONF_DIRECT_URL: "https://scrypted.lan:10443/",
+            },
+            "https",
+            "192.168.1.20",
+            "https://scrypted.lan:10443",
+        ),
+        (
+            "192.168.1.124",
+            {
+                CONF_TRUSTED_NETWORKS: "192.168.1.0/24",
+                CONF_DIRECT_URL: "https://scrypted.lan:10443",
+            },
+            "http",
+            "8.8.8.8",
+            None,
+        ),
+        (
+            "192.168.1.124",
+            {
+                CONF_TRUSTED_NETWORKS: "192.168.1.0/24",
+                CONF_DIRECT_URL: "http://192.168.1.124:11080",
+            },
+            "http",
+            "192.168.1.20",
+            "http://192.168.1.124:11080",
+        ),
+        # Plain HTTP under an HTTPS frontend would be blocked as mixed content.
+        (
+            "192.168.1.124",
+            {
+                CONF_TRUSTED_NETWORKS: "192.168.1.0/24",
+                CONF_DIRECT_URL: "http://192.168.1.124:11080",
+            },
+            "https",
+            "192.168.1.20",
+            None,
+        ),
+    ],
+)
+async def test_direct_origin(hass, host, options, scheme, remote, expected):
+    """Test which clients are sent straight to Scrypted."""
+    view = _view(hass, host, options)
+    request = SimpleNamespace(scheme=scheme, remote=remote)
+    assert view._direct_origin(request, "token") == expected
+
+
+async def test_retrieve_token_over_http_and_unix(tmp_path, allow_unix_connect):
+    """Test logging in over plain HTTP and a Unix domain socket."""
+    credentials = {CONF_USERNAME: "user", CONF_PASSWORD: "pass"}
+
+    tcp_server = StandInScrypted()
+    unix_server = StandInScrypted()
+    try:
+        tcp_host = await tcp_server.start_tcp()
+        unix_host = await unix_server.start_unix(str(tmp_path / "scrypted.sock"))
+        async with http.aiohttp.ClientSession() as session:
+            for host in (tcp_host, unix_host):
+                data = {**credentials, CONF_HOST: host}
+                assert await http.retrieve_token(data, session) == TOKEN
+    finally:
+        await tcp_server.close()
+        await unix_server.close()
+
+    assert len(tcp_server.requests) == len(unix_server.requests) == 1
+
+
+async def test_check_endpoint_sends_no_credentials(server):
+    """Test that health checks reach the server without logging in."""
+    host = f"http://127.0.0.1:{server.port}"
+    async with http.aiohttp.ClientSession() as session:
+        await http.check_endpoint(host, session)
+        await server.close()
+        with pytest.raises(http.aiohttp.ClientError):
+            await http.check_endpoint(host, session)
+
+    assert [request.path for request in server.requests] == ["/login"]
+    assert "Authorization" not in server.requests[0].headers
+
+
+async def test_retrieve_content_hash(tmp_path, allow_unix_connect):
+    """Test hashing a file served by Scrypted."""
+    server = StandInScrypted()
+    try:
+        data = {CONF_HOST: await server.start_unix(str(tmp_path / "scrypted.sock"))}
+        async with http.aiohttp.ClientSession() as session:
+            small = await http.retrieve_content_hash(data, session, TOKEN, "endpoint/a.js")
+            again = await http.retrieve_content_hash(data, session, TOKEN, "endpoint/a.js")
+            large = await http.retrieve_content_hash(
+                data, session, TOKEN, "endpoint/a.js?size=2048"
+            )
+    finally:
+        await server.close()
+
+    assert small == again != large
+    assert len(small) == 12
+    assert server.requests[0].headers["Authorization"] == f"Bearer {TOKEN}"
+
+
+async def _serve_logins(*delays: float, tls: bool = False) -> list[StandInScrypted]:
+    """Start stand-ins whose logins take the given seconds."""
+    servers = []
+    for delay in delays:
+        server = StandInScrypted()
+        server.login_delay = delay
+        await server.start_tcp(tls=tls)
+        servers.append(server)
+    return servers
+
+
+async def test_probe_endpoints_fastest_wins(monkeypatch, allow_unix_connect):
+    """Test that probing ranks the candidates and cuts off the stragglers."""
+    (fast,) = await _serve_logins(0, tls=True)
+    given, stalled = await _serve_logins(0.2, 30)
+    monkeypatch.setattr(http, "DEFAULT_HTTPS_PORT", str(fast.port))
+    monkeypatch.setattr(http, "DEFAULT_HTTP_PORT", str(stalled.port))
+
+    async def _resolve(host: str) -> list[str]:
+        assert host == "scrypted.local"
+        return ["127.0.0.1"]
+
+    monkeypatch.setattr(http, "_resolve_addresses", _resolve)
+    data = {
+        CONF_HOST: f"http://scrypted.local:{given.port}",
+        CONF_USERNAME: "user",
+        CONF_PASSWORD: "pass",
+    }
+    try:
+        async with http.aiohttp.ClientSession() as session:
+            started = asyncio.get_running_loop().time()
+            probes = await http.probe_endpoints(data, session, grace=0.5)
+            elapsed = asyncio.get_running_loop().time() - started
+            # The stalled login's connection was closed, not left to the pool.
+            assert not session.connector._acquired
+    finally:
+        for server in (fast, given, stalled):
+            await server.close()
+
+    assert [(probe.host, probe.address) for probe in probes] == [
+        (f"https://scrypted.local:{fast.port}", f"https://127.0.0.1:{fast.port}"),
+        (data[CONF_HOST], f"http://127.0.0.1:{given.port}"),
+        (f"http://scrypted.local:{stalled.port}", f"http://127.0.0.1:{stalled.port}"),
+    ]
+    assert probes[0].latency < 0.2 <= probes[1].latency < 0.5
+    assert (probes[2].latency, probes[2].error) == (None, "timeout")
+    assert len(stalled.requests) == 1
+    # Done half a second after the first success rather than after the timeout.
+    assert elapsed < 1
+    assert not [
+        task
+        for task in asyncio.all_tasks()
+        if task.get_coro().__qualname__.startswith("probe_endpoints")
+    ]
+
+
+async def test_probe_endpoints_failures(monkeypatch, allow_unix_connect):
+    """Test that refused, rejected and unanswered logins are told apart."""
+    stalled, rejecting, closed = await _serve_logins(30, 0, 0)
+    rejecting.app.router._resources.clear()
+    await closed.close()
+    monkeypatch.setattr(http, "DEFAULT_HTTPS_PORT", str(closed.port))
+    monkeypatch.setattr(http, "DEFAULT_HTTP_PORT", str(rejecting.port))
+    data = {CONF_HOST: f"http://127.0.0.1:{stalled.port}", CONF_USERNAME: "user"}
+    try:
+        async with http.aiohttp.ClientSession() as session:
+            started = asyncio.get_running_loop().time()
+            probes = await http.probe_endpoints(data, session, timeout=0.3)
+            assert asyncio.get_running_loop().time() - started < 0.6
+    finally:
+        await stalled.close()
+        await rejecting.close()
+
+    assert {probe.address: probe.error for probe in probes} == {
+        f"http://127.0.0.1:{stalled.port}": "timeout",
+        f"https://127.0.0.1:{closed.port}": "ClientConnectorError",
+        f"http://127.0.0.1:{rejecting.port}": "ClientResponseError",
+    }
+    assert all(probe.latency is None for probe in probes)
+
+
+async def test_probe_endpoints_unix_socket_alone(tmp_path, allow_unix_connect):
+    """Test that a Unix socket is the only candidate for itself."""
+    server = StandInScrypted()
+    try:
+        host = await server.start_unix(str(tmp_path / "scrypted.sock"))
+        async with http.aiohttp.ClientSession() as session:
+            probes = await http.probe_endpoints(
+                {CONF_HOST: host, CONF_USERNAME: "user"}, session
+            )
+    finally:
+        await server.close()
+
+    assert [(probe.host, probe.address, probe.error) for probe in probes] == [
+        (host, host, None)
+    ]
+    assert probes[0].latency is not None
+
+
+async def test_https_hosts_are_not_probed_in_cleartext(monkeypatch):
+    """Test that plain HTTP is only tried for hosts entered as plain HTTP."""
+
+    async def _resolve(host: str) -> list[str]:
+        return ["192.168.1.124"]
+
+    monkeypatch.setattr(http, "_resolve_addresses", _resolve)
+    for host in ("scrypted.local", "https://scrypted.local:443"):
+        candidates = await http._candidate_endpoints(host)
+        assert {endpoint.transport for _, endpoint in candidates} == {"https"}
+    candidates = await http._candidate_endpoints("http://scrypted.local:8080")
+    assert [endpoint.base_url for _, endpoint in candidates] == [
+        "http://192.168.1.124:8080",
+        "https://192.168.1.124:10443",
+        "http://192.168.1.124:11080",
+    ]
+
+
+async def test_resolve_addresses(monkeypatch):
+    """Test resolving host names to each IPv4 and IPv6 address once."""
+    loop = asyncio.get_running_loop()
+    infos = [
+        (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("192.0.2.1", 0)),
+        (socket.AF_INET6, socket.SOCK_STREAM, 6, "", ("2001:db8::1", 0, 0, 0)),
+        (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("192.0.2.1", 0)),
+    ]
+
+    async def _getaddrinfo(host, port, **kwargs):
+        if host == "missing":
+            raise socket.gaierror
+        return infos
+
+    monkeypatch.setattr(loop, "getaddrinfo", _getaddrinfo)
+    assert await http._resolve_addresses("scrypted") == ["192.0.2.1", "[2001:db8::1]"]
+    assert await http._resolve_addresses("missing") == ["missing"]
+    assert await http._resolve_addresses("[::1]") == ["[::1]"]
+    assert await http._resolve_addresses("10.0.0.2") == ["10.0.0.2"]
+
+
+def test_extract_preload_links():
+    """Test that the UI's scripts and styles become preload links."""
+    html = (
+        '<script type="module" crossorigin src="./assets/index-1a2b.js"></script>'
+        "<script>inline()</script>"
+        '<script src="https://cdn.example/x.js"></script>'
+        '<link rel="stylesheet" href="assets/index-3c4d.css">'
+        '<link rel="icon" href="favicon.ico">'
+    )
+    base = "/api/scrypted/tok/endpoint/@scrypted/core/public/"
+    assert http._extract_preload_links(html, base) == [
+        f"<{base}assets/index-1a2b.js>; rel=modulepreload",
+        f"<{base}assets/index-3c4d.css>; rel=preload; as=style",
+    ]
+
+
+async def _loaded_view(hass, options: dict | None = None) -> ScryptedView:
+    """Create a view for an entry at 192.168.1.124."""
+    entry = MockConfigEntry(
+        domain=DOMAIN, data={CONF_HOST: "192.168.1.124"}, options=options or {}
+    )
+    hass.data.setdefault(DOMAIN, {})["token"] = entry
+    return ScryptedView(hass, SimpleNamespace(loop=hass.loop))
+
+
+def _text(response) -> str:
+    """Return the text of a response built from a string body."""
+    return response.body._value.decode()
+
+
+def _request(path: str, remote: str = "8.8.8.8"):
+    """Create a mocked request from the given client address."""
+    transport = SimpleNamespace(
+        get_extra_info=lambda name, default=None: (
+            (remote, 1234) if name == "peername" else default
+        )
+    )
+    return make_mocked_request("GET", path, transport=transport)
+
+
+async def test_panel_assets_are_read_once_on_first_use(hass, monkeypatch):
+    """Test that creating the view does no disk I/O and assets are read once."""
+    reads = []
+    read_asset = http._read_asset
+    monkeypatch.setattr(
+        http, "_read_asset", lambda name: reads.append(name) or read_asset(name)
+    )
+    view = await _loaded_view(hass)
+    await hass.async_block_till_done()
+    assert not reads
+
+    request = _request("/api/scrypted/token/entrypoint.js")
+    await asyncio.gather(
+        *(view._handle(request, "token", "entrypoint.js") for _ in range(3))
+    )
+    await view._handle(request, "token", "entrypoint.js")
+    assert reads == ["entrypoint.js"]
+
+
+async def test_panel_asset_read_errors_are_retried(hass, monkeypatch):
+    """Test that a failed read isn't cached."""
+    view = await _loaded_view(hass)
+    monkeypatch.setattr(http, "_read_asset", lambda name: open("/nonexistent"))
+    with pytest.raises(OSError):
+        await view._async_asset("entrypoint.js")
+    assert not view._assets
+
+
+async def test_entrypoint_js_targets_ui_directly(hass):
+    """Test that the panel module points its iframe straight at the UI."""
+    view = await _loaded_view(hass)
+    view._preload_links["token"] = ["</a.js>; rel=modulepreload"]
+    request = _request("/api/scrypted/token/entrypoint.js")
+    response = await view._handle(request, "token", "entrypoint.js")
+    assert 'DEFAULT_URL = "/api/scrypted/token/endpoint/@scrypted/core/public/"' in _text(response)
+    assert "lit-core" not in _text(response)
+    assert response.headers["Link"] == "</a.js>; rel=modulepreload"
+
+
+async def test_entrypoint_js_preconnects_trusted_clients(hass):
+    """Test that trusted clients are pointed at the Scrypted origin."""
+    view = await _loaded_view(
+        hass,
+        {
+            CONF_TRUSTED_NETWORKS: "192.168.1.0/24",
+            CONF_DIRECT_URL: "https://scrypted.lan:10443",
+            CONF_SCRYPTED_NVR: True,
+        },
+    )
+    request = _request("/api/scrypted/token/entrypoint.js", "192.168.1.20")
+    response = await view._handle(request, "token", "entrypoint.js")
+    origin = "https://scrypted.lan:10443"
+    assert f'DEFAULT_URL = "{origin}/endpoint/@scrypted/nvr/public/"' in _text(response)
+    assert response.headers["Link"] == f"<{origin}>; rel=preconnect"
+
+
+async def test_entrypoint_html_redirects_explicit_url(hass):
+    """Test that an explicit target is redirected server side."""
+    view = await _loaded_view(hass)
+    target = "/api/scrypted/token/endpoint/@scrypted/nvr/public/#/events"
+    request = _request(f"/api/scrypted/token/entrypoint.html?url={quote(target)}")
+    with pytest.raises(HTTPFound) as err:
+        await view._handle(request, "token", "entrypoint.html")
+    assert err.value.location == target
+
+    request = _request("/api/scrypted/token/entrypoint.html?url=https://evil.example/")
+    with pytest.raises(HTTPBadRequest):
+        await view._handle(request, "token", "entrypoint.html")
+
+    request = _request("/api/scrypted/token/entrypoint.html")
+    response = await view._handle(request, "token", "entrypoint.html")
+    assert "window.parent.location.search" in _text(response)
+
+
+async def test_proxy_applies_header_policy(proxy):
+    """Test immutable caching for hashed assets and 304s for revalidation."""
+    proxy, prefix, session = proxy
+    assets = f"{prefix}/endpoint/@scrypted/core/public/assets"
+    async with session.get(f"{assets}/index-4f2a9c1e.js") as resp:
+        assert resp.headers["Cache-Control"] == IMMUTABLE
+        assert "ETag" not in resp.headers
+
+    async with session.get(f"{assets}/logo.svg") as resp:
+        assert resp.headers["Cache-Control"] == "no-cache"
+        etag = resp.headers["ETag"]
+        assert len(await resp.read()) == 1024
+
+    headers = {"If-None-Match": etag}
+    async with session.get(f"{assets}/logo.svg", headers=headers) as resp:
+        assert resp.status == 304
+        assert await resp.read() == b""
+
+
+async def test_proxy_resizes_images(server, proxy):
+    """Test downscaled images, their cache and revalidation."""
+    proxy, prefix, session = proxy
+    server.thumbnail = make_jpeg(1920, 1080)
+    thumbnail = (
+        f"{prefix}/endpoint/@scrypted/homeassistant/public/api/devices/1"
+        "/recordings/1/thumbnail"
+    )
+    async with session.get(f"{thumbnail}?width=320") as resp:
+        assert resp.status == 200
+        assert resp.headers["Cache-Control"] == IMMUTABLE
+        etag = resp.headers["ETag"]
+        body = await resp.read()
+    assert Image.open(io.BytesIO(body)).size == (320, 180)
+    assert len(body) < len(server.thumbnail) / 20
+    # The size parameters aren't forwarded upstream.
+    assert "width" not in server.requests[-1].query
+
+    async with session.get(f"{thumbnail}?width=320") as resp:
+        assert await resp.read() == body
+    assert (proxy.view._variants.hits, proxy.view._variants.misses) == (1, 1)
+
+    headers = {"If-None-Match": etag, "Range": "bytes=0-10"}
+    async with session.get(f"{thumbnail}?width=320", headers=headers) as resp:
+        assert resp.status == 304
+    assert "If-None-Match" not in server.requests[-1].headers
+    assert "Range" not in server.requests[-1].headers
+
+    async with session.get(thumbnail) as resp:
+        assert await resp.read() == server.thumbnail
+
+    for query in ("width=0", "height=x", "width=99999"):
+        async with session.get(f"{thumbnail}?{query}") as resp:
+            assert resp.status == 400
+
+    # Other content types pass through untouched, size parameters included.
+    async with session.get(f"{prefix}/endpoint/a.js?width=10") as resp:
+        assert len(await resp.read()) == 1024
+    assert server.requests[-1].query["width"] == "10"
+
+
+async def test_thumbnail_batch(server, proxy):
+    """Test fetching many thumbnails in one bounded, ordered response."""
+    proxy, prefix, session = proxy
+    server.thumbnail = make_jpeg(640, 360)
+    server.thumbnail_delay = 0.05
+    base = "endpoint/@scrypted/homeassistant/public/api/devices/1/recordings"
+    paths = [f"{base}/{index}/thumbnail" for index in range(20)]
+    paths[3] = f"{base}/missing/thumbnail"
+    paths[5] = f"{base}/5/thumbnail?v=1"
+    batch = f"{prefix}/{http.BATCH_THUMBNAILS_PATH}"
+    async with session.post(batch, json={"paths": paths, "width": 160}) as resp:
+        assert resp.status == 200
+        assert resp.headers["Cache-Control"] == "no-store"
+        reader = http.aiohttp.MultipartReader.from_response(resp)
+        parts = []
+        while (part := await reader.next()) is not None:
+            parts.append((part.name, part.headers["Content-Type"], await part.read()))
+    assert [name for name, _, _ in parts] == paths[:3] + paths[4:]
+    assert all(content_type == "image/jpeg" for _, content_type, _ in parts)
+    assert Image.open(io.BytesIO(parts[0][2])).size == (160, 90)
+    assert 1 < server.max_thumbnails_active <= http.BATCH_FAN_OUT
+    assert any(request.query.get("v") == "1" for request in server.requests)
+
+    async with session.post(batch, json={"paths": paths[:1]}) as resp:
+        reader = http.aiohttp.MultipartReader.from_response(resp)
+        part = await reader.next()
+        assert await part.read() == server.thumbnail
+
+    for body in (
+        {"paths": []},
+        {"paths": "a"},
+        {"paths": [1]},
+        {"paths": ["a"] * (http.MAX_BATCH_PATHS + 1)},
+        {"paths": ["a"], "width": "wide"},
+        {},
+    ):
+        async with session.post(batch, json=body) as resp:
+            assert resp.status == 400
+    async with session.post(batch, data=b"not json") as resp:
+        assert resp.status == 400
+
+    # Unreachable upstreams leave the item out.
+    await server.close()
+    async with session.post(batch, json={"paths": paths[:2]}) as resp:
+        reader = http.aiohttp.MultipartReader.from_response(resp)
+        assert await reader.next() is None
+
+
+async def test_drain_refuses_waits_then_cancels(server, proxy):
+    """Test that an unloading entry's requests finish or are cancelled in time."""
+    proxy, prefix, session = proxy
+    server.thumbnail_delay = 0.1
+    view = proxy.view
+    thumbnail = f"{API_PATH}/devices/1/recordings/1/thumbnail"
+
+    async def _get(path: str) -> int:
+        async with session.get(f"{prefix}/{path}") as resp:
+            await resp.read()
+            return resp.status
+
+    short = asyncio.create_task(_get(thumbnail))
+    live = await session.get(f"{prefix}/endpoint/live", params={"live": ""})
+    ws = await session.ws_connect(f"{prefix}/endpoint/ws")
+    await ws.send_str("hello")
+    assert (await ws.receive()).data == "hello"
+    assert len(view._inflight[proxy.entry.entry_id]) == 3
+
+    drain = asyncio.create_task(view.async_drain(proxy.entry.entry_id, 0.5))
+    await asyncio.sleep(0)
+    async with session.get(f"{prefix}/endpoint/x") as resp:
+        assert resp.status == 503
+        assert resp.headers["Retry-After"] == str(http.DRAIN_TIMEOUT)
+    # The short request finishes within the grace period.
+    assert await short == 200
+    assert not drain.done()
+    await drain
+    assert view._inflight == {}
+    # The endless ones were cancelled and their connections closed.
+    assert (await ws.receive()).type in (
+        http.aiohttp.WSMsgType.CLOSED,
+        http.aiohttp.WSMsgType.ERROR,
+    )
+    with pytest.raises(http.aiohttp.ClientError):
+        await live.content.read()
+    live.release()
+    await ws.close()
+
+    view.async_admit(proxy.entry.entry_id)
+    assert await _get("endpoint/x") == 200
+    async with session.get(f"{proxy.base_url}/api/{DOMAIN}/other/x") as resp:
+        assert resp.status == 404
+    # Draining an idle entry returns at once.
+    await asyncio.wait_for(view.async_drain(proxy.entry.entry_id), 0.1)
+
+
+@pytest.mark.parametrize("proxy_options", [{CONF_STREAM_LAG_LIMIT: 100}])
+async def test_streams_are_counted_and_limited_on_lag(server, proxy):
+    """Test the activity seen by the loop monitor and lag based admission."""
+    proxy, prefix, session = proxy
+    activity = proxy.view.activity
+    activity.loop_lag = 0.2
+    async with session.get(f"{prefix}/endpoint/live?live") as resp:
+        assert resp.status == 503
+        assert resp.headers["Retry-After"] == "1"
+    assert activity.streams_refused == 1
+    # A path that streamed before is refused without asking Scrypted.
+    asked = len(server.requests)
+    async with session.get(f"{prefix}/endpoint/live?live") as resp:
+        assert resp.status == 503
+    assert activity.streams_refused == 2
+    assert len(server.requests) == asked
+    # So is every WebSocket, before its handshake.
+    with pytest.raises(http.aiohttp.WSServerHandshakeError) as err:
+        await session.ws_connect(f"{prefix}/endpoint/ws")
+    assert err.value.status == 503
+    assert activity.streams_refused == 3
+    assert len(server.requests) == asked
+    # Buffered responses aren't bulk streams.
+    async with session.get(f"{prefix}/endpoint/x") as resp:
+        assert resp.status == 200
+
+    activity.loop_lag = 0.05
+    async with session.get(f"{prefix}/endpoint/live?live") as resp:
+        assert resp.status == 200
+        await resp.content.readexactly(1024)
+        assert activity.streams == 1
+        assert activity.writes >= 1
+        assert activity.bytes_written >= 1024
+    async with session.ws_connect(f"{prefix}/endpoint/ws") as ws:
+        writes = activity.writes
+        await ws.send_str("hello")
+        assert (await ws.receive()).data == "hello"
+        assert activity.writes == writes + 1
+    await wait_released(proxy.view)
+
+
+async def test_requests_fail_over_and_relays_stick(hass, server, proxy, start_servers):
+    """Test failing over to the next host, and relays keeping their host."""
+    proxy, prefix, session = proxy
+    primary = server
+    dead, backup = await start_servers(2)
+    await dead.close()
+    hosts = [
+        f"http://127.0.0.1:{stand_in.port}" for stand_in in (dead, primary, backup)
+    ]
+
+    async def _login(host: str) -> str:
+        return TOKEN
+
+    async def _ping(host: str) -> None:
+        pass
+
+    pool = EndpointPool(hass, "bench", hosts, _login, _ping)
+    proxy.view.async_set_pool(proxy.entry.entry_id, pool)
+    _, primary_health, backup_health = pool.endpoints
+    # Nothing checked yet: the dead host is tried first, then the next.
+    async with session.get(f"{prefix}/endpoint/x") as resp:
+        assert resp.status == 200
+    assert pool.select(weighted=False) == hosts[1:] + hosts[:1]
+    # Without a login of its own, a host is sent the entry's token.
+    assert primary.requests[0].headers["Authorization"] == f"Bearer {TOKEN}"
+
+    backup_health.healthy = False
+    async with session.ws_connect(f"{prefix}/endpoint/ws") as ws:
+        await ws.send_str("hello")
+        assert (await ws.receive()).data == "hello"
+
+        # The primary goes out of rotation, the open relay stays on it.
+        primary_health.healthy = False
+        backup_health.healthy = True
+        backup_health.token = "backup"
+        await ws.send_str("still")
+        assert (await ws.receive()).data == "still"
+        assert len(primary.requests) == 2
+        assert not backup.requests
+
+        async with session.get(f"{prefix}/endpoint/x") as resp:
+            assert resp.status == 200
+        assert backup.requests[0].headers["Authorization"] == "Bearer backup"
+        assert len(primary.requests) == 2
+
+    # Every host unreachable.
+    await backup.close()
+    await primary.close()
+    async with session.get(f"{prefix}/endpoint/x") as resp:
+        assert resp.status == 502
+    assert not any(health.healthy for health in pool.endpoints)
+
+
+async def test_device_media_goes_to_its_worker(hass, server, proxy, start_servers):
+    """Test routing media to cluster workers, and falling back to the primary."""
+    proxy, prefix, session = proxy
+    primary = server
+    (worker,) = await start_servers(1)
+    primary.cluster = {
+        "workers": [{"id": "w1", "host": f"http://127.0.0.1:{worker.port}"}],
+        "devices": {"1": "w1"},
+    }
+    host = f"http://127.0.0.1:{primary.port}"
+    routes = ClusterRoutes(hass, ScryptedClient(session, {CONF_HOST: host}, TOKEN))
+    await routes.async_refresh()
+    proxy.view.async_set_routes(proxy.entry.entry_id, routes)
+    primary.requests.clear()
+
+    async with session.get(f"{prefix}/{API_PATH}/devices/1/snapshot") as resp:
+        assert resp.status == 200
+    async with session.get(f"{prefix}/{API_PATH}/devices/2/snapshot") as resp:
+        assert resp.status == 200
+    async with session.get(f"{prefix}/endpoint/x") as resp:
+        assert resp.status == 200
+    assert [request.path for request in worker.requests] == [
+        f"/{API_PATH}/devices/1/snapshot"
+    ]
+    assert worker.requests[0].headers["Authorization"] == f"Bearer {TOKEN}"
+    assert len(primary.requests) == 2
+
+    # An unreachable worker's media comes through the primary.
+    await worker.close()
+    async with session.get(f"{prefix}/{API_PATH}/devices/1/snapshot") as resp:
+        assert resp.status == 200
+    assert primary.requests[2].path == f"/{API_PATH}/devices/1/snapshot"
+    await asyncio.gather(*hass._background_tasks)
+    assert primary.requests[-1].path == f"/{API_PATH}/cluster"
+    assert routes.host_for(f"{API_PATH}/devices/1/snapshot") is None
+
+    proxy.view.async_set_routes(proxy.entry.entry_id, None)
+    assert proxy.view._routes == {}
+
+
+async def test_head_requests_read_no_body(server, proxy):
+    """Test that HEAD goes upstream and returns the length of the body it skips."""
+    proxy, prefix, session = proxy
+    activity = proxy.view.activity
+    video = recording_path("1", "c1", "video")
+    async with session.head(f"{prefix}/{video}") as resp:
+        assert resp.status == 200
+        assert resp.headers["Content-Length"] == str(len(VIDEO))
+        assert resp.headers["Content-Type"] == "video/mp4"
+        assert resp.headers["Accept-Ranges"] == "bytes"
+    assert server.requests[-1].method == "HEAD"
+
+    # Bodies too large to buffer aren't streamed either.
+    size = 8 * 1024 * 1024
+    async with session.head(f"{prefix}/endpoint/clip.mp4?size={size}") as resp:
+        assert resp.status == 200
+        assert resp.headers["Content-Length"] == str(size)
+    assert server.requests[-1].method == "HEAD"
+    assert (activity.writes, activity.bytes_written) == (0, 0)
+
+
+async def test_options_route_comes_before_home_assistant_cors(hass):
+    """Test registering the view next to Home Assistant's CORS preflights."""
+    app = web.Application()
+    setup_cors(app, ["https://cast.home-assistant.io"])
+    view = await _loaded_view(hass)
+    view.register(hass, app, app.router)
+
+    for method, name in (("OPTIONS", "api:scrypted:options"), ("HEAD", None)):
+        match = await app.router.resolve(
+            make_mocked_request(method, "/api/scrypted/token/endpoint/x")
+        )
+        assert match.route.method == method
+        assert match.route.resource.name == name
+
+
+async def test_preflights_are_cached(server, proxy):
+    """Test that Scrypted answers a preflight once per plugin, origin and request."""
+    proxy, prefix, session = proxy
+    preflight = {
+        "Origin": "https://player.example",
+        "Access-Control-Request-Method": "GET",
+        "Access-Control-Request-Headers": "range",
+    }
+
+    def _preflights() -> int:
+        return sum(request.method == "OPTIONS" for request in server.requests)
+
+    for device in ("1", "1", "2"):
+        url = f"{prefix}/{recording_path(device, 'c1', 'video')}"
+        async with session.options(url, headers=preflight) as resp:
+            assert resp.status == 204
+            assert resp.headers["Access-Control-Allow-Origin"] == (
+                "https://player.example"
+            )
+            assert resp.headers["Access-Control-Allow-Headers"] == "range"
+            assert resp.headers["Access-Control-Max-Age"] == "600"
+    assert _preflights() == 1
+
+    # Other origins, requests and plugins are asked about on their own.
+    other_origin = {**preflight, "Origin": "https://other.example"}
+    async with session.options(f"{prefix}/{API_PATH}/x", headers=other_origin):
+        pass
+    other_method = {**preflight, "Access-Control-Request-Method": "POST"}
+    async with session.options(f"{prefix}/{API_PATH}/x", headers=other_method):
+        pass
+    async with session.options(f"{prefix}/endpoint/x", headers=preflight):
+        pass
+    assert _preflights() == 4
+
+    # Plain OPTIONS requests always go through.
+    for _ in range(2):
+        async with session.options(f"{prefix}/endpoint/x") as resp:
+            assert resp.status == 204
+            assert resp.headers["Allow"] == "GET, HEAD, OPTIONS"
+    assert _preflights() == 6
+
+    # Reloading the entry forgets its answers.
+    proxy.view.async_admit(proxy.entry.entry_id)
+    async with session.options(f"{prefix}/endpoint/x", headers=preflight):
+        pass
+    assert _preflights() == 7
+
+
+async def test_websocket_forward_dispatches_each_message_once():
+    """Test that data messages are relayed, not also taken for a closed peer."""
+    WSMsgType = http.aiohttp.WSMsgType
+
+    class _Socket:
+        def __init__(self, *messages):
+            self.messages = list(messages)
+            self.sent = []
+            self.closed = True
+
+        async def __aiter__(self):
+            for msg in self.messages:
+                yield msg
+
+        async def send_str(self, data):
+            self.sent.append(data)
+
+        async def send_bytes(self, data):
+            self.sent.append(data)
+
+        async def close(self, **kwargs):
+            self.sent.append("close")
+
+    messages = (
+        SimpleNamespace(type=WSMsgType.TEXT, data="hello"),
+        SimpleNamespace(type=WSMsgType.BINARY, data=b"\x00\x01"),
+    )
+    for activity in (None, http.ProxyActivity()):
+        ws_to = _Socket()
+        await http._websocket_forward(_Socket(*messages), ws_to, activity)
+        assert ws_to.sent == ["hello", b"\x00\x01"]
+    assert activity.writes == 2
+    assert activity.bytes_written == 7
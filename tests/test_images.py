@@ -0,0 +1,168 @@
+"""Tests for the resized image variants."""
+
+from __future__ import annotations
+
+import asyncio
+import io
+
+from PIL import Image
+import pytest
+
+from custom_components.scrypted.images import (
+    MAX_DIMENSION,
+    ImageVariantCache,
+    parse_size,
+    resize_image,
+    variant_etag,
+)
+
+from .stand_in import SNAPSHOT, make_jpeg
+
+
+def test_parse_size():
+    """Test valid and invalid sizes."""
+    assert parse_size("320", None) == (320, None)
+    assert parse_size(None, "180") == (None, 180)
+    for width, height in (
+        (None, None),
+        ("0", None),
+        ("wide", None),
+        (str(MAX_DIMENSION + 1), None),
+        ("320", "-1"),
+    ):
+        with pytest.raises(ValueError):
+            parse_size(width, height)
+
+
+def test_variant_etag():
+    """Test that variants of a source and size share a stable ETag."""
+    assert variant_etag('"a"', 320, None) == variant_etag('"a"', 320, None)
+    assert variant_etag('"a"', 320, None) != variant_etag('"a"', None, 320)
+    assert variant_etag('"a"', 320, None) != variant_etag('"b"', 320, None)
+    assert variant_etag('"a"', 320, None).startswith('W/"')
+
+
+def test_resize_jpeg_keeps_aspect_ratio():
+    """Test downscaling a JPEG to a width or into a box."""
+    source = make_jpeg(1920, 1080)
+    body, content_type = resize_image(source, 320, None)
+    assert content_type == "image/jpeg"
+    assert Image.open(io.BytesIO(body)).size == (320, 180)
+    assert len(body) < len(source) / 20
+
+    body, _ = resize_image(source, 640, 100)
+    assert Image.open(io.BytesIO(body)).size == (178, 100)
+
+
+def test_resize_png_keeps_transparency():
+    """Test that images with alpha stay PNG."""
+    output = io.BytesIO()
+    Image.new("RGBA", (400, 400), (255, 0, 0, 128)).save(output, "PNG")
+    body, content_type = resize_image(output.getvalue(), None, 100)
+    assert content_type == "image/png"
+    image = Image.open(io.BytesIO(body))
+    assert image.size == (100, 100)
+    assert image.mode == "RGBA"
+
+
+def test_resize_skips_small_and_undecodable_images():
+    """Test that nothing is upscaled and broken images are left alone."""
+    assert resize_image(make_jpeg(320, 180), 640, None) is None
+    assert resize_image(SNAPSHOT, 320, None) is None
+
+
+def test_resize_skips_decompression_bombs(monkeypatch):
+    """Test that images with more pixels than Pillow decodes are left alone."""
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 100_000)
+    assert resize_image(make_jpeg(640, 360), 320, None) is None
+
+
+async def test_cache_coalesces_and_evicts():
+    """Test single-flight creation, LRU order and the byte bound."""
+    cache = ImageVariantCache(max_bytes=10)
+    started = asyncio.Event()
+    release = asyncio.Event()
+    calls = []
+
+    async def _create(body: bytes):
+        calls.append(body)
+        started.set()
+        await release.wait()
+        return body, "image/jpeg"
+
+    first = asyncio.ensure_future(cache.async_get("a", lambda: _create(b"aaaa")))
+    await started.wait()
+    second = asyncio.ensure_future(cache.async_get("a", lambda: _create(b"xxxx")))
+    await asyncio.sleep(0)
+    release.set()
+    assert await first == await second == (b"aaaa", "image/jpeg")
+    assert calls == [b"aaaa"]
+
+    await cache.async_get("b", lambda: _create(b"bbbb"))
+    await cache.async_get("a", lambda: _create(b"xxxx"))
+    await cache.async_get("c", lambda: _create(b"cccc"))
+    # "b" was the least recently used variant.
+    assert len(cache) == 2 and cache.size == 8
+    await cache.async_get("b", lambda: _create(b"BBBB"))
+    assert calls[-1] == b"BBBB"
+    assert (cache.hits, cache.misses) == (2, 4)
+
+    # Variants larger than the whole cache aren't kept.
+    await cache.async_get("big", lambda: _create(b"x" * 11))
+    assert "big" not in cache._variants
+
+
+async def test_cache_failures_reach_waiters_and_are_retried():
+    """Test that a failed or cancelled creation isn't cached."""
+    cache = ImageVariantCache()
+    release = asyncio.Event()
+
+    async def _fail():
+        await release.wait()
+        raise OSError("boom")
+
+    first = asyncio.ensure_future(cache.async_get("a", _fail))
+    await asyncio.sleep(0)
+    second = asyncio.ensure_future(cache.async_get("a", _fail))
+    await asyncio.sleep(0)
+    release.set()
+    for future in (first, second):
+        with pytest.raises(OSError):
+            await future
+
+    release.clear()
+    cancelled = asyncio.ensure_future(cache.async_get("a", _fail))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
+    # The creation carries on without its caller, and fails unseen.
+    release.set()
+    await asyncio.sleep(0)
+    assert "a" not in cache._inflight
+
+    async def _create():
+        return b"ok", "image/jpeg"
+
+    assert await cache.async_get("a", _create) == (b"ok", "image/jpeg")
+
+
+async def test_cancelled_caller_leaves_waiters_their_variant():
+    """Test that the first requester hanging up doesn't fail the others."""
+    cache = ImageVariantCache()
+    release = asyncio.Event()
+
+    async def _create():
+        await release.wait()
+        return b"ok", "image/jpeg"
+
+    first = asyncio.ensure_future(cache.async_get("a", _create))
+    await asyncio.sleep(0)
+    second = asyncio.ensure_future(cache.async_get("a", _create))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+    assert await second == (b"ok", "image/jpeg")
+    assert first.cancelled()
+    assert len(cache) == 1
@@ -2,71 +2,58 @@
 
 from __future__ import annotations
 
+import asyncio
+import gc
+import os
+from pathlib import Path
+import subprocess
+import sys
 from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
-from aiohttp import ClientConnectorError
-from homeassistant.components.lovelace.const import DOMAIN as LL_DOMAIN
-from homeassistant.components.lovelace.resources import (
-    ResourceStorageCollection,
-    ResourceYAMLCollection,
+from aiohttp import (
+    ClientConnectorError,
+    ClientError,
+    ClientResponse,
+    ClientResponseError,
+    ClientSession,
+    web,
 )
 from homeassistant.config_entries import SOURCE_REAUTH
 from homeassistant.const import (
     CONF_HOST,
     CONF_ICON,
-    CONF_ID,
     CONF_NAME,
-    CONF_URL,
     CONF_USERNAME,
 )
 from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 
 import custom_components.scrypted as scrypted
 from custom_components.scrypted.const import (
     CONF_AUTO_REGISTER_RESOURCES,
+    CONF_BACKUP_HOSTS,
+    CONF_CLUSTER_ROUTING,
+    CONF_LOOP_MONITOR,
     CONF_SCRYPTED_NVR,
+    DATA_ENTRIES,
     DOMAIN,
+    SIGNAL_TOKEN_UPDATED,
+)
+from custom_components.scrypted.api import ScryptedClient, ScryptedCluster
+from custom_components.scrypted.http import ScryptedView
+from custom_components.scrypted.models import ScryptedEntryData
+from custom_components.scrypted.store import (
+    DEVICES_STORAGE_KEY,
+    DEVICES_STORAGE_VERSION,
+    TOKEN_STORAGE_KEY,
+    TOKEN_STORAGE_VERSION,
 )
 
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 
-
-class FakeStorageResources(ResourceStorageCollection):
-    """Storage-backed fake resources used in tests."""
-
-    def __init__(self, items: list[dict] | None = None) -> None:
-        self._items = list(items or [])
-        self.loaded = False
-        self.created: list[dict] = []
-        self.deleted: list[int] = []
-
-    async def async_load(self):
-        self.loaded = True
-
-    def async_items(self):
-        return list(self._items)
-
-    async def async_create_item(self, data):
-        item_id = len(self._items) + 1
-        item = {CONF_ID: item_id, **data}
-        self._items.append(item)
-        self.created.append(item)
-        return item
-
-    async def async_delete_item(self, resource_id):
-        self._items = [item for item in self._items if item[CONF_ID] != resource_id]
-        self.deleted.append(resource_id)
-
-
-class FakeYAMLResources(ResourceYAMLCollection):
-    """YAML-backed fake resources used in tests."""
-
-    def __init__(self, items: list[dict] | None = None) -> None:
-        super().__init__(items or [])
-        self.deleted: list[int] = []
-
+from .stand_in import StandInScrypted, serve_view
 
 
 def test_get_card_resource_definitions():
@@ -76,125 +63,43 @@ def test_get_card_resource_definitions():
     assert resources[1][1].endswith(".css")
 
 
-@pytest.mark.asyncio
-async def test_register_no_lovelace_data_is_noop(hass):
-    """Test case for test_register_no_lovelace_data_is_noop."""
-    await scrypted._async_register_lovelace_resource(hass, "tok", "entry")
-    assert scrypted._RESOURCE_TRACKER not in hass.data
-
-
-@pytest.mark.asyncio
-async def test_register_storage_creates_resources(hass):
-    """Test case for test_register_storage_creates_resources."""
-    resources = FakeStorageResources()
-    hass.data[LL_DOMAIN] = SimpleNamespace(resources=resources)
-    await scrypted._async_register_lovelace_resource(hass, "tok", "entry")
-    tracker = hass.data[scrypted._RESOURCE_TRACKER]
-    assert set(tracker["entry"]) == {
-        "/api/scrypted/tok/endpoint/@scrypted/nvr/assets/web-components.js",
-        "/api/scrypted/tok/endpoint/@scrypted/nvr/assets/web-components.css",
-    }
-    assert resources.loaded
-    assert len(resources.created) == 2
+def test_get_card_resource_definitions_versioned():
+    """Test that known bundle hashes become cache busters."""
+    resources = scrypted._get_card_resource_definitions("tok", {"js": "abc"})
+    assert resources[0][1].endswith("web-components.js?v=abc")
+    assert resources[1][1].endswith("web-components.css")
 
 
 @pytest.mark.asyncio
-async def test_register_storage_skips_existing(hass):
-    """Test case for test_register_storage_skips_existing."""
-    base = "/api/scrypted/token/endpoint/@scrypted/nvr/assets/web-components"
-    resources = FakeStorageResources(
-        [
-            {CONF_ID: 1, CONF_URL: f"{base}.js", "type": "module"},
-            {CONF_ID: 2, CONF_URL: f"{base}.css", "type": "css"},
-        ]
-    )
-    hass.data[LL_DOMAIN] = SimpleNamespace(resources=resources)
-    await scrypted._async_register_lovelace_resource(hass, "token", "entry")
-    assert scrypted._RESOURCE_TRACKER not in hass.data
-    assert not resources.created
+async def test_get_resource_versions(hass, monkeypatch):
+    """Test hashing the card bundles, skipping ones that fail to download."""
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_HOST: "example"})
 
+    async def _hash(data, session, token, path):
+        if path.endswith(".css"):
+            raise ClientError("boom")
+        return "abc"
 
-@pytest.mark.asyncio
-async def test_register_yaml_warns(hass, caplog):
-    """Test case for test_register_yaml_warns."""
-    hass.data[LL_DOMAIN] = SimpleNamespace(resources=FakeYAMLResources())
-    await scrypted._async_register_lovelace_resource(hass, "tok", "entry")
-    assert scrypted._RESOURCE_TRACKER not in hass.data
-    assert "can't automatically be registered" in caplog.text
-
-
-@pytest.mark.asyncio
-async def test_unregister_storage_removes_resources(hass):
-    """Test case for test_unregister_storage_removes_resources."""
-    base = "/api/scrypted/tok/endpoint/@scrypted/nvr/assets/web-components"
-    resources = FakeStorageResources(
-        [
-            {CONF_ID: 10, CONF_URL: f"{base}.js"},
-            {CONF_ID: 11, CONF_URL: f"{base}.css"},
-        ]
-    )
-    hass.data[LL_DOMAIN] = SimpleNamespace(resources=resources)
-    hass.data[scrypted._RESOURCE_TRACKER] = {
-        "entry": {f"{base}.js", f"{base}.css"}
-    }
-    await scrypted._async_unregister_lovelace_resource(hass, "tok", "entry")
-    assert set(resources.deleted) == {10, 11}
-    assert scrypted._RESOURCE_TRACKER not in hass.data
+    monkeypatch.setattr(scrypted, "retrieve_content_hash", _hash)
+    versions = await scrypted._async_get_resource_versions(hass, entry, "tok")
+    assert versions == {"js": "abc"}
 
 
 @pytest.mark.asyncio
-async def test_unregister_empty_tracked_urls_cleans_tracker(hass):
-    """Test case for test_unregister_empty_tracked_urls_cleans_tracker."""
-    hass.data[scrypted._RESOURCE_TRACKER] = {"entry": set()}
-    await scrypted._async_unregister_lovelace_resource(hass, "tok", "entry")
-    assert scrypted._RESOURCE_TRACKER not in hass.data
-
-
-@pytest.mark.asyncio
-async def test_unregister_without_lovelace_data_cleans_tracker(hass):
-    """Test case for test_unregister_without_lovelace_data_cleans_tracker."""
-    hass.data[scrypted._RESOURCE_TRACKER] = {"entry": {"/missing"}}
-    await scrypted._async_unregister_lovelace_resource(hass, "tok", "entry")
-    assert scrypted._RESOURCE_TRACKER not in hass.data
-
-
-@pytest.mark.asyncio
-async def test_unregister_without_tracker_is_noop(hass):
-    """Test case for test_unregister_without_tracker_is_noop."""
-    await scrypted._async_unregister_lovelace_resource(hass, "tok", "entry")
-    assert scrypted._RESOURCE_TRACKER not in hass.data
-
-
-@pytest.mark.asyncio
-async def test_unregister_logs_missing_resources(hass, caplog):
-    """Test case for test_unregister_logs_missing_resources."""
-    base = "/api/scrypted/tok/endpoint/@scrypted/nvr/assets/web-components"
-    resources = FakeStorageResources([{CONF_ID: 10, CONF_URL: f"{base}.js"}])
-    hass.data[LL_DOMAIN] = SimpleNamespace(resources=resources)
-    hass.data[scrypted._RESOURCE_TRACKER] = {
-        "entry": {f"{base}.js", f"{base}.css"}
-    }
-    await scrypted._async_unregister_lovelace_resource(hass, "tok", "entry")
-    assert resources.deleted == [10]
-    assert "was not found" in caplog.text
-
-
-@pytest.mark.asyncio
-async def test_unregister_yaml_resources_skip_deletion(hass):
-    """Test case for test_unregister_yaml_resources_skip_deletion."""
-    base = "/api/scrypted/tok/endpoint/@scrypted/nvr/assets/web-components"
-    resources = FakeYAMLResources(
-        [
-            {CONF_ID: 10, CONF_URL: f"{base}.js"},
-            {CONF_ID: 11, CONF_URL: f"{base}.css"},
-        ]
-    )
-    hass.data[LL_DOMAIN] = SimpleNamespace(resources=resources)
-    hass.data[scrypted._RESOURCE_TRACKER] = {
-        "entry": {f"{base}.js", f"{base}.css"}
-    }
-    await scrypted._async_unregister_lovelace_resource(hass, "tok", "entry")
-    assert not resources.deleted
+async def test_register_and_unregister_use_shared_reconciler(hass, monkeypatch):
+    """Test that entries declare their resources on one reconciler."""
+    reconciler = scrypted._get_resource_reconciler(hass)
+    assert scrypted._get_resource_reconciler(hass) is reconciler
+    update = AsyncMock()
+    remove = AsyncMock()
+    monkeypatch.setattr(reconciler, "async_update_entry", update)
+    monkeypatch.setattr(reconciler, "async_remove_entry", remove)
+    await scrypted._async_register_lovelace_resource(hass, "tok", "entry", {"js": "abc"})
+    update.assert_awaited_once_with(
+        "entry", scrypted._get_card_resource_definitions("tok", {"js": "abc"})
+    )
+    await scrypted._async_unregister_lovelace_resource(hass, "entry")
+    remove.assert_awaited_once_with("entry")
 
 
 @pytest.mark.asyncio
@@ -215,8 +120,7 @@ async def test_async_setup_imports_yaml_config(hass, monkeypatch):
     monkeypatch.setattr(scrypted, "ScryptedView", lambda hass, session: None)
     notifications = {}
     monkeypatch.setattr(
-        scrypted,
-        "async_create",
+        "homeassistant.components.persistent_notification.async_create",
         lambda *args, **kwargs: notifications.setdefault("created", (args, kwargs)),
     )
     flow_init = AsyncMock(return_value={"type": "form"})
@@ -253,9 +157,10 @@ async def test_async_setup_entry_registers_resources_and_panel(hass, monkeypatch
     monkeypatch.setattr(hass.config_entries, "async_forward_entry_setups", forward_setups)
     monkeypatch.setattr(hass.config_entries, "async_reload", reload_mock)
     result = await scrypted.async_setup_entry(hass, entry)
-    await hass.async_block_till_done()
+    await _wait_background_tasks(hass)
     assert result is True
     register_resource.assert_awaited()
+    assert register_resource.call_args.args[3] == {"js": "hash-js", "css": "hash-css"}
     forward_setups.assert_awaited()
     assert hass.data[DOMAIN]["token"] == entry
     assert entry.options[CONF_SCRYPTED_NVR] is False
@@ -475,7 +380,6 @@ async def test_async_unload_entry(hass, monkeypatch):
     )
     entry.add_to_hass(hass)
     hass.data.setdefault(DOMAIN, {})["token"] = entry
-    hass.data.setdefault(scrypted._RESOURCE_TRACKER, {})[entry.entry_id] = set()
     unregister = AsyncMock()
     monkeypatch.setattr(scrypted, "_async_unregister_lovelace_resource", unregister)
     removed = {}
@@ -601,3 +505,503 @@ async def test_panel_reload_uses_consistent_url_path(hass, monkeypatch):
     result = await scrypted.async_setup_entry(hass, entry)
     assert result is True
     assert f"{DOMAIN}_token" in registered_panels
+
+
+async def _wait_background_tasks(hass) -> None:
+    """Wait for background tasks such as the deferred login."""
+    await hass.async_block_till_done()
+    if tasks := list(hass._background_tasks):
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _setup_entry() -> MockConfigEntry:
+    """Return an entry ready to be set up."""
+    return MockConfigEntry(
+        domain=DOMAIN,
+        data={
+            CONF_HOST: "example",
+            CONF_ICON: "mdi:test",
+            CONF_NAME: "Scrypted",
+            CONF_USERNAME: "user",
+        },
+        options={
+            CONF_AUTO_REGISTER_RESOURCES: False,
+            CONF_SCRYPTED_NVR: False,
+        },
+    )
+
+
+@pytest.fixture
+def stub_frontend(hass, monkeypatch):
+    """Keep entry setups and unloads away from the frontend and the platforms."""
+    monkeypatch.setattr(scrypted, "async_register_built_in_panel", lambda *a, **k: None)
+    monkeypatch.setattr(scrypted, "async_remove_panel", lambda *args: None)
+    monkeypatch.setattr(scrypted, "_async_unregister_lovelace_resource", AsyncMock())
+    monkeypatch.setattr(hass.config_entries, "async_forward_entry_setups", AsyncMock())
+
+
+@pytest.mark.asyncio
+async def test_async_setup_entry_stores_first_token(hass, stub_frontend):
+    """Test that the token of the first login is persisted."""
+    entry = _setup_entry()
+    entry.add_to_hass(hass)
+    assert await scrypted.async_setup_entry(hass, entry) is True
+    await _wait_background_tasks(hass)
+    assert await scrypted._get_token_store(hass).async_get(entry.entry_id) == "token"
+
+
+async def test_events_wait_for_the_device_list(hass, monkeypatch, stub_frontend):
+    """Test that events are only subscribed to once the device API answered."""
+    started = []
+    monkeypatch.setattr(
+        scrypted.ScryptedDevices,
+        "async_start",
+        lambda self, entry, on_discovered=None: started.append(on_discovered),
+    )
+    entry = _setup_entry()
+    entry.add_to_hass(hass)
+    assert await scrypted.async_setup_entry(hass, entry)
+    events = hass.data[DATA_ENTRIES][entry.entry_id].events
+    assert started == [events.async_start]
+
+
+@pytest.mark.asyncio
+async def test_async_setup_entry_restores_device_snapshot(
+    hass, monkeypatch, hass_storage
+):
+    """Test that devices of the last run are known before platforms set up."""
+    entry = _setup_entry()
+    entry.add_to_hass(hass)
+    hass_storage[DEVICES_STORAGE_KEY.format(entry.entry_id)] = {
+        "version": DEVICES_STORAGE_VERSION,
+        "data": {"devices": [{"id": "1", "name": "Front Door"}]},
+    }
+    seen = []
+
+    async def _forward(config_entry, platforms):
+        devices = hass.data[DATA_ENTRIES][config_entry.entry_id].devices
+        seen.extend(device.name for device in await devices.async_get())
+
+    monkeypatch.setattr(scrypted, "async_register_built_in_panel", lambda *a, **k: None)
+    monkeypatch.setattr(hass.config_entries, "async_forward_entry_setups", _forward)
+    assert await scrypted.async_setup_entry(hass, entry) is True
+    assert seen == ["Front Door"]
+    await _wait_background_tasks(hass)
+
+
+@pytest.mark.asyncio
+async def test_async_setup_entry_uses_stored_token_then_swaps(hass, monkeypatch, hass_storage):
+    """Test that setup doesn't wait for Scrypted when a token is stored."""
+    entry = _setup_entry()
+    entry.add_to_hass(hass)
+    hass_storage[TOKEN_STORAGE_KEY] = {
+        "version": TOKEN_STORAGE_VERSION,
+        "data": {"tokens": {entry.entry_id: "stored"}},
+    }
+    login = asyncio.Event()
+
+    async def _slow_retrieve(data, session):
+        await login.wait()
+        return "fresh"
+
+    panels = []
+    removed = []
+    updates = []
+    monkeypatch.setattr(scrypted, "retrieve_token", _slow_retrieve)
+    monkeypatch.setattr(
+        scrypted,
+        "async_register_built_in_panel",
+        lambda *args, **kwargs: panels.append(kwargs["frontend_url_path"]),
+    )
+    monkeypatch.setattr(
+        scrypted, "async_remove_panel", lambda hass, path: removed.append(path)
+    )
+    monkeypatch.setattr(hass.config_entries, "async_forward_entry_setups", AsyncMock())
+    async_dispatcher_connect(
+        hass, SIGNAL_TOKEN_UPDATED.format(entry.entry_id), updates.append
+    )
+
+    assert await scrypted.async_setup_entry(hass, entry) is True
+    assert hass.data[DOMAIN] == {"stored": entry}
+    assert panels == [f"{DOMAIN}_stored"]
+
+    login.set()
+    await _wait_background_tasks(hass)
+    assert hass.data[DOMAIN] == {"fresh": entry}
+    assert removed == [f"{DOMAIN}_stored"]
+    assert panels == [f"{DOMAIN}_stored", f"{DOMAIN}_fresh"]
+    assert updates == ["fresh"]
+    assert await scrypted._get_token_store(hass).async_get(entry.entry_id) == "fresh"
+
+
+@pytest.mark.asyncio
+async def test_validate_token_keeps_unchanged_token(hass):
+    """Test that a matching login leaves everything in place."""
+    entry = _setup_entry()
+    hass.data[DOMAIN] = {"token": entry}
+    assert await scrypted._async_validate_token(hass, entry, "token") == "token"
+    assert hass.data[DOMAIN] == {"token": entry}
+
+
+@pytest.mark.asyncio
+async def test_validate_token_retries_connection_errors(hass, monkeypatch):
+    """Test that an unreachable host is retried with backoff."""
+    entry = _setup_entry()
+    attempts = []
+
+    async def _flaky(data, session):
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ClientError("down")
+        return "token"
+
+    monkeypatch.setattr(scrypted, "retrieve_token", _flaky)
+    monkeypatch.setattr(scrypted, "_LOGIN_RETRY_MIN", 0.001)
+    monkeypatch.setattr(scrypted, "_LOGIN_RETRY_MAX", 0.002)
+    assert await scrypted._async_validate_token(hass, entry, "token") == "token"
+    assert len(attempts) == 3
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "error",
+    [
+        ValueError("No token in response"),
+        ClientResponseError(SimpleNamespace(real_url="x"), (), status=401),
+        None,
+    ],
+)
+async def test_validate_token_rejected_credentials_start_reauth(hass, monkeypatch, error):
+    """Test that rejected credentials start a reauth flow."""
+    entry = _setup_entry()
+    entry.add_to_hass(hass)
+
+    async def _reject(data, session):
+        if error:
+            raise error
+        return None
+
+    flow_init = AsyncMock(return_value={"type": "form"})
+    monkeypatch.setattr(scrypted, "retrieve_token", _reject)
+    monkeypatch.setattr(hass.config_entries.flow, "async_init", flow_init)
+    assert await scrypted._async_validate_token(hass, entry, "token") is None
+    await hass.async_block_till_done()
+    assert flow_init.call_args.kwargs["context"]["source"] == SOURCE_REAUTH
+
+
+@pytest.mark.asyncio
+async def test_validate_token_retries_server_errors(hass, monkeypatch):
+    """Test that server errors while Scrypted restarts are retried, not raised."""
+    entry = _setup_entry()
+    attempts = []
+
+    async def _restarting(data, session):
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ClientResponseError(
+                SimpleNamespace(real_url="x"), (), status=500 + len(attempts)
+            )
+        return "token"
+
+    monkeypatch.setattr(scrypted, "retrieve_token", _restarting)
+    monkeypatch.setattr(scrypted, "_LOGIN_RETRY_MIN", 0.001)
+    monkeypatch.setattr(scrypted, "_LOGIN_RETRY_MAX", 0.002)
+    assert await scrypted._async_validate_token(hass, entry, "token") == "token"
+    assert len(attempts) == 3
+
+
+@pytest.mark.asyncio
+async def test_finish_setup_stops_after_rejected_login(hass, monkeypatch):
+    """Test that resources aren't registered when the login was rejected."""
+    entry = _setup_entry()
+    register = AsyncMock()
+    monkeypatch.setattr(scrypted, "_async_validate_token", AsyncMock(return_value=None))
+    monkeypatch.setattr(scrypted, "_async_register_lovelace_resource", register)
+    await scrypted._async_finish_setup(hass, entry, "token", False)
+    register.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_async_remove_entry_forgets_token(hass, hass_storage):
+    """Test that removing an entry deletes its stored token and devices."""
+    entry = _setup_entry()
+    store = scrypted._get_token_store(hass)
+    await store.async_set(entry.entry_id, "token")
+    hass_storage[DEVICES_STORAGE_KEY.format(entry.entry_id)] = {
+        "version": DEVICES_STORAGE_VERSION,
+        "data": {"devices": []},
+    }
+    await scrypted.async_remove_entry(hass, entry)
+    assert await store.async_get(entry.entry_id) is None
+    assert DEVICES_STORAGE_KEY.format(entry.entry_id) not in hass_storage
+
+
+async def test_unchanged_token_is_not_saved_again(hass, monkeypatch):
+    """Test that storing the token an entry already has doesn't write."""
+    entry = _setup_entry()
+    store = scrypted._get_token_store(hass)
+    await store.async_set(entry.entry_id, "token")
+    save = AsyncMock()
+    monkeypatch.setattr(store._store, "async_save", save)
+    await store.async_set(entry.entry_id, "token")
+    save.assert_not_awaited()
+    await store.async_set(entry.entry_id, "fresh")
+    save.assert_awaited_once()
+
+
+async def test_unload_entry_unloads_platforms(hass, monkeypatch, stub_frontend):
+    """Test that the entities go first, and a failed unload keeps the entry."""
+    entry = _setup_entry()
+    entry.add_to_hass(hass)
+    hass.data.setdefault(DOMAIN, {})["token"] = entry
+    unload = AsyncMock(return_value=False)
+    monkeypatch.setattr(hass.config_entries, "async_unload_platforms", unload)
+    assert await scrypted.async_unload_entry(hass, entry) is False
+    unload.assert_awaited_once_with(entry, scrypted.PLATFORMS)
+    assert hass.data[DOMAIN] == {"token": entry}
+
+    unload.return_value = True
+    assert await scrypted.async_unload_entry(hass, entry) is True
+    assert DOMAIN not in hass.data
+
+
+def _open_fds() -> int:
+    """Count the file descriptors open in this process."""
+    return len(os.listdir("/proc/self/fd"))
+
+
+def _live_objects() -> dict[str, int]:
+    """Count the live objects a leaked entry or proxied request would hold."""
+    kinds = (
+        ScryptedEntryData,
+        ScryptedClient,
+        web.Request,
+        web.StreamResponse,
+        ClientResponse,
+    )
+    gc.collect()
+    counts = dict.fromkeys((kind.__name__ for kind in kinds), 0)
+    for obj in gc.get_objects():
+        for kind in kinds:
+            if isinstance(obj, kind):
+                counts[kind.__name__] += 1
+    return counts
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs procfs")
+async def test_reloads_drain_proxy_without_leaks(
+    hass, monkeypatch, allow_unix_connect, stub_frontend
+):
+    """Test that reloading with open streams and WebSockets leaks nothing."""
+    server = StandInScrypted()
+    entry = _setup_entry()
+    entry.add_to_hass(hass)
+    hass.config_entries.async_update_entry(
+        entry, data={**entry.data, CONF_HOST: await server.start_tcp()}
+    )
+
+    async with ClientSession() as upstream, ClientSession() as session:
+        view = hass.data[scrypted._VIEW] = ScryptedView(hass, upstream)
+        original_drain = view.async_drain
+        monkeypatch.setattr(
+            view, "async_drain", lambda entry_id: original_drain(entry_id, 0.05)
+        )
+        runner, base_url = await serve_view(view)
+        prefix = f"{base_url}/api/{DOMAIN}/token"
+
+        async def _reload() -> None:
+            assert await scrypted.async_setup_entry(hass, entry)
+            live = await session.get(f"{prefix}/endpoint/live", params={"live": ""})
+            ws = await session.ws_connect(f"{prefix}/endpoint/ws")
+            await ws.send_str("hello")
+            await ws.receive()
+            assert await scrypted.async_unload_entry(hass, entry)
+            # Both were cut off by the drain rather than left to the client.
+            await ws.receive(timeout=1)
+            await ws.close()
+            with pytest.raises(ClientError):
+                await asyncio.wait_for(live.content.read(), 1)
+            live.release()
+            await _wait_background_tasks(hass)
+            # Let the stand-in notice the relays it served went away.
+            await asyncio.sleep(0.05)
+            server.requests.clear()
+
+        try:
+            # Warm up connection pools and caches first.
+            for _ in range(3):
+                await _reload()
+            fds, objects, tasks = _open_fds(), _live_objects(), len(asyncio.all_tasks())
+            for _ in range(20):
+                await _reload()
+            assert view._inflight == {}
+            assert not view._draining
+            assert _open_fds() <= fds
+            assert _live_objects() == objects
+            assert len(asyncio.all_tasks()) <= tasks
+        finally:
+            await runner.cleanup()
+            await server.close()
+
+
+async def test_loop_monitor_runs_while_an_entry_wants_it(
+    hass, monkeypatch, stub_frontend
+):
+    """Test that the monitor samples the view's activity for enabled entries."""
+    hass.http = SimpleNamespace(register_view=lambda view: None)
+    await scrypted.async_setup(hass, {})
+    entry = _setup_entry()
+    entry.add_to_hass(hass)
+    hass.config_entries.async_update_entry(
+        entry, options={**entry.options, CONF_LOOP_MONITOR: True}
+    )
+    assert await scrypted.async_setup_entry(hass, entry)
+    monitor = hass.data[scrypted._LOOP_MONITOR]
+    assert monitor.running
+    assert monitor.activity is hass.data[scrypted._VIEW].activity
+
+    monkeypatch.setattr(
+        hass.config_entries, "async_unload_platforms", AsyncMock(return_value=True)
+    )
+    assert await scrypted.async_unload_entry(hass, entry)
+    for unload in entry._on_unload:
+        unload()
+    assert not monitor.running
+    await _wait_background_tasks(hass)
+
+
+async def test_loop_monitor_without_view(hass):
+    """Test that the monitor still works before the view is registered."""
+    monitor = scrypted._get_loop_monitor(hass)
+    assert scrypted._get_loop_monitor(hass) is monitor
+    assert monitor.activity.streams == 0
+
+
+async def test_backup_hosts_log_in_and_share_the_proxy(hass, monkeypatch, stub_frontend):
+    """Test logging in through the first reachable host and pooling all hosts."""
+    hass.http = SimpleNamespace(register_view=lambda view: None)
+    await scrypted.async_setup(hass, {})
+    entry = _setup_entry()
+    entry.add_to_hass(hass)
+    hass.config_entries.async_update_entry(
+        entry, options={**entry.options, CONF_BACKUP_HOSTS: "vpn, example, lan"}
+    )
+    logins = []
+
+    async def _retrieve(data, session):
+        logins.append(data[CONF_HOST])
+        if data[CONF_HOST] == "example":
+            key = SimpleNamespace(host="example", port=10443, ssl=True)
+            raise ClientConnectorError(key, OSError(111, "Connection refused"))
+        return f"token-{data[CONF_HOST]}"
+
+    pings = []
+
+    async def _check(host, session):
+        pings.append(host)
+
+    monkeypatch.setattr(scrypted, "retrieve_token", _retrieve)
+    monkeypatch.setattr(scrypted, "check_endpoint", _check)
+    assert await scrypted.async_setup_entry(hass, entry)
+    assert hass.data[DOMAIN] == {"token-vpn": entry}
+
+    view: ScryptedView = hass.data[scrypted._VIEW]
+    pool = hass.data[DATA_ENTRIES][entry.entry_id].endpoints
+    assert view._pools == {entry.entry_id: pool}
+    await _wait_background_tasks(hass)
+    # The health check logged in to every host, and pinged those that answered.
+    assert logins == ["example", "vpn", "example", "vpn", "lan"]
+    assert pings == ["vpn", "lan"]
+    assert [health.healthy for health in pool.endpoints] == [False, True, True]
+    assert pool.token("lan") == "token-lan"
+    # Later checks only ping the hosts that logged in.
+    await pool.async_check()
+    assert pings == ["vpn", "lan"] * 2
+    assert logins[5:] == ["example"]
+
+    monkeypatch.setattr(
+        hass.config_entries, "async_unload_platforms", AsyncMock(return_value=True)
+    )
+    assert await scrypted.async_unload_entry(hass, entry)
+    for unload in entry._on_unload:
+        unload()
+    assert view._pools == {}
+    assert pool._unsub_check is None
+
+
+async def test_single_host_and_invalid_backups_have_no_pool(hass, monkeypatch):
+    """Test that entries without usable backup hosts keep a single upstream."""
+    entry = _setup_entry()
+    entry.add_to_hass(hass)
+    assert scrypted._create_endpoint_pool(hass, entry) is None
+    hass.config_entries.async_update_entry(
+        entry, options={**entry.options, CONF_BACKUP_HOSTS: "ftp://backup"}
+    )
+    assert scrypted._entry_hosts(entry) == ["example"]
+    assert scrypted._create_endpoint_pool(hass, entry) is None
+
+    async def _raise(data, session):
+        raise ClientConnectorError(SimpleNamespace(), OSError())
+
+    monkeypatch.setattr(scrypted, "retrieve_token", _raise)
+    with pytest.raises(ClientConnectorError):
+        await scrypted._async_retrieve_token(hass, entry)
+
+
+async def test_cluster_routing_is_shared_with_the_proxy(
+    hass, monkeypatch, stub_frontend
+):
+    """Test that entries routing to cluster workers hand their routes around."""
+    hass.http = SimpleNamespace(register_view=lambda view: None)
+    await scrypted.async_setup(hass, {})
+    entry = _setup_entry()
+    entry.add_to_hass(hass)
+    assert scrypted._create_cluster_routes(hass, entry, None) is None
+    hass.config_entries.async_update_entry(
+        entry, options={**entry.options, CONF_CLUSTER_ROUTING: True}
+    )
+    topology = ScryptedCluster(workers={"w1": "10.0.0.5"}, devices={"1": "w1"})
+    monkeypatch.setattr(
+        ScryptedClient, "async_get_cluster", AsyncMock(return_value=topology)
+    )
+    monkeypatch.setattr(scrypted, "retrieve_token", AsyncMock(return_value="token"))
+    assert await scrypted.async_setup_entry(hass, entry)
+
+    view: ScryptedView = hass.data[scrypted._VIEW]
+    entry_data = hass.data[DATA_ENTRIES][entry.entry_id]
+    routes = entry_data.cluster
+    assert entry_data.events.routes is routes
+    assert view._routes == {entry.entry_id: routes}
+    await _wait_background_tasks(hass)
+    assert routes.routes == {"1": "10.0.0.5"}
+
+    monkeypatch.setattr(
+        hass.config_entries, "async_unload_platforms", AsyncMock(return_value=True)
+    )
+    assert await scrypted.async_unload_entry(hass, entry)
+    for unload in entry._on_unload:
+        unload()
+    assert view._routes == {}
+    assert routes._unsub_refresh is None
+
+
+def test_optional_modules_are_imported_lazily():
+    """Test that the integration and its sensor platform load no optional modules."""
+    code = (
+        "import sys, custom_components.scrypted, custom_components.scrypted.sensor; "
+        "print(sorted(m for m in ("
+        "'custom_components.scrypted.cluster', "
+        "'custom_components.scrypted.endpoints', "
+        "'custom_components.scrypted.loop_monitor', "
+        "'custom_components.scrypted.relay', "
+        "'custom_components.scrypted.resources', "
+        "'homeassistant.components.lovelace') if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        check=True,
+        cwd=Path(__file__).parent.parent,
+        text=True,
+    )
+    assert result.stdout.strip() == "[]"
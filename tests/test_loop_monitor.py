@@ -0,0 +1,108 @@
+"""Tests for the event loop lag monitor."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.util import dt as dt_util
+
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+
+from custom_components.scrypted import loop_monitor
+from custom_components.scrypted.const import SIGNAL_LOOP_LAG
+from custom_components.scrypted.http import ProxyActivity
+from custom_components.scrypted.loop_monitor import LoopLagMonitor, _Sample
+
+
+def test_summarize_attributes_spikes():
+    """Test that spikes are told apart by the proxy work that preceded them."""
+    samples = [_Sample(0.001, 0, 0, 0)] * 96 + [
+        _Sample(0.2, 2, 4, 4 * 65536),
+        _Sample(0.1, 1, 2, 2 * 65536),
+        _Sample(0.08, 0, 0, 0),
+        _Sample(0.002, 1, 10, 10 * 4096),
+    ]
+    activity = ProxyActivity(streams=1, streams_refused=3)
+    stats = loop_monitor.summarize(samples, activity)
+    assert stats.lag_max == 0.2
+    assert stats.lag_p99 == 0.2
+    assert stats.spikes == 3
+    assert stats.spikes_with_streams == 2
+    assert stats.streams_during_spikes == 1
+    assert stats.write_size_during_spikes == 65536
+    assert stats.write_size == (6 * 65536 + 10 * 4096) / 16
+    assert stats.bytes_per_second > 0
+    assert (stats.streams, stats.streams_refused) == (1, 3)
+
+    empty = loop_monitor.summarize([], ProxyActivity())
+    assert (empty.lag_p99, empty.lag_max, empty.write_size) == (0.0, 0.0, 0.0)
+    assert empty.bytes_per_second == 0.0
+
+
+def _block(seconds: float) -> None:
+    """Keep the event loop busy, like a stalled callback would."""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+async def _wait_for_samples(monitor: LoopLagMonitor, count: int) -> None:
+    """Wait until the monitor took `count` more samples."""
+    target = len(monitor._samples) + count
+    while len(monitor._samples) < target:
+        await asyncio.sleep(loop_monitor.SAMPLE_INTERVAL / 2)
+
+
+async def test_monitor_measures_lag_and_reports(hass, monkeypatch):
+    """Test sampling, the recent lag, reports and stopping with the last entry."""
+    monkeypatch.setattr(loop_monitor, "SAMPLE_INTERVAL", 0.01)
+    activity = ProxyActivity()
+    monitor = LoopLagMonitor(hass, activity)
+    reports = []
+    async_dispatcher_connect(hass, SIGNAL_LOOP_LAG, reports.append)
+
+    monitor.async_add_entry("a")
+    monitor.async_add_entry("b")
+    assert monitor.running
+    await _wait_for_samples(monitor, 3)
+
+    # A stream writing while something blocks the loop.
+    activity.streams = 1
+    activity.writes += 5
+    activity.bytes_written += 5 * 65536
+    hass.loop.call_soon(_block, 0.12)
+    await _wait_for_samples(monitor, 2)
+    assert activity.loop_lag >= 0.1
+
+    async_fire_time_changed(hass, dt_util.utcnow() + loop_monitor.REPORT_INTERVAL)
+    await hass.async_block_till_done()
+    assert reports == [monitor.stats]
+    assert monitor.stats.spikes >= 1
+    assert monitor.stats.spikes_with_streams >= 1
+    assert monitor.stats.write_size_during_spikes == 65536
+
+    monitor.async_remove_entry("a")
+    assert monitor.running
+    monitor.async_remove_entry("b")
+    monitor.async_remove_entry("b")
+    assert not monitor.running
+    assert monitor.stats is None
+    assert activity.loop_lag == 0.0
+    async_fire_time_changed(hass, dt_util.utcnow() + 2 * loop_monitor.REPORT_INTERVAL)
+    await hass.async_block_till_done()
+    assert len(reports) == 1
+
+
+async def test_idle_loop_has_no_spikes(hass):
+    """Test that sampling alone doesn't register as lag."""
+    activity = ProxyActivity()
+    monitor = LoopLagMonitor(hass, activity)
+    monitor.async_add_entry("a")
+    try:
+        await _wait_for_samples(monitor, 4)
+        stats = loop_monitor.summarize(list(monitor._samples), activity)
+        assert stats.lag_max < loop_monitor.SPIKE_LAG
+    finally:
+        monitor.async_remove_entry("a")
@@ -0,0 +1,146 @@
+"""Tests for the Scrypted media source."""
+
+from __future__ import annotations
+
+import time
+
+from aiohttp import ClientSession
+import pytest
+from homeassistant.components.media_player import BrowseError
+from homeassistant.components.media_source import MediaSourceItem, Unresolvable
+from homeassistant.const import CONF_HOST
+
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.scrypted.api import (
+    API_PATH,
+    RECORDINGS_PAGE_SIZE,
+    ScryptedClient,
+    ScryptedDevice,
+)
+from custom_components.scrypted.cache_policy import IMMUTABLE
+from custom_components.scrypted.const import DATA_ENTRIES, DOMAIN
+from custom_components.scrypted.devices import ScryptedDevices
+from custom_components.scrypted.media_source import async_get_media_source
+from custom_components.scrypted.models import ScryptedEntryData
+
+from .stand_in import VIDEO, make_recordings
+
+NVR = frozenset({"Camera", "VideoRecorder"})
+DEVICES = [
+    ScryptedDevice("1", "Front Door", "Doorbell", NVR),
+    ScryptedDevice("2", "Driveway", "Camera", frozenset({"Camera"})),
+    ScryptedDevice("3", "Backyard", "Camera", NVR),
+]
+
+
+@pytest.fixture
+def server(server):
+    """Serve 90 days of 1000 clips each for the front door."""
+    server.recordings["1"] = make_recordings(90, 1000)
+    return server
+
+
+@pytest.fixture
+async def source(hass, server, setup_entry_devices):
+    """Return the media source with one entry on the stand-in server."""
+    entry = MockConfigEntry(
+        domain=DOMAIN, entry_id="entry", data={CONF_HOST: "example"}
+    )
+    entry.add_to_hass(hass)
+    async with ClientSession() as session:
+        client = ScryptedClient(
+            session, {CONF_HOST: f"http://127.0.0.1:{server.port}"}, "token"
+        )
+        await setup_entry_devices(entry, DEVICES, client)
+        yield await async_get_media_source(hass)
+
+
+async def _browse(hass, source, identifier: str | None):
+    """Browse an identifier of the source."""
+    return await source.async_browse_media(
+        MediaSourceItem(hass, DOMAIN, identifier or "", None)
+    )
+
+
+async def test_browse_cameras(hass, source, setup_entry_devices):
+    """Test that only recording cameras are listed, prefixed per entry."""
+    root = await _browse(hass, source, None)
+    assert [child.title for child in root.children] == ["Backyard", "Front Door"]
+    assert root.children[1].identifier == "entry/1"
+
+    other = MockConfigEntry(domain=DOMAIN, title="Garage", data={CONF_HOST: "x"})
+    other.add_to_hass(hass)
+    await setup_entry_devices(other, [ScryptedDevice("9", "Door", "Camera", NVR)])
+    # An entry still discovering its devices is skipped.
+    hass.data[DATA_ENTRIES]["pending"] = ScryptedEntryData(
+        client=None, devices=ScryptedDevices(hass, "pending", None), events=None
+    )
+    root = await _browse(hass, source, None)
+    assert [child.title for child in root.children] == [
+        "Garage: Door",
+        "Mock Title: Backyard",
+        "Mock Title: Front Door",
+    ]
+
+
+async def test_browse_is_lazy_and_paginated(hass, source, server):
+    """Test that each level costs one request and a day one page at a time."""
+    requests = len(server.requests)
+    started = time.perf_counter()
+    camera = await _browse(hass, source, "entry/1")
+    assert len(camera.children) == 90
+    assert camera.children[0].title == "2024-03-30"
+    assert not camera.children[0].children
+
+    day = await _browse(hass, source, camera.children[0].identifier)
+    assert len(day.children) == RECORDINGS_PAGE_SIZE + 1
+    clip, more = day.children[0], day.children[-1]
+    assert clip.can_play and clip.identifier == "entry/1/clip/89-999"
+    assert clip.thumbnail == (
+        f"/api/{DOMAIN}/token/{API_PATH}/devices/1/recordings/89-999/thumbnail"
+    )
+    assert more.title == "More"
+
+    page = await _browse(hass, source, more.identifier)
+    assert page.children[0].identifier == "entry/1/clip/89-949"
+    elapsed = time.perf_counter() - started
+    # Each browse fetched one small response of the 90000 clips.
+    assert len(server.requests) - requests == 3
+    assert elapsed < 1
+
+
+async def test_browse_errors(hass, source, server):
+    """Test unknown items and unreachable servers."""
+    for identifier in ("other/1", "entry", "entry/7", "entry/1/clip/1-1"):
+        with pytest.raises(BrowseError):
+            await _browse(hass, source, identifier)
+    await server.close()
+    with pytest.raises(BrowseError):
+        await _browse(hass, source, "entry/1")
+
+
+async def test_resolve_plays_through_the_proxy(hass, source, proxy):
+    """Test that clips resolve to range capable proxied URLs."""
+    with pytest.raises(Unresolvable):
+        await source.async_resolve_media(
+            MediaSourceItem(hass, DOMAIN, "entry/1/2024-03-30", None)
+        )
+    with pytest.raises(Unresolvable):
+        await source.async_resolve_media(
+            MediaSourceItem(hass, DOMAIN, "other/1/clip/1-1", None)
+        )
+    media = await source.async_resolve_media(
+        MediaSourceItem(hass, DOMAIN, "entry/1/clip/89-999", None)
+    )
+    assert media.mime_type == "video/mp4"
+
+    proxy, _, session = proxy
+    headers = {"Range": "bytes=100-199"}
+    async with session.get(f"{proxy.base_url}{media.url}", headers=headers) as resp:
+        assert resp.status == 206
+        assert resp.headers["Content-Range"] == f"bytes 100-199/{len(VIDEO)}"
+        assert await resp.read() == VIDEO[100:200]
+    thumbnail = media.url.replace("/video", "/thumbnail")
+    async with session.get(f"{proxy.base_url}{thumbnail}") as resp:
+        assert resp.headers["Cache-Control"] == IMMUTABLE
@@ -0,0 +1,180 @@
+"""Tests for WebSocket relays that outlive restarts of the Scrypted server."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from aiohttp import ClientWebSocketResponse, WSCloseCode, WSMsgType
+
+from custom_components.scrypted import relay
+from custom_components.scrypted.const import CONF_RESUMABLE_WEBSOCKETS
+
+from .stand_in import StandInScrypted, wait_released
+
+
+@pytest.fixture(autouse=True)
+def _fast_backoff(monkeypatch):
+    """Reconnect within milliseconds."""
+    monkeypatch.setattr(relay, "_BACKOFF_MIN", 0.01)
+    monkeypatch.setattr(relay, "_BACKOFF_MAX", 0.05)
+
+
+@pytest.fixture
+def proxy_options() -> dict:
+    """Proxy with resumable relays."""
+    return {CONF_RESUMABLE_WEBSOCKETS: True}
+
+
+async def test_relay_resumes_across_a_restart(server, proxy):
+    """Test that the client stays connected and its messages are held in order."""
+    proxy, prefix, session = proxy
+    async with session.ws_connect(f"{prefix}/endpoint/ws", autoping=False) as ws:
+        await ws.send_str("before")
+        assert (await ws.receive(timeout=1)).data == "before"
+
+        await server.close()
+        await ws.send_str("held")
+        await ws.send_bytes(b"held too")
+        # The relay answers pings while Scrypted is away.
+        await ws.ping(b"alive")
+        assert (await ws.receive(timeout=1)).type == WSMsgType.PONG
+
+        restarted = StandInScrypted()
+        await restarted.start_tcp(port=server.port)
+        try:
+            assert (await ws.receive(timeout=2)).data == "held"
+            assert (await ws.receive(timeout=1)).data == b"held too"
+            await ws.send_str("after")
+            assert (await ws.receive(timeout=1)).data == "after"
+            assert proxy.view.activity.relays_resumed == 1
+        finally:
+            await ws.close()
+            await restarted.close()
+    await wait_released(proxy.view)
+
+
+async def test_server_closes(server, proxy):
+    """Test resuming after a server going away, and passing other closes on."""
+    proxy, prefix, session = proxy
+    server.faults.close_code = WSCloseCode.SERVICE_RESTART
+    async with session.ws_connect(f"{prefix}/endpoint/ws") as ws:
+        for message in ("one", "two"):
+            await ws.send_str(message)
+            assert (await ws.receive(timeout=1)).data == message
+        assert proxy.view.activity.relays_resumed >= 1
+
+        server.faults.close_code = 4000
+        await ws.send_str("last")
+        assert (await ws.receive(timeout=1)).data == "last"
+        message = await ws.receive(timeout=1)
+        assert (message.type, message.data) == (WSMsgType.CLOSE, 4000)
+    await wait_released(proxy.view)
+
+
+async def test_relay_gives_up(server, proxy, monkeypatch):
+    """Test closing the client's socket on a full buffer or when time is up."""
+    proxy, prefix, session = proxy
+    monkeypatch.setattr(relay, "RESUME_BUFFER", 8)
+    async with session.ws_connect(f"{prefix}/endpoint/ws") as ws:
+        await ws.send_str("ready")
+        assert (await ws.receive(timeout=1)).data == "ready"
+        await server.close()
+        await ws.send_str("12345")
+        await ws.send_str("6789")
+        message = await ws.receive(timeout=1)
+        assert (message.type, message.data) == (
+            WSMsgType.CLOSE,
+            WSCloseCode.TRY_AGAIN_LATER,
+        )
+    await wait_released(proxy.view)
+
+    monkeypatch.setattr(relay, "RESUME_TIMEOUT", 0.1)
+    async with session.ws_connect(f"{prefix}/endpoint/ws") as ws:
+        message = await ws.receive(timeout=1)
+        assert (message.type, message.data) == (
+            WSMsgType.CLOSE,
+            WSCloseCode.SERVICE_RESTART,
+        )
+    await wait_released(proxy.view)
+
+
+async def test_client_leaving_ends_the_relay(server, proxy):
+    """Test that a client leaving while Scrypted is away frees the relay."""
+    proxy, prefix, session = proxy
+    async with session.ws_connect(f"{prefix}/endpoint/ws") as ws:
+        await ws.send_str("ready")
+        assert (await ws.receive(timeout=1)).data == "ready"
+        await server.close()
+        await asyncio.sleep(0.02)
+    await wait_released(proxy.view)
+
+
+async def test_engine_io_sessions_are_not_resumed(server, proxy):
+    """Test that sockets with a server-side session close with the server."""
+    proxy, prefix, session = proxy
+    server.faults.reset_after = 1
+    async with session.ws_connect(f"{prefix}/endpoint/ws?EIO=4") as ws:
+        await ws.send_str("hello")
+        assert (await ws.receive(timeout=1)).data == "hello"
+        assert (await ws.receive(timeout=1)).type in (
+            WSMsgType.CLOSE,
+            WSMsgType.CLOSED,
+        )
+    assert proxy.view.activity.relays_resumed == 0
+    await wait_released(proxy.view)
+
+
+async def test_pings_are_relayed(server, proxy):
+    """Test that pings and pongs pass both ways while the upstream is there."""
+    proxy, prefix, session = proxy
+    async with session.ws_connect(f"{prefix}/endpoint/ws", autoping=False) as ws:
+        await ws.send_str("ready")
+        assert (await ws.receive(timeout=1)).data == "ready"
+        # Scrypted answers the client's ping, through the relay.
+        await ws.ping(b"upstream")
+        message = await ws.receive(timeout=1)
+        assert (message.type, message.data) == (WSMsgType.PONG, b"upstream")
+    await wait_released(proxy.view)
+
+    # Scrypted's heartbeats reach the client, and its answers come back in time.
+    server.ws_heartbeat = 0.05
+    async with session.ws_connect(f"{prefix}/endpoint/ws") as ws:
+
+        async def _later() -> None:
+            await asyncio.sleep(0.3)
+            await ws.send_str("alive")
+
+        later = asyncio.create_task(_later())
+        assert (await ws.receive(timeout=1)).data == "alive"
+        await later
+    assert proxy.view.activity.relays_resumed == 0
+    await wait_released(proxy.view)
+
+
+async def test_failed_send_is_held_for_the_next_upstream(server, proxy, monkeypatch):
+    """Test that a message the dying upstream didn't take is sent after resuming."""
+    proxy, prefix, session = proxy
+    send_str = ClientWebSocketResponse.send_str
+    failures = []
+
+    async def _send_str(self, data, compress=None):
+        if data == "flaky" and not failures:
+            failures.append(data)
+            raise ConnectionResetError("Cannot write to closing transport")
+        await send_str(self, data, compress)
+
+    monkeypatch.setattr(ClientWebSocketResponse, "send_str", _send_str)
+    async with session.ws_connect(f"{prefix}/endpoint/ws") as ws:
+        await ws.send_str("ready")
+        assert (await ws.receive(timeout=1)).data == "ready"
+        # Only the relay's upstream send fails.
+        await send_str(ws, "flaky")
+        server.faults.close_code = WSCloseCode.GOING_AWAY
+        await ws.send_str("next")
+        assert (await ws.receive(timeout=1)).data == "next"
+        server.faults.close_code = None
+        assert (await ws.receive(timeout=1)).data == "flaky"
+    assert failures == ["flaky"]
+    await wait_released(proxy.view)
+
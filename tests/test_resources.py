@@ -0,0 +1,204 @@
+"""Tests for the Scrypted Lovelace resource reconciler."""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from homeassistant.components.lovelace.const import DOMAIN as LL_DOMAIN
+from homeassistant.components.lovelace.resources import (
+    ResourceStorageCollection,
+    ResourceYAMLCollection,
+)
+from homeassistant.const import CONF_ID, CONF_URL
+
+from custom_components.scrypted import resources as scrypted_resources
+from custom_components.scrypted.resources import LovelaceResourceReconciler
+
+BASE = "/api/scrypted/tok/endpoint/@scrypted/nvr/assets/web-components"
+DEFINITIONS = [("module", f"{BASE}.js"), ("css", f"{BASE}.css")]
+
+
+class FakeStorageResources(ResourceStorageCollection):
+    """Storage-backed fake resources used in tests."""
+
+    def __init__(self, items: list[dict] | None = None) -> None:
+        self._items = list(items or [])
+        self.loaded = False
+        self.loads = 0
+        self.created: list[dict] = []
+        self.updated: list[int] = []
+        self.deleted: list[int] = []
+
+    async def async_load(self):
+        self.loads += 1
+        self.loaded = True
+
+    def async_items(self):
+        return list(self._items)
+
+    async def async_create_item(self, data):
+        # Yield so concurrent reconciles would interleave without the lock.
+        await asyncio.sleep(0)
+        item_id = max((item[CONF_ID] for item in self._items), default=0) + 1
+        item = {CONF_ID: item_id, **data}
+        self._items.append(item)
+        self.created.append(item)
+        return item
+
+    async def async_update_item(self, resource_id, updates):
+        for item in self._items:
+            if item[CONF_ID] == resource_id:
+                item.update(updates)
+        self.updated.append(resource_id)
+
+    async def async_delete_item(self, resource_id):
+        self._items = [item for item in self._items if item[CONF_ID] != resource_id]
+        self.deleted.append(resource_id)
+
+
+class FakeYAMLResources(ResourceYAMLCollection):
+    """YAML-backed fake resources used in tests."""
+
+    def __init__(self, items: list[dict] | None = None) -> None:
+        super().__init__(items or [])
+
+
+@pytest.fixture
+def storage(hass) -> FakeStorageResources:
+    """Install storage-backed Lovelace resources."""
+    resources = FakeStorageResources()
+    hass.data[LL_DOMAIN] = SimpleNamespace(resources=resources)
+    return resources
+
+
+async def test_creates_missing_resources_once(hass, storage):
+    """Test creation, persistence and a single collection load."""
+    reconciler = LovelaceResourceReconciler(hass)
+    await reconciler.async_update_entry("entry", DEFINITIONS)
+    await reconciler.async_update_entry("entry", DEFINITIONS)
+    assert [item[CONF_URL] for item in storage.created] == [url for _, url in DEFINITIONS]
+    assert storage.loads == 1
+    assert await reconciler._store.async_load() == {
+        "entries": {"entry": sorted(url for _, url in DEFINITIONS)}
+    }
+
+
+async def test_concurrent_entries_do_not_duplicate(hass, storage):
+    """Test that entries setting up together create each URL once."""
+    reconciler = LovelaceResourceReconciler(hass)
+    other = [("module", "/api/scrypted/other/web-components.js")]
+    await asyncio.gather(
+        reconciler.async_update_entry("a", DEFINITIONS),
+        reconciler.async_update_entry("b", DEFINITIONS),
+        reconciler.async_update_entry("c", other),
+    )
+    urls = [item[CONF_URL] for item in storage.async_items()]
+    assert sorted(urls) == sorted([url for _, url in DEFINITIONS] + [other[0][1]])
+
+
+async def test_skips_existing_untracked_resources(hass, storage):
+    """Test that manually registered resources are left alone."""
+    storage._items = [{CONF_ID: 1, CONF_URL: f"{BASE}.js"}, {CONF_ID: 2, CONF_URL: f"{BASE}.css"}]
+    reconciler = LovelaceResourceReconciler(hass)
+    await reconciler.async_update_entry("entry", DEFINITIONS)
+    await reconciler.async_remove_entry("entry")
+    assert not storage.created
+    assert not storage.deleted
+    assert await reconciler._store.async_load() is None
+
+
+async def test_updates_version_in_place(hass, storage):
+    """Test that a new bundle hash updates the existing resource."""
+    storage._items = [{CONF_ID: 1, CONF_URL: f"{BASE}.js?v=old"}]
+    reconciler = LovelaceResourceReconciler(hass)
+    await reconciler.async_update_entry("entry", [("module", f"{BASE}.js?v=new")])
+    assert storage.updated == [1]
+    assert storage.async_items()[0][CONF_URL] == f"{BASE}.js?v=new"
+
+    # An unversioned definition keeps the current versioned URL.
+    await reconciler.async_update_entry("entry", [("module", f"{BASE}.js")])
+    assert storage.updated == [1]
+
+
+async def test_remove_entry_deletes_created_resources(hass, storage):
+    """Test that unloading removes exactly what the entry created."""
+    storage._items = [{CONF_ID: 50, CONF_URL: "/manual.js"}]
+    reconciler = LovelaceResourceReconciler(hass)
+    await reconciler.async_update_entry("entry", DEFINITIONS)
+    await reconciler.async_remove_entry("entry")
+    assert [item[CONF_URL] for item in storage.async_items()] == ["/manual.js"]
+    assert await reconciler._store.async_load() == {"entries": {}}
+
+
+async def test_tracking_survives_restart(hass, storage, hass_storage):
+    """Test that resources created before a restart are removed on unload."""
+    storage._items = [{CONF_ID: 10, CONF_URL: f"{BASE}.js?v=abc"}, {CONF_ID: 11, CONF_URL: f"{BASE}.css"}]
+    hass_storage[scrypted_resources.STORAGE_KEY] = {
+        "version": scrypted_resources.STORAGE_VERSION,
+        "data": {"entries": {"entry": [f"{BASE}.js", f"{BASE}.css", "/gone.js"]}},
+    }
+    reconciler = LovelaceResourceReconciler(hass)
+    await reconciler.async_remove_entry("entry")
+    assert sorted(storage.deleted) == [10, 11]
+
+
+async def test_changed_token_replaces_resources(hass, storage):
+    """Test that resources of an old token are replaced by the new ones."""
+    reconciler = LovelaceResourceReconciler(hass)
+    await reconciler.async_update_entry("entry", DEFINITIONS)
+    new = [("module", "/api/scrypted/new/web-components.js")]
+    await reconciler.async_update_entry("entry", new)
+    assert [item[CONF_URL] for item in storage.async_items()] == [new[0][1]]
+
+
+async def test_shared_url_is_handed_over(hass, storage):
+    """Test that a URL wanted by another entry survives the creator's unload."""
+    reconciler = LovelaceResourceReconciler(hass)
+    await reconciler.async_update_entry("a", DEFINITIONS)
+    await reconciler.async_update_entry("b", DEFINITIONS)
+    await reconciler.async_remove_entry("a")
+    assert not storage.deleted
+    await reconciler.async_remove_entry("b")
+    assert len(storage.deleted) == 2
+
+
+async def test_yaml_mode_warns_and_skips_changes(hass, caplog):
+    """Test that YAML managed resources are never modified."""
+    resources = FakeYAMLResources([{CONF_ID: 1, CONF_URL: f"{BASE}.css?v=old"}])
+    hass.data[LL_DOMAIN] = SimpleNamespace(resources=resources)
+    reconciler = LovelaceResourceReconciler(hass)
+    reconciler._tracked = {"entry": {f"{BASE}.css"}}
+    await reconciler.async_update_entry("entry", [("module", f"{BASE}.js")])
+    assert "can't automatically be registered" in caplog.text
+    await reconciler.async_update_entry("entry", [("css", f"{BASE}.css?v=new")])
+    await reconciler.async_remove_entry("entry")
+    assert "skipping automatic removal" in caplog.text
+    assert resources.async_items()[0][CONF_URL] == f"{BASE}.css?v=old"
+
+
+async def test_missing_resource_is_logged(hass, storage, caplog):
+    """Test that a tracked resource deleted by the user is just forgotten."""
+    reconciler = LovelaceResourceReconciler(hass)
+    reconciler._tracked = {"entry": {f"{BASE}.js"}}
+    await reconciler.async_remove_entry("entry")
+    assert "was not found" in caplog.text
+    assert reconciler._tracked == {}
+
+
+async def test_without_lovelace_forgets_unloaded_entries(hass):
+    """Test that nothing is touched without Lovelace data."""
+    reconciler = LovelaceResourceReconciler(hass)
+    reconciler._tracked = {"entry": {f"{BASE}.js"}, "other": {"/x.js"}}
+    reconciler._desired = {"other": [("module", "/x.js")]}
+    await reconciler.async_remove_entry("entry")
+    assert reconciler._tracked == {"other": {"/x.js"}}
+    await reconciler.async_reconcile()
+    assert reconciler._tracked == {"other": {"/x.js"}}
+
+
+def test_strip_version():
+    """Test removing the version query."""
+    assert scrypted_resources.strip_version(f"{BASE}.js?v=abc") == f"{BASE}.js"
+    assert scrypted_resources.strip_version(f"{BASE}.js") == f"{BASE}.js"
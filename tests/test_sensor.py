@@ -4,11 +4,22 @@ from __future__ import annotations
 
 import pytest
 from homeassistant.const import CONF_HOST
+from homeassistant.helpers.dispatcher import async_dispatcher_send
 
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 
 from custom_components.scrypted import sensor
-from custom_components.scrypted.const import DOMAIN
+from custom_components.scrypted.const import (
+    CONF_LOOP_MONITOR,
+    DATA_ENTRIES,
+    DOMAIN,
+    SIGNAL_LOOP_LAG,
+    SIGNAL_TOKEN_UPDATED,
+)
+from custom_components.scrypted.endpoints import EndpointPool
+from custom_components.scrypted.http import ProxyActivity
+from custom_components.scrypted.loop_monitor import LoopLagMonitor, _Sample, summarize
+from custom_components.scrypted.models import ScryptedEntryData
 
 
 def test_sensor_attributes():
@@ -34,3 +45,109 @@ async def test_async_setup_entry_adds_token_sensor(hass):
     await sensor.async_setup_entry(hass, entry, _add_entities)
     assert len(added) == 1
     assert added[0].native_value == "token"
+
+
+@pytest.mark.asyncio
+async def test_sensor_follows_token_updates(hass):
+    """Test that the sensor picks up a token swapped in by a background login."""
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_HOST: "example"})
+    entity = sensor.ScryptedTokenSensor(entry, "token")
+    entity.hass = hass
+    entity.entity_id = "sensor.scrypted_token"
+    await entity.async_added_to_hass()
+    async_dispatcher_send(hass, SIGNAL_TOKEN_UPDATED.format(entry.entry_id), "fresh")
+    assert entity.native_value == "fresh"
+    assert hass.states.get("sensor.scrypted_token").state == "fresh"
+
+
+async def test_loop_monitor_sensors(hass):
+    """Test that the shared monitor's sensors are added once and follow reports."""
+    monitor = LoopLagMonitor(hass, ProxyActivity())
+    entries = []
+    for host in ("first", "second"):
+        entry = MockConfigEntry(
+            domain=DOMAIN, data={CONF_HOST: host}, options={CONF_LOOP_MONITOR: True}
+        )
+        entry.add_to_hass(hass)
+        hass.data.setdefault(DOMAIN, {})[host] = entry
+        hass.data.setdefault(DATA_ENTRIES, {})[entry.entry_id] = ScryptedEntryData(
+            client=None, devices=None, events=None, loop_monitor=monitor
+        )
+        monitor.async_add_entry(entry.entry_id)
+        entries.append(entry)
+    first, second = entries
+
+    added: dict[str, list] = {}
+    for entry in entries:
+        added[entry.entry_id] = []
+        await sensor.async_setup_entry(hass, entry, added[entry.entry_id].extend)
+    assert len(added[second.entry_id]) == 1
+    _, lag, streams = added[first.entry_id]
+    assert lag.unique_id == f"{DOMAIN}_loop_lag"
+    assert lag.native_unit_of_measurement == "ms"
+    assert "spikes" in lag._unrecorded_attributes
+
+    # The sensors move to the next entry when their entry unloads.
+    for unload in first._on_unload:
+        unload()
+    monitor.async_remove_entry(first.entry_id)
+    assert [entity.unique_id for entity in added[second.entry_id][1:]] == [
+        f"{DOMAIN}_loop_lag",
+        f"{DOMAIN}_proxy_streams",
+    ]
+    monitor.async_remove_entry(second.entry_id)
+    assert not monitor.running
+
+    for entity, entity_id in ((lag, "sensor.lag"), (streams, "sensor.streams")):
+        entity.hass = hass
+        entity.entity_id = entity_id
+        await entity.async_added_to_hass()
+    stats = summarize(
+        [_Sample(0.2, 2, 4, 4 * 65536), _Sample(0.001, 0, 0, 0)],
+        ProxyActivity(streams=2, streams_refused=1),
+    )
+    async_dispatcher_send(hass, SIGNAL_LOOP_LAG, stats)
+    state = hass.states.get("sensor.lag")
+    assert float(state.state) == 200
+    assert state.attributes["spikes_with_streams"] == 1
+    assert state.attributes["write_size_during_spikes"] == 65536
+    state = hass.states.get("sensor.streams")
+    assert state.state == "2"
+    assert state.attributes["streams_refused"] == 1
+
+
+async def test_endpoint_sensor(hass):
+    """Test that entries with backup hosts show the host in use."""
+    entry = MockConfigEntry(domain=DOMAIN, data={CONF_HOST: "lan"})
+    entry.add_to_hass(hass)
+    hass.data.setdefault(DOMAIN, {})["token"] = entry
+
+    async def _login(host: str) -> str:
+        return "token"
+
+    async def _ping(host: str) -> None:
+        pass
+
+    pool = EndpointPool(hass, entry.entry_id, ["lan", "vpn"], _login, _ping)
+    hass.data[DATA_ENTRIES] = {
+        entry.entry_id: ScryptedEntryData(
+            client=None, devices=None, events=None, endpoints=pool
+        )
+    }
+    added = []
+    await sensor.async_setup_entry(hass, entry, added.extend)
+    _, entity = added
+    assert entity.unique_id == f"{entry.entry_id}_active_endpoint"
+    assert entity.native_value == "lan"
+
+    entity.hass = hass
+    entity.entity_id = "sensor.endpoint"
+    await entity.async_added_to_hass()
+    pool.endpoints[1].latency = 0.0123
+    pool.async_report_failure("lan", OSError("refused"))
+    state = hass.states.get("sensor.endpoint")
+    assert state.state == "vpn"
+    assert state.attributes["endpoints"] == [
+        {CONF_HOST: "lan", "healthy": False, "latency_ms": None, "error": "refused"},
+        {CONF_HOST: "vpn", "healthy": True, "latency_ms": 12.3, "error": None},
+    ]
@@ -0,0 +1,137 @@
+"""Tests for the Scrypted snapshot cache."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from custom_components.scrypted.snapshots import SnapshotCache
+
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeCamera:
+    """Counts fetches and lets a test control when they finish."""
+
+    def __init__(self) -> None:
+        self.fetches = 0
+        self.release = asyncio.Event()
+        self.release.set()
+        self.error: Exception | None = None
+
+    async def fetch(self) -> bytes:
+        self.fetches += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return f"image-{self.fetches}".encode()
+
+
+async def test_serves_cached_image_within_ttl():
+    """Test that requests within the TTL are cache hits."""
+    clock = FakeClock()
+    camera = FakeCamera()
+    cache = SnapshotCache(camera.fetch, ttl=10, clock=clock)
+    assert await cache.async_get() == b"image-1"
+    clock.now += 9
+    assert await cache.async_get() == b"image-1"
+    clock.now += 1
+    assert await cache.async_get() == b"image-2"
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert cache.hit_rate == pytest.approx(1 / 3)
+
+
+async def test_concurrent_requests_share_one_fetch():
+    """Test that viewers arriving during a fetch wait for it."""
+    camera = FakeCamera()
+    camera.release.clear()
+    cache = SnapshotCache(camera.fetch, ttl=10)
+    waiters = [asyncio.ensure_future(cache.async_get()) for _ in range(10)]
+    await asyncio.sleep(0)
+    camera.release.set()
+    assert await asyncio.gather(*waiters) == [b"image-1"] * 10
+    assert camera.fetches == 1
+    assert (cache.misses, cache.coalesced) == (1, 9)
+    assert cache.hit_rate == pytest.approx(0.9)
+
+
+async def test_cancelled_viewer_does_not_cancel_fetch():
+    """Test that the fetch survives the viewer that started it."""
+    camera = FakeCamera()
+    camera.release.clear()
+    cache = SnapshotCache(camera.fetch, ttl=10)
+    first = asyncio.ensure_future(cache.async_get())
+    await asyncio.sleep(0)
+    second = asyncio.ensure_future(cache.async_get())
+    await asyncio.sleep(0)
+    first.cancel()
+    camera.release.set()
+    assert await second == b"image-1"
+    assert camera.fetches == 1
+
+
+async def test_failure_without_image_is_raised_and_not_cached():
+    """Test that errors propagate and the next request tries again."""
+    camera = FakeCamera()
+    camera.error = OSError("down")
+    cache = SnapshotCache(camera.fetch, ttl=10)
+    with pytest.raises(OSError):
+        await cache.async_get()
+    camera.error = None
+    assert await cache.async_get() == b"image-2"
+    assert cache.errors == 1
+
+
+async def test_failure_serves_previous_image():
+    """Test that a failed refresh falls back to the stale image."""
+    clock = FakeClock()
+    camera = FakeCamera()
+    cache = SnapshotCache(camera.fetch, ttl=10, clock=clock)
+    await cache.async_get()
+    clock.now += 10
+    camera.error = OSError("down")
+    assert await cache.async_get() == b"image-1"
+    camera.error = None
+    assert await cache.async_get() == b"image-3"
+
+
+async def test_invalidate_forces_refresh():
+    """Test that an invalidated image is fetched again."""
+    camera = FakeCamera()
+    cache = SnapshotCache(camera.fetch, ttl=10)
+    await cache.async_get()
+    cache.invalidate()
+    assert await cache.async_get() == b"image-2"
+
+
+async def test_stats():
+    """Test the statistics exposed as attributes."""
+    clock = FakeClock()
+
+    async def _fetch() -> bytes:
+        clock.now += 0.25
+        return b"image"
+
+    cache = SnapshotCache(_fetch, ttl=10, clock=clock)
+    assert cache.stats()["snapshot_hit_rate"] is None
+    assert cache.stats()["snapshot_latency_ms"] is None
+    await cache.async_get()
+    await cache.async_get()
+    assert cache.stats() == {
+        "snapshot_hits": 1,
+        "snapshot_misses": 1,
+        "snapshot_coalesced": 0,
+        "snapshot_errors": 0,
+        "snapshot_hit_rate": 0.5,
+        "snapshot_latency_ms": 250.0,
+        "snapshot_average_latency_ms": 250.0,
+    }
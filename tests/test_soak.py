@@ -0,0 +1,295 @@
+"""Soak tests: churn the proxy and entry reloads, and fail on unbounded growth.
+
+Each test runs warm-up rounds, then measured rounds of churn, sampling the
+process after every round. They are left out of the default run; run them with
+`pytest -m soak --no-cov tests/test_soak.py`. Set `SCRYPTED_SOAK_ROUNDS` to soak
+for longer, e.g. 200 rounds churn 15000 proxied connections and 600 entry
+reloads, and `SCRYPTED_SOAK_FRAMES` to see more of the stack behind the
+allocators reported on failure.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+from dataclasses import dataclass
+import gc
+import logging
+import os
+import time
+import tracemalloc
+import warnings
+
+import pytest
+from aiohttp import ClientError, ClientSession
+from homeassistant.const import CONF_HOST, CONF_ICON, CONF_NAME, CONF_USERNAME
+from homeassistant.helpers import storage
+from yarl import URL
+
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+import custom_components.scrypted as scrypted
+from custom_components.scrypted.const import (
+    CONF_AUTO_REGISTER_RESOURCES,
+    CONF_LOOP_MONITOR,
+    CONF_SCRYPTED_NVR,
+    DOMAIN,
+)
+from custom_components.scrypted.http import ScryptedView
+
+from .stand_in import ProxyUnderTest, StandInScrypted, serve_view
+
+ROUNDS = int(os.environ.get("SCRYPTED_SOAK_ROUNDS", 4))
+WARMUP_ROUNDS = 2
+# Connections of each kind churned, and entry reloads, per round.
+CHURN = 25
+RELOADS = 3
+# Growth from the first to the second half of the measured rounds that still
+# counts as steady state: allocator slack and connections still closing.
+SLACK = {"rss": 4 * 1024 * 1024, "traced": 32 * 1024, "fds": 2, "tasks": 2}
+# Frames kept per traced allocation; deeper traces attribute growth better but
+# slow the churn down a lot.
+TRACE_FRAMES = int(os.environ.get("SCRYPTED_SOAK_FRAMES", 1))
+# Allocations of the test harness itself, like captured logs and warnings.
+UNTRACED = tuple(
+    tracemalloc.Filter(False, pattern)
+    for pattern in (
+        "*/_pytest/*",
+        "*/pytest_homeassistant_custom_component/*",
+        "*/tracemalloc.py",
+        "*/linecache.py",
+        "*/warnings.py",
+        "*/logging/__init__.py",
+        "*/tests/*",
+        "<frozen importlib._bootstrap*>",
+        "<unknown>",
+    )
+)
+
+pytestmark = [
+    pytest.mark.soak,
+    pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs procfs"),
+]
+
+
+@dataclass(frozen=True)
+class _Usage:
+    """Process resources after a round."""
+
+    rss: int
+    traced: int
+    fds: int
+    tasks: int
+
+
+class ResourceTracker:
+    """Sample resources between rounds and tell steady state from growth."""
+
+    def __init__(self) -> None:
+        """Initialize the tracker."""
+        self.samples: list[_Usage] = []
+        self._first: tracemalloc.Snapshot | None = None
+        self._last: tracemalloc.Snapshot | None = None
+
+    def __enter__(self) -> ResourceTracker:
+        """Start tracing allocations, with the harness out of the way.
+
+        Debug mode keeps a traceback for every task and handle, and pytest keeps
+        every log record and warning; neither happens in production.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._debug = self._loop.get_debug()
+        self._loop.set_debug(False)
+        self._warnings = warnings.catch_warnings()
+        self._warnings.__enter__()
+        warnings.simplefilter("ignore")
+        logging.disable(logging.CRITICAL)
+        tracemalloc.start(TRACE_FRAMES)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Stop tracing allocations and restore the harness."""
+        tracemalloc.stop()
+        logging.disable(logging.NOTSET)
+        self._warnings.__exit__(*exc_info)
+        self._loop.set_debug(self._debug)
+
+    def sample(self) -> None:
+        """Record the resources in use now."""
+        gc.collect()
+        snapshot = tracemalloc.take_snapshot().filter_traces(UNTRACED)
+        if self._first is None:
+            self._first = snapshot
+        self._last = snapshot
+        with open("/proc/self/statm", encoding="ascii") as statm:
+            rss = int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        self.samples.append(
+            _Usage(
+                rss=rss,
+                traced=sum(stat.size for stat in snapshot.statistics("filename")),
+                fds=len(os.listdir("/proc/self/fd")),
+                tasks=len(asyncio.all_tasks()),
+            )
+        )
+
+    def assert_bounded(self) -> None:
+        """Fail if the second half of the rounds used more than the first half."""
+        half = len(self.samples) // 2
+        first, second = self.samples[:half], self.samples[half:]
+        grown = [
+            name
+            for name, slack in SLACK.items()
+            if max(getattr(usage, name) for usage in second)
+            > max(getattr(usage, name) for usage in first) + slack
+        ]
+        assert not grown, f"{', '.join(grown)} kept growing:\n{self.report()}"
+
+    def report(self) -> str:
+        """Describe the samples and the allocators that grew the most."""
+        lines = [str(usage) for usage in self.samples]
+        if self._first is not None and self._last is not None:
+            lines += [
+                str(stat)
+                for stat in self._last.compare_to(self._first, "traceback")[:10]
+            ]
+        return "\n".join(lines)
+
+
+async def _wait_idle(view: ScryptedView) -> None:
+    """Wait until the view finished every relay and stream."""
+    deadline = time.monotonic() + 5
+    while view._inflight or view.activity.streams:
+        assert time.monotonic() < deadline, "proxied requests never finished"
+        await asyncio.sleep(0.01)
+
+
+async def _vanish_mid_relay(url: URL) -> None:
+    """Open a WebSocket by hand and drop the connection, like a killed tab."""
+    reader, writer = await asyncio.open_connection(url.host, url.port)
+    key = base64.b64encode(os.urandom(16)).decode()
+    writer.write(
+        f"GET {url.raw_path} HTTP/1.1\r\nHost: {url.host}:{url.port}\r\n"
+        "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+        f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n".encode()
+    )
+    assert (await reader.readuntil(b"\r\n\r\n")).startswith(b"HTTP/1.1 101")
+    writer.transport.abort()
+
+
+async def test_proxy_churn_is_bounded(allow_unix_connect):
+    """Test that relays and aborted streams leave nothing behind."""
+    server = StandInScrypted()
+    proxy = ProxyUnderTest(await server.start_tcp())
+    prefix = await proxy.start()
+    view = proxy.view
+    try:
+        async with ClientSession() as session:
+
+            async def _round(number: int) -> None:
+                for index in range(CHURN):
+                    async with session.ws_connect(f"{prefix}/endpoint/ws") as ws:
+                        await ws.send_str("hello")
+                        assert (await ws.receive()).data == "hello"
+                    await _vanish_mid_relay(URL(f"{prefix}/endpoint/ws"))
+                    # A distinct path each time, so no per-path state may pile up.
+                    live = await session.get(
+                        f"{prefix}/endpoint/{number}-{index}.ts", params={"live": ""}
+                    )
+                    await live.content.readexactly(1024)
+                    live.close()
+                async with session.get(f"{prefix}/lit-core.min.js") as resp:
+                    assert resp.status == 200
+                await _wait_idle(view)
+                server.requests.clear()
+
+            # Warm up past the size of the URL cache, or it filling up would look
+            # like growth; it must stay at its size from then on.
+            info = ScryptedView._create_url.cache_info()
+            warmup = max(WARMUP_ROUNDS, info.maxsize // CHURN + 1)
+            with ResourceTracker() as tracker:
+                for number in range(warmup + ROUNDS):
+                    await _round(number)
+                    if number >= warmup:
+                        tracker.sample()
+                tracker.assert_bounded()
+            info = ScryptedView._create_url.cache_info()
+            assert info.currsize == info.maxsize
+    finally:
+        await proxy.close()
+        await server.close()
+
+
+async def test_entry_reload_churn_is_bounded(hass, monkeypatch, allow_unix_connect):
+    """Test that reloading with relays, streams and the loop monitor is bounded."""
+    server = StandInScrypted()
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        data={
+            CONF_HOST: await server.start_tcp(),
+            CONF_ICON: "mdi:cctv",
+            CONF_NAME: "Scrypted",
+            CONF_USERNAME: "user",
+        },
+        options={
+            CONF_AUTO_REGISTER_RESOURCES: False,
+            CONF_LOOP_MONITOR: True,
+            CONF_SCRYPTED_NVR: False,
+        },
+    )
+    entry.add_to_hass(hass)
+
+    # Plain functions, as mocks would keep a record of every call.
+    async def _done(*args) -> bool:
+        return True
+
+    monkeypatch.setattr(scrypted, "async_register_built_in_panel", lambda *a, **k: None)
+    monkeypatch.setattr(scrypted, "async_remove_panel", lambda *args: None)
+    monkeypatch.setattr(scrypted, "_async_unregister_lovelace_resource", _done)
+    monkeypatch.setattr(hass.config_entries, "async_forward_entry_setups", _done)
+    monkeypatch.setattr(hass.config_entries, "async_unload_platforms", _done)
+
+    async with ClientSession() as upstream, ClientSession() as session:
+        view = hass.data[scrypted._VIEW] = ScryptedView(hass, upstream)
+        original_drain = view.async_drain
+        monkeypatch.setattr(
+            view, "async_drain", lambda entry_id: original_drain(entry_id, 0.05)
+        )
+        runner, base_url = await serve_view(view)
+        prefix = f"{base_url}/api/{DOMAIN}/token"
+
+        async def _reload() -> None:
+            assert await scrypted.async_setup_entry(hass, entry)
+            live = await session.get(f"{prefix}/endpoint/live", params={"live": ""})
+            ws = await session.ws_connect(f"{prefix}/endpoint/ws")
+            await ws.send_str("hello")
+            await ws.receive()
+            assert await scrypted.async_unload_entry(hass, entry)
+            # What Home Assistant does once the entry unloaded.
+            while entry._on_unload:
+                entry._on_unload.pop()()
+            await ws.receive(timeout=1)
+            await ws.close()
+            with pytest.raises(ClientError):
+                await asyncio.wait_for(live.content.read(), 1)
+            live.release()
+            await hass.async_block_till_done()
+            await asyncio.gather(*hass._background_tasks, return_exceptions=True)
+            await _wait_idle(view)
+            server.requests.clear()
+            # The harness' storage mocks record every call with its Store.
+            storage.Store._async_load.reset_mock()
+            storage.Store._async_write_data.reset_mock()
+
+        try:
+            with ResourceTracker() as tracker:
+                for number in range(WARMUP_ROUNDS + ROUNDS):
+                    for _ in range(RELOADS):
+                        await _reload()
+                    if number >= WARMUP_ROUNDS:
+                        tracker.sample()
+                tracker.assert_bounded()
+            assert not scrypted._get_loop_monitor(hass).running
+            assert view._inflight == {}
+        finally:
+            await runner.cleanup()
+            await server.close()